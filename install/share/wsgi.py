@@ -45,9 +45,13 @@ from ipalib import api
 
 logger = logging.getLogger(os.path.basename(__file__))
 
-api.bootstrap(context='server', confdir=paths.ETC_IPA, log=None)
+# Plugin modules are imported and plugins finalized when they are first
+# used, see ipaserver/plugins/manifest.json
+api.bootstrap(context='server', confdir=paths.ETC_IPA, log=None,
+              plugins_on_demand=True)
 try:
     api.finalize()
+    api.Backend.wsgi_dispatch.ensure_finalized()
 except Exception as e:
     logger.error('Failed to start IPA: %s', e)
 else:
@@ -2,9 +2,11 @@
 # Copyright (C) 2016  FreeIPA Contributors see COPYING for license
 #
 
-from ipalib import api
+import json
+
+from ipalib import api, errors
 from ipalib.frontend import Command, Method
-from ipalib.parameters import Str
+from ipalib.parameters import File, Str
 from ipalib.text import _
 from ipalib.util import classproperty
 
@@ -211,3 +213,47 @@ class MethodOverride(CommandOverride, Method):
                 continue
             seen.add(output_param.name)
             yield output_param
+
+
+class BulkCreateOverride(MethodOverride):
+    """
+    Bulk create command which reads the records from a file in the CLI.
+
+    The file contains one JSON object with arguments and options of the add
+    command per line. When no file is given, the records are read from the
+    standard input.
+    """
+
+    def get_args(self):
+        for arg in super(BulkCreateOverride, self).get_args():
+            if arg.name == 'records' and self.api.env.context == 'cli':
+                arg = arg.clone_retype(
+                    arg.name, File,
+                    multivalue=False,
+                    stdin_if_missing=True,
+                    label=_('Records file'),
+                    doc=_('File with one JSON object per line'),
+                )
+            yield arg
+
+    def forward(self, records=None, **options):
+        if isinstance(records, str):
+            records = self._parse_records(records)
+        return super(BulkCreateOverride, self).forward(records, **options)
+
+    def _parse_records(self, data):
+        records = []
+        for lineno, line in enumerate(data.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                raise errors.ValidationError(
+                    name='records',
+                    error=_('line %(lineno)d: must be a JSON object') % dict(
+                        lineno=lineno))
+            records.append(record)
+        return records
@@ -0,0 +1,13 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+from ipaclient.frontend import BulkCreateOverride
+from ipalib.plugable import Registry
+
+register = Registry()
+
+
+@register(override=True, no_fail=True)
+class group_add_bulk(BulkCreateOverride):
+    pass
@@ -18,7 +18,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from ipaclient.frontend import MethodOverride
+from ipaclient.frontend import BulkCreateOverride, MethodOverride
 from ipalib import errors, util
 from ipalib.plugable import Registry
 from ipalib import _
@@ -27,6 +27,11 @@ from ipalib import x509
 register = Registry()
 
 
+@register(override=True, no_fail=True)
+class host_add_bulk(BulkCreateOverride):
+    pass
+
+
 @register(override=True, no_fail=True)
 class host_show(MethodOverride):
     def forward(self, *keys, **options):
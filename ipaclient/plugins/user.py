@@ -18,7 +18,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from ipaclient.frontend import MethodOverride
+from ipaclient.frontend import BulkCreateOverride, MethodOverride
 from ipalib import errors
 from ipalib import Flag
 from ipalib import util
@@ -29,6 +29,11 @@ from ipalib import x509
 register = Registry()
 
 
+@register(override=True, no_fail=True)
+class user_add_bulk(BulkCreateOverride):
+    pass
+
+
 @register(override=True, no_fail=True)
 class user_del(MethodOverride):
     def get_options(self):
@@ -5,11 +5,13 @@
 import errno
 import json
 import logging
+import mmap
 import os
+import struct
 import sys
 import tempfile
 import types
-import zipfile
+import zlib
 
 from cryptography import x509 as crypto_x509
 
@@ -36,7 +38,7 @@ else:
 
 logger = logging.getLogger(__name__)
 
-FORMAT = '1'
+FORMAT = '2'
 
 if six.PY3:
     unicode = str
@@ -352,6 +354,11 @@ class NotAvailable(Exception):
     pass
 
 
+# schema file starts with _MAGIC and size of the index
+_MAGIC = b'IPA-SCHEMA\n'
+_INDEX_SIZE = struct.Struct('>Q')
+
+
 class Schema:
     """
     Store and provide schema for commands and topics
@@ -378,7 +385,8 @@ class Schema:
     def __init__(self, client, fingerprint=None):
         self._dict = {}
         self._namespaces = {}
-        self._help = None
+        self._help = {}
+        self._data = None
 
         for ns in self.namespaces:
             self._dict[ns] = {}
@@ -444,16 +452,37 @@ class Schema:
         return (fp, ttl,)
 
     def _read_schema(self, fingerprint):
-        # It's more efficient to read zip file members at once than to open
-        # the zip file a couple of times, see #6690.
+        # Only the index is decoded here, namespace members and help are
+        # read from the mapped file and decoded on first access, so running
+        # a single command does not need to process the whole schema.
         filename = os.path.join(self._DIR, fingerprint)
-        with zipfile.ZipFile(filename, 'r') as schema:
-            for name in schema.namelist():
-                ns, _slash, key = name.partition('/')
-                if ns in self.namespaces:
-                    self._dict[ns][key] = schema.read(name)
-                elif name == '_help':
-                    self._help = schema.read(name)
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if data[:len(_MAGIC)] != _MAGIC:
+                raise ValueError("{}: invalid schema file".format(filename))
+            index_start = len(_MAGIC) + _INDEX_SIZE.size
+            (index_size,) = _INDEX_SIZE.unpack(data[len(_MAGIC):index_start])
+            data_start = index_start + index_size
+            index = json.loads(
+                data[index_start:data_start].decode('utf-8'))
+            if data_start + index['size'] != len(data):
+                raise ValueError("{}: truncated schema file".format(filename))
+        except Exception:
+            data.close()
+            raise
+
+        self._data = (data, data_start)
+        for ns in self.namespaces:
+            self._dict[ns] = index['members'][ns]
+        self._help = index['help']
+
+    def _read_data(self, location):
+        data, data_start = self._data
+        offset, size = location
+        start = data_start + offset
+        return json.loads(zlib.decompress(data[start:start + size]))
 
     def __getitem__(self, key):
         try:
@@ -502,27 +531,41 @@ class Schema:
                 os.rename(f.name, os.path.join(self._DIR, fingerprint))
 
     def _write_schema_data(self, fileobj):
-        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as schema:
-            for key, value in self._dict.items():
-                if key in self.namespaces:
-                    ns = value
-                    for member in ns:
-                        path = '{}/{}'.format(key, member)
-                        s = json.dumps(ns[member], default=json_default)
-                        schema.writestr(path, s.encode('utf-8'))
-                else:
-                    schema.writestr(key, json.dumps(value).encode('utf-8'))
-
-            schema.writestr(
-                '_help',
-                json.dumps(self._help, default=json_default).encode('utf-8')
-            )
+        index = dict(members={}, help={})
+        chunks = []
+        offset = 0
+
+        def add(value):
+            nonlocal offset
+            chunk = zlib.compress(
+                json.dumps(value, default=json_default).encode('utf-8'))
+            chunks.append(chunk)
+            location = (offset, len(chunk))
+            offset += len(chunk)
+            return location
+
+        for ns in sorted(self.namespaces):
+            index['members'][ns] = {
+                member: add(self.read_namespace_member(ns, member))
+                for member in sorted(self._dict[ns])
+            }
+        for ns in sorted(self._help):
+            index['help'][ns] = add(self._get_help_namespace(ns))
+        index['size'] = offset
+
+        index = json.dumps(index, sort_keys=True).encode('utf-8')
+        fileobj.write(_MAGIC)
+        fileobj.write(_INDEX_SIZE.pack(len(index)))
+        fileobj.write(index)
+        for chunk in chunks:
+            fileobj.write(chunk)
 
     def read_namespace_member(self, namespace, member):
         value = self._dict[namespace][member]
 
-        if isinstance(value, bytes):
-            value = json.loads(value.decode('utf-8'))
+        if isinstance(value, list):
+            # location of the member in the schema file
+            value = self._read_data(value)
             self._dict[namespace][member] = value
 
         return value
@@ -530,13 +573,40 @@ class Schema:
     def iter_namespace(self, namespace):
         return iter(self._dict[namespace])
 
+    def _get_help_namespace(self, namespace):
+        value = self._help[namespace]
+
+        if isinstance(value, list):
+            value = self._read_data(value)
+            self._help[namespace] = value
+
+        return value
+
     def get_help(self, namespace, member):
-        if isinstance(self._help, bytes):
-            self._help = json.loads(
-                self._help.decode('utf-8')  # pylint: disable=no-member
-            )
+        return self._get_help_namespace(namespace)[member]
+
+
+class _SchemaTopicModule(types.ModuleType):
+    # Topic module, its docstring is read from the schema on first access
 
-        return self._help[namespace][member]
+    _doc = None
+    _doc_source = None
+
+    def set_doc_source(self, topics, full_name):
+        self._doc_source = (topics, full_name)
+
+    @property
+    def __doc__(self):
+        if self._doc_source is not None:
+            topics, full_name = self._doc_source
+            self._doc = topics[full_name].get('doc')
+            self._doc_source = None
+        return self._doc
+
+    @__doc__.setter
+    def __doc__(self, value):
+        self._doc = value
+        self._doc_source = None
 
 
 def get_package(server_info, client):
@@ -595,15 +665,22 @@ def get_package(server_info, client):
             plugin = module.register()(plugin)  # pylint: disable=no-member
     sys.modules[module_name] = module
 
-    for full_name, topic in six.iteritems(schema['topics']):
+    topics = schema['topics']
+    for full_name in topics:
+        # the help index has everything but the docstring of the topic
+        topic = topics.get_help(full_name)
         name = str(topic['name'])
         module_name = '.'.join((package_name, name))
         try:
             module = sys.modules[module_name]
         except KeyError:
-            module = sys.modules[module_name] = types.ModuleType(module_name)
+            module = _SchemaTopicModule(module_name)
+            sys.modules[module_name] = module
             module.__file__ = os.path.join(package_dir, '{}.py'.format(name))
-        module.__doc__ = topic.get('doc')
+        if isinstance(module, _SchemaTopicModule):
+            module.set_doc_source(topics, full_name)
+        else:
+            module.__doc__ = topics[full_name].get('doc')
         if 'topic_topic' in topic:
             s = topic['topic_topic']
             if isinstance(s, bytes):
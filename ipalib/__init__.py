@@ -932,6 +932,7 @@ Registry = plugable.Registry
 
 class API(plugable.API):
     bases = (Command, Object, Method, Backend, Updater)
+    manifest_attributes = ('obj_name',)
 
     @property
     def packages(self):
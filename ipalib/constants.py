@@ -206,6 +206,34 @@ DEFAULT_CONFIG = (
     ('recommended_max_agmts', 4),  # Recommended maximum number of replication
                                    # agreements
 
+    # Batch plugin:
+    # Maximum number of threads executing read-only commands of a batch
+    # in parallel
+    ('batch_max_workers', 4),
+
+    # LDAP backend:
+    # Maximum number of idle GSSAPI-bound LDAP connections a server process
+    # keeps for reuse by later requests of the same principal, 0 disables
+    # connection pooling
+    ('ldap_pool_size', 10),
+    # Idle pooled LDAP connections are closed after this many seconds
+    ('ldap_pool_idle_timeout', 60),
+
+    # Trusted domains:
+    # Seconds for which a server process caches Global Catalog servers of
+    # trusted domains and objects resolved in them, 0 disables the cache
+    ('trust_cache_ttl', 300),
+    # Seconds for which failed lookups in trusted domains are cached
+    ('trust_negative_cache_ttl', 30),
+
+    # Request timing:
+    # Record durations of command phases and LDAP operations of each request
+    # and return them in the X-IPA-Timing response header
+    ('command_timing', False),
+    # With command_timing, log commands which take at least this many
+    # milliseconds
+    ('slow_command_threshold', 1000),
+
     # Special CLI:
     ('prompt_all', False),
     ('interactive', True),
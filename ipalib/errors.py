@@ -245,6 +245,14 @@ class PluginModuleError(PrivateError):
     format = '%(name)s is not a valid plugin module'
 
 
+class PluginManifestError(PrivateError):
+    """
+    Raised when a plugin manifest does not match the plugin modules.
+    """
+
+    format = 'plugin manifest of %(name)s is out of date: %(reason)s'
+
+
 ##############################################################################
 # Public errors:
 
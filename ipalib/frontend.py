@@ -36,7 +36,7 @@ from ipalib.errors import (ZeroArgumentError, MaxArgumentError, OverlapError,
     VersionError, OptionError,
     ValidationError, ConversionError)
 from ipalib import errors, messages
-from ipalib.request import context, context_frame
+from ipalib.request import context, context_frame, get_timings
 from ipalib.util import classproperty, json_serialize
 
 if six.PY3:
@@ -450,6 +450,15 @@ class Command(HasParam):
             return self.__do_call(*args, **options)
 
     def __do_call(self, *args, **options):
+        timings = get_timings()
+        if timings is not None:
+            if timings.command is None:
+                timings.command = self.name
+                start = timings.clock()
+            else:
+                # only the phases of the requested command are recorded,
+                # commands it calls are part of its run phase
+                timings = None
         self.context.__messages = []
         if 'version' in options:
             self.verify_client_version(unicode(options['version']))
@@ -465,17 +474,29 @@ class Command(HasParam):
         logger.debug(
             'raw: %s(%s)', self.name, ', '.join(self._repr_iter(**params))
         )
+        if timings is not None:
+            start = timings.add_phase('args_options_2_params', start)
         if self.api.env.in_server:
             params.update(self.get_default(**params))
+            if timings is not None:
+                start = timings.add_phase('get_default', start)
         params = self.normalize(**params)
+        if timings is not None:
+            start = timings.add_phase('normalize', start)
         params = self.convert(**params)
         logger.debug(
             '%s(%s)', self.name, ', '.join(self._repr_iter(**params))
         )
+        if timings is not None:
+            start = timings.add_phase('convert', start)
         if self.api.env.in_server:
             self.validate(**params)
+            if timings is not None:
+                start = timings.add_phase('validate', start)
         (args, options) = self.params_2_args_options(**params)
         ret = self.run(*args, **options)
+        if timings is not None:
+            start = timings.add_phase('run', start)
         if isinstance(ret, dict):
             for message in self.context.__messages:
                 messages.add_message(options['version'], ret, message)
@@ -487,6 +508,8 @@ class Command(HasParam):
             ret['summary'] = self.get_summary_default(ret)
         if self.use_output_validation and (self.output or ret is not None):
             self.validate_output(ret, options['version'])
+            if timings is not None:
+                timings.add_phase('validate_output', start)
         return ret
 
     def add_message(self, message):
@@ -1273,11 +1296,17 @@ class Object(HasParam):
             return
         namespace = self.api[name]
         assert type(namespace) is APINameSpace
-        for plugin in namespace(): # Equivalent to dict.itervalues()
-            if plugin is not namespace[plugin.name]:
+        for plugin in namespace:
+            if plugin is not namespace.get_plugin(plugin.name):
+                continue
+            # skip plugins of other objects without instantiating them when
+            # the object name is known from the class or plugin manifest
+            obj_name = getattr(plugin, 'obj_name', None)
+            if isinstance(obj_name, str) and obj_name != self.name:
                 continue
-            if plugin.obj_name == self.name:
-                yield plugin
+            instance = namespace[plugin]
+            if instance.obj_name == self.name:
+                yield instance
 
     def get_params(self):
         """
@@ -35,7 +35,9 @@ from os import path
 import optparse  # pylint: disable=deprecated-module
 import textwrap
 import collections
+import hashlib
 import importlib
+import json
 
 import six
 
@@ -66,6 +68,10 @@ logger = logging.getLogger(__name__)
 # FIXME: Updated constants.TYPE_ERROR to use this clearer format from wehjit:
 TYPE_ERROR = '%s: need a %r; got a %r: %r'
 
+# Plugin manifest of a plugins package, see `API.make_manifest`
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_FORMAT = 2
+
 
 # FIXME: This function has no unit test
 def find_modules_in_dir(src_dir):
@@ -89,6 +95,19 @@ def find_modules_in_dir(src_dir):
         yield module
 
 
+def module_source_hash(src_dir, module):
+    """
+    Return SHA-256 hex digest of the source of ``module`` in ``src_dir``.
+
+    None is returned if the module has no source file.
+    """
+    try:
+        with open(os.path.join(src_dir, module + '.py'), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
 class Registry:
     """A decorator that makes plugins available to the API
 
@@ -131,6 +150,65 @@ class Registry:
         return iter(self.__registry.values())
 
 
+class _ManifestPlugin:
+    """
+    Stand-in for a plugin described in a plugin manifest.
+
+    It provides the attributes the API needs to register the plugin. The
+    plugin module is imported only when the plugin is instantiated or when
+    any other attribute is accessed.
+    """
+
+    def __init__(self, module_name, module_plugins, bases, info,
+                 attributes):
+        self._module_name = module_name
+        self._module_plugins = module_plugins
+        self._plugin = None
+        self.full_name = info['full_name']
+        self.name, _slash, self.version = self.full_name.partition('/')
+        self.bases = bases
+        for name in attributes:
+            setattr(self, name, info.get(name))
+
+    def __repr__(self):
+        return '<%s %s from %s>' % (
+            self.__class__.__name__, self.full_name, self._module_name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get_plugin(), name)
+
+    def get_plugin(self):
+        """
+        Import the plugin module, return the plugin class.
+        """
+        if self._plugin is not None:
+            return self._plugin
+
+        logger.debug("importing plugin module %s", self._module_name)
+        module = importlib.import_module(self._module_name)
+        plugins = {
+            kwargs['plugin'].full_name: kwargs['plugin']
+            for kwargs in getattr(module, 'register', ())
+        }
+        if set(plugins) != self._module_plugins:
+            logger.warning(
+                "%s", errors.PluginManifestError(
+                    name=self._module_name,
+                    reason="registered plugins differ"))
+        try:
+            self._plugin = plugins[self.full_name]
+        except KeyError:
+            raise errors.PluginManifestError(
+                name=self._module_name,
+                reason="%s is not registered" % self.full_name)
+        return self._plugin
+
+    def __call__(self, api):
+        return self.get_plugin()(api)
+
+
 class Plugin(ReadOnly):
     """
     Base class for all plugins.
@@ -367,6 +445,9 @@ class API(ReadOnly):
     def packages(self):
         raise NotImplementedError
 
+    # Plugin class attributes recorded in plugin manifests
+    manifest_attributes = ()
+
     def __len__(self):
         """
         Return the number of plugin namespaces in this API object.
@@ -625,13 +706,7 @@ class API(ReadOnly):
         for package in self.packages:
             self.add_package(package)
 
-    # FIXME: This method has no unit test
-    def add_package(self, package):
-        """
-        Add plugin modules from the ``package``.
-
-        :param package: A package from which to add modules.
-        """
+    def __get_package_modules(self, package):
         package_name = package.__name__
         package_file = package.__file__
         package_dir = path.dirname(path.abspath(package_file))
@@ -643,8 +718,31 @@ class API(ReadOnly):
                 name=package_name, file=package_file
             )
 
-        logger.debug("importing all plugin modules in %s...", package_name)
         modules = getattr(package, 'modules', find_modules_in_dir(package_dir))
+        return package_dir, list(modules)
+
+    def add_package(self, package):
+        """
+        Add plugin modules from the ``package``.
+
+        If plugins are finalized on-demand and the package ships an up to
+        date plugin manifest, the plugins are added from the manifest and
+        their modules are imported only when the plugins are used.
+
+        :param package: A package from which to add modules.
+        """
+        package_name = package.__name__
+        package_dir, modules = self.__get_package_modules(package)
+
+        if self.env.plugins_on_demand:
+            try:
+                self.__add_manifest(package, package_dir, modules)
+            except errors.PluginManifestError as e:
+                logger.debug("%s", e)
+            else:
+                return
+
+        logger.debug("importing all plugin modules in %s...", package_name)
         modules = ['.'.join((package_name, mname)) for mname in modules]
 
         for name in modules:
@@ -665,6 +763,122 @@ class API(ReadOnly):
             except errors.PluginModuleError as e:
                 logger.debug("%s", e)
 
+    def __add_manifest(self, package, package_dir, modules):
+        package_name = package.__name__
+        filename = path.join(package_dir, MANIFEST_FILE)
+        try:
+            with open(filename) as f:
+                manifest = json.load(f)
+        except (IOError, ValueError) as e:
+            raise errors.PluginManifestError(name=package_name, reason=e)
+
+        if manifest.get('format') != MANIFEST_FORMAT:
+            raise errors.PluginManifestError(
+                name=package_name, reason="unsupported format")
+        if sorted(manifest['modules']) != sorted(modules):
+            raise errors.PluginManifestError(
+                name=package_name, reason="plugin modules differ")
+        if manifest['attributes'] != list(self.manifest_attributes):
+            raise errors.PluginManifestError(
+                name=package_name, reason="plugin attributes differ")
+        # modified modules may register other plugins
+        for mname in modules:
+            source_hash = module_source_hash(package_dir, mname)
+            if manifest['sources'].get(mname) != source_hash:
+                raise errors.PluginManifestError(
+                    name=package_name,
+                    reason="plugin module %s changed" % mname)
+        # plugin modules may register different plugins depending on these
+        # settings, see `make_manifest`
+        for key, value in manifest['env'].items():
+            if getattr(self.env, key, None) != value:
+                raise errors.PluginManifestError(
+                    name=package_name,
+                    reason="generated with %s=%r" % (key, value))
+
+        bases = {base.__name__: base for base in self.bases}
+        plugins = []
+        for mname in modules:
+            infos = manifest['modules'][mname]
+            module_name = '.'.join((package_name, mname))
+            module_plugins = frozenset(info['full_name'] for info in infos)
+            for info in infos:
+                try:
+                    plugin_bases = tuple(bases[b] for b in info['bases'])
+                except KeyError as e:
+                    raise errors.PluginManifestError(
+                        name=package_name, reason="unknown base %s" % e)
+                plugin = _ManifestPlugin(
+                    module_name, module_plugins, plugin_bases, info,
+                    self.manifest_attributes)
+                plugins.append((plugin, info))
+
+        logger.debug("adding plugins in %s from manifest", package_name)
+        for plugin, info in plugins:
+            self.add_plugin(
+                plugin,
+                override=info.get('override', False),
+                no_fail=info.get('no_fail', False),
+            )
+
+    def make_manifest(self, package):
+        """
+        Describe the plugins registered by the modules of the ``package``.
+
+        The manifest maps the plugin modules to the full names of the plugins
+        they register, `add_package` uses it to add the plugins without
+        importing the modules. Settings listed in ``manifest_env`` of the
+        package and hashes of the module sources are recorded, the manifest
+        is used only when they are the same.
+
+        :param package: A package from which to describe modules.
+        """
+        package_name = package.__name__
+        package_dir, modules = self.__get_package_modules(package)
+
+        result = collections.OrderedDict()
+        sources = collections.OrderedDict()
+        for mname in sorted(modules):
+            result[mname] = infos = []
+            sources[mname] = module_source_hash(package_dir, mname)
+            name = '.'.join((package_name, mname))
+            try:
+                module = importlib.import_module(name)
+            except errors.SkipPluginModule:
+                continue
+            register = getattr(module, 'register', None)
+            if not isinstance(register, Registry):
+                continue
+            for kwargs in register:
+                plugin = kwargs['plugin']
+                info = collections.OrderedDict()
+                info['full_name'] = plugin.full_name
+                info['bases'] = sorted(
+                    base.__name__ for base in self.bases
+                    if any(issubclass(b, base) for b in plugin.bases)
+                )
+                for key in ('override', 'no_fail'):
+                    if kwargs.get(key):
+                        info[key] = True
+                for attr in self.manifest_attributes:
+                    value = getattr(plugin, attr, None)
+                    if isinstance(value, property):
+                        value = value.fget(plugin)
+                    if value is not None:
+                        info[attr] = value
+                infos.append(info)
+
+        return collections.OrderedDict((
+            ('format', MANIFEST_FORMAT),
+            ('env', collections.OrderedDict(
+                (key, getattr(self.env, key, None))
+                for key in getattr(package, 'manifest_env', ())
+            )),
+            ('attributes', list(self.manifest_attributes)),
+            ('sources', sources),
+            ('modules', result),
+        ))
+
     def add_module(self, module):
         """
         Add plugins from the ``module``.
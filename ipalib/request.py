@@ -22,8 +22,10 @@
 Per-request thread-local data.
 """
 
+import collections
 import contextlib
 import threading
+import time
 
 from ipalib.base import ReadOnly, lock
 from ipalib.constants import CALLABLE_ERROR
@@ -68,6 +70,87 @@ class Connection(ReadOnly):
         lock(self)
 
 
+class Timings:
+    """
+    Timings of a request, recorded when ``command_timing`` is enabled.
+
+    Durations of the phases of the executed command are summed up by phase
+    name, LDAP operations by operation name with their count and the size
+    of the received entries.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self):
+        self.start = self.clock()
+        self.end = None
+        self.command = None
+        self.phases = collections.OrderedDict()
+        self.ldap = collections.OrderedDict()
+        # LDAP operations of parallel batch commands are recorded by worker
+        # threads
+        self.__lock = threading.Lock()
+
+    def add_phase(self, name, start):
+        """
+        Record a phase which started at ``start``, return the current clock
+        value to be used as the start of the next phase.
+        """
+        now = self.clock()
+        self.phases[name] = self.phases.get(name, 0.0) + now - start
+        return now
+
+    def add_ldap(self, operation, duration, size=0):
+        """
+        Record an LDAP operation which took ``duration`` seconds and
+        received ``size`` bytes of entries.
+        """
+        with self.__lock:
+            stats = self.ldap.setdefault(operation, [0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] += size
+
+    def finish(self):
+        self.end = self.clock()
+
+    @property
+    def total(self):
+        end = self.end if self.end is not None else self.clock()
+        return end - self.start
+
+    def __str__(self):
+        """
+        Format the timings as Server-Timing header value with durations in
+        milliseconds, e.g.::
+
+            total;dur=12.1, run;dur=10.5, ldap_search;dur=8.2;count=2;bytes=4096
+        """
+        items = ['total;dur=%.1f' % (self.total * 1000)]
+        for name, duration in self.phases.items():
+            items.append('%s;dur=%.1f' % (name, duration * 1000))
+        with self.__lock:
+            for name, (count, duration, size) in self.ldap.items():
+                items.append('ldap_%s;dur=%.1f;count=%d;bytes=%d' % (
+                    name, duration * 1000, count, size))
+        return ', '.join(items)
+
+
+def start_timings():
+    """
+    Start recording `Timings` of the current request.
+    """
+    context.timings = Timings()
+    return context.timings
+
+
+def get_timings():
+    """
+    Return `Timings` of the current request, None if they are not recorded.
+    """
+    return getattr(context, 'timings', None)
+
+
 def destroy_context():
     """
     Delete all attributes on thread-local `request.context`.
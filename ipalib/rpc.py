@@ -418,6 +418,103 @@ def json_encode_binary(val, version, pretty_print=False):
         return json.dumps(result)
 
 
+def _json_iterencode(primer, val, depth, _encode=json.JSONEncoder().encode):
+    """Encode val, walk the containers down to the given depth"""
+    func = primer[val.__class__]
+    if depth > 0 and func == primer._enc_list:
+        yield '['
+        first = True
+        for v in val:
+            if first:
+                first = False
+            else:
+                yield ', '
+            for chunk in _json_iterencode(primer, v, depth - 1):
+                yield chunk
+        yield ']'
+    elif (depth > 0 and func == primer._enc_dict and
+            all(isinstance(k, unicode) for k in val)):
+        yield '{'
+        first = True
+        for k, v in six.iteritems(val):
+            if first:
+                first = False
+            else:
+                yield ', '
+            yield _encode(k)
+            yield ': '
+            for chunk in _json_iterencode(primer, v, depth - 1):
+                yield chunk
+        yield '}'
+    else:
+        yield _encode(primer.convert(val))
+
+
+_JSON_KEY_TYPES = (unicode, int, float, bool, type(None))
+
+
+def _json_check(primer, val):
+    """Raise TypeError if val contains an object JSON cannot encode"""
+    enc_list = primer._enc_list
+    enc_dict = primer._enc_dict
+    stack = [val]
+    while stack:
+        val = stack.pop()
+        func = primer[val.__class__]
+        if func == enc_list:
+            stack.extend(val)
+        elif func == enc_dict:
+            for k in val:
+                if not isinstance(k, _JSON_KEY_TYPES):
+                    raise TypeError(
+                        'keys must be str, int, float, bool or None, '
+                        'not %s' % k.__class__.__name__)
+            stack.extend(six.itervalues(val))
+
+
+def json_iterencode_binary(val, version, pretty_print=False, depth=3,
+                           chunk_size=65536):
+    """Serialize a Python object structure to JSON incrementally
+
+    The output is the same as the output of json_encode_binary(), but it is
+    produced in chunks of at least chunk_size characters. Lists and dicts
+    down to the given depth are walked item by item and only the items
+    below are primed and serialized at once, so a large search result never
+    exists in memory twice.
+
+    The whole structure is checked before this function returns, an object
+    which cannot be serialized raises TypeError here rather than in the
+    middle of the iteration.
+
+    :param object val: Python object structure
+    :param str version: client version
+    :param bool pretty_print: indent and sort JSON (not incremental)
+    :param int depth: nesting level of incrementally encoded containers
+    :param int chunk_size: minimum size of produced chunks
+    :return: iterator of text chunks
+    """
+    if pretty_print:
+        return iter([json_encode_binary(val, version, pretty_print=True)])
+
+    primer = _JSONPrimer(version)
+    _json_check(primer, val)
+    return _json_iterchunks(primer, val, depth, chunk_size)
+
+
+def _json_iterchunks(primer, val, depth, chunk_size):
+    buf = []
+    size = 0
+    for chunk in _json_iterencode(primer, val, depth):
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield ''.join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield ''.join(buf)
+
+
 def _ipa_obj_hook(dct, _iteritems=six.iteritems, _list=list):
     """JSON object hook
 
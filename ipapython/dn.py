@@ -544,6 +544,46 @@ def rdn_key(rdn):
     return (len(rdn),) + tuple(ava_key(k) for k in rdn)
 
 
+def dn_key(rdns):
+    return tuple(rdn_key(rdn) for rdn in rdns)
+
+
+# Cache of parsed DN strings. DN objects are immutable, so the parsed RDNs
+# and their comparison key can be shared between all DN objects created
+# from the same string.
+_DN_CACHE_SIZE = 10000
+_dn_cache = {}
+
+
+def _parse_dn(value):
+    """
+    Parse DN string into a list of sorted RDNs in open ldap format and its
+    comparison key.
+    """
+    try:
+        return _dn_cache[value]
+    except KeyError:
+        pass
+
+    try:
+        rdns = str2dn(val_encode(value))
+    except DECODING_ERROR:
+        raise ValueError("malformed RDN string = \"%s\"" % value)
+    for rdn in rdns:
+        sort_avas(rdn)
+    result = (rdns, dn_key(rdns))
+
+    if len(_dn_cache) >= _DN_CACHE_SIZE:
+        _dn_cache.clear()
+    _dn_cache[value] = result
+    return result
+
+
+def clear_dn_cache():
+    """Forget all parsed DN strings, e.g. to measure DN parsing"""
+    _dn_cache.clear()
+
+
 if six.PY2:
     # Python 2: Input/output is unicode; we store UTF-8 bytes
     def val_encode(s):
@@ -1109,9 +1149,55 @@ class DN:
     AVA_type = AVA
     RDN_type = RDN
 
+    # normalized comparison key and hash, computed on first use
+    _key = None
+    _hash = None
+
     def __init__(self, *args, **kwds):
+        if len(args) == 1:
+            # fast path for the most common case
+            value = args[0]
+            if isinstance(value, str):
+                rdns, self._key = _parse_dn(value)
+                self.rdns = list(rdns)
+                return
+            elif isinstance(value, DN):
+                self.rdns = value._copy_rdns()
+                self._key = value._key
+                self._hash = value._hash
+                return
         self.rdns = self._rdns_from_sequence(args)
 
+    @classmethod
+    def from_many(cls, values):
+        """
+        Create a list of DN objects from a sequence of DN strings.
+
+        The values may also be UTF-8 encoded bytes, e.g. raw LDAP attribute
+        values. Every distinct string is parsed only once, so this is
+        considerably faster than calling DN() for each value of large
+        multi-valued DN attributes such as member.
+        """
+        result = []
+        for value in values:
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            elif not isinstance(value, str):
+                raise TypeError(
+                    "must be str or bytes, got %s instead" % type(value))
+            rdns, key = _parse_dn(value)
+            dn = cls.__new__(cls)
+            dn.rdns = list(rdns)
+            dn._key = key
+            result.append(dn)
+        return result
+
+    def _get_key(self):
+        key = self._key
+        if key is None:
+            key = self._key = dn_key(self.rdns)
+        return key
+
     def _copy_rdns(self, rdns=None):
         if not rdns:
             rdns = self.rdns
@@ -1119,14 +1205,7 @@ class DN:
 
     def _rdns_from_value(self, value):
         if isinstance(value, str):
-            try:
-                if isinstance(value, str):
-                    value = val_encode(value)
-                rdns = str2dn(value)
-            except DECODING_ERROR:
-                raise ValueError("malformed RDN string = \"%s\"" % value)
-            for rdn in rdns:
-                sort_avas(rdn)
+            rdns = list(_parse_dn(value)[0])
         elif isinstance(value, DN):
             rdns = value._copy_rdns()
         elif isinstance(value, (tuple, list, AVA)):
@@ -1204,23 +1283,24 @@ class DN:
                                 (key.__class__.__name__))
 
     def __hash__(self):
-        # Hash is computed from DN's string representation.
+        # Hash is computed from DN's normalized comparison key.
         #
         # Because attrs & values are comparison case-insensitive the
         # hash value between two objects which compare as equal but
         # differ in case must yield the same hash value.
-
-        str_dn = ';,'.join([
-            '++'.join([
-                '=='.join((atype, avalue or ''))
-                for atype, avalue, _dummy in rdn
-            ]) for rdn in self.rdns
-        ])
-        return hash(str_dn.lower())
+        h = self._hash
+        if h is None:
+            h = self._hash = hash(self._get_key())
+        return h
 
     def __eq__(self, other):
         # Try coercing to DN, if successful compare to coerced object
-        if isinstance(other, (str, RDN, AVA)):
+        if isinstance(other, str):
+            try:
+                return self._get_key() == _parse_dn(other)[1]
+            except Exception:
+                return False
+        elif isinstance(other, (RDN, AVA)):
             try:
                 other_dn = DN(other)
                 return self.__eq__(other_dn)
@@ -1231,11 +1311,19 @@ class DN:
         if not isinstance(other, DN):
             return False
 
-        if len(self) != len(other):
+        if self is other:
+            return True
+
+        if len(self.rdns) != len(other.rdns):
+            return False
+
+        h1 = self._hash
+        h2 = other._hash
+        if h1 is not None and h2 is not None and h1 != h2:
             return False
 
         # Perform comparison between objects of same type
-        return self._cmp_sequence(other, 0, len(self)) == 0
+        return self._get_key() == other._get_key()
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -1247,7 +1335,7 @@ class DN:
         if len(self) != len(other):
             return len(self) < len(other)
 
-        return self._cmp_sequence(other, 0, len(self)) < 0
+        return self._get_key() < other._get_key()
 
     def _cmp_sequence(self, pattern, self_start, pat_len):
         self_idx = self_start
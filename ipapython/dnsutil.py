@@ -21,9 +21,17 @@ import copy
 import logging
 import operator
 import random
+import selectors
+import socket
+import time
 
 import dns.name
 import dns.exception
+import dns.flags
+import dns.inet
+import dns.message
+import dns.query
+import dns.rcode
 import dns.resolver
 import dns.rdataclass
 import dns.rdatatype
@@ -38,6 +46,9 @@ if six.PY3:
 
 logger = logging.getLogger(__name__)
 
+# response codes for which the query is sent to the next nameserver
+_RETRY_RCODES = (dns.rcode.SERVFAIL, dns.rcode.REFUSED)
+
 
 class DNSZoneAlreadyExists(dns.exception.DNSException):
     supp_kwargs = {'zone', 'ns'}
@@ -466,3 +477,104 @@ def query_srv(qname, resolver=None, **kwargs):
         resolver = dns.resolver
     answer = resolver.query(qname, rdtype=dns.rdatatype.SRV, **kwargs)
     return sort_prio_weight(answer)
+
+
+def query_concurrently(queries, resolver=None):
+    """Send DNS queries at once to the nameservers of the resolver
+
+    All queries are sent over UDP to the first nameserver before waiting
+    for any response and the responses are collected as they arrive, for
+    at most resolver.timeout seconds per nameserver. Truncated responses
+    are repeated over TCP. Like dns.resolver, queries which got no response
+    or a SERVFAIL or REFUSED response are sent to the next nameserver.
+
+    :param queries: list of dns.message.Message queries
+    :return: list with a dns.message.Message response or
+        a dns.exception.DNSException instance for each query
+    """
+    if resolver is None:
+        resolver = dns.resolver.get_default_resolver()
+
+    results = [None] * len(queries)
+    pending = list(range(len(queries)))
+    for where in resolver.nameservers:
+        port = resolver.nameserver_ports.get(where, resolver.port)
+        responses = _query_nameserver(
+            [queries[i] for i in pending], where, port, resolver.timeout)
+        retry = []
+        for i, response in zip(pending, responses):
+            results[i] = response
+            if (isinstance(response, dns.exception.DNSException) or
+                    response.rcode() in _RETRY_RCODES):
+                retry.append(i)
+        pending = retry
+        if not pending:
+            break
+
+    return [
+        dns.resolver.NoNameservers() if result is None else result
+        for result in results
+    ]
+
+
+def _query_nameserver(queries, where, port, timeout):
+    """Send DNS queries at once to one nameserver, see query_concurrently
+    """
+    af = dns.inet.af_for_address(where)
+
+    results = [None] * len(queries)
+    sel = selectors.DefaultSelector()
+    try:
+        for i, query in enumerate(queries):
+            sock = socket.socket(af, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            try:
+                sock.sendto(query.to_wire(), (where, port))
+            except OSError as e:
+                logger.debug('failed to send DNS query to %s: %s', where, e)
+                sock.close()
+                results[i] = dns.resolver.NoNameservers()
+            else:
+                sel.register(sock, selectors.EVENT_READ, i)
+
+        deadline = time.time() + timeout
+        while sel.get_map():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            for key, _mask in sel.select(remaining):
+                i = key.data
+                try:
+                    wire, _address = key.fileobj.recvfrom(65535)
+                    response = dns.message.from_wire(wire)
+                except OSError as e:
+                    # e.g. ICMP port unreachable
+                    logger.debug('DNS query to %s failed: %s', where, e)
+                    response = dns.resolver.NoNameservers()
+                except dns.exception.DNSException:
+                    # malformed response, wait for a valid one
+                    continue
+                else:
+                    if not queries[i].is_response(response):
+                        continue
+                    if response.flags & dns.flags.TC:
+                        try:
+                            response = dns.query.tcp(
+                                queries[i], where, timeout=timeout,
+                                port=port)
+                        except (OSError, dns.exception.DNSException) as e:
+                            logger.debug('DNS query to %s over TCP '
+                                         'failed: %s', where, e)
+                            response = dns.resolver.NoNameservers()
+                results[i] = response
+                sel.unregister(key.fileobj)
+                key.fileobj.close()
+    finally:
+        for key in list(sel.get_map().values()):
+            key.fileobj.close()
+        sel.close()
+
+    return [
+        dns.exception.Timeout() if result is None else result
+        for result in results
+    ]
@@ -18,9 +18,11 @@
 #
 
 import collections
+from concurrent import futures
 import gzip
 import io
 import logging
+import threading
 from urllib.parse import urlencode
 import xml.dom.minidom
 import zlib
@@ -147,13 +149,68 @@ def ca_status(ca_host=None):
     return _parse_ca_status(body)
 
 
+def https_connection(host, port, cafile, client_certfile, client_keyfile):
+    """
+    Create a client authenticated HTTPS connection.
+
+    The connection can be passed to https_request() to send several
+    requests over one keep-alive connection. The caller is responsible
+    for closing it.
+    """
+    return create_https_connection(
+        host, port,
+        cafile=cafile,
+        client_certfile=client_certfile,
+        client_keyfile=client_keyfile,
+        tls_version_min=api.env.tls_version_min,
+        tls_version_max=api.env.tls_version_max)
+
+
+def map_with_connections(func, items, connection_factory,
+                         max_connections=4):
+    """
+    Call func(item, connection) for all items concurrently.
+
+    The calls are spread over up to max_connections threads, each of them
+    sends its requests over one connection created by connection_factory().
+    The connections are closed when all calls are finished.
+
+    Returns a list of the results in the order of items. If a call raises
+    an exception, the first one in the order of items is re-raised.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    local = threading.local()
+    connections = []
+    lock = threading.Lock()
+
+    def call(item):
+        conn = getattr(local, 'connection', None)
+        if conn is None:
+            conn = local.connection = connection_factory()
+            with lock:
+                connections.append(conn)
+        return func(item, conn)
+
+    max_workers = max(1, min(max_connections, len(items)))
+    try:
+        with futures.ThreadPoolExecutor(max_workers) as executor:
+            return list(executor.map(call, items))
+    finally:
+        for conn in connections:
+            conn.close()
+
+
 def https_request(
         host, port, url, cafile, client_certfile, client_keyfile,
-        method='POST', headers=None, body=None, **kw):
+        method='POST', headers=None, body=None, connection=None, **kw):
     """
     :param method: HTTP request method (defalut: 'POST')
     :param url: The path (not complete URL!) to post to.
     :param body: The request body (encodes kw if None)
+    :param connection: Connection from https_connection() to reuse
     :param kw:  Keyword arguments to encode into POST body.
     :return:   (http_status, http_headers, http_body)
                as (integer, dict, str)
@@ -162,19 +219,14 @@ def https_request(
     """
 
     def connection_factory(host, port):
-        return create_https_connection(
-            host, port,
-            cafile=cafile,
-            client_certfile=client_certfile,
-            client_keyfile=client_keyfile,
-            tls_version_min=api.env.tls_version_min,
-            tls_version_max=api.env.tls_version_max)
+        return https_connection(
+            host, port, cafile, client_certfile, client_keyfile)
 
     if body is None:
         body = urlencode(kw)
     return _httplib_request(
         'https', host, port, url, connection_factory, body,
-        method=method, headers=headers)
+        method=method, headers=headers, connection=connection)
 
 
 def http_request(host, port, url, timeout=None, **kw):
@@ -200,7 +252,8 @@ def http_request(host, port, url, timeout=None, **kw):
 
 def _httplib_request(
         protocol, host, port, path, connection_factory, request_body,
-        method='POST', headers=None, connection_options=None):
+        method='POST', headers=None, connection_options=None,
+        connection=None):
     """
     :param request_body: Request body
     :param connection_factory: Connection class to use. Will be called
@@ -208,6 +261,8 @@ def _httplib_request(
     :param method: HTTP request method (default: 'POST')
     :param connection_options: a dictionary that will be passed to
         connection_factory as keyword arguments.
+    :param connection: an open connection to use instead of creating a new
+        one. It is left open for further requests.
 
     Perform a HTTP(s) request.
     """
@@ -226,16 +281,33 @@ def _httplib_request(
         headers['content-type'] = 'application/x-www-form-urlencoded'
 
     try:
-        conn = connection_factory(host, port, **connection_options)
-        conn.request(method, path, body=request_body, headers=headers)
-        res = conn.getresponse()
+        if connection is None:
+            conn = connection_factory(host, port, **connection_options)
+        else:
+            conn = connection
+        try:
+            conn.request(method, path, body=request_body, headers=headers)
+            res = conn.getresponse()
+        except (httplib.RemoteDisconnected, ConnectionResetError,
+                BrokenPipeError):
+            if connection is None:
+                raise
+            # the server closed the idle keep-alive connection, the
+            # connection is opened again by the next request
+            logger.debug("connection closed by server, reconnecting")
+            conn.close()
+            conn.request(method, path, body=request_body, headers=headers)
+            res = conn.getresponse()
 
         http_status = res.status
         http_headers = res.msg
         http_body = res.read()
-        conn.close()
+        if connection is None:
+            conn.close()
     except Exception as e:
         logger.debug("httplib request failed:", exc_info=True)
+        if connection is not None:
+            connection.close()
         raise NetworkError(uri=uri, error=str(e))
 
     encoding = res.getheader('Content-Encoding')
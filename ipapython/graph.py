@@ -77,12 +77,120 @@ class Graph:
         """
         if not start:
             start = next(iter(self.vertices))
-        visited = set()
+        visited = {start}
         queue = deque([start])
 
         while queue:
             vertex = queue.popleft()
-            if vertex not in visited:
-                visited.add(vertex)
-                queue.extend(set(self._adj.get(vertex, [])) - visited)
+            for head in self._adj.get(vertex, []):
+                if head not in visited:
+                    visited.add(head)
+                    queue.append(head)
         return visited
+
+    def _adjacency(self, removed_vertices=(), removed_edges=()):
+        """
+        Get adjacency lists of the graph without the given vertices and
+        edges. An edge which is in the graph several times is removed once
+        for each occurrence in `removed_edges`.
+        """
+        removed_vertices = set(removed_vertices)
+        adj = {
+            tail: [head for head in heads if head not in removed_vertices]
+            for tail, heads in self._adj.items()
+            if tail not in removed_vertices
+        }
+        for tail, head in removed_edges:
+            try:
+                adj[tail].remove(head)
+            except (KeyError, ValueError):
+                pass
+        return adj
+
+    def strongly_connected_components(self, removed_vertices=(),
+                                      removed_edges=()):
+        """
+        Find strongly connected components of the graph with Tarjan's
+        algorithm, as if `removed_vertices` and `removed_edges` were removed
+        from the graph.
+
+        Return a list of sets of vertices in reverse topological order, no
+        component has an edge to a component which follows it in the list.
+        """
+        return self._strongly_connected_components(
+            self._adjacency(removed_vertices, removed_edges))
+
+    def _strongly_connected_components(self, adj):
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+
+        for root in adj:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(adj[root]))]
+
+            while work:
+                vertex, heads = work[-1]
+                for head in heads:
+                    if head not in index:
+                        index[head] = lowlink[head] = len(index)
+                        stack.append(head)
+                        on_stack.add(head)
+                        work.append((head, iter(adj[head])))
+                        break
+                    elif head in on_stack:
+                        lowlink[vertex] = min(lowlink[vertex], index[head])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent],
+                                              lowlink[vertex])
+                    if lowlink[vertex] == index[vertex]:
+                        component = set()
+                        while True:
+                            v = stack.pop()
+                            on_stack.remove(v)
+                            component.add(v)
+                            if v == vertex:
+                                break
+                        components.append(component)
+
+        return components
+
+    def reachability(self, removed_vertices=(), removed_edges=()):
+        """
+        Get vertices reachable from each vertex, as if `removed_vertices`
+        and `removed_edges` were removed from the graph.
+
+        The graph is traversed once, vertices of one strongly connected
+        component share the same frozenset.
+
+        Return a dictionary mapping each vertex to the frozenset of vertices
+        reachable from it, including the vertex itself
+        """
+        adj = self._adjacency(removed_vertices, removed_edges)
+        components = self._strongly_connected_components(adj)
+        component_of = {
+            v: i for i, component in enumerate(components) for v in component
+        }
+
+        reachable = []
+        for i, component in enumerate(components):
+            reach = set(component)
+            successors = {
+                component_of[head] for v in component for head in adj[v]
+            }
+            successors.discard(i)
+            # successors precede the component in reverse topological order
+            for successor in successors:
+                reach |= reachable[successor]
+            reachable.append(frozenset(reach))
+
+        return {v: reachable[component_of[v]] for v in adj}
@@ -21,7 +21,10 @@
 
 import binascii
 import errno
+import hashlib
+import json
 import logging
+import tempfile
 import time
 import datetime
 from decimal import Decimal
@@ -43,7 +46,8 @@ import six
 
 # pylint: disable=ipa-forbidden-import
 from ipalib import errors, x509, _
-from ipalib.constants import LDAP_GENERALIZED_TIME_FORMAT
+from ipalib.constants import LDAP_GENERALIZED_TIME_FORMAT, USER_CACHE_PATH
+from ipalib.request import get_timings
 # pylint: enable=ipa-forbidden-import
 from ipaplatform.paths import paths
 from ipapython.ipautil import format_netloc, CIDict
@@ -146,18 +150,62 @@ def ldap_initialize(uri, cacertfile=None):
 class _ServerSchema:
     '''
     Properties of a schema retrieved from an LDAP server.
+
+    The schema definitions are parsed on first access to the schema
+    attribute. Syntax and single-value flag of every attribute type are
+    kept in a precomputed lookup table, so attribute decoding does not need
+    the parsed schema at all.
     '''
 
-    def __init__(self, server, schema):
+    def __init__(self, server, schema_entry, csn=None, attribute_types=None):
         self.server = server
-        self.schema = schema
+        self.schema_entry = schema_entry
+        self.csn = csn
         self.retrieve_timestamp = time.time()
+        self._schema = None
+        if attribute_types is None:
+            attribute_types = self._get_attribute_types(self.schema)
+        self.attribute_types = attribute_types
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            self._schema = ldap.schema.SubSchema(self.schema_entry)
+        return self._schema
+
+    @staticmethod
+    def _get_attribute_types(schema):
+        attribute_types = {}
+        for oid in schema.listall(ldap.schema.AttributeType):
+            obj = schema.get_obj(ldap.schema.AttributeType, oid)
+            for name in (obj.oid,) + tuple(obj.names):
+                attribute_types[name.lower()] = (obj.syntax, obj.single_value)
+        return attribute_types
+
+    def get_attribute_type(self, name_or_oid):
+        '''
+        Return (syntax, single_value) tuple of an attribute type, or None if
+        the attribute type is not in the schema.
+        '''
+        # strip attribute options the same way SubSchema.getoid() does
+        name_or_oid = name_or_oid.split(';')[0].strip()
+        return self.attribute_types.get(name_or_oid.lower())
 
 
 class SchemaCache:
     '''
     Cache the schema's from individual LDAP servers.
+
+    Besides the per-process cache, retrieved schemas are stored on disk
+    together with the schema CSN of the server. A new process only checks
+    the CSN and loads the schema from disk if it is still current.
+
+    Server processes store them in the system directory created for the
+    IPA API user, other processes in the cache directory of the user.
     '''
+    FORMAT = '1'
+    _SERVER_DIR = os.path.join(paths.IPA_LDAP_SCHEMA_CACHE, FORMAT)
+    _USER_DIR = os.path.join(USER_CACHE_PATH, 'ipa', 'ldap-schema', FORMAT)
 
     def __init__(self):
         self.servers = {}
@@ -171,16 +219,31 @@ class SchemaCache:
         existing schema for the server from the cache and reacquires
         it.
         '''
+        return self.get_server_schema(url, conn, force_update).schema
 
+    def get_server_schema(self, url, conn, force_update=False):
+        '''
+        Return _ServerSchema object of a specific LDAP server.
+
+        force_update flushes the schema of the server from the process
+        cache. The on-disk cache is used only if the schema CSN of the
+        server matches, so a schema modification is always picked up.
+        '''
         if force_update:
             self.flush(url)
 
         server_schema = self.servers.get(url)
         if server_schema is None:
-            schema = self._retrieve_schema_from_server(url, conn)
-            server_schema = _ServerSchema(url, schema)
+            csn = self._retrieve_schema_csn(url, conn)
+            if csn is not None:
+                server_schema = self._read_server_schema(url, csn)
+            if server_schema is None:
+                schema_entry = self._retrieve_schema_from_server(url, conn)
+                server_schema = _ServerSchema(url, schema_entry, csn)
+                if csn is not None:
+                    self._write_server_schema(server_schema)
             self.servers[url] = server_schema
-        return server_schema.schema
+        return server_schema
 
     def flush(self, url):
         logger.debug('flushing %s from SchemaCache', url)
@@ -189,6 +252,102 @@ class SchemaCache:
         except KeyError:
             pass
 
+    def _get_dir(self):
+        server_dir = os.path.dirname(self._SERVER_DIR)
+        if os.access(server_dir, os.W_OK | os.X_OK):
+            return self._SERVER_DIR
+        return self._USER_DIR
+
+    def _get_path(self, url):
+        filename = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._get_dir(), filename)
+
+    def _read_server_schema(self, url, csn):
+        path = self._get_path(url)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data['url'] != url or data['csn'] != csn:
+                return None
+            schema_entry = {
+                attr: [v.encode('utf-8') for v in values]
+                for attr, values in data['schema'].items()
+            }
+            attribute_types = {
+                name: tuple(value)
+                for name, value in data['attributetypes'].items()
+            }
+        except Exception as e:
+            if not (isinstance(e, EnvironmentError) and
+                    e.errno == errno.ENOENT):  # pylint: disable=no-member
+                logger.debug('Failed to read cached LDAP schema %s: %s',
+                             path, e)
+            return None
+
+        logger.debug('loaded schema for SchemaCache url=%s from %s',
+                     url, path)
+        return _ServerSchema(url, schema_entry, csn, attribute_types)
+
+    def _write_server_schema(self, server_schema):
+        path = self._get_path(server_schema.server)
+        data = {
+            'url': server_schema.server,
+            'csn': server_schema.csn,
+            'schema': {
+                attr: [v.decode('utf-8') for v in values]
+                for attr, values in server_schema.schema_entry.items()
+            },
+            'attributetypes': server_schema.attribute_types,
+        }
+        cache_dir = os.path.dirname(path)
+        temp_name = None
+        try:
+            try:
+                os.makedirs(cache_dir)
+            except EnvironmentError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            # write to a temporary file and rename it to the final name so
+            # that concurrent processes never read a partially written file
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=cache_dir, delete=False) as f:
+                temp_name = f.name
+                json.dump(data, f)
+            os.rename(temp_name, path)
+            temp_name = None
+        except EnvironmentError as e:
+            logger.info('Failed to write cached LDAP schema %s: %s',
+                        path, e)
+        finally:
+            if temp_name is not None:
+                try:
+                    os.unlink(temp_name)
+                except EnvironmentError:
+                    pass
+
+    def _retrieve_schema_csn(self, url, conn):
+        """
+        Retrieve change sequence number of the schema, or None if it is not
+        available.
+
+        389-DS updates nsSchemaCSN on every schema modification. Fall back
+        to modifyTimestamp of the schema entry on other servers.
+        """
+        try:
+            schema_entry = conn.search_s(
+                'cn=schema', ldap.SCOPE_BASE,
+                attrlist=['nsSchemaCSN', 'modifyTimestamp'])[0]
+        except (ldap.LDAPError, IndexError) as e:
+            logger.debug('Failed to retrieve schema CSN url=%s: %s', url, e)
+            return None
+
+        attrs = CIDict(schema_entry[1])
+        for attr in ('nsSchemaCSN', 'modifyTimestamp'):
+            values = attrs.get(attr)
+            if values:
+                return '%s:%s' % (attr.lower(), values[0].decode('utf-8'))
+        return None
+
     def _retrieve_schema_from_server(self, url, conn):
         """
         Retrieve the LDAP schema from the provided url and determine if
@@ -201,6 +360,8 @@ class SchemaCache:
 
         If a connection is provided then it the credentials bound to it are
         used. The connection is not closed when the request is done.
+
+        Returns attributes of the subschema entry.
         """
         assert conn is not None
 
@@ -230,14 +391,14 @@ class SchemaCache:
         # TODO: DS uses 'cn=schema', support for other server?
         #       raise a more appropriate exception
 
-        return ldap.schema.SubSchema(schema_entry[1])
+        return schema_entry[1]
 
 schema_cache = SchemaCache()
 
 
 class LDAPEntry(MutableMapping):
     __slots__ = ('_conn', '_dn', '_names', '_nice', '_raw', '_sync',
-                 '_not_list', '_orig_raw', '_raw_view',
+                 '_not_list', '_orig_raw', '_unmodified', '_raw_view',
                  '_single_value_view')
 
     __hash__ = None
@@ -283,11 +444,14 @@ class LDAPEntry(MutableMapping):
         self._sync = {}
         self._not_list = set()
         self._orig_raw = {}
+        self._unmodified = set()
         self._raw_view = None
         self._single_value_view = None
 
         if isinstance(_obj, LDAPEntry):
             #pylint: disable=E1103
+            # the copies may share values, which are modified in place
+            _obj._save_orig_raw()
             self._not_list = set(_obj._not_list)
             self._orig_raw = dict(_obj._orig_raw)
             if _obj.conn is _conn:
@@ -302,6 +466,45 @@ class LDAPEntry(MutableMapping):
 
         self.update(_obj, **kwargs)
 
+    @classmethod
+    def _from_result(cls, conn, dn, attrs):
+        """
+        Create an entry from an attribute dictionary returned by python-ldap.
+
+        The dictionary is used as is. Values are decoded on first access and
+        the original values of an attribute used by generate_modlist() are
+        copied only when the attribute is about to be modified.
+        """
+        self = cls.__new__(cls)
+        self._conn = conn
+        self._dn = dn
+        self._names = CIDict()
+        self._nice = dict.fromkeys(attrs)
+        self._raw = attrs
+        self._sync = {}
+        self._not_list = set()
+        self._orig_raw = {}
+        self._unmodified = set(attrs)
+        self._raw_view = None
+        self._single_value_view = None
+
+        for name in attrs:
+            self._add_attr_name(name)
+
+        return self
+
+    def _save_orig_raw(self, *names):
+        """
+        Copy the original values of the given attributes, or of all
+        attributes, which are still unmodified values of a search result.
+        """
+        if not self._unmodified:
+            return
+        for name in names or list(self._unmodified):
+            if name in self._unmodified:
+                self._unmodified.remove(name)
+                self._orig_raw[name] = list(self._raw[name])
+
     @property
     def conn(self):
         return self._conn
@@ -346,6 +549,12 @@ class LDAPEntry(MutableMapping):
         if nice == nice_sync and raw == raw_sync:
             return
 
+        if name in self._unmodified and raw_sync:
+            # values of a search result were modified in place after the
+            # last sync, which left the original values in raw_sync
+            self._unmodified.remove(name)
+            self._orig_raw[name] = raw_sync
+
         nice_adds = set(nice) - set(nice_sync)
         nice_dels = set(nice_sync) - set(nice)
         raw_adds = set(raw) - set(raw_sync)
@@ -383,7 +592,8 @@ class LDAPEntry(MutableMapping):
                 continue
             nice.append(value)
 
-        self._sync[name] = (deepcopy(nice), deepcopy(raw))
+        # raw values are immutable bytes, a shallow copy is enough
+        self._sync[name] = (deepcopy(nice), list(raw))
 
         if len(nice) > 1:
             self._not_list.discard(name)
@@ -428,6 +638,7 @@ class LDAPEntry(MutableMapping):
     def _set_nice(self, name, value):
         name = self._attr_name(name)
         name = self._add_attr_name(name)
+        self._save_orig_raw(name)
 
         if not isinstance(value, list):
             if value is None:
@@ -460,6 +671,7 @@ class LDAPEntry(MutableMapping):
                 )
 
         name = self._add_attr_name(name)
+        self._save_orig_raw(name)
 
         if self._raw.get(name) is not value:
             self._raw[name] = value
@@ -500,6 +712,8 @@ class LDAPEntry(MutableMapping):
     def _get_raw(self, name):
         name = self._get_attr_name(name)
 
+        # values of a search result are not copied here, in place
+        # modifications are only seen once the decoded values were read
         value = self._raw[name]
         if value is None:
             value = self._raw[name] = []
@@ -515,6 +729,7 @@ class LDAPEntry(MutableMapping):
 
     def __delitem__(self, name):
         name = self._get_attr_name(name)
+        self._save_orig_raw(name)
 
         for (altname, keyname) in list(self._names.items()):
             if keyname == name:
@@ -526,6 +741,7 @@ class LDAPEntry(MutableMapping):
         self._not_list.discard(name)
 
     def clear(self):
+        self._save_orig_raw()
         self._names.clear()
         self._nice.clear()
         self._raw.clear()
@@ -556,12 +772,19 @@ class LDAPEntry(MutableMapping):
             other = self
         assert isinstance(other, LDAPEntry)
         self._orig_raw = deepcopy(dict(other.raw))
+        self._unmodified = set()
 
     def generate_modlist(self):
         modlist = []
 
+        # detect values of a search result modified in place
+        for name in list(self._unmodified):
+            if self._nice[name] is not None:
+                self._sync_attr(name)
+
         names = set(self)
         names.update(self._orig_raw)
+        names.difference_update(self._unmodified)
         for name in names:
             new = self.raw.get(name, [])
             old = self._orig_raw.get(name, [])
@@ -796,6 +1019,7 @@ class LDAPClient:
 
         self._has_schema = False
         self._schema = None
+        self._server_schema = None
 
         if ldap_uri is not None:
             self._conn = self._connect()
@@ -863,24 +1087,50 @@ class LDAPClient:
         else:
             return None
 
-    def _get_schema(self):
+    def _get_server_schema(self):
         if self._no_schema:
             return None
 
         if not self._has_schema:
             try:
-                schema = schema_cache.get_schema(
+                server_schema = schema_cache.get_server_schema(
                     self.ldap_uri, self.conn,
                     force_update=self._force_schema_updates)
             except (errors.ExecutionError, IndexError):
-                schema = None
+                server_schema = None
 
             # bypass ldap2's locking
-            object.__setattr__(self, '_schema', schema)
+            object.__setattr__(self, '_server_schema', server_schema)
+            object.__setattr__(self, '_schema', None)
             object.__setattr__(self, '_has_schema', True)
 
+        return self._server_schema
+
+    def _get_schema(self):
+        server_schema = self._get_server_schema()
+        if self._schema is None and server_schema is not None:
+            # parse the schema only when it is really needed
+            object.__setattr__(self, '_schema', server_schema.schema)
+
         return self._schema
 
+    def _get_attribute_type_info(self, name_or_oid):
+        """
+        Return (syntax, single_value) tuple of an attribute type, or None
+        if the schema is not available or the attribute type is not in it.
+        """
+        server_schema = self._get_server_schema()
+        if server_schema is not None:
+            return server_schema.get_attribute_type(name_or_oid)
+
+        schema = self._get_schema()
+        if schema is not None:
+            obj = schema.get_obj(ldap.schema.AttributeType, name_or_oid)
+            if obj is not None:
+                return obj.syntax, obj.single_value
+
+        return None
+
     def _flush_schema(self):
         '''
         Force this instance to forget it's cached schema and reacquire
@@ -909,6 +1159,7 @@ class LDAPClient:
         # bypass ldap2's locking
         object.__setattr__(self, '_has_schema', False)
         object.__setattr__(self, '_schema', None)
+        object.__setattr__(self, '_server_schema', None)
 
     def get_attribute_type(self, name_or_oid):
         if not self._decode_attrs:
@@ -922,12 +1173,10 @@ class LDAPClient:
         if name_or_oid in self._SYNTAX_OVERRIDE:
             return self._SYNTAX_OVERRIDE[name_or_oid]
 
-        schema = self._get_schema()
-        if schema is not None:
-            # Try to lookup the syntax in the schema returned by the server
-            obj = schema.get_obj(ldap.schema.AttributeType, name_or_oid)
-            if obj is not None and obj.syntax in self._SYNTAX_MAPPING:
-                return self._SYNTAX_MAPPING[obj.syntax]
+        # Try to lookup the syntax in the schema returned by the server
+        info = self._get_attribute_type_info(name_or_oid)
+        if info is not None and info[0] in self._SYNTAX_MAPPING:
+            return self._SYNTAX_MAPPING[info[0]]
 
         return unicode
 
@@ -954,11 +1203,9 @@ class LDAPClient:
         if name_or_oid in self._SINGLE_VALUE_OVERRIDE:
             return self._SINGLE_VALUE_OVERRIDE[name_or_oid]
 
-        schema = self._get_schema()
-        if schema is not None:
-            obj = schema.get_obj(ldap.schema.AttributeType, name_or_oid)
-            if obj is not None:
-                return obj.single_value
+        info = self._get_attribute_type_info(name_or_oid)
+        if info is not None:
+            return info[1]
 
         return None
 
@@ -1024,6 +1271,13 @@ class LDAPClient:
                 logger.error('%s', msg)
                 raise ValueError(msg)
         elif isinstance(val, list):
+            if (len(val) > 1 and self.get_attribute_type(attr) is DN and
+                    all(isinstance(m, bytes) for m in val)):
+                # fast path for large multi-valued DN attributes (member)
+                try:
+                    return DN.from_many(val)
+                except (ValueError, UnicodeDecodeError):
+                    pass
             return [self.decode(m, attr) for m in val]
         elif isinstance(val, tuple):
             return tuple(self.decode(m, attr) for m in val)
@@ -1062,11 +1316,8 @@ class LDAPClient:
 
                 continue
 
-            ipa_entry = LDAPEntry(self, DN(original_dn))
-
-            for attr, original_values in original_attrs.items():
-                ipa_entry.raw[attr] = original_values
-            ipa_entry.reset_modlist()
+            ipa_entry = LDAPEntry._from_result(
+                self, DN(original_dn), original_attrs)
 
             ipa_result.append(ipa_entry)
 
@@ -1153,6 +1404,31 @@ class LDAPClient:
                 'Unhandled LDAPError: %s: %s', type(e).__name__, str(e))
             raise errors.DatabaseError(desc=desc, info=info)
 
+    @contextlib.contextmanager
+    def _timed(self, operation):
+        """
+        Record the duration of an LDAP operation in the request timings.
+        """
+        timings = get_timings()
+        if timings is None:
+            yield
+            return
+        start = timings.clock()
+        try:
+            yield
+        finally:
+            timings.add_ldap(operation, timings.clock() - start)
+
+    @staticmethod
+    def _result_size(res_list):
+        """
+        Return size of the raw entries of a python-ldap result in bytes.
+        """
+        return sum(
+            len(dn) + sum(len(v) for values in attrs.values() for v in values)
+            for dn, attrs in res_list if dn is not None
+        )
+
     @staticmethod
     def handle_truncated_result(truncated):
         if not truncated:
@@ -1227,8 +1503,9 @@ class LDAPClient:
             assert isinstance(bind_dn, DN)
             bind_dn = str(bind_dn)
             bind_password = self.encode(bind_password)
-            self.conn.simple_bind_s(
-                bind_dn, bind_password, server_controls, client_controls)
+            with self._timed('bind'):
+                self.conn.simple_bind_s(
+                    bind_dn, bind_password, server_controls, client_controls)
 
     def external_bind(self, server_controls=None, client_controls=None):
         """
@@ -1238,8 +1515,9 @@ class LDAPClient:
         with self.error_handler():
             auth_tokens = ldap.sasl.external(user_name)
             self._flush_schema()
-            self.conn.sasl_interactive_bind_s(
-                '', auth_tokens, server_controls, client_controls)
+            with self._timed('bind'):
+                self.conn.sasl_interactive_bind_s(
+                    '', auth_tokens, server_controls, client_controls)
 
     def gssapi_bind(self, server_controls=None, client_controls=None):
         """
@@ -1251,8 +1529,9 @@ class LDAPClient:
             else:
                 auth_tokens = SASL_GSSAPI
             self._flush_schema()
-            self.conn.sasl_interactive_bind_s(
-                '', auth_tokens, server_controls, client_controls)
+            with self._timed('bind'):
+                self.conn.sasl_interactive_bind_s(
+                    '', auth_tokens, server_controls, client_controls)
 
     def unbind(self):
         """
@@ -1483,6 +1762,40 @@ class LDAPClient:
         :param paged_search: search using paged results control
         :param get_effective_rights: use GetEffectiveRights control
 
+        :raises: errors.NotFound if result set is empty
+                                 or base_dn doesn't exist
+        """
+        res = []
+        entries = self.iter_entries(
+            filter=filter, attrs_list=attrs_list, base_dn=base_dn,
+            scope=scope, time_limit=time_limit, size_limit=size_limit,
+            paged_search=paged_search,
+            get_effective_rights=get_effective_rights)
+        while True:
+            try:
+                res.append(next(entries))
+            except StopIteration as e:
+                return (res, e.value)
+
+    def iter_entries(
+            self, filter=None, attrs_list=None, base_dn=None,
+            scope=ldap.SCOPE_SUBTREE, time_limit=None, size_limit=None,
+            paged_search=False, get_effective_rights=False):
+        """
+        Iterate over entries matching specified search parameters.
+
+        Entries are yielded one by one as they are received from the server,
+        so with paged_search only a single page of results is kept in memory.
+        When the iteration is finished, the generator returns the truncated
+        flag (see find_entries), i.e. it can be obtained with::
+
+            truncated = yield from ldap.iter_entries(...)
+
+        or from the value of the StopIteration exception. If the iteration
+        is stopped early, the outstanding search operation is abandoned.
+
+        Arguments are the same as for find_entries.
+
         :raises: errors.NotFound if result set is empty
                                  or base_dn doesn't exist
         """
@@ -1491,7 +1804,7 @@ class LDAPClient:
         assert isinstance(base_dn, DN)
         if not filter:
             filter = '(objectClass=*)'
-        res = []
+        count = 0
         truncated = False
 
         if time_limit is None:
@@ -1514,11 +1827,24 @@ class LDAPClient:
         if get_effective_rights:
             base_sctrls.append(self.__get_effective_rights_control())
 
+        timings = get_timings()
+
         cookie = ''
         page_size = (size_limit if size_limit > 0 else 2000) - 1
         if page_size == 0:
             paged_search = False
 
+        def cancel_paged_search():
+            sctrls = [SimplePagedResultsControl(0, 0, cookie)]
+            try:
+                self.conn.search_ext_s(
+                    str(base_dn), scope, filter, attrs_list,
+                    serverctrls=sctrls, timeout=time_limit,
+                    sizelimit=size_limit)
+            except ldap.LDAPError as e2:
+                logger.warning(
+                    "Error cancelling paged search: %s", e2)
+
         # pass arguments to python-ldap
         with self.error_handler():
             if six.PY2:
@@ -1533,7 +1859,14 @@ class LDAPClient:
                 else:
                     sctrls = base_sctrls or None
 
+                id = None
+                # time spent waiting for the server, the consumer of the
+                # entries runs between the results
+                duration = 0.0
+                size = 0
                 try:
+                    if timings is not None:
+                        start = timings.clock()
                     id = self.conn.search_ext(
                         str(base_dn), scope, filter, attrs_list,
                         serverctrls=sctrls, timeout=time_limit,
@@ -1542,11 +1875,17 @@ class LDAPClient:
                     while True:
                         result = self.conn.result3(id, 0)
                         objtype, res_list, _res_id, res_ctrls = result
+                        if timings is not None:
+                            duration += timings.clock() - start
+                            size += self._result_size(res_list)
                         if objtype == ldap.RES_SEARCH_RESULT:
                             break
                         res_list = self._convert_result(res_list)
                         if res_list:
-                            res.append(res_list[0])
+                            count += 1
+                            yield res_list[0]
+                        if timings is not None:
+                            start = timings.clock()
 
                     if paged_search:
                         # Get cookie for the next page
@@ -1556,6 +1895,16 @@ class LDAPClient:
                                 break
                         else:
                             cookie = ''
+                except GeneratorExit:
+                    # The consumer stopped iterating, abandon the running
+                    # operation and the rest of the paged search
+                    try:
+                        self.conn.abandon(id)
+                    except ldap.LDAPError as e2:
+                        logger.warning("Error abandoning search: %s", e2)
+                    if paged_search and cookie:
+                        cancel_paged_search()
+                    raise
                 except ldap.ADMINLIMIT_EXCEEDED:
                     truncated = TRUNCATED_ADMIN_LIMIT
                     break
@@ -1568,15 +1917,7 @@ class LDAPClient:
                 except ldap.LDAPError as e:
                     # If paged search is in progress, try to cancel it
                     if paged_search and cookie:
-                        sctrls = [SimplePagedResultsControl(0, 0, cookie)]
-                        try:
-                            self.conn.search_ext_s(
-                                str(base_dn), scope, filter, attrs_list,
-                                serverctrls=sctrls, timeout=time_limit,
-                                sizelimit=size_limit)
-                        except ldap.LDAPError as e2:
-                            logger.warning(
-                                "Error cancelling paged search: %s", e2)
+                        cancel_paged_search()
                         cookie = ''
 
                     try:
@@ -1585,14 +1926,17 @@ class LDAPClient:
                             ldap.SIZELIMIT_EXCEEDED):
                         truncated = True
                         break
+                finally:
+                    if timings is not None:
+                        timings.add_ldap('search', duration, size)
 
                 if not paged_search or not cookie:
                     break
 
-        if not res and not truncated:
+        if not count and not truncated:
             raise errors.EmptyResult(reason='no matching entry found')
 
-        return (res, truncated)
+        return truncated
 
     def __get_effective_rights_control(self):
         """Construct a GetEffectiveRights control for current user."""
@@ -1642,6 +1986,52 @@ class LDAPClient:
 
         return entries[0]
 
+    def get_entries_by_dn(self, dns, attrs_list=None):
+        """Get several entries by DN.
+
+        All searches are sent before waiting for their results, so the
+        server processes them without waiting for a round trip each.
+
+        Return a dictionary mapping every DN to its entry, or to None if the
+        entry does not exist. DNs which could not be read for any other
+        reason are left out.
+        """
+        if attrs_list:
+            attrs_list = [a.lower() for a in set(attrs_list)]
+        time_limit = self.time_limit
+        if time_limit == 0:
+            time_limit = -1.0
+
+        entries = {}
+        msgids = []
+        for dn in dns:
+            assert isinstance(dn, DN)
+            try:
+                with self.error_handler():
+                    msgid = self.conn.search_ext(
+                        str(dn), ldap.SCOPE_BASE, '(objectClass=*)',
+                        attrs_list, timeout=float(time_limit))
+            except errors.PublicError as e:
+                logger.debug("Failed to read %s: %s", dn, e)
+            else:
+                msgids.append((dn, msgid))
+
+        for dn, msgid in msgids:
+            try:
+                with self.error_handler():
+                    with self._timed('search'):
+                        _type, res_list, _id, _ctrls = self.conn.result3(
+                            msgid)
+            except errors.NotFound:
+                entries[dn] = None
+            except errors.PublicError as e:
+                logger.debug("Failed to read %s: %s", dn, e)
+            else:
+                res_list = self._convert_result(res_list)
+                entries[dn] = res_list[0] if res_list else None
+
+        return entries
+
     def add_entry(self, entry):
         """Create a new entry.
 
@@ -1652,10 +2042,48 @@ class LDAPClient:
 
         with self.error_handler():
             attrs = self.encode(attrs)
-            self.conn.add_s(str(entry.dn), list(attrs.items()))
+            with self._timed('add'):
+                self.conn.add_s(str(entry.dn), list(attrs.items()))
 
         entry.reset_modlist()
 
+    def add_entries(self, entries):
+        """Create several new entries.
+
+        All add operations are sent before waiting for their results, so
+        the server processes them without waiting for a round trip each.
+
+        Return a list with an exception (errors.PublicError) for every entry
+        which could not be created, or None for every entry created.
+        """
+        results = [None] * len(entries)
+        msgids = []
+
+        for i, entry in enumerate(entries):
+            # remove all [] values (python-ldap hates 'em)
+            attrs = dict((k, v) for k, v in entry.raw.items() if v)
+            try:
+                with self.error_handler():
+                    attrs = self.encode(attrs)
+                    msgid = self.conn.add_ext(
+                        str(entry.dn), list(attrs.items()))
+            except errors.PublicError as e:
+                results[i] = e
+            else:
+                msgids.append((i, msgid))
+
+        for i, msgid in msgids:
+            try:
+                with self.error_handler():
+                    with self._timed('add'):
+                        self.conn.result3(msgid)
+            except errors.PublicError as e:
+                results[i] = e
+            else:
+                entries[i].reset_modlist()
+
+        return results
+
     def move_entry(self, dn, new_dn, del_old=True):
         """
         Move an entry (either to a new superior or/and changing relative distinguished name)
@@ -1683,8 +2111,10 @@ class LDAPClient:
             new_superior = str(DN(*new_dn[1:]))
 
         with self.error_handler():
-            self.conn.rename_s(str(dn), str(new_rdn), newsuperior=new_superior,
-                               delold=int(del_old))
+            with self._timed('rename'):
+                self.conn.rename_s(str(dn), str(new_rdn),
+                                   newsuperior=new_superior,
+                                   delold=int(del_old))
             time.sleep(.3)  # Give memberOf plugin a chance to work
 
     def update_entry(self, entry):
@@ -1701,7 +2131,8 @@ class LDAPClient:
         with self.error_handler():
             modlist = [(a, str(b), self.encode(c))
                        for a, b, c in modlist]
-            self.conn.modify_s(str(entry.dn), modlist)
+            with self._timed('modify'):
+                self.conn.modify_s(str(entry.dn), modlist)
 
         entry.reset_modlist()
 
@@ -1713,7 +2144,8 @@ class LDAPClient:
             dn = entry_or_dn.dn
 
         with self.error_handler():
-            self.conn.delete_s(str(dn))
+            with self._timed('delete'):
+                self.conn.delete_s(str(dn))
 
     def entry_exists(self, dn):
         """
@@ -1727,6 +2159,28 @@ class LDAPClient:
         else:
             return True
 
+    def get_last_usn(self):
+        """
+        Get the last update sequence numbers from the root DSE.
+
+        389 DS maintains them with the USN plug-in, they change with every
+        modification of the directory, including replicated ones.
+
+        :return: tuple of (attribute name, values) pairs or None if the
+            server does not provide them
+        """
+        try:
+            entry = self.get_entry(DN(), ['lastusn'])
+        except errors.PublicError as e:
+            logger.debug("Failed to read last USN: %s", e)
+            return None
+        lastusn = tuple(sorted(
+            (attr.lower(), tuple(entry.raw[attr]))
+            for attr in entry
+            if attr.lower().startswith('lastusn')
+        ))
+        return lastusn or None
+
 
 def get_ldap_uri(host='', port=389, cacert=None, ldapi=False, realm=None,
                  protocol=None):
@@ -2,8 +2,11 @@
 # Copyright (C) 2017  FreeIPA Contributors see COPYING for license
 #
 
+import collections
 import ctypes
+import os
 import sys
+import threading
 
 
 KRB5_CC_NOSUPP = -1765328137
@@ -141,6 +144,10 @@ krb5_free_data_contents = LIBKRB5.krb5_free_data_contents
 krb5_free_data_contents.argtypes = (krb5_context, krb5_data_p)
 krb5_free_data_contents.restype = None
 
+krb5_cc_default_name = LIBKRB5.krb5_cc_default_name
+krb5_cc_default_name.argtypes = (krb5_context, )
+krb5_cc_default_name.restype = ctypes.c_char_p
+
 krb5_cc_default = LIBKRB5.krb5_cc_default
 krb5_cc_default.argtypes = (krb5_context, ctypes.POINTER(krb5_ccache), )
 krb5_cc_default.restype = krb5_error
@@ -223,6 +230,113 @@ CONF_REALM = b"X-CACHECONF:"
 CONF_NAME = b"krb5_ccache_conf_data"
 
 
+class CCacheDataCache:
+    """
+    Bounded cache of data read from FILE credential caches.
+
+    Entries are keyed by the ccache name and an arbitrary key and stay valid
+    only as long as the ccache file is not modified or replaced. Other
+    ccache types are not cached.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_filename(ccache_name):
+        if isinstance(ccache_name, bytes):
+            ccache_name = ccache_name.decode('utf-8')
+        if ccache_name.startswith('FILE:'):
+            return ccache_name[len('FILE:'):]
+        elif ccache_name.startswith('/'):
+            return ccache_name
+        return None
+
+    @staticmethod
+    def _get_state(filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def get(self, ccache_name, key, func):
+        """
+        Return the cached value for ``key`` of the ccache ``ccache_name``.
+
+        When there is no valid cached value, it is computed by calling
+        ``func`` and cached unless it is None.
+        """
+        filename = self._get_filename(ccache_name)
+        if filename is None:
+            return func()
+
+        # the state is taken before calling func so that modifications
+        # made in the meantime invalidate the value
+        state = self._get_state(filename)
+        if state is None:
+            return func()
+
+        with self._lock:
+            entry = self._entries.get((filename, key))
+            if entry is not None and entry[0] == state:
+                self._entries.move_to_end((filename, key))
+                return entry[1]
+
+        value = func()
+        if value is not None:
+            with self._lock:
+                self._entries[filename, key] = (state, value)
+                self._entries.move_to_end((filename, key))
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, ccache_name, key):
+        filename = self._get_filename(ccache_name)
+        if filename is None:
+            return
+        with self._lock:
+            self._entries.pop((filename, key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_data_cache = CCacheDataCache()
+_default_ccache_names = {}
+
+
+def get_default_ccache_name():
+    """
+    Return the name of the default ccache.
+
+    The name depends only on the KRB5CCNAME environment variable and the
+    Kerberos configuration, so it is resolved once for each value of the
+    variable.
+    """
+    env_name = os.environ.get('KRB5CCNAME')
+    try:
+        return _default_ccache_names[env_name]
+    except KeyError:
+        pass
+
+    context = krb5_context()
+    try:
+        krb5_init_context(ctypes.byref(context))
+        name = krb5_cc_default_name(context)
+    finally:
+        if context:
+            krb5_free_context(context)
+
+    name = name.decode('utf-8')
+    _default_ccache_names[env_name] = name
+    return name
+
+
 def store_data(princ_name, key, value):
     """
     Stores the session cookie in a hidden ccache entry.
@@ -271,12 +385,20 @@ def store_data(princ_name, key, value):
 def get_data(princ_name, key):
     """
     Gets the session cookie in a hidden ccache entry.
+
+    The value is cached until the default ccache is modified.
     """
     if not isinstance(princ_name, bytes):
         princ_name = princ_name.encode('utf-8')
     if not isinstance(key, bytes):
         key = key.encode('utf-8')
 
+    return _data_cache.get(
+        get_default_ccache_name(), (princ_name, key),
+        lambda: _get_data(princ_name, key))
+
+
+def _get_data(princ_name, key):
     context = krb5_context()
     principal = krb5_principal()
     srv_princ = krb5_principal()
@@ -365,6 +487,10 @@ def remove_data(princ_name, key):
     if not isinstance(key, bytes):
         key = key.encode('utf-8')
 
+    # removal is not supported by all ccache types, the ccache might not
+    # change at all
+    _data_cache.invalidate(get_default_ccache_name(), (princ_name, key))
+
     context = krb5_context()
     principal = krb5_principal()
     ccache = krb5_ccache()
@@ -0,0 +1,97 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""Per-process cache of data derived from the entries of an LDAP container
+
+Cached data are kept separately for each bound principal, as the visible
+entries depend on access controls, and are dropped when an entry of the
+container is added, modified or deleted.
+
+Changes are detected in two steps. The last USN of the root DSE changes with
+every modification of the directory. Only when it changed, the entryUSN and
+modifyTimestamp values of all entries of the container are read with a
+single one-level search and compared with the values seen before, so
+modifications of other entries do not drop the cached data.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import threading
+
+from ipalib import errors
+from ipalib.request import context
+from ipapython.dn import DN
+
+# maximum number of principals whose data are kept in a cache
+MAX_PRINCIPALS = 16
+
+
+class ContainerCache:
+    """
+    Cache of data derived from the entries of one LDAP container.
+
+    container is the name of the api.env variable with the container DN,
+    objectclass is the object class of the entries that matter.
+    """
+
+    def __init__(self, container, objectclass, max_size=MAX_PRINCIPALS):
+        self.container = container
+        self.objectclass = objectclass
+        self.max_size = max_size
+        # guards the dictionaries returned by get()
+        self.lock = threading.Lock()
+        # key: (last USN, fingerprint, data)
+        self._states = collections.OrderedDict()
+
+    def get_fingerprint(self, api):
+        """Return the entryUSN and modifyTimestamp values of the entries"""
+        ldap = api.Backend.ldap2
+        try:
+            entries = ldap.get_entries(
+                DN(getattr(api.env, self.container), api.env.basedn),
+                ldap.SCOPE_ONELEVEL, '(objectclass=%s)' % self.objectclass,
+                ['entryusn', 'modifytimestamp'])
+        except errors.NotFound:
+            entries = []
+        return frozenset(
+            (str(entry.dn).lower(),
+             tuple(entry.raw.get('entryusn', ())),
+             tuple(entry.raw.get('modifytimestamp', ())))
+            for entry in entries
+        )
+
+    def get(self, api):
+        """
+        Return the dictionary of cached data of the bound principal.
+
+        The dictionary is empty after the container changed. It is shared by
+        concurrent requests and must be accessed with the lock held.
+        """
+        ldap = api.Backend.ldap2
+        key = (ldap.ldap_uri, str(api.env.basedn),
+               getattr(context, 'principal', None))
+        lastusn = ldap.get_last_usn()
+
+        with self.lock:
+            state = self._states.get(key)
+        if (state is not None and lastusn is not None and
+                state[0] == lastusn):
+            return state[2]
+
+        fingerprint = self.get_fingerprint(api)
+        with self.lock:
+            state = self._states.get(key)
+            if state is not None and state[1] == fingerprint:
+                data = state[2]
+            else:
+                data = {}
+            self._states[key] = (lastusn, fingerprint, data)
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_size:
+                self._states.popitem(last=False)
+        return data
+
+    def clear(self):
+        with self.lock:
+            self._states.clear()
@@ -24,12 +24,16 @@
 
 from __future__ import absolute_import
 
+import collections
+import hashlib
 import logging
 import re
+import threading
 import time
 
 from ipalib import api, _
 from ipalib import errors
+from ipalib.request import context
 from ipapython import ipautil
 from ipapython.dn import DN
 from ipapython.dnsutil import query_srv
@@ -192,6 +196,199 @@ class ExtendedDNControl(LDAPControl):
         )
 
 
+def _copy_error(error):
+    """
+    Return a new instance of a cached errors.PublicError.
+
+    The copy module can't copy these errors, their classes don't accept
+    the formatted message as format.
+    """
+    return type(error)(message=error.strerror, **error.kw)
+
+
+class _ExpiringCache:
+    """
+    Thread-safe cache of values which expire after a time to live.
+
+    When the cache holds more than max_size values, the oldest ones are
+    dropped first.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._values = collections.OrderedDict()
+
+    def get(self, key):
+        """Return the cached value, raise KeyError if it is missing"""
+        with self._lock:
+            expires, value = self._values[key]
+            if expires <= time.time():
+                del self._values[key]
+                raise KeyError(key)
+        return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = (time.time() + ttl, value)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class _GCConnectionPool:
+    """
+    Per-process pool of LDAP connections to Global Catalog servers of
+    trusted domains.
+
+    A connection is bound with credentials of a trusted domain
+    administrator and is handed out again for a search on the same server
+    with the same credentials, saving the kinit and the SASL bind. A
+    connection is in use by at most one thread at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key: [(released, conn), ...], most recently released last
+        self._idle = collections.OrderedDict()
+
+    def acquire(self, key, idle_timeout):
+        """Check out an idle connection matching key, return it or None"""
+        now = time.time()
+        found = None
+        stale = []
+        with self._lock:
+            for idle_key in list(self._idle):
+                connections = self._idle[idle_key]
+                fresh = [(released, conn) for released, conn in connections
+                         if released + idle_timeout > now]
+                stale.extend(conn for released, conn in connections
+                             if released + idle_timeout <= now)
+                if found is None and idle_key == key and fresh:
+                    found = fresh.pop()[1]
+                if fresh:
+                    self._idle[idle_key] = fresh
+                else:
+                    del self._idle[idle_key]
+        self._close(stale)
+        return found
+
+    def release(self, key, conn, max_size):
+        """Return a connection to the pool"""
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append((time.time(), conn))
+            self._idle.move_to_end(key)
+            while sum(len(c) for c in self._idle.values()) > max_size:
+                oldest_key = next(iter(self._idle))
+                evicted.append(self._idle[oldest_key].pop(0)[1])
+                if not self._idle[oldest_key]:
+                    del self._idle[oldest_key]
+        self._close(evicted)
+
+    def discard(self, conn):
+        """Close a checked out connection which must not be reused"""
+        self._close([conn])
+
+    def clear(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle = [conn for connections in self._idle.values()
+                    for _released, conn in connections]
+            self._idle.clear()
+        self._close(idle)
+
+    @staticmethod
+    def _close(connections):
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.debug("Failed to close AD DC connection: %s", e)
+
+
+_gc_connection_pool = _GCConnectionPool()
+
+
+class _SIDTrieNode:
+    __slots__ = ('children', 'domain', 'first')
+
+    def __init__(self):
+        self.children = {}
+        # (order, name) of the first domain with SID ending in this node
+        self.domain = None
+        # (order, name) of the first domain with SID in this subtree
+        self.first = None
+
+
+class TrustedDomainSIDIndex:
+    """
+    Index of trusted domain SIDs.
+
+    A SID belongs to a trusted domain when the sub-authorities of one of
+    the two SIDs are a prefix of the sub-authorities of the other one. The
+    SIDs are stored in a trie keyed on their sub-authorities, so the
+    lookup takes time proportional to the number of sub-authorities of
+    the SID and not to the number of trusted domains. When more domains
+    match, the first one in the order of `domains' is returned.
+    """
+
+    def __init__(self, domains):
+        self.domains = domains
+        self._root = _SIDTrieNode()
+        self._sids = {}
+
+        for order, name in enumerate(domains):
+            domsid = domains[name][1]
+            self._sids.setdefault(str(domsid), name)
+
+            item = (order, name)
+            node = self._root
+            if node.first is None:
+                node.first = item
+            for sub_auth in domsid.sub_auths[:domsid.num_auths]:
+                node = node.children.setdefault(sub_auth, _SIDTrieNode())
+                if node.first is None:
+                    node.first = item
+            if node.domain is None:
+                node.domain = item
+
+    def get_domain_by_sid(self, sid):
+        """
+        Get name of the trusted domain the given dom_sid belongs to or None
+        """
+        found = None
+        node = self._root
+        for sub_auth in sid.sub_auths[:sid.num_auths]:
+            if node.domain is not None:
+                if found is None or node.domain < found:
+                    found = node.domain
+            node = node.children.get(sub_auth)
+            if node is None:
+                break
+        else:
+            # the SID is a prefix of the SIDs in this subtree
+            if node.first is not None:
+                if found is None or node.first < found:
+                    found = node.first
+
+        if found is None:
+            return None
+        return found[1]
+
+    def get_domain_by_exact_sid(self, sid):
+        """
+        Get name of the trusted domain with the given SID string or None
+        """
+        return self._sids.get(sid)
+
+
 class DomainValidator:
     ATTR_FLATNAME = 'ipantflatname'
     ATTR_SID = 'ipantsecurityidentifier'
@@ -199,6 +396,17 @@ class DomainValidator:
     ATTR_TRUST_PARTNER = 'ipanttrustpartner'
     ATTR_TRUST_AUTHOUT = 'ipanttrustauthoutgoing'
 
+    # trusted domains shared by all validators of the process,
+    # {(LDAP URI, base DN, principal): (last USN, TrustedDomainSIDIndex)}
+    _trusted_domains_cache = {}
+    _trusted_domains_cache_size = 16
+    _trusted_domains_lock = threading.Lock()
+
+    # Global Catalog servers and objects of trusted domains shared by all
+    # validators of the process, see trust_cache_ttl
+    _gc_info_cache = _ExpiringCache()
+    _trusted_objects_cache = _ExpiringCache()
+
     def __init__(self, api):
         self.api = api
         self.ldap = self.api.Backend.ldap2
@@ -207,6 +415,7 @@ class DomainValidator:
         self.dn = None
         self.sid = None
         self._domains = None
+        self._sid_index = None
         self._info = dict()
         self._creds = None
         self._admin_creds = None
@@ -232,7 +441,33 @@ class DomainValidator:
         """
         Returns case-insensitive dict of trusted domain tuples
         (flatname, sid, trust_auth_outgoing), keyed by domain name.
+
+        The result is cached for all validators of the process until the
+        last USN of the LDAP server changes and must not be modified.
         """
+        # different principals may be allowed to read different data
+        key = (self.ldap.ldap_uri, self.api.env.basedn,
+               getattr(context, 'principal', None))
+        lastusn = self.ldap.get_last_usn()
+
+        with self._trusted_domains_lock:
+            cached = self._trusted_domains_cache.get(key)
+        if cached is not None and lastusn is not None and \
+                cached[0] == lastusn:
+            self._sid_index = cached[1]
+            return cached[1].domains
+
+        self._sid_index = TrustedDomainSIDIndex(self._search_trusted_domains())
+        if lastusn is not None:
+            cache = self._trusted_domains_cache
+            with self._trusted_domains_lock:
+                if len(cache) >= self._trusted_domains_cache_size:
+                    cache.clear()
+                cache[key] = (lastusn, self._sid_index)
+
+        return self._sid_index.domains
+
+    def _search_trusted_domains(self):
         cn_trust = DN(('cn', 'ad'), self.api.env.container_trusts,
                       self.api.env.basedn)
 
@@ -301,29 +536,60 @@ class DomainValidator:
         # check it against prefixes of domain SIDs we trust to
         self.set_trusted_domains()
 
-        # We have non-zero list of trusted domains and have to go through
-        # them one by one and check their sids as prefixes / exact match
-        # depending on the value of exact_match flag
+        # We have non-zero list of trusted domains and have to check their
+        # sids as prefixes / exact match depending on the value of
+        # exact_match flag
+        sid_index = self._get_sid_index()
         if exact_match:
             # check exact match of sids
-            for domain in self._domains:
-                if sid == str(self._domains[domain][1]):
-                    return domain
+            domain = sid_index.get_domain_by_exact_sid(sid)
+            if domain is not None:
+                return domain
 
             raise errors.NotFound(reason=_("SID does not match exactly"
                                            "with any trusted domain's SID"))
         else:
             # check as prefixes
-            test_sid_subauths = test_sid.sub_auths
-            for domain in self._domains:
-                domsid = self._domains[domain][1]
-                sub_auths = domsid.sub_auths
-                num_auths = min(test_sid.num_auths, domsid.num_auths)
-                if test_sid_subauths[:num_auths] == sub_auths[:num_auths]:
-                    return domain
+            domain = sid_index.get_domain_by_sid(test_sid)
+            if domain is not None:
+                return domain
             raise errors.NotFound(reason=_('SID does not match any '
                                            'trusted domain'))
 
+    def _get_sid_index(self):
+        if self._sid_index is None or \
+                self._sid_index.domains is not self._domains:
+            self._sid_index = TrustedDomainSIDIndex(self._domains)
+        return self._sid_index
+
+    def validate_sids(self, sids):
+        """
+        Check which of the given SIDs belong to a trusted domain.
+
+        Unlike repeated calls of is_trusted_sid_valid(), the trusted domains
+        are read only once.
+
+        :param sids: iterable of SID strings
+        :returns: dict mapping each SID to the name of the trusted domain it
+            belongs to or None if it is not a valid trusted domain SID
+        """
+        result = dict.fromkeys(sids)
+        if not self.domain:
+            return result
+        try:
+            self.set_trusted_domains()
+        except errors.ValidationError:
+            return result
+
+        sid_index = self._get_sid_index()
+        for sid in result:
+            try:
+                test_sid = security.dom_sid(sid)
+            except TypeError:
+                continue
+            result[sid] = sid_index.get_domain_by_sid(test_sid)
+        return result
+
     def is_trusted_sid_valid(self, sid):
         try:
             self.get_domain_by_sid(sid)
@@ -402,9 +668,103 @@ class DomainValidator:
 
         return entries
 
+    def _admin_creds_key(self):
+        # AD DC LDAP is only searched with administrator credentials,
+        # results of lookups with and without them may differ
+        if not self._admin_creds:
+            return None
+        return hashlib.sha256(self._admin_creds.encode('utf-8')).hexdigest()
+
+    def _cache_key(self, *key):
+        # different principals may be allowed to read different data
+        return (self._admin_creds_key(),
+                getattr(context, 'principal', None)) + key
+
+    def _get_cached(self, cache_key):
+        """
+        Return a cached lookup result, raise a copy of a cached error or
+        raise KeyError if there is none.
+        """
+        value = self._trusted_objects_cache.get(cache_key)
+        if isinstance(value, errors.PublicError):
+            raise _copy_error(value)
+        return value
+
+    def _set_cached(self, cache_key, value):
+        if isinstance(value, errors.PublicError):
+            ttl = self.api.env.trust_negative_cache_ttl
+            value = _copy_error(value)
+        else:
+            ttl = self.api.env.trust_cache_ttl
+        self._trusted_objects_cache.set(cache_key, value, ttl)
+
+    def _cached_lookup(self, key, func, *args):
+        cache_key = self._cache_key(*key)
+        try:
+            return self._get_cached(cache_key)
+        except KeyError:
+            pass
+        try:
+            value = func(*args)
+        except errors.PublicError as e:
+            self._set_cached(cache_key, e)
+            raise
+        self._set_cached(cache_key, value)
+        return value
+
+    def get_trusted_domain_object_sids(self, object_names,
+                                       fallback_to_ldap=True):
+        """
+        Resolve names of trusted domain objects to SIDs.
+
+        Names which are not cached are resolved by SSSD with a single
+        request, with a fallback to the AD DC LDAP for each name SSSD
+        could not resolve.
+
+        :returns: dict mapping each name to its SID or to the
+            errors.PublicError raised when resolving it
+        """
+        result = {}
+        pending = []
+        for object_name in object_names:
+            if object_name in result:
+                continue
+            cache_key = self._cache_key(
+                'object_sid', fallback_to_ldap, object_name)
+            try:
+                result[object_name] = self._get_cached(cache_key)
+            except errors.PublicError as e:
+                result[object_name] = e
+            except KeyError:
+                pending.append(object_name)
+                result[object_name] = None
+
+        if pending:
+            sssd_result = pysss_nss_idmap.getsidbyname(pending)
+            for object_name in pending:
+                try:
+                    value = self._get_trusted_domain_object_sid(
+                        object_name, sssd_result, fallback_to_ldap)
+                except errors.PublicError as e:
+                    value = e
+                result[object_name] = value
+                self._set_cached(
+                    self._cache_key(
+                        'object_sid', fallback_to_ldap, object_name),
+                    value)
+
+        return result
+
     def get_trusted_domain_object_sid(self, object_name,
                                       fallback_to_ldap=True):
-        result = pysss_nss_idmap.getsidbyname(object_name)
+        result = self.get_trusted_domain_object_sids(
+            [object_name], fallback_to_ldap=fallback_to_ldap)[object_name]
+        if isinstance(result, errors.PublicError):
+            raise result
+        return result
+
+    def _get_trusted_domain_object_sid(self, object_name, result,
+                                       fallback_to_ldap):
         if object_name in result and \
            (pysss_nss_idmap.SID_KEY in result[object_name]):
             object_sid = result[object_name][pysss_nss_idmap.SID_KEY]
@@ -475,6 +835,11 @@ class DomainValidator:
         return pysss_type_key_translation_dict.get(object_type)
 
     def get_trusted_domain_object_from_sid(self, sid):
+        return self._cached_lookup(
+            ('object_name', sid),
+            self._get_trusted_domain_object_from_sid, sid)
+
+    def _get_trusted_domain_object_from_sid(self, sid):
         logger.debug("Converting SID to object name: %s", sid)
 
         # Check if the given SID is valid
@@ -591,7 +956,8 @@ class DomainValidator:
         a member of.
 
         First attempts to perform SID lookup via SSSD and in case of failure
-        resorts back to checking trusted domain's AD DC LDAP directly.
+        resorts back to checking trusted domain's AD DC LDAP directly. The
+        result is cached for trust_cache_ttl seconds.
 
         LIMITATIONS:
             - only Trusted Admins group members can use this function as it
@@ -599,6 +965,11 @@ class DomainValidator:
             - List of group SIDs does not contain group memberships outside
               of the trusted domain
         """
+        return self._cached_lookup(
+            ('user_and_groups', object_name),
+            self._get_trusted_domain_user_and_groups, object_name)
+
+    def _get_trusted_domain_user_and_groups(self, object_name):
         group_sids = None
         group_list = None
         object_sid = None
@@ -715,18 +1086,66 @@ class DomainValidator:
         """
         Actual search in AD LDAP server, using SASL GSSAPI authentication
         Returns LDAP result or None.
+
+        Connections are pooled per AD DC and administrator credentials, a
+        pooled connection saves the kinit and the bind.
         """
+        if not self._admin_creds:
+            return None
 
-        ccache_name = None
+        if basedn is None:
+            # Use domain root base DN
+            basedn = ipautil.realm_to_suffix(info['dns_domain'])
 
-        if self._admin_creds:
-            (ccache_name,
-             _principal) = self.kinit_as_administrator(info['dns_domain'])
+        pool_key = (self._admin_creds_key(), host, port)
+        pool_enabled = (self.api.env.context in ('server', 'lite') and
+                        self.api.env.ldap_pool_size > 0)
 
-        if ccache_name:
-            with ipautil.private_ccache(path=ccache_name):
+        def log_failure(e):
+            msg = "Search on AD DC {host}:{port} failed with: {err}"\
+                  .format(host=host, port=str(port), err=str(e))
+            if quiet:
+                logger.debug('%s', msg)
+            else:
+                logger.warning('%s', msg)
+
+        def search(conn):
+            """
+            Search and return the entries, release the connection to the
+            pool unless it failed
+            """
+            try:
+                entries = conn.get_entries(basedn, scope, filter, attrs)
+            except errors.NotFound as e:
+                log_failure(e)
                 entries = None
+            except Exception:
+                _gc_connection_pool.discard(conn)
+                raise
+            if pool_enabled:
+                _gc_connection_pool.release(
+                    pool_key, conn, self.api.env.ldap_pool_size)
+            else:
+                conn.close()
+            return entries
 
+        if pool_enabled:
+            conn = _gc_connection_pool.acquire(
+                pool_key, self.api.env.ldap_pool_idle_timeout)
+            if conn is not None:
+                try:
+                    return search(conn)
+                except Exception as e:
+                    # the AD DC may have closed the idle connection, retry
+                    # with a new one
+                    logger.debug("Search on pooled connection to AD DC %s "
+                                 "failed with: %s", host, e)
+
+        (ccache_name,
+         _principal) = self.kinit_as_administrator(info['dns_domain'])
+
+        if ccache_name:
+            with ipautil.private_ccache(path=ccache_name):
                 try:
                     # AD does not support SASL + TLS at the same time
                     # https://msdn.microsoft.com/en-us/library/cc223500.aspx
@@ -736,21 +1155,10 @@ class DomainValidator:
                         decode_attrs=False
                     )
                     conn.gssapi_bind()
-
-                    if basedn is None:
-                        # Use domain root base DN
-                        basedn = ipautil.realm_to_suffix(info['dns_domain'])
-
-                    entries = conn.get_entries(basedn, scope, filter, attrs)
+                    return search(conn)
                 except Exception as e:
-                    msg = "Search on AD DC {host}:{port} failed with: {err}"\
-                          .format(host=host, port=str(port), err=str(e))
-                    if quiet:
-                        logger.debug('%s', msg)
-                    else:
-                        logger.warning('%s', msg)
-
-                return entries
+                    log_failure(e)
+                    return None
         return None
 
     def __retrieve_trusted_domain_gc_list(self, domain):
@@ -764,6 +1172,30 @@ class DomainValidator:
         if domain in self._info:
             return self._info[domain]
 
+        cache_key = domain.lower()
+        try:
+            info = self._gc_info_cache.get(cache_key)
+        except KeyError:
+            pass
+        else:
+            if isinstance(info, errors.PublicError):
+                raise _copy_error(info)
+            self._info[domain] = info
+            return info
+
+        try:
+            info = self.__find_trusted_domain_gc_list(domain)
+        except errors.PublicError as e:
+            self._gc_info_cache.set(
+                cache_key, _copy_error(e),
+                self.api.env.trust_negative_cache_ttl)
+            raise
+        self._gc_info_cache.set(cache_key, info, self.api.env.trust_cache_ttl)
+        self._info[domain] = info
+        return info
+
+    def __find_trusted_domain_gc_list(self, domain):
+
         if not self._creds:
             self._parm = param.LoadParm()
             self._parm.load(
@@ -819,7 +1251,6 @@ class DomainValidator:
         if finddc_error and len(info['gc']) == 0:
             raise assess_dcerpc_error(finddc_error)
 
-        self._info[domain] = info
         return info
 
 
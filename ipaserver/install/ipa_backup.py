@@ -19,14 +19,19 @@
 
 from __future__ import absolute_import, print_function
 
+import hashlib
 import logging
 import optparse  # pylint: disable=deprecated-module
 import os
 import shutil
+import subprocess
 import sys
+import tarfile
 import tempfile
+import threading
 import time
 import pwd
+from concurrent import futures
 
 import six
 
@@ -98,6 +103,147 @@ def encrypt_file(filename, remove_original=True):
     return dest
 
 
+def get_compress_args():
+    """
+    Return the command compressing stdin to stdout in gzip format.
+
+    pigz is used if it is installed, it compresses using all CPUs.
+    """
+    if os.path.exists(paths.PIGZ):
+        return [paths.PIGZ, '-c']
+    return [paths.GZIP, '-c']
+
+
+class _TeeReader:
+    """
+    File-like object passing everything read from fileobj also to sink and
+    logging the progress.
+    """
+    progress_interval = 30
+
+    def __init__(self, fileobj, sink, total):
+        self.fileobj = fileobj
+        self.sink = sink
+        self.total = total
+        self.count = 0
+        self.reported = time.time()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        if data:
+            self.sink.write(data)
+            self.count += len(data)
+            now = time.time()
+            if now - self.reported >= self.progress_interval:
+                self.reported = now
+                logger.info('Archived %d of %d MiB (%d%%)',
+                            self.count >> 20, self.total >> 20,
+                            min(100, 100 * self.count // max(self.total, 1)))
+        return data
+
+
+def _copy_with_checksum(src, dst=None):
+    """Read src to the end, copy it to dst and return its checksum"""
+    h = hashlib.sha256()
+    for data in iter(lambda: src.read(1 << 20), b''):
+        h.update(data)
+        if dst is not None:
+            dst.write(data)
+    return 'sha256:%s' % h.hexdigest()
+
+
+def write_archive(directory, filename, encrypt=False):
+    """
+    Archive the contents of directory to filename in a single pass.
+
+    The archive is compressed in gzip format and encrypted with gpg if
+    requested. The uncompressed tar stream passes through this process,
+    so the checksums of the files in the archive and of the archive itself
+    are computed without reading the data again.
+
+    Return a dictionary mapping the names of the archived files and the
+    base name of the archive to their SHA-256 checksums.
+    """
+    total = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _dirs, files in os.walk(directory) for name in files
+    )
+    checksums = {}
+    procs = []
+    write_errors = []
+
+    def start(args, **kwargs):
+        # stderr goes to a file, a full pipe would block the pipeline
+        err = tempfile.TemporaryFile()
+        procs.append((args[0], subprocess.Popen(args, stderr=err, **kwargs),
+                      err))
+        return procs[-1][1]
+
+    def write_output(fileobj):
+        try:
+            with open(filename, 'wb') as f:
+                checksums[os.path.basename(filename)] = _copy_with_checksum(
+                    fileobj, f)
+        except Exception as e:
+            write_errors.append(e)
+            # keep reading so that the pipeline is not blocked
+            _copy_with_checksum(fileobj)
+
+    try:
+        tar = start(['tar', '--xattrs', '--selinux', '-cf', '-', '.'],
+                    cwd=directory, stdout=subprocess.PIPE)
+        compress = start(get_compress_args(), stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE)
+        output = compress
+        if encrypt:
+            output = start([paths.GPG2, '--batch', '--default-recipient-self',
+                            '--encrypt'],
+                           stdin=compress.stdout, stdout=subprocess.PIPE)
+            compress.stdout.close()
+
+        writer = threading.Thread(target=write_output, args=(output.stdout,))
+        writer.start()
+        try:
+            stream = _TeeReader(tar.stdout, compress.stdin, total)
+            with tarfile.open(fileobj=stream, mode='r|',
+                              bufsize=1 << 20) as archive:
+                for member in archive:
+                    if member.isfile():
+                        checksums[os.path.normpath(member.name)] = (
+                            _copy_with_checksum(archive.extractfile(member)))
+            # pass on the padding after the end of the archive
+            while stream.read(1 << 20):
+                pass
+        finally:
+            compress.stdin.close()
+            writer.join()
+    except BaseException:
+        for _name, proc, _err in procs:
+            if proc.poll() is None:
+                proc.kill()
+        raise
+    finally:
+        for _name, proc, _err in procs:
+            proc.wait()
+
+    try:
+        for name, proc, err in procs:
+            if proc.returncode != 0:
+                err.seek(0)
+                raise admintool.ScriptError(
+                    '%s returned non-zero code %d: %s' % (
+                        name, proc.returncode,
+                        err.read().decode('utf-8', 'replace')))
+    finally:
+        for _name, _proc, err in procs:
+            err.close()
+    if write_errors:
+        raise admintool.ScriptError(
+            'Unable to write %s: %s' % (filename, write_errors[0]))
+
+    return checksums
+
+
 class Backup(admintool.AdminTool):
     command_name = 'ipa-backup'
     log_file_name = paths.IPABACKUP_LOG
@@ -302,6 +448,7 @@ class Backup(admintool.AdminTool):
         os.mkdir(self.dir, 0o750)
         os.chown(self.dir, pent.pw_uid, pent.pw_gid)
         self.tarfile = None
+        self.tarfile_compressed = False
 
         self.header = os.path.join(self.top_dir, 'header')
 
@@ -330,10 +477,11 @@ class Backup(admintool.AdminTool):
             instance = ipaldap.realm_to_serverid(api.env.realm)
             if os.path.exists(paths.VAR_LIB_SLAPD_INSTANCE_DIR_TEMPLATE %
                               instance):
+                backends = ['userRoot']
                 if os.path.exists(paths.SLAPD_INSTANCE_DB_DIR_TEMPLATE %
                                   (instance, 'ipaca')):
-                    self.db2ldif(instance, 'ipaca', online=options.online)
-                self.db2ldif(instance, 'userRoot', online=options.online)
+                    backends.insert(0, 'ipaca')
+                self.export_ldif(instance, backends, online=options.online)
                 self.db2bak(instance, online=options.online)
             if not options.data_only:
                 # create backup of auth configuration
@@ -483,6 +631,30 @@ class Backup(admintool.AdminTool):
 
         return self._conn
 
+    def export_ldif(self, instance, backends, online=True):
+        '''
+        Create LDIF backups of the backends in this instance.
+
+        Online, the export tasks of the backends run concurrently. Offline,
+        the backends are exported one after another, as concurrent
+        db2ldif runs would compete for the database files and locks of the
+        stopped instance.
+        '''
+        if not online:
+            for backend in backends:
+                self.db2ldif(instance, backend, online)
+            return
+
+        # connect and bind before the threads share the connection
+        self.get_connection()
+        with futures.ThreadPoolExecutor(len(backends)) as executor:
+            exports = [
+                executor.submit(self.db2ldif, instance, backend, online)
+                for backend in backends
+            ]
+            for export in exports:
+                export.result()
+
     def db2ldif(self, instance, backend, online=True):
         '''
         Create a LDIF backup of the data in this instance.
@@ -494,7 +666,7 @@ class Backup(admintool.AdminTool):
         '''
         logger.info('Backing up %s in %s to LDIF', backend, instance)
 
-        cn = time.strftime('export_%Y_%m_%d_%H_%M_%S')
+        cn = '%s_%s' % (time.strftime('export_%Y_%m_%d_%H_%M_%S'), backend)
         dn = DN(('cn', cn), ('cn', 'export'), ('cn', 'tasks'), ('cn', 'config'))
 
         ldifname = '%s-%s.ldif' % (instance, backend)
@@ -628,14 +800,21 @@ class Backup(admintool.AdminTool):
 
         self.tarfile = os.path.join(self.dir, 'files.tar')
 
+        # With pigz the archive is compressed while it is written, pigz
+        # keeps up with the disk and the services are not stopped for
+        # longer. gzip is slower, so the archive is compressed only after
+        # the services are restarted.
+        self.tarfile_compressed = os.path.exists(paths.PIGZ)
+
         logger.info("Backing up files")
         args = ['tar',
                 '--exclude=%s' % paths.IPA_BACKUP_DIR,
                 '--xattrs',
                 '--selinux',
-                '-cf',
-                self.tarfile
                ]
+        if self.tarfile_compressed:
+            args.append('--use-compress-program=%s' % paths.PIGZ)
+        args.extend(['-cf', self.tarfile])
 
         args.extend(verify_directories(self.dirs))
         args.extend(verify_directories(self.files))
@@ -643,17 +822,22 @@ class Backup(admintool.AdminTool):
         if options.logs:
             args.extend(verify_directories(self.logs))
 
+        # Backup the necessary directory structure. The '--no-recursion'
+        # flag stores the directory structure only, no files.
+        missing_directories = verify_directories(self.required_dirs)
+
+        if missing_directories and self.tarfile_compressed:
+            # a compressed archive cannot be appended to, store them in
+            # the same call; --no-recursion applies to the names after it
+            args.append('--no-recursion')
+            args.extend(missing_directories)
+
         result = run(args, raiseonerr=False)
         if result.returncode != 0:
             raise admintool.ScriptError('tar returned non-zero code %d: %s' %
                                         (result.returncode, result.error_log))
 
-        # Backup the necessary directory structure. This is a separate
-        # call since we are using the '--no-recursion' flag to store
-        # the directory structure only, no files.
-        missing_directories = verify_directories(self.required_dirs)
-
-        if missing_directories:
+        if missing_directories and not self.tarfile_compressed:
             args = ['tar',
                     '--exclude=%s' % paths.IPA_BACKUP_DIR,
                     '--xattrs',
@@ -675,7 +859,7 @@ class Backup(admintool.AdminTool):
 
         # Compress the archive. This is done separately, since 'tar' cannot
         # append to a compressed archive.
-        if self.tarfile:
+        if self.tarfile and not self.tarfile_compressed:
             result = run([paths.GZIP, self.tarfile], raiseonerr=False)
             if result.returncode != 0:
                 raise admintool.ScriptError(
@@ -723,6 +907,21 @@ class Backup(admintool.AdminTool):
         with open(self.header, 'w') as fd:
             config.write(fd)
 
+    def add_checksums(self, checksums):
+        '''
+        Add the checksums of the backup archive and of the files in it to
+        the backup file header.
+        '''
+        config = SafeConfigParser()
+        # file names are case sensitive
+        config.optionxform = str
+        config.read(self.header)
+        config.add_section('checksums')
+        for name, checksum in sorted(checksums.items()):
+            config.set('checksums', name, checksum)
+        with open(self.header, 'w') as fd:
+            config.write(fd)
+
     def finalize_backup(self, data_only=False, encrypt=False, keyring=None):
         '''
         Create the final location of the backup files and move the files
@@ -760,19 +959,12 @@ class Backup(admintool.AdminTool):
                 'Unexpected error: %s' % e
             )
 
-        os.chdir(self.dir)
-        args = [
-            'tar', '--xattrs', '--selinux', '-czf', filename, '.'
-        ]
-        result = run(args, raiseonerr=False)
-        if result.returncode != 0:
-            raise admintool.ScriptError(
-                'tar returned non-zero code %s: %s' %
-                (result.returncode, result.error_log)
-            )
         if encrypt:
             logger.info('Encrypting %s', filename)
-            filename = encrypt_file(filename)
+            filename = filename + '.gpg'
+        # archive, compress and encrypt in a single pass
+        checksums = write_archive(self.dir, filename, encrypt)
+        self.add_checksums(checksums)
         try:
             shutil.move(self.header, backup_dir)
         except (IOError, OSError) as e:
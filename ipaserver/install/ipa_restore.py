@@ -19,6 +19,7 @@
 
 from __future__ import absolute_import, print_function
 
+import hashlib
 import logging
 import optparse  # pylint: disable=deprecated-module
 import os
@@ -795,6 +796,8 @@ class Restore(admintool.AdminTool):
         this particular backup.
         '''
         config = SafeConfigParser()
+        # file names in the checksums section are case sensitive
+        config.optionxform = str
         config.read(self.header)
 
         self.backup_type = config.get('ipa', 'type')
@@ -807,6 +810,28 @@ class Restore(admintool.AdminTool):
         # method
         self.backup_services = config.get('ipa', 'services').split(',')
         # pylint: enable=no-member
+        self.backup_checksums = {}
+        if config.has_section('checksums'):
+            self.backup_checksums = dict(config.items('checksums'))
+
+    def verify_checksum(self, filename):
+        '''
+        Verify the checksum of a file of the backup if the header has it.
+        Backups made by older versions have no checksums.
+        '''
+        expected = self.backup_checksums.get(os.path.basename(filename))
+        if expected is None:
+            return
+        logger.info('Verifying %s', filename)
+        algorithm, _sep, expected = expected.partition(':')
+        h = hashlib.new(algorithm)
+        with open(filename, 'rb') as f:
+            for data in iter(lambda: f.read(1 << 20), b''):
+                h.update(data)
+        if h.hexdigest() != expected:
+            raise admintool.ScriptError(
+                'Checksum of %s does not match, the backup is corrupted' %
+                filename)
 
     def extract_backup(self):
         '''
@@ -827,6 +852,8 @@ class Restore(admintool.AdminTool):
                 filename = filename + '.gpg'
                 encrypt = True
 
+        self.verify_checksum(filename)
+
         if encrypt:
             logger.info('Decrypting %s', filename)
             filename = decrypt_file(self.dir, filename)
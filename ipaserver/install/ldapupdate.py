@@ -143,6 +143,8 @@ class LDAPUpdate:
         ('cn', 'index'), ('cn', 'userRoot'), ('cn', 'ldbm database'),
         ('cn', 'plugins'), ('cn', 'config')
     )
+    entry_attrs = ["*", "aci", "attributeTypes", "objectClasses"]
+    max_prefetch_size = 256
 
     def __init__(self, dm_password=None, sub_dict={},
                  online=True, ldapi=False):
@@ -264,6 +266,9 @@ class LDAPUpdate:
         self.dm_password = dm_password
         self.conn = None
         self.modified = False
+        self.index_attributes = set()
+        self._prefetched = {}
+        self._prefetch_size = 1
         self.online = online
         self.ldapi = ldapi
         self.pw_name = pwd.getpwuid(os.geteuid()).pw_name
@@ -640,11 +645,48 @@ class LDAPUpdate:
            The return type is ipaldap.LDAPEntry
         """
         assert isinstance(dn, DN)
+        try:
+            entry = self._prefetched.pop(dn)
+        except KeyError:
+            pass
+        else:
+            if entry is None:
+                raise errors.NotFound(reason='no such entry')
+            return [entry]
+
         searchfilter="objectclass=*"
-        sattrs = ["*", "aci", "attributeTypes", "objectClasses"]
         scope = self.conn.SCOPE_BASE
 
-        return self.conn.get_entries(dn, scope, searchfilter, sattrs)
+        return self.conn.get_entries(dn, scope, searchfilter, self.entry_attrs)
+
+    def _prefetch_entries(self, all_updates, start):
+        """
+        Read the entries of the update records from start on with pipelined
+        searches, up to the next delete or plugin.
+
+        A modification may change other entries through DS plugins, so it
+        discards the prefetched entries. The number of entries read at once
+        starts at one and doubles every time all of them were used.
+        """
+        dns = []
+        seen = set()
+        for update in all_updates[start:]:
+            if 'deleteentry' in update or 'plugin' in update:
+                break
+            dn = update['dn']
+            if dn not in seen:
+                seen.add(dn)
+                dns.append(dn)
+                if len(dns) >= self._prefetch_size:
+                    break
+
+        self._prefetched = self.conn.get_entries_by_dn(dns, self.entry_attrs)
+        self._prefetch_size = min(self._prefetch_size * 2,
+                                  self.max_prefetch_size)
+
+    def _discard_prefetched(self):
+        self._prefetched = {}
+        self._prefetch_size = 1
 
     def _apply_update_disposition(self, updates, entry):
         """
@@ -828,6 +870,7 @@ class LDAPUpdate:
                     # addifexist may result in an entry with only a
                     # dn defined. In that case there is nothing to do.
                     # It means the entry doesn't exist, so skip it.
+                    self._discard_prefetched()
                     try:
                         self.conn.add_entry(entry)
                     except errors.NotFound:
@@ -852,6 +895,7 @@ class LDAPUpdate:
                 logger.debug("%s", safe_changes)
                 logger.debug("Updated %d", updated)
                 if updated:
+                    self._discard_prefetched()
                     self.conn.update_entry(entry)
                 logger.debug("Done")
             except errors.EmptyModlist:
@@ -878,6 +922,7 @@ class LDAPUpdate:
         """
 
         dn = updates['dn']
+        self._discard_prefetched()
         try:
             logger.debug("Deleting entry %s", dn)
             self.conn.delete_entry(dn)
@@ -902,7 +947,11 @@ class LDAPUpdate:
 
     def _run_update_plugin(self, plugin_name):
         logger.debug("Executing upgrade plugin: %s", plugin_name)
+        # the plugin may search using the new indexes and modify entries
+        self._run_index_task()
+        self._discard_prefetched()
         restart_ds, updates = self.api.Updater[plugin_name]()
+        self._discard_prefetched()
         if updates:
             self._run_updates(updates)
         # restart may be required even if no updates were returned
@@ -922,24 +971,34 @@ class LDAPUpdate:
             raise RuntimeError("Offline updates are not supported.")
 
     def _run_updates(self, all_updates):
-        index_attributes = set()
-        for update in all_updates:
+        for i, update in enumerate(all_updates):
             if 'deleteentry' in update:
                 self._delete_record(update)
             elif 'plugin' in update:
                 self._run_update_plugin(update['plugin'])
             else:
+                if update['dn'] not in self._prefetched:
+                    self._prefetch_entries(all_updates, i)
                 entry, modified = self._update_record(update)
                 if modified and entry.dn.endswith(self.index_suffix):
-                    index_attributes.add(entry.single_value['cn'])
+                    self.index_attributes.add(entry.single_value['cn'])
 
-        if index_attributes:
-            # The LDAPUpdate framework now keeps record of all changed/added
-            # indices and batches all changed attribute in a single index
-            # task. This makes updates much faster when multiple indices are
-            # added or modified.
-            task_dn = self.create_index_task(*sorted(index_attributes))
-            self.monitor_index_task(task_dn)
+    def _run_index_task(self):
+        """
+        Index the attributes whose indices were added or modified.
+
+        The LDAPUpdate framework keeps record of all changed/added indices
+        and batches all changed attributes in a single index task, which is
+        run before the next update plugin or at the end of the update. DS
+        does not run several index tasks of one backend at once and every
+        task reads the whole backend, so this makes updates much faster when
+        indices are added or modified in several update files.
+        """
+        if not self.index_attributes:
+            return
+        task_dn = self.create_index_task(*sorted(self.index_attributes))
+        self.index_attributes = set()
+        self.monitor_index_task(task_dn)
 
     def update(self, files, ordered=True):
         """Execute the update. files is a list of the update files to use.
@@ -948,6 +1007,7 @@ class LDAPUpdate:
         returns True if anything was changed, otherwise False
         """
         self.modified = False
+        self.index_attributes = set()
         try:
             self.create_connection()
 
@@ -972,7 +1032,10 @@ class LDAPUpdate:
                     "LDAP update duration: %s %.03f sec", f, dur,
                     extra={'timing': ('ldapupdate', f, None, dur)}
                 )
+
+            self._run_index_task()
         finally:
+            self._discard_prefetched()
             self.close_connection()
 
         return self.modified
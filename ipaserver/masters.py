@@ -9,10 +9,13 @@ from __future__ import absolute_import
 import collections
 import logging
 import random
+import threading
+import time
 
 from ipapython.dn import DN
 from ipalib import api
 from ipalib import errors
+from ipalib.request import context
 
 logger = logging.getLogger(__name__)
 
@@ -48,25 +51,98 @@ SERVICES = [
 
 SERVICE_LIST = {s.service_entry: s for s in SERVICES}
 
+# maximum age of a service index in seconds, the index is also reloaded
+# whenever the last USN of the LDAP server changes
+SERVICE_INDEX_TTL = 300
+SERVICE_INDEX_CACHE_SIZE = 16
 
-def find_providing_servers(svcname, conn=None, preferred_hosts=(), api=api):
-    """Find servers that provide the given service.
 
-    :param svcname: The service to find
-    :param preferred_hosts: preferred servers
-    :param conn: a connection to the LDAP server
-    :param api: ipalib.API instance
-    :return: list of host names in randomized order (possibly empty)
+class ServiceIndex:
+    """Configuration strings of all services in cn=masters,cn=ipa,cn=etc
 
-    Preferred servers are moved to the front of the list if and only if they
-    are found as providing servers.
+    The index maps lower case service names to dictionaries mapping lower
+    case server host names to sets of configuration strings.
     """
-    assert isinstance(preferred_hosts, (tuple, list))
-    if svcname not in SERVICE_LIST:
-        raise ValueError("Unknown service '{}'.".format(svcname))
-    if conn is None:
-        conn = api.Backend.ldap2
 
+    _cache = {}
+    _lock = threading.Lock()
+
+    def __init__(self, services, lastusn):
+        self.services = services
+        self.lastusn = lastusn
+        self.created = time.time()
+
+    def is_valid(self, lastusn):
+        return (
+            lastusn is not None and
+            lastusn == self.lastusn and
+            time.time() - self.created < SERVICE_INDEX_TTL
+        )
+
+    def get_servers(self, svcname):
+        return self.services.get(svcname.lower(), {})
+
+    @classmethod
+    def _load(cls, conn, api, lastusn):
+        dn = DN(api.env.container_masters, api.env.basedn)
+        entries, truncated = conn.find_entries(
+            filter='(objectClass=ipaConfigObject)',
+            attrs_list=['cn', 'ipaConfigString'],
+            base_dn=dn,
+            size_limit=0
+        )
+        if truncated:
+            return None
+
+        services = {}
+        for entry in entries:
+            if len(entry.dn) < 2:
+                continue
+            servername = entry.dn[1].value.lower()
+            cfgstrings = set(entry.get('ipaConfigString', []))
+            for cn in entry.get('cn', []):
+                servers = services.setdefault(cn.lower(), {})
+                servers.setdefault(servername, set()).update(cfgstrings)
+        return cls(services, lastusn)
+
+    @classmethod
+    def get(cls, conn, api=api):
+        """Get the service index of the LDAP server of the connection
+
+        The index is shared by all threads of the process. It is loaded with
+        a single search and reused until the last USN of the server changes.
+
+        :return: ServiceIndex or None if the index cannot be loaded
+        """
+        # different principals may be allowed to read different data
+        key = (conn.ldap_uri, api.env.basedn,
+               getattr(context, 'principal', None))
+        lastusn = conn.get_last_usn()
+
+        with cls._lock:
+            index = cls._cache.get(key)
+        if index is not None and index.is_valid(lastusn):
+            return index
+
+        try:
+            index = cls._load(conn, api, lastusn)
+        except errors.NotFound:
+            index = cls({}, lastusn)
+        if index is None or lastusn is None:
+            return index
+
+        with cls._lock:
+            if len(cls._cache) >= SERVICE_INDEX_CACHE_SIZE:
+                cls._cache.clear()
+            cls._cache[key] = index
+        return index
+
+
+def _search_providing_servers(svcname, conn, api):
+    """Search for service entries of servers providing the given service
+
+    :return: dictionary mapping host names to sets of configuration strings
+    """
     dn = DN(api.env.container_masters, api.env.basedn)
 
     query_filter = conn.combine_filters(
@@ -95,14 +171,44 @@ def find_providing_servers(svcname, conn=None, preferred_hosts=(), api=api):
             base_dn=dn
         )
     except errors.NotFound:
-        return []
+        return {}
+
+    servers = {}
+    for entry in entries:
+        servername = entry.dn[1].value.lower()
+        servers.setdefault(servername, set()).update(
+            entry.get('ipaConfigString', []))
+    return servers
+
+
+def find_providing_servers(svcname, conn=None, preferred_hosts=(), api=api):
+    """Find servers that provide the given service.
+
+    :param svcname: The service to find
+    :param preferred_hosts: preferred servers
+    :param conn: a connection to the LDAP server
+    :param api: ipalib.API instance
+    :return: list of host names in randomized order (possibly empty)
+
+    Preferred servers are moved to the front of the list if and only if they
+    are found as providing servers.
+    """
+    assert isinstance(preferred_hosts, (tuple, list))
+    if svcname not in SERVICE_LIST:
+        raise ValueError("Unknown service '{}'.".format(svcname))
+    if conn is None:
+        conn = api.Backend.ldap2
+
+    index = ServiceIndex.get(conn, api)
+    if index is not None:
+        service_servers = index.get_servers(svcname)
+    else:
+        service_servers = _search_providing_servers(svcname, conn, api)
 
     # DNS is case insensitive
     preferred_hosts = list(host_name.lower() for host_name in preferred_hosts)
     servers = []
-    for entry in entries:
-        servername = entry.dn[1].value.lower()
-        cfgstrings = entry.get('ipaConfigString', [])
+    for servername, cfgstrings in service_servers.items():
         # always consider enabled services
         if ENABLED_SERVICE in cfgstrings:
             servers.append(servername)
@@ -177,6 +283,10 @@ def is_service_enabled(svcname, conn=None, api=api):
     if conn is None:
         conn = api.Backend.ldap2
 
+    index = ServiceIndex.get(conn, api)
+    if index is not None:
+        return bool(index.get_servers(svcname))
+
     dn = DN(api.env.container_masters, api.env.basedn)
     query_filter = conn.make_filter(
         {
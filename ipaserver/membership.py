@@ -0,0 +1,246 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""Per-process cache of the membership graph of the IPA tree
+
+The graph is built from all entries which contain member, memberUser or
+memberHost values. It is used to compute indirect membership (the
+memberindirect and memberofindirect virtual attributes) without searching
+the whole tree for every displayed entry.
+
+Before a cached graph is used, membership containers with entryUSN (or
+modifyTimestamp, if the USN plugin is not enabled) newer than the newest one
+seen so far are read again and replace their old version in the graph.
+Deleted containers are not removed from the graph, they are unreachable once
+the referential integrity plugin removes them from their parents.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import logging
+import threading
+
+from ipalib import errors
+from ipalib.request import context
+
+logger = logging.getLogger(__name__)
+
+# attributes whose values form the edges of the membership graph, they are
+# the same as memberofgroupattr of the memberOf plugin
+MEMBER_ATTRS = ('member', 'memberuser', 'memberhost')
+
+# entries that can hold membership attributes, used to detect changes
+# of containers which lost their last member
+CONTAINER_FILTER = (
+    '(|(objectclass=groupofnames)(objectclass=ipaassociation)'
+    '(member=*)(memberuser=*)(memberhost=*))'
+)
+
+# maximum number of graphs (one per bound principal) kept in a process
+MAX_GRAPHS = 8
+
+# maximum number of member values held by all graphs of a process
+MAX_VALUES = 1000000
+
+
+def _key(value):
+    if not isinstance(value, bytes):
+        value = str(value).encode('utf-8')
+    return value.lower()
+
+
+class MembershipGraph:
+    """
+    Membership relations between entries of a subtree.
+
+    Vertices are normalized DN strings of entries, edges go from a container
+    to the values of its member, memberUser and memberHost attributes.
+    """
+
+    def __init__(self, base_dn):
+        self.base_dn = base_dn
+        self.usn = None
+        self.timestamp = None
+        self._members = {}
+        self._children = {}
+        self._containers = collections.defaultdict(set)
+        self._closure = {}
+        self.size = 0
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, ldap, base_dn):
+        """Build membership graph of base_dn subtree from LDAP"""
+        graph = cls(base_dn)
+        search_filter = ldap.combine_filters(
+            ['(%s=*)' % attr for attr in MEMBER_ATTRS], ldap.MATCH_ANY)
+        graph._add_entries(ldap, search_filter)
+        logger.debug("loaded membership graph of %s with %d containers",
+                     base_dn, len(graph._children))
+        return graph
+
+    def _add_entries(self, ldap, search_filter):
+        count = 0
+        try:
+            for entry in ldap.iter_entries(
+                    search_filter,
+                    list(MEMBER_ATTRS) + ['entryusn', 'modifytimestamp'],
+                    self.base_dn,
+                    size_limit=-1,  # paged search will get everything anyway
+                    paged_search=True):
+                self.add_entry(entry)
+                count += 1
+        except errors.NotFound:
+            pass
+        return count
+
+    def add_entry(self, entry):
+        """
+        Add a container entry and its membership values to the graph,
+        replace the previous version of the entry if there is any
+        """
+        key = _key(entry.dn)
+        with self.lock:
+            old_children = self._children.get(key, ())
+            for member in old_children:
+                self._containers[member].discard(key)
+            self.size -= len(old_children)
+            children = set()
+            for attr in MEMBER_ATTRS:
+                for value in entry.raw.get(attr, []):
+                    member = _key(value)
+                    children.add(member)
+                    self._containers[member].add(key)
+            self._children[key] = children
+            self._members[key] = entry.raw.get('member', [])
+            self.size += len(children)
+            self._closure.clear()
+
+            for value in entry.raw.get('entryusn', []):
+                usn = int(value)
+                if self.usn is None or usn > self.usn:
+                    self.usn = usn
+            for value in entry.raw.get('modifytimestamp', []):
+                timestamp = value.decode('utf-8')
+                if self.timestamp is None or timestamp > self.timestamp:
+                    self.timestamp = timestamp
+
+    def refresh(self, ldap):
+        """
+        Read again membership containers changed since the newest change
+        seen by the graph. Return the number of entries read.
+        """
+        if self.usn is not None:
+            changed_filter = '(entryusn>=%d)' % (self.usn + 1)
+        elif self.timestamp is not None:
+            # modifyTimestamp has a resolution of one second, entries
+            # modified in the same second as the newest one are read again
+            changed_filter = '(modifytimestamp>=%s)' % self.timestamp
+        else:
+            changed_filter = '(objectclass=*)'
+        search_filter = ldap.combine_filters(
+            (CONTAINER_FILTER, changed_filter), ldap.MATCH_ALL)
+        with self.lock:
+            count = self._add_entries(ldap, search_filter)
+        if count:
+            logger.debug("refreshed %d entries of membership graph of %s",
+                         count, self.base_dn)
+        return count
+
+    def get_indirect_members(self, dn):
+        """
+        Return raw member values of all containers transitively nested in
+        the entry dn. Values of the direct members of dn are included and
+        have to be removed by the caller.
+        """
+        key = _key(dn)
+        with self.lock:
+            try:
+                return self._closure[key]
+            except KeyError:
+                pass
+            indirect = self._get_indirect_members(key)
+            self._closure[key] = indirect
+            return indirect
+
+    def _get_indirect_members(self, key):
+        indirect = set()
+        visited = set()
+        stack = list(self._children.get(key, ()))
+        while stack:
+            vertex = stack.pop()
+            if vertex in visited:
+                continue
+            visited.add(vertex)
+            members = self._members.get(vertex)
+            if members is not None:
+                indirect.update(members)
+                stack.extend(self._children[vertex])
+
+        return frozenset(indirect)
+
+    def get_containers(self, dn):
+        """
+        Return normalized DNs of the containers which list dn among their
+        member, memberUser or memberHost values.
+        """
+        return self._containers.get(_key(dn), frozenset())
+
+    def is_direct_member(self, dn, container):
+        """Check if container lists dn directly, container is a raw value"""
+        return _key(container) in self.get_containers(dn)
+
+
+class MembershipCache:
+    """
+    Cache membership graphs of the LDAP tree.
+
+    Graphs are kept separately for each bound principal, as the visible
+    membership depends on access controls. The least recently used graphs
+    are dropped when there are more than max_graphs of them or when they
+    hold more than max_values member values together.
+    """
+
+    def __init__(self, max_graphs=MAX_GRAPHS, max_values=MAX_VALUES):
+        self.max_graphs = max_graphs
+        self.max_values = max_values
+        self.graphs = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_graph(self, ldap, base_dn):
+        """
+        Return the membership graph of base_dn subtree, load it from LDAP
+        if it is missing or refresh entries changed since it was loaded.
+        """
+        key = (getattr(context, 'principal', None), str(base_dn))
+        with self.lock:
+            graph = self.graphs.get(key)
+            if graph is not None:
+                self.graphs.move_to_end(key)
+
+        if graph is None:
+            graph = MembershipGraph.load(ldap, base_dn)
+        else:
+            graph.refresh(ldap)
+
+        with self.lock:
+            self.graphs[key] = graph
+            self.graphs.move_to_end(key)
+            self._evict()
+        return graph
+
+    def _evict(self):
+        size = sum(graph.size for graph in self.graphs.values())
+        while len(self.graphs) > 1 and (len(self.graphs) > self.max_graphs or
+                                        size > self.max_values):
+            _key, graph = self.graphs.popitem(last=False)
+            size -= graph.size
+
+    def flush(self):
+        logger.debug('flushing MembershipCache')
+        with self.lock:
+            self.graphs.clear()
+
+
+membership_cache = MembershipCache()
@@ -19,3 +19,8 @@
 """
 Sub-package containing all server plugins.
 """
+
+# Settings which change the plugins registered by the plugin modules. The
+# plugin manifest (manifest.json, generated by "make api") is used only if
+# they have the same values as when it was generated.
+manifest_env = ('context', 'in_server', 'ra_plugin')
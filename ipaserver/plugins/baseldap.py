@@ -20,6 +20,7 @@
 Base classes for LDAP plugins.
 """
 
+import logging
 import re
 import time
 from copy import deepcopy
@@ -31,17 +32,21 @@ from ipalib import api, crud, errors
 from ipalib import Method, Object
 from ipalib import Flag, Int, Str
 from ipalib.cli import to_cli
+from ipalib.parameters import Dict
 from ipalib import output
-from ipalib.text import _
+from ipalib.text import _, ngettext
 from ipalib.util import json_serialize, validate_hostname
 from ipalib.capabilities import client_has_capability
 from ipalib.messages import add_message, SearchResultTruncated
 from ipapython.dn import DN, RDN
 from ipapython.version import API_VERSION
+from ipaserver.membership import membership_cache
 
 if six.PY3:
     unicode = str
 
+logger = logging.getLogger(__name__)
+
 DNA_MAGIC = -1
 
 global_output_params = (
@@ -663,8 +668,7 @@ class LDAPObject(Object):
                 continue
             del entry_attrs[attr]
 
-            for member in value:
-                memberdn = DN(member.decode('utf-8'))
+            for memberdn in DN.from_many(value):
                 for ldap_obj_name in self.attribute_members[attr]:
                     ldap_obj = self.api.Object[ldap_obj_name]
                     try:
@@ -684,64 +688,52 @@ class LDAPObject(Object):
                         new_attr.append(new_value)
                         break
 
-    def get_indirect_members(self, entry_attrs, attrs_list):
+    def get_indirect_members(self, entry_attrs, attrs_list, graph=None):
+        """
+        Fill in memberindirect and memberofindirect of entry_attrs.
+
+        graph is a membership graph from the membership cache. Callers
+        processing many entries should get it once and pass it in.
+        """
+        if graph is None and ('memberindirect' in attrs_list or
+                              'memberofindirect' in attrs_list):
+            graph = membership_cache.get_graph(
+                self.backend, self.api.env.basedn)
         if 'memberindirect' in attrs_list:
-            self.get_memberindirect(entry_attrs)
+            self.get_memberindirect(entry_attrs, graph)
         if 'memberofindirect' in attrs_list:
-            self.get_memberofindirect(entry_attrs)
+            self.get_memberofindirect(entry_attrs, graph)
 
-    def get_memberindirect(self, group_entry):
+    def get_memberindirect(self, group_entry, graph=None):
         """
         Get indirect members
         """
+        if graph is None:
+            graph = membership_cache.get_graph(
+                self.backend, self.api.env.basedn)
 
-        mo_filter = self.backend.make_filter({'memberof': group_entry.dn})
-        filter = self.backend.combine_filters(
-            ('(member=*)', mo_filter), self.backend.MATCH_ALL)
-        try:
-            result = self.backend.get_entries(
-                self.api.env.basedn,
-                filter=filter,
-                attrs_list=['member'],
-                size_limit=-1, # paged search will get everything anyway
-                paged_search=True)
-        except errors.NotFound:
-            result = []
-
-        indirect = set()
-        for entry in result:
-            indirect.update(entry.raw.get('member', []))
+        indirect = set(graph.get_indirect_members(group_entry.dn))
         indirect.difference_update(group_entry.raw.get('member', []))
 
         if indirect:
             group_entry.raw['memberindirect'] = list(indirect)
 
-    def get_memberofindirect(self, entry):
-
-        dn = entry.dn
-        filter = self.backend.make_filter(
-            {'member': dn, 'memberuser': dn, 'memberhost': dn})
-        try:
-            result = self.backend.get_entries(
-                self.api.env.basedn,
-                filter=filter,
-                attrs_list=[''],
-                size_limit=-1,  # paged search will get everything anyway
-                paged_search=True)
-        except errors.NotFound:
-            result = []
+    def get_memberofindirect(self, entry, graph=None):
+        if graph is None:
+            graph = membership_cache.get_graph(
+                self.backend, self.api.env.basedn)
 
-        direct = set()
-        indirect = set(entry.raw.get('memberof', []))
-        for group_entry in result:
-            dn = str(group_entry.dn).encode('utf-8')
-            if dn in indirect:
-                indirect.remove(dn)
-                direct.add(dn)
+        direct = []
+        indirect = []
+        for dn in entry.raw.get('memberof', []):
+            if graph.is_direct_member(entry.dn, dn):
+                direct.append(dn)
+            else:
+                indirect.append(dn)
 
-        entry.raw['memberof'] = list(direct)
+        entry.raw['memberof'] = direct
         if indirect:
-            entry.raw['memberofindirect'] = list(indirect)
+            entry.raw['memberofindirect'] = indirect
 
     def get_password_attributes(self, ldap, dn, entry_attrs):
         """
@@ -1157,9 +1149,14 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
 
     has_output_params = global_output_params
 
-    def execute(self, *keys, **options):
-        ldap = self.obj.backend
+    def prepare_entry(self, ldap, *keys, **options):
+        """
+        Make the entry to add from the arguments and options and run the pre
+        callbacks on it.
 
+        Return (entry_attrs, attrs_list) tuple, attrs_list is the list of
+        attributes to return for the new entry.
+        """
         dn = self.obj.get_dn(*keys, **options)
         entry_attrs = ldap.make_entry(
             dn, self.args_options_2_entry(*keys, **options))
@@ -1206,6 +1203,13 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
         _check_limit_object_class(self.api.Backend.ldap2.schema.attribute_types(self.obj.limit_object_classes), list(entry_attrs), allow_only=True)
         _check_limit_object_class(self.api.Backend.ldap2.schema.attribute_types(self.obj.disallow_object_classes), list(entry_attrs), allow_only=False)
 
+        return entry_attrs, attrs_list
+
+    def execute(self, *keys, **options):
+        ldap = self.obj.backend
+
+        entry_attrs, attrs_list = self.prepare_entry(ldap, *keys, **options)
+
         try:
             self._exc_wrapper(keys, options, ldap.add_entry)(entry_attrs)
         except errors.NotFound:
@@ -1273,6 +1277,182 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
         raise exc
 
 
+class LDAPBulkCreate(BaseLDAPCommand):
+    """
+    Create several new entries in LDAP.
+
+    Each record is a dictionary of arguments and options of the create
+    command of the object. The records are processed in chunks: all records
+    of a chunk are checked for existing entries by a single search, the
+    entries are prepared by the create command and then added by pipelined
+    LDAP operations.
+
+    Unlike the create command, the new entries are not read back and the post
+    callbacks of the create command are not called. The post callbacks of the
+    bulk command are called with a list of (entry_attrs, keys, options,
+    result) tuples of the entries added in a chunk instead.
+    """
+    chunk_size = 100
+
+    takes_args = (
+        Dict('records*',
+             doc=_('Entries to add, dictionaries of arguments and options '
+                   'of the add command'),
+        ),
+    )
+
+    has_output = (
+        output.summary,
+        output.ListOfEntries('result'),
+        output.Output('count', int, _('Number of entries added')),
+        output.Output('failed', int, _('Number of records not added')),
+    )
+
+    has_output_params = (
+        Str('value', label=_('Entry')),
+        Str('error', label=_('Error')),
+        Int('error_code', flags=['no_display']),
+        Str('error_name', flags=['no_display']),
+    )
+
+    msg_summary = ngettext(
+        '%(count)d entry added', '%(count)d entries added', 0
+    )
+
+    @property
+    def create_command(self):
+        return self.api.Command['%s_add' % self.obj.name]
+
+    def execute(self, records=None, **options):
+        ldap = self.obj.backend
+        records = records or ()
+
+        result = []
+        for i in range(0, len(records), self.chunk_size):
+            result.extend(self._add_chunk(
+                ldap, records[i:i + self.chunk_size], options['version']))
+
+        count = sum(1 for r in result if r['error'] is None)
+        return dict(result=result, count=count, failed=len(result) - count)
+
+    def _add_chunk(self, ldap, records, version):
+        command = self.create_command
+        pkey_name = self.obj.primary_key.name
+
+        results = []
+        records_keys = []
+        for record in records:
+            result = dict(value=None, error=None)
+            results.append(result)
+            records_keys.append(None)
+            try:
+                keys, options = self._convert_record(command, record, version)
+            except Exception as e:
+                value = record.get(pkey_name)
+                if value is not None:
+                    result['value'] = unicode(value)
+                self._set_error(result, e)
+                continue
+            result['value'] = pkey_to_unicode(keys[-1])
+            records_keys[-1] = (keys, options)
+
+        # one search for the entries which already exist
+        existing = self._find_existing(
+            ldap, [r['value'] for r in results if r['error'] is None])
+
+        entries = []
+        for result, record_keys in zip(results, records_keys):
+            if result['error'] is not None:
+                continue
+            keys, options = record_keys
+            try:
+                key = result['value'].lower()
+                if key in existing:
+                    self.obj.handle_duplicate_entry(*keys)
+                existing.add(key)
+                entry_attrs, _attrs_list = command.prepare_entry(
+                    ldap, *keys, **options)
+            except Exception as e:
+                self._set_error(result, e)
+                continue
+            entries.append((entry_attrs, keys, options, result))
+
+        added = []
+        add_errors = ldap.add_entries([entry[0] for entry in entries])
+        for entry, error in zip(entries, add_errors):
+            _entry_attrs, keys, _options, result = entry
+            if error is None:
+                added.append(entry)
+                continue
+            if isinstance(error, errors.DuplicateEntry):
+                try:
+                    self.obj.handle_duplicate_entry(*keys)
+                except errors.DuplicateEntry as e:
+                    error = e
+            elif isinstance(error, errors.NotFound):
+                error = errors.NotFound(
+                    reason=self.obj.container_not_found_msg % {
+                        'container': self.obj.container_dn,
+                    }
+                )
+            self._set_error(result, error)
+
+        if added:
+            for callback in self.get_callbacks('post'):
+                callback(self, ldap, added)
+
+        return results
+
+    def _convert_record(self, command, record, version):
+        """
+        Convert and validate a record like when the create command is called.
+
+        Return (args, options) tuple for the create command.
+        """
+        options = dict((str(k), v) for k, v in record.items())
+        options['version'] = version
+        params = command.args_options_2_params(**options)
+        params.update(command.get_default(**params))
+        params = command.normalize(**params)
+        params = command.convert(**params)
+        command.validate(**params)
+        return command.params_2_args_options(**params)
+
+    def _find_existing(self, ldap, keys):
+        """
+        Return set of lower case primary keys of the existing entries.
+        """
+        if not keys:
+            return set()
+
+        pkey_name = self.obj.primary_key.name
+        search_filter = ldap.make_filter_from_attr(
+            pkey_name, keys, rules=ldap.MATCH_ANY)
+        try:
+            entries, _truncated = ldap.find_entries(
+                search_filter, [pkey_name],
+                DN(self.obj.container_dn, api.env.basedn), size_limit=0)
+        except errors.NotFound:
+            return set()
+
+        return {
+            value.lower()
+            for entry in entries
+            for value in entry.get(pkey_name, [])
+        }
+
+    def _set_error(self, result, error):
+        if not isinstance(error, errors.PublicError):
+            logger.exception('%s: %s', self.name, result['value'])
+            error = errors.InternalError()
+        result['error'] = error.strerror
+        result['error_code'] = error.errno
+        result['error_name'] = unicode(type(error).__name__)
+
+    def post_callback(self, ldap, entries):
+        pass
+
+
 class LDAPQuery(BaseLDAPCommand, crud.PKQuery):
     """
     Base class for commands that need to retrieve an existing entry.
@@ -2093,8 +2273,12 @@ class LDAPSearch(BaseLDAPCommand, crud.Search):
                 entries.sort(key=sort_key)
 
         if not options.get('raw', False):
+            graph = None
+            if entries and ('memberindirect' in attrs_list or
+                            'memberofindirect' in attrs_list):
+                graph = membership_cache.get_graph(ldap, api.env.basedn)
             for entry in entries:
-                self.obj.get_indirect_members(entry, attrs_list)
+                self.obj.get_indirect_members(entry, attrs_list, graph)
                 self.obj.convert_attribute_members(entry, *args, **options)
 
         for (i, e) in enumerate(entries):
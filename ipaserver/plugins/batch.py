@@ -19,18 +19,22 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import os
+import time
 
 import six
 
 from ipalib import api, errors
 from ipalib import Command
+from ipalib import crud
 from ipalib.frontend import Local
-from ipalib.parameters import Str, Dict
+from ipalib.parameters import Str, Dict, Flag
 from ipalib.output import Output
 from ipalib.text import _
 from ipalib.request import context
 from ipalib.plugable import Registry
 from ipapython.version import API_VERSION
+from ipaserver.workerpool import WorkerPool
 
 __doc__ = _("""
 Plugin to make multiple ipa calls via one remote procedure call
@@ -57,6 +61,15 @@ The format of the response is nested the same way.  At the top you will see
 
 And then a nested response for each IPA command method sent in the request
 
+With the "parallel" option set, consecutive read-only commands (show and
+find commands) are executed concurrently by a pool of at most
+batch_max_workers threads, each with its own LDAP connection bound with the
+credentials of the caller. Other commands are executed one by one in the
+order of the request and all results are returned in the request order.
+
+With the "timing" option set, each nested response contains the execution
+time of the command in seconds in the "duration" field.
+
 """)
 
 if six.PY3:
@@ -88,6 +101,15 @@ class batch(Command):
         ),
     )
 
+    takes_options = (
+        Flag('parallel?',
+            doc=_('Execute consecutive read-only commands concurrently'),
+        ),
+        Flag('timing?',
+            doc=_('Report execution time of each command'),
+        ),
+    )
+
     has_output = (
         Output('count', int, doc=''),
         Output('results', (list, tuple), doc='')
@@ -157,53 +179,103 @@ class batch(Command):
             logger.debug('batch: %s',
                          ', '.join(super(batch, self)._repr_iter(**params)))
 
-    def execute(self, methods=None, **options):
-        results = []
-        for arg in (methods or []):
-            params = dict()
-            name = None
-            try:
-                self._validate_request(arg)
-                name = arg['method']
-                a, kw = arg['params']
-                newkw = dict((str(k), v) for k, v in kw.items())
-                params = api.Command[name].args_options_2_params(
-                    *a, **newkw)
-                newkw.setdefault('version', options['version'])
-
-                result = api.Command[name](*a, **newkw)
+    def _is_read_only(self, request):
+        """
+        Check if the request is for a command which does not modify any data
+        and can be executed concurrently with other such commands.
+        """
+        try:
+            command = self.api.Command[request['method']]
+        except (KeyError, TypeError):
+            return False
+        return isinstance(command, (crud.Retrieve, crud.Search))
+
+    def _execute_one(self, arg, version, timing=False):
+        start = time.monotonic()
+        params = dict()
+        name = None
+        try:
+            self._validate_request(arg)
+            name = arg['method']
+            a, kw = arg['params']
+            newkw = dict((str(k), v) for k, v in kw.items())
+            params = api.Command[name].args_options_2_params(
+                *a, **newkw)
+            newkw.setdefault('version', version)
+
+            result = api.Command[name](*a, **newkw)
+            logger.info(
+                '%s: batch: %s(%s): SUCCESS',
+                getattr(context, 'principal', 'UNKNOWN'),
+                name,
+                ', '.join(api.Command[name]._repr_iter(**params))
+            )
+            result['error']=None
+        except Exception as e:
+            if (isinstance(e, errors.RequirementError) or
+                    isinstance(e, errors.CommandError) or
+                    isinstance(e, errors.ConversionError)):
                 logger.info(
-                    '%s: batch: %s(%s): SUCCESS',
+                    '%s: batch: %s',
                     getattr(context, 'principal', 'UNKNOWN'),
-                    name,
-                    ', '.join(api.Command[name]._repr_iter(**params))
+                    e.__class__.__name__
                 )
-                result['error']=None
-            except Exception as e:
-                if (isinstance(e, errors.RequirementError) or
-                        isinstance(e, errors.CommandError) or
-                        isinstance(e, errors.ConversionError)):
-                    logger.info(
-                        '%s: batch: %s',
-                        context.principal,  # pylint: disable=no-member
-                        e.__class__.__name__
-                    )
-                else:
-                    logger.info(
-                        '%s: batch: %s(%s): %s',
-                        context.principal, name,  # pylint: disable=no-member
-                        ', '.join(api.Command[name]._repr_iter(**params)),
-                        e.__class__.__name__
-                    )
-                if isinstance(e, errors.PublicError):
-                    reported_error = e
-                else:
-                    reported_error = errors.InternalError()
-                result = dict(
-                    error=reported_error.strerror,
-                    error_code=reported_error.errno,
-                    error_name=unicode(type(reported_error).__name__),
-                    error_kw=reported_error.kw,
+            else:
+                logger.info(
+                    '%s: batch: %s(%s): %s',
+                    getattr(context, 'principal', 'UNKNOWN'), name,
+                    ', '.join(api.Command[name]._repr_iter(**params)),
+                    e.__class__.__name__
                 )
-            results.append(result)
+            if isinstance(e, errors.PublicError):
+                reported_error = e
+            else:
+                reported_error = errors.InternalError()
+            result = dict(
+                error=reported_error.strerror,
+                error_code=reported_error.errno,
+                error_name=unicode(type(reported_error).__name__),
+                error_kw=reported_error.kw,
+            )
+        if timing:
+            result['duration'] = time.monotonic() - start
+        return result
+
+    def _execute_parallel(self, methods, version, timing, ccache_name):
+        results = [None] * len(methods)
+
+        def execute_one(i):
+            results[i] = self._execute_one(methods[i], version, timing)
+
+        workers = min(self.api.env.batch_max_workers,
+                      sum(1 for arg in methods if self._is_read_only(arg)))
+        with WorkerPool(self.api, workers, ccache_name, name='batch') as pool:
+            for i, arg in enumerate(methods):
+                if self._is_read_only(arg):
+                    pool.submit(execute_one, i)
+                else:
+                    # keep the order of modifications and reads
+                    pool.wait()
+                    execute_one(i)
+        return results
+
+    def execute(self, methods=None, **options):
+        methods = methods or []
+        version = options['version']
+        timing = options.get('timing', False)
+
+        # the workers can only re-use Kerberos credentials of the caller
+        ccache_name = getattr(context, 'ccache_name',
+                              os.environ.get('KRB5CCNAME'))
+        if (options.get('parallel', False) and
+                self.api.env.in_server and
+                self.api.env.batch_max_workers > 1 and
+                getattr(context, 'principal', None) is not None and
+                any(self._is_read_only(arg) for arg in methods)):
+            results = self._execute_parallel(
+                methods, version, timing, ccache_name)
+        else:
+            results = [
+                self._execute_one(arg, version, timing) for arg in methods
+            ]
         return dict(count=len(results) , results=results)
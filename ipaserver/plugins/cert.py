@@ -21,6 +21,7 @@
 
 import base64
 import collections
+from concurrent import futures
 import datetime
 import itertools
 import logging
@@ -52,6 +53,7 @@ from ipalib.request import context
 from ipalib import output
 from ipapython import dnsutil, kerberos
 from ipapython.dn import DN
+from ipaserver.containercache import ContainerCache
 from ipaserver.plugins.service import normalize_principal, validate_realm
 from ipaserver.masters import (
     ENABLED_SERVICE, CONFIGURED_SERVICE, is_service_enabled
@@ -236,6 +238,74 @@ def _acl_make_rule(principal_type, obj):
     return rule
 
 
+class _CAACLCache:
+    """Compiled CA ACL rules indexed by principal type, CA and profile.
+
+    The rules are compiled again only when a CA ACL was added, modified or
+    deleted, see ipaserver.containercache. They are kept for each bound
+    principal, as the CA ACLs visible to principals may differ.
+
+    Changes of group membership do not invalidate the cache, the groups of
+    the requesting principal are resolved for each request.
+    """
+
+    def __init__(self):
+        self._cache = ContainerCache('container_caacl', 'ipacaacl')
+
+    def _find_acls(self):
+        return api.Command.caacl_find(no_members=False)['result']
+
+    @staticmethod
+    def _build_index(principal_type, acls):
+        """Map (CA, profile) to rules, None stands for category all"""
+        index = collections.defaultdict(list)
+        for obj in acls:
+            rule = _acl_make_rule(principal_type, obj)
+            if not (rule.users.category or rule.users.names or
+                    rule.users.groups):
+                # the rule does not apply to this type of principal
+                continue
+            if rule.targethosts.category:
+                cas = [None]
+            else:
+                cas = {ca.lower() for ca in rule.targethosts.names}
+            if rule.services.category:
+                profiles = [None]
+            else:
+                profiles = {p.lower() for p in rule.services.names}
+            for key in itertools.product(cas, profiles):
+                index[key].append(rule)
+        return index
+
+    def get_rules(self, principal_type, ca_id, profile_id):
+        """Return HBAC rules which may apply to the given CA and profile"""
+        compiled = self._cache.get(api)
+        with self._cache.lock:
+            acls = compiled.get('acls')
+        if acls is None:
+            logger.debug("compiling CA ACL rules")
+            acls = [
+                obj for obj in self._find_acls() if obj['ipaenabledflag'][0]
+            ]
+        with self._cache.lock:
+            acls = compiled.setdefault('acls', acls)
+            try:
+                index = compiled[principal_type]
+            except KeyError:
+                index = self._build_index(principal_type, acls)
+                compiled[principal_type] = index
+
+        ca_key = (ca_id or u'').lower()
+        profile_key = (profile_id or u'').lower()
+        rules = []
+        for key in itertools.product((ca_key, None), (profile_key, None)):
+            rules.extend(index.get(key, ()))
+        return rules
+
+
+_caacl_cache = _CAACLCache()
+
+
 def acl_evaluate(principal, ca_id, profile_id):
     if principal.is_user:
         principal_type = 'user'
@@ -244,8 +314,7 @@ def acl_evaluate(principal, ca_id, profile_id):
     else:
         principal_type = 'service'
     req = _acl_make_request(principal_type, principal, ca_id, profile_id)
-    acls = api.Command.caacl_find(no_members=False)['result']
-    rules = [_acl_make_rule(principal_type, obj) for obj in acls]
+    rules = _caacl_cache.get_rules(principal_type, ca_id, profile_id)
     return req.evaluate(rules) == pyhbac.HBAC_EVAL_ALLOW
 
 
@@ -1633,7 +1702,11 @@ class cert_find(Search, CertMethod):
 
         return result, False, True
 
-    def _ca_search(self, raw, pkey_only, exactly, **options):
+    def _ca_search(self, raw, pkey_only, exactly, executor=None, **options):
+        """
+        Search certificates in the CA. With executor, the search is sent to
+        the CA from a worker thread and a future of the result is returned.
+        """
         ra_options = {}
         for name in ('revocation_reason',
                      'issuer',
@@ -1692,7 +1765,24 @@ class cert_find(Search, CertMethod):
         )['result']
         ca_objs = {DN(ca['ipacasubjectdn'][0]): ca for ca in ca_objs}
 
+        # ca_host may need an LDAP search, resolve it in this thread
         ra = self.api.Backend.ra
+        ra.ca_host  # pylint: disable=pointless-statement
+
+        if executor is None:
+            return self._ca_search_results(
+                ra, ra_options, ca_objs, raw, pkey_only, complete)
+
+        # the rest of the search does not use LDAP, let it run while the
+        # other sub-searches are executed
+        return executor.submit(
+            self._ca_search_results, ra, ra_options, ca_objs, raw, pkey_only,
+            complete)
+
+    def _ca_search_results(self, ra, ra_options, ca_objs, raw, pkey_only,
+                           complete):
+        result = collections.OrderedDict()
+
         for ra_obj in ra.find(ra_options):
             issuer = DN(ra_obj['issuer'])
             serial_number = ra_obj['serial_number']
@@ -1846,14 +1936,27 @@ class cert_find(Search, CertMethod):
         else:
             searches = [self._cert_search, self._ldap_search]
 
-        for sub_search in searches:
-            sub_result, sub_truncated, sub_complete = sub_search(
-                all=all,
-                raw=raw,
-                pkey_only=pkey_only,
-                no_members=no_members,
-                **options)
+        # The CA sub-search runs concurrently with the LDAP sub-search and
+        # returns a future. The results are merged in the original order.
+        with futures.ThreadPoolExecutor(1) as executor:
+            sub_results = []
+            for sub_search in searches:
+                if sub_search == self._ca_search:
+                    sub_options = dict(options, executor=executor)
+                else:
+                    sub_options = options
+                sub_results.append(sub_search(
+                    all=all,
+                    raw=raw,
+                    pkey_only=pkey_only,
+                    no_members=no_members,
+                    **sub_options))
+            sub_results = [
+                r.result() if isinstance(r, futures.Future) else r
+                for r in sub_results
+            ]
 
+        for sub_result, sub_truncated, sub_complete in sub_results:
             if sub_complete:
                 for key in tuple(result):
                     if key not in sub_result:
@@ -1874,12 +1977,16 @@ class cert_find(Search, CertMethod):
 
         if not pkey_only:
             ca_objs = {}
-            if ca_enabled:
-                ra = self.api.Backend.ra
+            ra_certs = {}
+            if ca_enabled and all:
+                # fetch the certificates from the CA concurrently
+                keys = [key for key, obj in six.iteritems(result)
+                        if 'cacn' in obj]
+                ra_certs = dict(zip(keys, self.api.Backend.ra.get_certificates(
+                    str(serial_number) for _issuer, serial_number in keys)))
 
             for key, obj in six.iteritems(result):
                 if all and 'cacn' in obj:
-                    _issuer, serial_number = key
                     cacn = obj['cacn']
 
                     try:
@@ -1888,7 +1995,7 @@ class cert_find(Search, CertMethod):
                         ca_obj = ca_objs[cacn] = (
                             self.api.Command.ca_show(cacn, all=True)['result'])
 
-                    obj.update(ra.get_certificate(str(serial_number)))
+                    obj.update(ra_certs[key])
                     if not raw:
                         obj['certificate'] = (
                             obj['certificate'].replace('\r\n', ''))
@@ -30,6 +30,8 @@ import encodings.idna
 
 import dns.name
 import dns.exception
+import dns.message
+import dns.rcode
 import dns.rdatatype
 import dns.resolver
 import six
@@ -80,7 +82,7 @@ from ipaplatform import services
 from ipapython.dn import DN
 from ipapython.ipautil import CheckedIPAddress
 from ipapython.dnsutil import check_zone_overlap, DNSZoneAlreadyExists
-from ipapython.dnsutil import DNSName
+from ipapython.dnsutil import DNSName, query_concurrently
 from ipapython.dnsutil import related_to_auto_empty_zone
 from ipaserver.dns_data_management import (
     IPASystemRecords,
@@ -343,6 +345,9 @@ _IN = dns.rdataclass.IN
 # NS record type
 _NS = dns.rdatatype.from_text('NS')
 
+# CNAME record type
+_CNAME = dns.rdatatype.from_text('CNAME')
+
 _output_permissions = (
     output.summary,
     output.Output('result', bool, _('True means the operation was successful')),
@@ -3349,130 +3354,157 @@ class dnsrecord(LDAPObject):
 
         return ldap_rrsets
 
-    def wait_for_modified_attr(self, ldap_rrset, rdtype, dns_name):
-        '''Wait until DNS resolver returns up-to-date answer for given RRset
-            or until the maximum number of attempts is reached.
+    def _get_dns_rrset(self, response, dns_name, rdtype):
+        '''Get RRset of given type from DNS response like dns.resolver does.
+
+        :param response: dns.message.Message or exception from
+            query_concurrently
+        :return: dns.rrset.RRset or None if the RRset is empty
+        :raises dns.exception.DNSException: if DNS resolution failed
+        '''
+        if isinstance(response, Exception):
+            raise response
+
+        rcode = response.rcode()
+        if rcode == dns.rcode.NXDOMAIN:
+            raise dns.resolver.NXDOMAIN(qnames=[dns_name],
+                                        responses={dns_name: response})
+        elif rcode == dns.rcode.YXDOMAIN:
+            raise dns.resolver.YXDOMAIN()
+        elif rcode != dns.rcode.NOERROR:
+            raise dns.resolver.NoNameservers()
+
+        if rdtype == _NS:
+            # NS records can be in Authority section (sometimes)
+            dns_rrset = response.get_rrset(
+                response.authority, dns_name, _IN, rdtype)
+            if dns_rrset:
+                return dns_rrset
+
+        # Look for NS and other data in Answer section, follow CNAME chain
+        name = dns_name
+        for _i in range(16):
+            dns_rrset = response.get_rrset(response.answer, name, _IN, rdtype)
+            if dns_rrset or rdtype == _CNAME:
+                return dns_rrset
+            cname = response.get_rrset(response.answer, name, _IN, _CNAME)
+            if not cname:
+                break
+            name = cname[0].target
+        return None
+
+    def wait_for_modified_entries(self, entries):
+        '''Wait until DNS resolver returns up-to-date answers for all
+            given entries or until the maximum number of attempts is reached.
             Number of attempts is controlled by self.api.env['wait_for_dns'].
 
-        :param ldap_rrset:
-            None if given rdtype should not exist or
-            dns.rrset.RRset to match against data in DNS.
-        :param dns_name: FQDN to query
-        :type dns_name: dns.name.Name
-        :return: None if data in DNS and LDAP match
+            All RRsets are queried at once and only the RRsets which do not
+            match yet are queried again. The delay between attempts starts
+            at 0.1 second and doubles up to one second.
+
+        :param entries:
+            Dict {(dns_domain, dns_name): entry_attrs}, where entry_attrs is
+            None if the entry was deleted from LDAP or LDAPEntry instance
+            containing at least all modified attributes.
         :raises errors.DNSDataMismatch: if data in DNS and LDAP doesn't match
-        :raises dns.exception.DNSException: if DNS resolution failed
         '''
+        # (dns_name, rdtype, ldap_rrset, nxdomain) for each RRset
+        checks = []
+        for (dns_domain, dns_name), entry_attrs in entries.items():
+            dns_name = dns_name.derelativize(dns_domain)
+            # represent data in LDAP as dictionary rdtype => rrset
+            ldap_rrsets = self._entry2rrsets(entry_attrs, dns_name,
+                                             dns_domain)
+            nxdomain = ldap_rrsets is None
+            if nxdomain:
+                # name should not exist => ask for A record and check result
+                ldap_rrsets = {dns.rdatatype.from_text('A'): None}
+            for rdtype, ldap_rrset in ldap_rrsets.items():
+                checks.append((dns_name, rdtype, ldap_rrset, nxdomain))
+        if not checks:
+            return
+
+        # one resolver configuration for the whole batch
         resolver = dns.resolver.Resolver()
-        resolver.set_flags(0)  # disable recursion (for NS RR checks)
         max_attempts = int(self.api.env['wait_for_dns'])
         warn_attempts = max_attempts // 2
-        period = 1  # second
+        period = 0.1  # second
         attempt = 0
         log_fn = logger.debug
-        log_fn('querying DNS server: expecting answer {%s}', ldap_rrset)
+        for check in checks:
+            log_fn('querying DNS server: expecting answer {%s}', check[2])
         wait_template = 'waiting for DNS answer {%s}: got {%s} (attempt %s); '\
                         'waiting %s seconds before next try'
 
-        while attempt < max_attempts:
+        failures = []
+        while checks and attempt < max_attempts:
             if attempt >= warn_attempts:
                 log_fn = logger.warning
             attempt += 1
-            try:
-                dns_answer = resolver.query(dns_name, rdtype,
-                                            dns.rdataclass.IN,
-                                            raise_on_no_answer=False)
-                dns_rrset = None
-                if rdtype == _NS:
-                    # NS records can be in Authority section (sometimes)
-                    dns_rrset = dns_answer.response.get_rrset(
-                        dns_answer.response.authority, dns_name, _IN, rdtype)
-
-                if not dns_rrset:
-                    # Look for NS and other data in Answer section
-                    dns_rrset = dns_answer.rrset
-
-                if dns_rrset == ldap_rrset:
-                    log_fn('DNS answer matches expectations (attempt %s)',
-                           attempt)
-                    return
-
-                log_msg = wait_template % (ldap_rrset, dns_answer.response,
-                                           attempt, period)
-
-            except (dns.resolver.NXDOMAIN,
-                    dns.resolver.YXDOMAIN,
-                    dns.resolver.NoNameservers,
-                    dns.resolver.Timeout) as e:
-                if attempt >= max_attempts:
-                    raise
-                else:
-                    log_msg = wait_template % (ldap_rrset, type(e), attempt,
-                                               period)
 
-            log_fn(log_msg)
-            time.sleep(period)
+            queries = []
+            for dns_name, rdtype, _ldap_rrset, _nxdomain in checks:
+                query = dns.message.make_query(dns_name, rdtype, _IN)
+                query.flags = 0  # disable recursion (for NS RR checks)
+                queries.append(query)
+            responses = query_concurrently(queries, resolver)
+
+            pending = []
+            failures = []
+            for check, response in zip(checks, responses):
+                dns_name, rdtype, ldap_rrset, nxdomain = check
+                try:
+                    dns_rrset = self._get_dns_rrset(response, dns_name,
+                                                    rdtype)
+                except dns.resolver.NXDOMAIN as e:
+                    if nxdomain:
+                        log_fn('DNS answer matches expectations (attempt %s)',
+                               attempt)
+                        continue
+                    failure = e
+                    got = type(e)
+                except dns.exception.DNSException as e:
+                    failure = e
+                    got = type(e)
+                else:
+                    if dns_rrset == ldap_rrset:
+                        log_fn('DNS answer matches expectations (attempt %s)',
+                               attempt)
+                        continue
+                    failure = dns_rrset
+                    got = response
+                pending.append(check)
+                failures.append(failure)
+                if attempt < max_attempts:
+                    log_fn(wait_template, ldap_rrset, got, attempt, period)
+
+            checks = pending
+            if checks and attempt < max_attempts:
+                time.sleep(period)
+                period = min(period * 2, 1)
 
         # Maximum number of attempts was reached
-        raise errors.DNSDataMismatch(expected=ldap_rrset, got=dns_rrset)
-
-    def wait_for_modified_attrs(self, entry_attrs, dns_name, dns_domain):
-        '''Wait until DNS resolver returns up-to-date answer for given entry
-            or until the maximum number of attempts is reached.
-
-        :param entry_attrs:
-            None if the entry was deleted from LDAP or
-            LDAPEntry instance containing at least all modified attributes.
-        :param dns_name: FQDN
-        :type dns_name: dns.name.Name
-        :raises errors.DNSDataMismatch: if data in DNS and LDAP doesn't match
-        '''
-
-        # represent data in LDAP as dictionary rdtype => rrset
-        ldap_rrsets = self._entry2rrsets(entry_attrs, dns_name, dns_domain)
-        nxdomain = ldap_rrsets is None
-        if nxdomain:
-            # name should not exist => ask for A record and check result
-            ldap_rrsets = {dns.rdatatype.from_text('A'): None}
-
-        for rdtype, ldap_rrset in ldap_rrsets.items():
-            try:
-                self.wait_for_modified_attr(ldap_rrset, rdtype, dns_name)
-
-            except dns.resolver.NXDOMAIN as e:
-                if nxdomain:
-                    continue
+        for check, failure in zip(checks, failures):
+            ldap_rrset = check[2]
+            if isinstance(failure, dns.resolver.NXDOMAIN):
                 e = errors.DNSDataMismatch(expected=ldap_rrset,
                                            got="NXDOMAIN")
-                logger.error('%s', e)
-                raise e
-
-            except dns.resolver.NoNameservers as e:
+            elif isinstance(failure, dns.resolver.NoNameservers):
                 # Do not raise exception if we have got SERVFAILs.
                 # Maybe the user has created an invalid zone intentionally.
                 logger.warning('waiting for DNS answer {%s}: got {%s}; '
-                               'ignoring', ldap_rrset, type(e))
+                               'ignoring', ldap_rrset, type(failure))
                 continue
-
-            except dns.exception.DNSException as e:
-                err_desc = str(type(e))
-                err_str = str(e)
+            elif isinstance(failure, dns.exception.DNSException):
+                err_desc = str(type(failure))
+                err_str = str(failure)
                 if err_str:
                     err_desc += ": %s" % err_str
                 e = errors.DNSDataMismatch(expected=ldap_rrset, got=err_desc)
-                logger.error('%s', e)
-                raise e
-
-    def wait_for_modified_entries(self, entries):
-        '''Call wait_for_modified_attrs for all entries in given dict.
-
-        :param entries:
-            Dict {(dns_domain, dns_name): entry_for_wait_for_modified_attrs}
-        '''
-        for entry_name, entry in entries.items():
-            dns_domain = entry_name[0]
-            dns_name = entry_name[1].derelativize(dns_domain)
-            self.wait_for_modified_attrs(entry, dns_name, dns_domain)
+            else:
+                e = errors.DNSDataMismatch(expected=ldap_rrset, got=failure)
+            logger.error('%s', e)
+            raise e
 
     def warning_if_ns_change_cause_fwzone_ineffective(self, result, *keys,
                                                       **options):
@@ -1527,7 +1527,7 @@ class ra(rabase.rabase, RestClient):
 
         return cmd_result
 
-    def get_certificate(self, serial_number):
+    def get_certificate(self, serial_number, connection=None):
         """
         Retrieve an existing certificate.
 
@@ -1538,6 +1538,8 @@ class ra(rabase.rabase, RestClient):
                               be prefixed with a hex radix prefix if the integral value
                               is represented as hexadecimal. If no radix prefix is
                               supplied the string will be interpreted as decimal.
+        :param connection: Keep-alive connection to the CA agent port to use
+                           instead of a new one, see get_certificates().
 
         The command returns a dict with these possible key/value pairs.
         Some key/value pairs may be absent.
@@ -1583,6 +1585,7 @@ class ra(rabase.rabase, RestClient):
         http_status, _http_headers, http_body = (
             self._sslget('/ca/agent/ca/displayBySerial',
                          self.env.ca_agent_port,
+                         connection=connection,
                          serialNumber=str(serial_number),
                          xml='true')
         )
@@ -1616,6 +1619,37 @@ class ra(rabase.rabase, RestClient):
 
         return cmd_result
 
+    def get_certificates(self, serial_numbers, max_connections=4):
+        """
+        Retrieve several existing certificates.
+
+        The certificates are retrieved concurrently by up to
+        ``max_connections`` threads, each of them sending its requests over
+        one keep-alive connection to the CA.
+
+        Returns a list of get_certificate() results in the order of
+        serial_numbers.
+        """
+        serial_numbers = list(serial_numbers)
+        if not serial_numbers:
+            return []
+
+        # ca_host may need an LDAP search, resolve it in this thread
+        ca_host = self.ca_host
+
+        def connection_factory():
+            return dogtag.https_connection(
+                ca_host, self.env.ca_agent_port,
+                cafile=self.ca_cert,
+                client_certfile=self.client_certfile,
+                client_keyfile=self.client_keyfile)
+
+        def get_certificate(serial_number, connection):
+            return self.get_certificate(serial_number, connection=connection)
+
+        return dogtag.map_with_connections(
+            get_certificate, serial_numbers, connection_factory,
+            max_connections=max_connections)
 
     def request_certificate(
             self, csr, profile_id, ca_id, request_type='pkcs10'):
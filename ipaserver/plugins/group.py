@@ -31,6 +31,7 @@ from .baseldap import (
     pkey_to_value,
     remove_external_post_callback,
     LDAPObject,
+    LDAPBulkCreate,
     LDAPCreate,
     LDAPUpdate,
     LDAPDelete,
@@ -388,6 +389,15 @@ class group_add(LDAPCreate):
         return dn
 
 
+@register()
+class group_add_bulk(LDAPBulkCreate):
+    __doc__ = _('Create several new groups.')
+
+    msg_summary = ngettext(
+        '%(count)d group added', '%(count)d groups added', 0
+    )
+
+
 @register()
 class group_del(LDAPDelete):
     __doc__ = _('Delete group.')
@@ -626,16 +636,18 @@ class group_add_member(LDAPAddMember):
                                       'Make sure you have run ipa-adtrust-install on the IPA server first'))
             sids = []
             failed_sids = []
+            trusted_sids = domain_validator.validate_sids(
+                options['ipaexternalmember'])
+            actual_sids = domain_validator.get_trusted_domain_object_sids(
+                [sid for sid in options['ipaexternalmember']
+                 if trusted_sids[sid] is None])
             for sid in options['ipaexternalmember']:
-                if domain_validator.is_trusted_sid_valid(sid):
+                if trusted_sids[sid] is not None:
                     sids.append(sid)
+                elif isinstance(actual_sids[sid], errors.PublicError):
+                    failed_sids.append((sid, actual_sids[sid].strerror))
                 else:
-                    try:
-                        actual_sid = domain_validator.get_trusted_domain_object_sid(sid)
-                    except errors.PublicError as e:
-                        failed_sids.append((sid, e.strerror))
-                    else:
-                        sids.append(actual_sid)
+                    sids.append(actual_sids[sid])
             restore = []
             if 'member' in failed and 'group' in failed['member']:
                 restore = failed['member']['group']
@@ -683,16 +695,18 @@ class group_remove_member(LDAPRemoveMember):
                                                'Make sure you have run ipa-adtrust-install on the IPA server first'))
             sids = []
             failed_sids = []
+            trusted_sids = domain_validator.validate_sids(
+                options['ipaexternalmember'])
+            actual_sids = domain_validator.get_trusted_domain_object_sids(
+                [sid for sid in options['ipaexternalmember']
+                 if trusted_sids[sid] is None])
             for sid in options['ipaexternalmember']:
-                if domain_validator.is_trusted_sid_valid(sid):
+                if trusted_sids[sid] is not None:
                     sids.append(sid)
+                elif isinstance(actual_sids[sid], errors.PublicError):
+                    failed_sids.append((sid, unicode(actual_sids[sid])))
                 else:
-                    try:
-                        actual_sid = domain_validator.get_trusted_domain_object_sid(sid)
-                    except errors.PublicError as e:
-                        failed_sids.append((sid, unicode(e)))
-                    else:
-                        sids.append(actual_sid)
+                    sids.append(actual_sids[sid])
             restore = []
             if 'member' in failed and 'group' in failed['member']:
                 restore = failed['member']['group']
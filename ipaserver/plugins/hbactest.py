@@ -17,13 +17,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import itertools
 import logging
 
 from ipalib import api, errors, output, util
-from ipalib import Command, Str, Flag, Int
-from ipalib import _
+from ipalib import Command, Str, Flag, Int, Bool
+from ipalib import _, ngettext
 from ipapython.dn import DN
 from ipalib.plugable import Registry
+from ipaserver.containercache import ContainerCache
 if api.env.in_server:
     try:
         import ipaserver.dcerpc
@@ -145,6 +147,18 @@ EXAMPLES:
       Not matched rules: new-rule
       Matched rules: allow_all
 
+    8. Test several users, hosts and services at once:
+    $ ipa hbactest-bulk --users=a1a --users=b2b --hosts=foo --hosts=bar \\
+          --services=sshd
+    ---------------------
+    4 decisions evaluated
+    ---------------------
+      User name: a1a
+      Target host: foo.example.com
+      Service: sshd
+      Access granted: True
+    ...
+
 
 HBACTEST AND TRUSTED DOMAINS
 
@@ -251,8 +265,254 @@ def _convert_to_ipa_rule(rule):
     return ipa_rule
 
 
+class _HBACRuleCache:
+    """Compiled HBAC rules returned by hbacrule_find.
+
+    The rules are compiled again only when an HBAC rule was added, modified
+    or deleted, see ipaserver.containercache. They are kept for each bound
+    principal, as the rules visible to principals may differ.
+
+    All compiled rules are enabled, the original state of the rule is kept
+    next to it, so the rules can be shared by concurrent requests.
+    """
+
+    def __init__(self):
+        self._cache = ContainerCache('container_hbac', 'ipahbacrule')
+
+    def get_rules(self, api, sizelimit=None):
+        """Return list of (enabled, pyhbac rule) tuples"""
+        compiled = self._cache.get(api)
+        with self._cache.lock:
+            try:
+                return compiled[sizelimit]
+            except KeyError:
+                pass
+
+        logger.debug("compiling HBAC rules")
+        rules = []
+        hbacset = api.Command.hbacrule_find(
+            sizelimit=sizelimit, no_members=False)['result']
+        for rule in hbacset:
+            ipa_rule = _convert_to_ipa_rule(rule)
+            enabled = ipa_rule.enabled
+            ipa_rule.enabled = True
+            rules.append((enabled, ipa_rule))
+
+        with self._cache.lock:
+            compiled[sizelimit] = rules
+        return rules
+
+
+_rule_cache = _HBACRuleCache()
+
+
+class BaseHBACTest(Command):
+    """
+    Base class for HBAC simulation commands.
+    """
+
+    def canonicalize(self, host):
+        """
+        Canonicalize the host name -- add default IPA domain if that is missing
+        """
+        if host.find('.') == -1:
+            return u'%s.%s' % (host, self.env.domain)
+        return host
+
+    def get_rules(self, testrules, all_enabled, all_disabled, sizelimit):
+        """
+        Return list of pyhbac rules to test and list of names of the rules
+        from testrules which do not exist.
+        """
+        rules = []
+        # We need a local copy of test rules in order find incorrect ones
+        testrules = list(testrules)
+
+        if len(testrules) == 0:
+            # --enabled will import all enabled rules (default)
+            # --disabled will import all disabled rules
+            for enabled, ipa_rule in _rule_cache.get_rules(self.api,
+                                                          sizelimit):
+                if (all_enabled and enabled) or (all_disabled and not enabled):
+                    rules.append(ipa_rule)
+            return rules, testrules
+
+        hbacset = []
+        for rule in testrules:
+            try:
+                hbacset.append(self.api.Command.hbacrule_show(rule)['result'])
+            except Exception:
+                pass
+
+        # We have some rules, import them
+        # --rules will implicitly add the rules from a rule list
+        for rule in hbacset:
+            ipa_rule = _convert_to_ipa_rule(rule)
+            if ipa_rule.name in testrules:
+                ipa_rule.enabled = True
+                rules.append(ipa_rule)
+                testrules.remove(ipa_rule.name)
+            elif all_enabled and ipa_rule.enabled:
+                # Option --enabled forces to include all enabled IPA rules into test
+                rules.append(ipa_rule)
+            elif all_disabled and not ipa_rule.enabled:
+                # Option --disabled forces to include all disabled IPA rules into test
+                ipa_rule.enabled = True
+                rules.append(ipa_rule)
+
+        return rules, testrules
+
+    def get_rule_options(self, options):
+        """
+        Return (testrules, all_enabled, all_disabled, sizelimit) from the
+        --rules, --enabled, --disabled and --sizelimit options.
+        """
+        # Use all enabled IPA rules by default
+        all_enabled = True
+        all_disabled = False
+
+        testrules = ()
+        if 'rules' in options:
+            testrules = options['rules']
+            # When explicit rules are provided, disable assumptions
+            all_enabled = False
+            all_disabled = False
+
+        sizelimit = None
+        if 'sizelimit' in options:
+            sizelimit = int(options['sizelimit'])
+
+        # Check if --disabled is specified, include all disabled IPA rules
+        if options['disabled']:
+            all_disabled = True
+            all_enabled = False
+
+        # Finally, if enabled is specified implicitly, override above decisions
+        if options['enabled']:
+            all_enabled = True
+
+        return testrules, all_enabled, all_disabled, sizelimit
+
+    def get_user(self, user):
+        """
+        Return name and groups of a user as used in HBAC request, None
+        stands for a value which is not set.
+        """
+        if user == u'all':
+            return None, None
+
+        # check first if this is not a trusted domain user
+        if _dcerpc_bindings_installed:
+            is_valid_sid = ipaserver.dcerpc.is_sid_valid(user)
+        else:
+            is_valid_sid = False
+        components = util.normalize_name(user)
+        if is_valid_sid or 'domain' in components or 'flatname' in components:
+            # this is a trusted domain user
+            if not _dcerpc_bindings_installed:
+                raise errors.NotFound(reason=_(
+                    'Cannot perform external member validation without '
+                    'Samba 4 support installed. Make sure you have installed '
+                    'server-trust-ad sub-package of IPA on the server'))
+            domain_validator = ipaserver.dcerpc.DomainValidator(self.api)
+            if not domain_validator.is_configured():
+                raise errors.NotFound(reason=_(
+                    'Cannot search in trusted domains without own domain configured. '
+                    'Make sure you have run ipa-adtrust-install on the IPA server first'))
+            user_sid, group_sids = domain_validator.get_trusted_domain_user_and_groups(user)
+
+            # Now search for all external groups that have this user or
+            # any of its groups in its external members. Found entires
+            # memberOf links will be then used to gather all groups where
+            # this group is assigned, including the nested ones
+            filter_sids = "(&(objectclass=ipaexternalgroup)(|(ipaExternalMember=%s)))" \
+                    % ")(ipaExternalMember=".join(group_sids + [user_sid])
+
+            ldap = self.api.Backend.ldap2
+            group_container = DN(api.env.container_group, api.env.basedn)
+            try:
+                entries, _truncated = ldap.find_entries(
+                    filter_sids, ['memberof'], group_container)
+            except errors.NotFound:
+                return user_sid, []
+            else:
+                groups = []
+                for entry in entries:
+                    memberof_dns = entry.get('memberof', [])
+                    for memberof_dn in memberof_dns:
+                        if memberof_dn.endswith(group_container):
+                            groups.append(memberof_dn[0][0].value)
+                return user_sid, sorted(set(groups))
+
+        # try searching for a local user
+        user_dn = DN(('uid', user), self.api.env.container_user,
+                     self.api.env.basedn)
+        return user, self.get_groups(user_dn, self.api.env.container_group)
+
+    def get_service(self, service):
+        """
+        Return name and groups of a service as used in HBAC request
+        """
+        if service == u'all':
+            return None, None
+
+        try:
+            service_result = self.api.Command.hbacsvc_show(service)['result']
+        except Exception:
+            return service, None
+        return service, service_result.get('memberof_hbacsvcgroup')
+
+    def get_targethost(self, targethost):
+        """
+        Return name and groups of a host as used in HBAC request
+        """
+        if targethost == u'all':
+            return None, None
+
+        targethost = self.canonicalize(targethost)
+        host_dn = DN(('fqdn', targethost), self.api.env.container_host,
+                     self.api.env.basedn)
+        return targethost, self.get_groups(
+            host_dn, self.api.env.container_hostgroup)
+
+    def get_groups(self, dn, container):
+        """
+        Return names of the groups in container the entry is a direct or
+        indirect member of, None if the entry does not exist.
+
+        The memberOf plugin expands nested membership, the memberOf values
+        of the entry name all of its groups.
+        """
+        ldap = self.api.Backend.ldap2
+        try:
+            entry = ldap.get_entry(dn, ['memberof'])
+        except errors.PublicError:
+            return None
+        group_container = DN(container, self.api.env.basedn)
+        return sorted({
+            group_dn[0].value for group_dn in entry.get('memberof', [])
+            if group_dn[1:] == group_container
+        })
+
+    @staticmethod
+    def make_request(user, targethost, service):
+        """
+        Build HBAC request from (name, groups) tuples of user, target host
+        and service
+        """
+        request = pyhbac.HbacRequest()
+        for element, (name, groups) in ((request.user, user),
+                                        (request.targethost, targethost),
+                                        (request.service, service)):
+            if name is not None:
+                element.name = name
+            if groups is not None:
+                element.groups = groups
+        return request
+
+
 @register()
-class hbactest(Command):
+class hbactest(BaseHBACTest):
     __doc__ = _('Simulate use of Host-based access controls')
 
     has_output = (
@@ -309,74 +569,12 @@ class hbactest(Command):
         ),
     )
 
-    def canonicalize(self, host):
-        """
-        Canonicalize the host name -- add default IPA domain if that is missing
-        """
-        if host.find('.') == -1:
-            return u'%s.%s' % (host, self.env.domain)
-        return host
-
     def execute(self, *args, **options):
         # First receive all needed information:
         # 1. HBAC rules (whether enabled or disabled)
         # 2. Required options are (user, target host, service)
         # 3. Options: rules to test (--rules, --enabled, --disabled), request for detail output
-        rules = []
-
-        # Use all enabled IPA rules by default
-        all_enabled = True
-        all_disabled = False
-
-        # We need a local copy of test rules in order find incorrect ones
-        testrules = {}
-        if 'rules' in options:
-            testrules = list(options['rules'])
-            # When explicit rules are provided, disable assumptions
-            all_enabled = False
-            all_disabled = False
-
-        sizelimit = None
-        if 'sizelimit' in options:
-            sizelimit = int(options['sizelimit'])
-
-        # Check if --disabled is specified, include all disabled IPA rules
-        if options['disabled']:
-            all_disabled = True
-            all_enabled = False
-
-        # Finally, if enabled is specified implicitly, override above decisions
-        if options['enabled']:
-            all_enabled = True
-
-        hbacset = []
-        if len(testrules) == 0:
-            hbacset = self.api.Command.hbacrule_find(
-                sizelimit=sizelimit, no_members=False)['result']
-        else:
-            for rule in testrules:
-                try:
-                    hbacset.append(self.api.Command.hbacrule_show(rule)['result'])
-                except Exception:
-                    pass
-
-        # We have some rules, import them
-        # --enabled will import all enabled rules (default)
-        # --disabled will import all disabled rules
-        # --rules will implicitly add the rules from a rule list
-        for rule in hbacset:
-            ipa_rule = _convert_to_ipa_rule(rule)
-            if ipa_rule.name in testrules:
-                ipa_rule.enabled = True
-                rules.append(ipa_rule)
-                testrules.remove(ipa_rule.name)
-            elif all_enabled and ipa_rule.enabled:
-                # Option --enabled forces to include all enabled IPA rules into test
-                rules.append(ipa_rule)
-            elif all_disabled and not ipa_rule.enabled:
-                # Option --disabled forces to include all disabled IPA rules into test
-                ipa_rule.enabled = True
-                rules.append(ipa_rule)
+        rules, testrules = self.get_rules(*self.get_rule_options(options))
 
         # Check if there are unresolved rules left
         if len(testrules) > 0:
@@ -386,83 +584,10 @@ class hbactest(Command):
                     'warning' : None, 'value' : False}
 
         # Rules are converted to pyhbac format, build request and then test it
-        request = pyhbac.HbacRequest()
-
-        if options['user'] != u'all':
-            # check first if this is not a trusted domain user
-            if _dcerpc_bindings_installed:
-                is_valid_sid = ipaserver.dcerpc.is_sid_valid(options['user'])
-            else:
-                is_valid_sid = False
-            components = util.normalize_name(options['user'])
-            if is_valid_sid or 'domain' in components or 'flatname' in components:
-                # this is a trusted domain user
-                if not _dcerpc_bindings_installed:
-                    raise errors.NotFound(reason=_(
-                        'Cannot perform external member validation without '
-                        'Samba 4 support installed. Make sure you have installed '
-                        'server-trust-ad sub-package of IPA on the server'))
-                domain_validator = ipaserver.dcerpc.DomainValidator(self.api)
-                if not domain_validator.is_configured():
-                    raise errors.NotFound(reason=_(
-                        'Cannot search in trusted domains without own domain configured. '
-                        'Make sure you have run ipa-adtrust-install on the IPA server first'))
-                user_sid, group_sids = domain_validator.get_trusted_domain_user_and_groups(options['user'])
-                request.user.name = user_sid
-
-                # Now search for all external groups that have this user or
-                # any of its groups in its external members. Found entires
-                # memberOf links will be then used to gather all groups where
-                # this group is assigned, including the nested ones
-                filter_sids = "(&(objectclass=ipaexternalgroup)(|(ipaExternalMember=%s)))" \
-                        % ")(ipaExternalMember=".join(group_sids + [user_sid])
-
-                ldap = self.api.Backend.ldap2
-                group_container = DN(api.env.container_group, api.env.basedn)
-                try:
-                    entries, _truncated = ldap.find_entries(
-                        filter_sids, ['memberof'], group_container)
-                except errors.NotFound:
-                    request.user.groups = []
-                else:
-                    groups = []
-                    for entry in entries:
-                        memberof_dns = entry.get('memberof', [])
-                        for memberof_dn in memberof_dns:
-                            if memberof_dn.endswith(group_container):
-                                groups.append(memberof_dn[0][0].value)
-                    request.user.groups = sorted(set(groups))
-            else:
-                # try searching for a local user
-                try:
-                    request.user.name = options['user']
-                    search_result = self.api.Command.user_show(request.user.name)['result']
-                    groups = search_result['memberof_group']
-                    if 'memberofindirect_group' in search_result:
-                        groups += search_result['memberofindirect_group']
-                    request.user.groups = sorted(set(groups))
-                except Exception:
-                    pass
-
-        if options['service'] != u'all':
-            try:
-                request.service.name = options['service']
-                service_result = self.api.Command.hbacsvc_show(request.service.name)['result']
-                if 'memberof_hbacsvcgroup' in service_result:
-                    request.service.groups = service_result['memberof_hbacsvcgroup']
-            except Exception:
-                pass
-
-        if options['targethost'] != u'all':
-            try:
-                request.targethost.name = self.canonicalize(options['targethost'])
-                tgthost_result = self.api.Command.host_show(request.targethost.name)['result']
-                groups = tgthost_result['memberof_hostgroup']
-                if 'memberofindirect_hostgroup' in tgthost_result:
-                    groups += tgthost_result['memberofindirect_hostgroup']
-                request.targethost.groups = sorted(set(groups))
-            except Exception:
-                pass
+        request = self.make_request(
+            self.get_user(options['user']),
+            self.get_targethost(options['targethost']),
+            self.get_service(options['service']))
 
         matched_rules = []
         notmatched_rules = []
@@ -508,3 +633,93 @@ class hbactest(Command):
 
         result['value'] = access_granted
         return result
+
+
+@register()
+class hbactest_bulk(BaseHBACTest):
+    __doc__ = _('Simulate use of Host-based access controls for several '
+                'users, hosts and services at once')
+
+    has_output = (
+        output.summary,
+        output.ListOfEntries('result'),
+        output.Output('count', int, _('Number of decisions')),
+    )
+
+    has_output_params = (
+        Str('user', label=_('User name')),
+        Str('targethost', label=_('Target host')),
+        Str('service', label=_('Service')),
+        Bool('value', label=_('Access granted')),
+    )
+
+    takes_options = (
+        Str('user+',
+            cli_name='users',
+            label=_('User name'),
+        ),
+        Str('targethost+',
+            cli_name='hosts',
+            label=_('Target host'),
+        ),
+        Str('service+',
+            cli_name='services',
+            label=_('Service'),
+        ),
+        Str('rules*',
+             cli_name='rules',
+             label=_('Rules to test. If not specified, --enabled is assumed'),
+        ),
+        Flag('enabled?',
+             cli_name='enabled',
+             label=_('Include all enabled IPA rules into test [default]'),
+        ),
+        Flag('disabled?',
+             cli_name='disabled',
+             label=_('Include all disabled IPA rules into test'),
+        ),
+        Int('sizelimit?',
+            label=_('Size Limit'),
+            doc=_('Maximum number of rules to process when no --rules is specified'),
+            flags=['no_display'],
+            minvalue=0,
+            autofill=False,
+        ),
+    )
+
+    msg_summary = ngettext(
+        '%(count)d decision evaluated', '%(count)d decisions evaluated', 0
+    )
+
+    def execute(self, *args, **options):
+        rules, testrules = self.get_rules(*self.get_rule_options(options))
+        if len(testrules) > 0:
+            raise errors.NotFound(
+                reason=_('Unresolved rules in --rules: %(rules)s') % dict(
+                    rules=u', '.join(testrules)))
+
+        # every user, host and service is looked up only once
+        users = [(u, self.get_user(u)) for u in options['user']]
+        targethosts = [(h, self.get_targethost(h))
+                       for h in options['targethost']]
+        services = [(s, self.get_service(s)) for s in options['service']]
+
+        result = []
+        for (user, user_info), (targethost, targethost_info), \
+                (service, service_info) in itertools.product(
+                    users, targethosts, services):
+            request = self.make_request(user_info, targethost_info,
+                                        service_info)
+            value = request.evaluate(rules) == pyhbac.HBAC_EVAL_ALLOW
+            result.append(dict(
+                user=user,
+                targethost=targethost_info[0] or targethost,
+                service=service,
+                value=value,
+            ))
+
+        return dict(
+            result=result,
+            count=len(result),
+            summary=unicode(self.msg_summary % dict(count=len(result))),
+        )
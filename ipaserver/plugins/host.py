@@ -31,7 +31,7 @@ from ipalib import messages
 from ipalib import Str, StrEnum, Flag
 from ipalib.parameters import Principal, Certificate
 from ipalib.plugable import Registry
-from .baseldap import (LDAPQuery, LDAPObject, LDAPCreate,
+from .baseldap import (LDAPQuery, LDAPObject, LDAPBulkCreate, LDAPCreate,
                                      LDAPDelete, LDAPUpdate, LDAPSearch,
                                      LDAPRetrieve, LDAPAddMember,
                                      LDAPRemoveMember, host_is_master,
@@ -729,24 +729,8 @@ class host_add(LDAPCreate):
     def post_callback(self, ldap, dn, entry_attrs, *keys, **options):
         assert isinstance(dn, DN)
         if dns_container_exists(ldap):
-            try:
-                parts = keys[-1].split('.')
-                host = parts[0]
-                domain = unicode('.'.join(parts[1:]))
-
-                if options.get('ip_address'):
-                    add_reverse = not options.get('no_reverse', False)
-
-                    add_records_for_host(DNSName(host),
-                                         DNSName(domain).make_absolute(),
-                                         options['ip_address'],
-                                         add_forward=True,
-                                         add_reverse=add_reverse)
-                    del options['ip_address']
-
-                update_sshfp_record(domain, unicode(parts[0]), entry_attrs)
-            except Exception as e:
-                self.add_message(messages.FailedToAddHostDNSRecords(reason=e))
+            self.add_dns_records(entry_attrs, *keys, **options)
+            options.pop('ip_address', None)
         if options.get('random', False):
             try:
                 entry_attrs['randompassword'] = unicode(
@@ -771,6 +755,45 @@ class host_add(LDAPCreate):
 
         return dn
 
+    def add_dns_records(self, entry_attrs, *keys, **options):
+        try:
+            parts = keys[-1].split('.')
+            host = parts[0]
+            domain = unicode('.'.join(parts[1:]))
+
+            if options.get('ip_address'):
+                add_reverse = not options.get('no_reverse', False)
+
+                add_records_for_host(DNSName(host),
+                                     DNSName(domain).make_absolute(),
+                                     options['ip_address'],
+                                     add_forward=True,
+                                     add_reverse=add_reverse)
+
+            update_sshfp_record(domain, unicode(parts[0]), entry_attrs)
+        except Exception as e:
+            self.add_message(messages.FailedToAddHostDNSRecords(reason=e))
+
+
+@register()
+class host_add_bulk(LDAPBulkCreate):
+    __doc__ = _('Add several new hosts.')
+
+    msg_summary = ngettext(
+        '%(count)d host added', '%(count)d hosts added', 0
+    )
+
+    def post_callback(self, ldap, entries):
+        dns_container = dns_container_exists(ldap)
+        for entry_attrs, keys, options, result in entries:
+            if dns_container:
+                self.create_command.add_dns_records(
+                    entry_attrs, *keys, **options)
+
+            if options.get('random', False):
+                result['randompassword'] = unicode(
+                    entry_attrs.single_value['userpassword'])
+
 
 @register()
 class host_del(LDAPDelete):
@@ -29,8 +29,11 @@ Backend plugin for LDAP.
 
 from __future__ import absolute_import
 
+import collections
 import logging
 import os
+import threading
+import time
 
 import ldap as _ldap
 
@@ -51,6 +54,106 @@ register = Registry()
 _missing = object()
 
 
+class _PooledConnection:
+    __slots__ = ('conn', 'key', 'authzid', 'expires', 'released')
+
+    def __init__(self, conn, key, authzid, expires):
+        self.conn = conn
+        self.key = key
+        self.authzid = authzid
+        self.expires = expires
+        self.released = None
+
+
+class _ConnectionPool:
+    """
+    Per-process pool of LDAP connections bound with GSSAPI.
+
+    A connection of a finished request is kept bound and is handed out
+    again to a later request with the same LDAP URI, credentials cache and
+    principal, saving the SASL negotiation and bind. A connection is in use
+    by at most one thread at a time.
+
+    Idle connections are closed when they were not used for idle_timeout
+    seconds, when the credentials they were bound with expire, or when the
+    pool has more than max_size idle connections (the least recently used
+    ones are closed first).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = collections.OrderedDict()
+        self._busy = {}
+
+    def acquire(self, key, idle_timeout):
+        """
+        Check out an idle connection matching key, return the
+        _PooledConnection or None.
+        """
+        now = time.time()
+        found = None
+        stale = []
+        with self._lock:
+            # most recently released connections are at the end
+            for conn_id, pooled in reversed(list(self._idle.items())):
+                if (pooled.released + idle_timeout <= now or
+                        pooled.expires <= now):
+                    stale.append(self._idle.pop(conn_id))
+                elif found is None and pooled.key == key:
+                    found = self._idle.pop(conn_id)
+                    self._busy[conn_id] = found
+        self._close(stale)
+        return found
+
+    def add(self, conn, key, authzid, expires):
+        """Register a newly bound connection as checked out"""
+        pooled = _PooledConnection(conn, key, authzid, expires)
+        with self._lock:
+            self._busy[id(conn)] = pooled
+
+    def discard(self, conn):
+        """Remove a checked out connection from the pool and close it"""
+        with self._lock:
+            pooled = self._busy.pop(id(conn), None)
+        if pooled is not None:
+            self._close([pooled])
+
+    def release(self, conn, max_size):
+        """
+        Return a checked out connection to the pool. Return False if the
+        connection does not belong to the pool.
+        """
+        evicted = []
+        with self._lock:
+            pooled = self._busy.pop(id(conn), None)
+            if pooled is None:
+                return False
+            pooled.released = time.time()
+            self._idle[id(conn)] = pooled
+            while len(self._idle) > max_size:
+                evicted.append(self._idle.popitem(last=False)[1])
+        self._close(evicted)
+        return True
+
+    def clear(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle = list(self._idle.values())
+            self._idle.clear()
+        self._close(idle)
+
+    @staticmethod
+    def _close(pooled_connections):
+        for pooled in pooled_connections:
+            try:
+                pooled.conn.unbind_s()
+            except _ldap.LDAPError:
+                pass
+
+
+_connection_pool = _ConnectionPool()
+
+
 @register()
 class ldap2(CrudBackend, LDAPClient):
     """
@@ -153,6 +256,22 @@ class ldap2(CrudBackend, LDAPClient):
         if size_limit is not _missing:
             object.__setattr__(self, 'size_limit', size_limit)
 
+        ldapi = self.ldap_uri.startswith('ldapi://')
+        external = (not bind_pw and autobind != AUTOBIND_DISABLED and
+                    os.getegid() == 0 and ldapi)
+
+        pool_key = None
+        if not bind_pw and not external and self._pool_enabled(ccache):
+            creds = krb_utils.get_credentials_if_valid(ccache_name=ccache)
+            if creds is not None:
+                pool_key = (self.ldap_uri, ccache, str(creds.name))
+                expires = time.time() + creds.lifetime
+                conn = self._acquire_pooled_connection(pool_key)
+                if conn is not None:
+                    os.environ['KRB5CCNAME'] = ccache
+                    setattr(context, 'principal', pool_key[2])
+                    return conn
+
         client = LDAPClient(self.ldap_uri,
                             force_schema_updates=self._force_schema_updates,
                             cacert=cacert)
@@ -169,13 +288,11 @@ class ldap2(CrudBackend, LDAPClient):
                 if maxssf < minssf:
                     conn.set_option(_ldap.OPT_X_SASL_SSF_MAX, minssf)
 
-        ldapi = self.ldap_uri.startswith('ldapi://')
-
         if bind_pw:
             client.simple_bind(bind_dn, bind_pw,
                                server_controls=serverctrls,
                                client_controls=clientctrls)
-        elif autobind != AUTOBIND_DISABLED and os.getegid() == 0 and ldapi:
+        elif external:
             try:
                 client.external_bind(server_controls=serverctrls,
                                      client_controls=clientctrls)
@@ -199,13 +316,53 @@ class ldap2(CrudBackend, LDAPClient):
                                client_controls=clientctrls)
             setattr(context, 'principal', principal)
 
+            if pool_key is not None and principal == pool_key[2]:
+                with client.error_handler():
+                    authzid = conn.whoami_s()
+                _connection_pool.add(conn, pool_key, authzid, expires)
+
         return conn
 
+    def _pool_enabled(self, ccache):
+        """
+        Pool connections only in the server processes, where requests of
+        the same principal come repeatedly, and only for an explicit
+        credentials cache.
+        """
+        return (ccache is not None and
+                self.api.env.context in ('server', 'lite') and
+                self.api.env.ldap_pool_size > 0)
+
+    def _acquire_pooled_connection(self, pool_key):
+        """
+        Return a pooled connection bound as the principal of pool_key, or
+        None. The connection is checked to be still alive and bound to the
+        same identity.
+        """
+        while True:
+            pooled = _connection_pool.acquire(
+                pool_key, self.api.env.ldap_pool_idle_timeout)
+            if pooled is None:
+                return None
+            try:
+                authzid = pooled.conn.whoami_s()
+            except _ldap.LDAPError as e:
+                logger.debug("Dropping pooled LDAP connection: %s", e)
+                authzid = None
+            if authzid is not None and authzid == pooled.authzid:
+                self._flush_schema()
+                logger.debug("Reusing pooled LDAP connection of %s",
+                             pool_key[2])
+                return pooled.conn
+            _connection_pool.discard(pooled.conn)
+
     def destroy_connection(self):
         """Disconnect from LDAP server."""
         try:
             if self.conn is not None:
-                self.unbind()
+                if not _connection_pool.release(
+                        self.conn, self.api.env.ldap_pool_size):
+                    self.unbind()
         except errors.PublicError:
             # ignore when trying to unbind multiple times
             pass
@@ -430,6 +587,33 @@ class ldap2(CrudBackend, LDAPClient):
             # TYPE_OR_VALUE_EXISTS
             raise errors.AlreadyGroupMember()
 
+    def add_entries_to_group(self, dns, group_dn, member_attr='member'):
+        """
+        Add entries designated by dns to group group_dn in the member
+        attribute member_attr by a single modification.
+
+        Unlike add_entry_to_group, the entries are not checked to exist.
+        AlreadyGroupMember is raised if any of the entries is already a member
+        and no entry is added then.
+        """
+
+        assert isinstance(group_dn, DN)
+
+        logger.debug(
+            "add_entries_to_group: %d entries group_dn=%s member_attr=%s",
+            len(dns), group_dn, member_attr)
+
+        modlist = [(_ldap.MOD_ADD, member_attr, list(dns))]
+
+        try:
+            with self.error_handler():
+                modlist = [(a, b, self.encode(c))
+                           for a, b, c in modlist]
+                self.conn.modify_s(str(group_dn), modlist)
+        except errors.DuplicateEntry:
+            # TYPE_OR_VALUE_EXISTS
+            raise errors.AlreadyGroupMember()
+
     def remove_entry_from_group(self, dn, group_dn, member_attr='member'):
         """Remove entry from group."""
 
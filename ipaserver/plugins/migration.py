@@ -19,18 +19,24 @@
 
 from __future__ import absolute_import
 
+import contextlib
+import hashlib
 import logging
+import os
 import re
-from ldap import MOD_ADD
+import threading
+from ldap import filter as ldap_filter
 from ldap import SCOPE_BASE, SCOPE_ONELEVEL, SCOPE_SUBTREE
 
 import six
 
 from ipalib import api, errors, output
-from ipalib import Command, Password, Str, Flag, StrEnum, DNParam, Bool
+from ipalib import Command, Password, Str, Flag, StrEnum, DNParam, Bool, Int
 from ipalib.cli import to_cli
 from ipalib.plugable import Registry
+from ipalib.request import context as request_context
 from ipaserver.plugins.user import NO_UPG_MAGIC
+from ipaserver.workerpool import WorkerPool
 from ipalib import _
 from ipapython.dn import DN
 from ipapython.ipaldap import LDAPClient
@@ -120,6 +126,12 @@ EXAMPLES:
        --user-ignore-attribute=radiusgroupname \\
        ldap://ds.example.com:389
 
+ Continue an interrupted migration, migrating 4 entries concurrently:
+   ipa migrate-ds --resume --workers=4 ldap://ds.example.com:389
+
+ Migrate users and groups created or modified since the last migration:
+   ipa migrate-ds --incremental ldap://ds.example.com:389
+
 LOGGING
 
 Migration will log warnings and errors to the Apache error log. This
@@ -134,6 +146,19 @@ If the log level is debug, either by setting debug = True in
 /etc/ipa/default.conf or /etc/ipa/server.conf, then an entry will be printed
 for each user added plus a summary when the default user group is
 updated.
+
+CHECKPOINTS
+
+The progress of the migration from each LDAP server is saved every 100
+entries. An interrupted migration can be continued with the --resume
+option, entries migrated before the interruption are then skipped. Once
+all users or groups are migrated, the highest entryUSN (or modifyTimestamp
+if the server does not maintain entryUSN) of the migrated entries is
+saved. The --incremental option only migrates entries created or modified
+after the last completed migration, and the entries which failed to
+migrate in it. Entries which already exist in IPA are not updated.
+
+With the --workers option, several entries are migrated concurrently.
 """)
 
 logger = logging.getLogger(__name__)
@@ -154,6 +179,10 @@ _supported_schemas = (u'RFC2307bis', u'RFC2307')
 _supported_scopes = {u'base': SCOPE_BASE, u'onelevel': SCOPE_ONELEVEL, u'subtree': SCOPE_SUBTREE}
 _default_scope = u'onelevel'
 
+# operational attributes used to find entries changed since the last
+# migration, in the order of preference
+_checkpoint_attrs = ('entryusn', 'modifytimestamp')
+
 
 def _create_kerberos_principals(ldap, pkey, entry_attrs, failed):
     """
@@ -320,12 +349,24 @@ def _post_migrate_user(ldap, pkey, dn, entry_attrs, failed, config, ctx):
             pass
 
 def _update_default_group(ldap, ctx, force):
-    migrate_cnt = ctx['migrate_cnt']
     group_dn = ctx['def_group_dn']
+    lock = ctx['def_group_lock']
+
+    # With several workers, the users migrated concurrently see the same
+    # count. Only one of them adds the users to the group, the others go on
+    # while it does.
+    if not lock.acquire(blocking=force):
+        return
+    try:
+        migrate_cnt = ctx['migrate_cnt']
+        # Purposely let this fire when migrate_cnt == 0 so on re-running
+        # migration it can catch any users migrated but not added to the
+        # default group.
+        if not force:
+            if migrate_cnt < ctx['def_group_next']:
+                return
+            ctx['def_group_next'] = migrate_cnt - migrate_cnt % 100 + 100
 
-    # Purposely let this fire when migrate_cnt == 0 so on re-running migration
-    # it can catch any users migrated but not added to the default group.
-    if force or migrate_cnt % 100 == 0:
         s = datetime.datetime.now()
         searchfilter = "(&(objectclass=posixAccount)(!(memberof=%s)))" % group_dn
         try:
@@ -337,10 +378,17 @@ def _update_default_group(ldap, ctx, force):
             return
 
         member_dns = [m.dn for m in result]
-        modlist = [(MOD_ADD, 'member', ldap.encode(member_dns))]
         try:
-            with ldap.error_handler():
-                ldap.conn.modify_s(str(group_dn), modlist)
+            try:
+                ldap.add_entries_to_group(member_dns, group_dn)
+            except errors.AlreadyGroupMember:
+                # some of the users are members already, add the others
+                # one by one
+                for member_dn in member_dns:
+                    try:
+                        ldap.add_entry_to_group(member_dn, group_dn)
+                    except (errors.AlreadyGroupMember, errors.NotFound):
+                        pass
         except errors.DatabaseError as e:
             logger.error('Adding new members to default group failed: %s \n'
                          'members: %s', e, ','.join(member_dns))
@@ -350,6 +398,8 @@ def _update_default_group(ldap, ctx, force):
         mode = " (forced)" if force else ""
         logger.info('Adding %d users to group%s duration %s',
                     len(member_dns), mode, d)
+    finally:
+        lock.release()
 
 # GROUP MIGRATION CALLBACKS AND VARS
 
@@ -464,6 +514,251 @@ def _group_exc_callback(ldap, dn, entry_attrs, exc, options):
 
     raise exc
 
+# MIGRATION CHECKPOINTS
+
+class _Checkpoint:
+    """
+    Progress of migrations from one source DS.
+
+    The progress is stored in ipaConfigString of an entry in
+    cn=migration,cn=etc, with these values for each object type:
+
+      <obj>:position:<count>:<dn> - number of entries of an unfinished
+          migration which are done and the source DN of the last of them
+      <obj>:failed:<attr>:<value> - lowest entryUSN or modifyTimestamp of
+          the entries an unfinished migration failed to migrate
+      <obj>:<attr>:<value> - highest entryUSN or modifyTimestamp of the
+          entries seen by the last finished migration, lowered below the
+          entries which failed to migrate
+
+    Entries may be migrated concurrently, the position only moves over
+    entries which are done without a gap before them, so a resumed
+    migration never skips an entry which was not migrated.
+    """
+    container_dn = DN(('cn', 'migration'), ('cn', 'etc'))
+    save_interval = 100
+
+    def __init__(self, ldap, ldapuri, ds_base_dn):
+        self.ldap = ldap
+        self.source = u'%s %s' % (ldapuri, ds_base_dn)
+        name = hashlib.sha256(self.source.encode('utf-8')).hexdigest()[:32]
+        self.dn = DN(('cn', name), self.container_dn, api.env.basedn)
+        self.entry = None
+        self.positions = {}
+        self.failed = {}
+        self.marks = {}
+        self.lock = threading.Lock()
+        # state of the running migration of one object type
+        self.obj = None
+        self.count = 0
+        self.last_dn = None
+        self.saved = 0
+        self.pending = {}
+
+    def load(self):
+        try:
+            self.entry = self.ldap.get_entry(self.dn, ['ipaconfigstring'])
+        except errors.NotFound:
+            return
+
+        for value in self.entry.get('ipaconfigstring', []):
+            obj, _sep, value = value.partition(':')
+            kind, _sep, value = value.partition(':')
+            try:
+                if kind == 'position':
+                    count, _sep, dn = value.partition(':')
+                    self.positions[obj] = (int(count), DN(dn))
+                elif kind == 'failed':
+                    attr, _sep, value = value.partition(':')
+                    if attr in _checkpoint_attrs and value:
+                        self.failed.setdefault(obj, {})[attr] = value
+                elif kind in _checkpoint_attrs and value:
+                    self.marks[obj] = (kind, value)
+            except ValueError as e:
+                logger.warning('%s: ignoring invalid checkpoint %s: %s',
+                               self.dn, value, e)
+
+    def get_position(self, obj):
+        """Return (count, last DN) of an unfinished migration of obj"""
+        return self.positions.get(obj, (0, None))
+
+    def get_filter(self, obj):
+        """
+        Return a filter matching entries changed since the last finished
+        migration of obj, or None.
+        """
+        try:
+            attr, value = self.marks[obj]
+        except KeyError:
+            return None
+        if attr == 'entryusn':
+            # USNs are unique, skip the last entry seen before; modify
+            # timestamps have a resolution of one second
+            value = str(int(value) + 1)
+        return '(%s>=%s)' % (attr, ldap_filter.escape_filter_chars(value))
+
+    def start(self, obj, count=0, last_dn=None):
+        self.obj = obj
+        self.count = self.saved = count
+        self.last_dn = last_dn
+        self.pending = {}
+        if not count:
+            # failed entries are migrated again
+            self.failed.pop(obj, None)
+
+    def not_migrated(self, values):
+        """
+        Record that an entry with the _mark_values() values failed to
+        migrate, before it is done.
+        """
+        with self.lock:
+            failed = self.failed.setdefault(self.obj, {})
+            for attr, value in values.items():
+                old = failed.get(attr)
+                if attr == 'entryusn':
+                    lower = old is None or int(value) < int(old)
+                else:
+                    lower = old is None or value < old
+                if lower:
+                    failed[attr] = value
+
+    def done(self, index, dn):
+        """Record that the entry at index in the search result is done"""
+        with self.lock:
+            self.pending[index] = dn
+            while self.count in self.pending:
+                self.last_dn = self.pending.pop(self.count)
+                self.count += 1
+            if self.count - self.saved >= self.save_interval:
+                self.positions[self.obj] = (self.count, self.last_dn)
+                self.saved = self.count
+                self._save()
+
+    def finish(self, mark):
+        """
+        Record that all entries of the object type are done, mark is the
+        highest entryUSN or modifyTimestamp seen.
+        """
+        with self.lock:
+            self.positions.pop(self.obj, None)
+            failed = self.failed.pop(self.obj, {})
+            mark = _lower_mark(mark, [failed])
+            if mark is not None:
+                self.marks[self.obj] = mark
+            self._save()
+
+    def _save(self):
+        values = [u'source:%s' % self.source]
+        for obj, (count, dn) in sorted(self.positions.items()):
+            values.append(u'%s:position:%d:%s' % (obj, count, dn))
+        for obj, failed in sorted(self.failed.items()):
+            for attr, value in sorted(failed.items()):
+                values.append(u'%s:failed:%s:%s' % (obj, attr, value))
+        for obj, (attr, value) in sorted(self.marks.items()):
+            values.append(u'%s:%s:%s' % (obj, attr, value))
+
+        try:
+            if self.entry is None:
+                self._create(values)
+            else:
+                self.entry['ipaconfigstring'] = values
+                self.ldap.update_entry(self.entry)
+        except errors.EmptyModlist:
+            pass
+        except errors.PublicError as e:
+            logger.warning('Failed to save migration checkpoint %s: %s',
+                           self.dn, e)
+
+    def _create(self, values):
+        entry = self.ldap.make_entry(
+            self.dn,
+            objectclass=['top', 'nsContainer', 'ipaConfigObject'],
+            cn=[self.dn[0].value],
+            ipaconfigstring=values,
+        )
+        try:
+            self.ldap.add_entry(entry)
+        except errors.NotFound:
+            container = self.ldap.make_entry(
+                DN(self.container_dn, api.env.basedn),
+                objectclass=['top', 'nsContainer'],
+                cn=[self.container_dn[0].value],
+            )
+            try:
+                self.ldap.add_entry(container)
+            except errors.DuplicateEntry:
+                pass
+            self.ldap.add_entry(entry)
+        self.entry = entry
+
+
+def _mark_values(entry_attrs):
+    """
+    Return dictionary of the entryUSN and modifyTimestamp values of a
+    source entry.
+    """
+    return {
+        attr: entry_attrs.raw[attr][0].decode('utf-8')
+        for attr in _checkpoint_attrs if attr in entry_attrs
+    }
+
+
+def _update_mark(entry_attrs, mark):
+    """
+    Remove the checkpoint attributes from a source entry and return the
+    higher of mark and the entry's entryUSN or modifyTimestamp.
+
+    The comparison is done on the raw values, generalized time values of
+    one server all have the same format.
+    """
+    values = _mark_values(entry_attrs)
+    for attr in values:
+        del entry_attrs[attr]
+
+    if mark is None:
+        for attr in _checkpoint_attrs:
+            if attr in values:
+                return (attr, values[attr])
+        return None
+
+    attr, value = mark
+    if attr not in values:
+        return mark
+    if attr == 'entryusn':
+        if int(values[attr]) > int(value):
+            return (attr, values[attr])
+    elif values[attr] > value:
+        return (attr, values[attr])
+    return mark
+
+
+def _lower_mark(mark, not_migrated):
+    """
+    Return mark lowered so that the filter of the next incremental
+    migration matches the entries which were not migrated.
+
+    :param not_migrated: list of _mark_values() of those entries
+    """
+    if mark is None:
+        return None
+
+    attr, value = mark
+    for values in not_migrated:
+        if attr not in values:
+            continue
+        if attr == 'entryusn':
+            # the filter skips the entry with the USN of the mark
+            if int(values[attr]) <= int(value):
+                value = str(int(values[attr]) - 1)
+        elif values[attr] < value:
+            value = values[attr]
+    return (attr, value)
+
+
+class _OrderChanged(Exception):
+    pass
+
+
 # DS MIGRATION PLUGIN
 
 def construct_filter(template, oc_list):
@@ -654,6 +949,26 @@ class migrate_ds(Command):
                 default=_default_scope,
                 autofill=True,
                 ),
+        Flag('resume?',
+             label=_('Resume'),
+             doc=_('Continue an interrupted migration from the last '
+                   'checkpoint'),
+             default=False,
+             ),
+        Flag('incremental?',
+             label=_('Incremental'),
+             doc=_('Only migrate entries created or modified since the last '
+                   'completed migration'),
+             default=False,
+             ),
+        Int('workers?',
+            label=_('Workers'),
+            doc=_('Number of entries migrated concurrently (default: 1)'),
+            minvalue=1,
+            maxvalue=16,
+            default=1,
+            autofill=True,
+            ),
     )
 
     has_output = (
@@ -732,6 +1047,54 @@ migration process might be incomplete\n''')
             search_bases[ldap_obj_name] = search_base
         return search_bases
 
+    def _iter_source_entries(self, ds_ldap, ldap_obj, search_filter,
+                             search_base, scope, oc_list, options,
+                             allow_empty=False):
+        """
+        Iterate over the entries of one object type in the source DS.
+
+        The entries are retrieved in pages and migrated as they arrive, so
+        the whole source tree is never held in memory at once.
+        """
+        try:
+            truncated = yield from ds_ldap.iter_entries(
+                search_filter, ['*'] + list(_checkpoint_attrs), search_base,
+                scope, time_limit=0, size_limit=-1, paged_search=True
+            )
+        except errors.NotFound:
+            if not allow_empty and not options.get('continue', False):
+                raise errors.NotFound(
+                    reason=_('%(container)s LDAP search did not return any result '
+                             '(search base: %(search_base)s, '
+                             'objectclass: %(objectclass)s)')
+                             % {'container': ldap_obj.name,
+                                'search_base': search_base,
+                                'objectclass': ', '.join(oc_list)}
+                )
+            truncated = False
+        if truncated:
+            logger.error(
+                '%s: %s',
+                ldap_obj.name, self.truncated_err_msg
+            )
+
+    @contextlib.contextmanager
+    def _worker_pool(self, workers):
+        """
+        Provide a pool of threads migrating entries concurrently, or None if
+        the entries are to be migrated one by one.
+        """
+        if (workers <= 1 or not self.api.env.in_server or
+                getattr(request_context, 'principal', None) is None):
+            yield None
+            return
+        # the workers can only re-use Kerberos credentials of the caller
+        ccache_name = getattr(request_context, 'ccache_name',
+                              os.environ.get('KRB5CCNAME'))
+        with WorkerPool(self.api, workers, ccache_name, name='migrate_ds',
+                        max_pending=workers) as pool:
+            yield pool
+
     def migrate(self, ldap, config, ds_ldap, ds_base_dn, options):
         """
         Migrate objects from DS to LDAP.
@@ -744,148 +1107,223 @@ migration process might be incomplete\n''')
 
         scope = _supported_scopes[options.get('scope')]
 
-        for ldap_obj_name in self.migrate_order:
-            ldap_obj = self.api.Object[ldap_obj_name]
+        checkpoint = _Checkpoint(ldap, ds_ldap.ldap_uri, ds_base_dn)
+        checkpoint.load()
 
-            template = self.migrate_objects[ldap_obj_name]['filter_template']
-            oc_list = options[to_cli(self.migrate_objects[ldap_obj_name]['oc_option'])]
-            search_filter = construct_filter(template, oc_list)
+        with self._worker_pool(options.get('workers', 1)) as pool:
+            for ldap_obj_name in self.migrate_order:
+                context = self._migrate_objects(
+                    ldap, config, ds_ldap, ldap_obj_name, options,
+                    search_bases, scope, checkpoint, pool, migrated, failed,
+                    migration_start)
 
-            exclude = options['exclude_%ss' % to_cli(ldap_obj_name)]
-            context = dict(ds_ldap = ds_ldap)
+        if 'def_group_dn' in context:
+            _update_default_group(ldap, context, True)
 
-            migrated[ldap_obj_name] = []
-            failed[ldap_obj_name] = {}
+        return (migrated, failed)
 
+    def _migrate_objects(self, ldap, config, ds_ldap, ldap_obj_name, options,
+                         search_bases, scope, checkpoint, pool, migrated,
+                         failed, migration_start):
+        """
+        Migrate objects of one type from DS to LDAP, return the object
+        context.
+        """
+        ldap_obj = self.api.Object[ldap_obj_name]
+
+        template = self.migrate_objects[ldap_obj_name]['filter_template']
+        oc_list = options[to_cli(self.migrate_objects[ldap_obj_name]['oc_option'])]
+        search_filter = construct_filter(template, oc_list)
+        changed_filter = None
+        if options.get('incremental'):
+            changed_filter = checkpoint.get_filter(ldap_obj_name)
+        if changed_filter:
+            search_filter = '(&%s%s)' % (search_filter, changed_filter)
+
+        exclude = options['exclude_%ss' % to_cli(ldap_obj_name)]
+        context = dict(ds_ldap = ds_ldap)
+
+        migrated[ldap_obj_name] = []
+        failed[ldap_obj_name] = {}
+
+        blacklists = {}
+        for blacklist in ('oc_blacklist', 'attr_blacklist'):
+            blacklist_option = self.migrate_objects[ldap_obj_name][blacklist+'_option']
+            if blacklist_option is not None:
+                blacklists[blacklist] = options.get(blacklist_option, tuple())
+            else:
+                blacklists[blacklist] = tuple()
+
+        # get default primary group for new users
+        if 'def_group_dn' not in context and options.get('use_def_group'):
+            def_group = config.get('ipadefaultprimarygroup')
+            context['def_group_dn'] = api.Object.group.get_dn(def_group)
+            context['def_group_lock'] = threading.Lock()
+            context['def_group_next'] = 0
             try:
-                entries, truncated = ds_ldap.find_entries(
-                    search_filter, ['*'], search_bases[ldap_obj_name],
-                    scope,
-                    time_limit=0, size_limit=-1
-                )
+                ldap.get_entry(context['def_group_dn'], ['gidnumber', 'cn'])
             except errors.NotFound:
-                if not options.get('continue',False):
-                    raise errors.NotFound(
-                        reason=_('%(container)s LDAP search did not return any result '
-                                 '(search base: %(search_base)s, '
-                                 'objectclass: %(objectclass)s)')
-                                 % {'container': ldap_obj_name,
-                                    'search_base': search_bases[ldap_obj_name],
-                                    'objectclass': ', '.join(oc_list)}
-                    )
-                else:
-                    truncated = False
-                    entries = []
-            if truncated:
-                logger.error(
-                    '%s: %s',
-                    ldap_obj.name, self.truncated_err_msg
-                )
+                error_msg = _('Default group for new users not found')
+                raise errors.NotFound(reason=error_msg)
 
-            blacklists = {}
-            for blacklist in ('oc_blacklist', 'attr_blacklist'):
-                blacklist_option = self.migrate_objects[ldap_obj_name][blacklist+'_option']
-                if blacklist_option is not None:
-                    blacklists[blacklist] = options.get(blacklist_option, tuple())
-                else:
-                    blacklists[blacklist] = tuple()
+        context['has_upg'] = ldap.has_upg()
 
-            # get default primary group for new users
-            if 'def_group_dn' not in context and options.get('use_def_group'):
-                def_group = config.get('ipadefaultprimarygroup')
-                context['def_group_dn'] = api.Object.group.get_dn(def_group)
-                try:
-                    ldap.get_entry(context['def_group_dn'], ['gidnumber', 'cn'])
-                except errors.NotFound:
-                    error_msg = _('Default group for new users not found')
-                    raise errors.NotFound(reason=error_msg)
-
-            context['has_upg'] = ldap.has_upg()
-
-            valid_gids = set()
-            invalid_gids = set()
-            migrate_cnt = 0
-            context['migrate_cnt'] = 0
-            for entry_attrs in entries:
-                context['migrate_cnt'] = migrate_cnt
-                s = datetime.datetime.now()
-
-                ava = entry_attrs.dn[0][0]
-                if ava.attr == ldap_obj.primary_key.name:
-                    # In case if pkey attribute is in the migrated object DN
-                    # and the original LDAP is multivalued, make sure that
-                    # we pick the correct value (the unique one stored in DN)
-                    pkey = ava.value.lower()
-                else:
-                    pkey = entry_attrs[ldap_obj.primary_key.name][0].lower()
+        valid_gids = set()
+        invalid_gids = set()
+        context['migrate_cnt'] = 0
+        lock = threading.Lock()
+        worker_errors = []
 
-                if pkey in exclude:
-                    continue
+        def migrate_entry(index, source_dn, entry_attrs, mark_values):
+            if worker_errors:
+                # another entry failed, the migration is being aborted
+                return
+            try:
+                migrated_entry = migrate_one(entry_attrs)
+            except Exception as e:
+                worker_errors.append(e)
+                raise
+            if not migrated_entry:
+                checkpoint.not_migrated(mark_values)
+            checkpoint.done(index, source_dn)
+
+        def migrate_one(entry_attrs):
+            """
+            Migrate an entry, return False if it failed or was rejected
+            and is to be migrated again by an incremental migration.
+            """
+            s = datetime.datetime.now()
+
+            ava = entry_attrs.dn[0][0]
+            if ava.attr == ldap_obj.primary_key.name:
+                # In case if pkey attribute is in the migrated object DN
+                # and the original LDAP is multivalued, make sure that
+                # we pick the correct value (the unique one stored in DN)
+                pkey = ava.value.lower()
+            else:
+                pkey = entry_attrs[ldap_obj.primary_key.name][0].lower()
 
-                entry_attrs.dn = ldap_obj.get_dn(pkey)
-                entry_attrs['objectclass'] = list(
-                    set(
-                        config.get(
-                            ldap_obj.object_class_config, ldap_obj.object_class
-                        ) + [o.lower() for o in entry_attrs['objectclass']]
-                    )
+            if pkey in exclude:
+                return True
+
+            entry_attrs.dn = ldap_obj.get_dn(pkey)
+            entry_attrs['objectclass'] = list(
+                set(
+                    config.get(
+                        ldap_obj.object_class_config, ldap_obj.object_class
+                    ) + [o.lower() for o in entry_attrs['objectclass']]
                 )
-                entry_attrs[ldap_obj.primary_key.name][0] = entry_attrs[ldap_obj.primary_key.name][0].lower()
+            )
+            entry_attrs[ldap_obj.primary_key.name][0] = entry_attrs[ldap_obj.primary_key.name][0].lower()
+
+            callback = self.migrate_objects[ldap_obj_name]['pre_callback']
+            if callable(callback):
+                try:
+                    entry_attrs.dn = callback(
+                        ldap, pkey, entry_attrs.dn, entry_attrs,
+                        failed[ldap_obj_name], config, context,
+                        schema=options['schema'],
+                        search_bases=search_bases,
+                        valid_gids=valid_gids,
+                        invalid_gids=invalid_gids,
+                        **blacklists
+                    )
+                    if not entry_attrs.dn:
+                        return False
+                except errors.NotFound as e:
+                    failed[ldap_obj_name][pkey] = unicode(e.reason)
+                    return False
 
-                callback = self.migrate_objects[ldap_obj_name]['pre_callback']
+            try:
+                ldap.add_entry(entry_attrs)
+            except errors.ExecutionError as e:
+                callback = self.migrate_objects[ldap_obj_name]['exc_callback']
                 if callable(callback):
                     try:
-                        entry_attrs.dn = callback(
-                            ldap, pkey, entry_attrs.dn, entry_attrs,
-                            failed[ldap_obj_name], config, context,
-                            schema=options['schema'],
-                            search_bases=search_bases,
-                            valid_gids=valid_gids,
-                            invalid_gids=invalid_gids,
-                            **blacklists
-                        )
-                        if not entry_attrs.dn:
-                            continue
-                    except errors.NotFound as e:
-                        failed[ldap_obj_name][pkey] = unicode(e.reason)
+                        callback(
+                            ldap, entry_attrs.dn, entry_attrs, e, options)
+                    except errors.ExecutionError as e2:
+                        failed[ldap_obj_name][pkey] = unicode(e2)
+                        return False
+                else:
+                    failed[ldap_obj_name][pkey] = unicode(e)
+                    return False
+
+            migrated[ldap_obj_name].append(pkey)
+
+            callback = self.migrate_objects[ldap_obj_name]['post_callback']
+            if callable(callback):
+                callback(
+                    ldap, pkey, entry_attrs.dn, entry_attrs,
+                    failed[ldap_obj_name], config, context)
+            e = datetime.datetime.now()
+            d = e - s
+            total_dur = e - migration_start
+            with lock:
+                context['migrate_cnt'] += 1
+                migrate_cnt = context['migrate_cnt']
+            if migrate_cnt > 0 and migrate_cnt % 100 == 0:
+                logger.info("%d %ss migrated. %s elapsed.",
+                            migrate_cnt, ldap_obj_name, total_dur)
+            logger.debug("%d %ss migrated, duration: %s (total %s)",
+                         migrate_cnt, ldap_obj_name, d, total_dur)
+            return True
+
+        position, last_dn = 0, None
+        if options.get('resume'):
+            position, last_dn = checkpoint.get_position(ldap_obj_name)
+            if position:
+                logger.info('Resuming migration of %ss after %d entries',
+                            ldap_obj_name, position)
+
+        while True:
+            checkpoint.start(ldap_obj_name, position, last_dn)
+            mark = None
+            entries = self._iter_source_entries(
+                ds_ldap, ldap_obj, search_filter,
+                search_bases[ldap_obj_name], scope, oc_list, options,
+                allow_empty=bool(changed_filter or position))
+            seen = 0
+            try:
+                for index, entry_attrs in enumerate(entries):
+                    seen = index + 1
+                    mark_values = _mark_values(entry_attrs)
+                    mark = _update_mark(entry_attrs, mark)
+                    if index < position:
+                        # migrated before the interruption
+                        if (index == position - 1 and
+                                entry_attrs.dn != last_dn):
+                            raise _OrderChanged()
                         continue
-
-                try:
-                    ldap.add_entry(entry_attrs)
-                except errors.ExecutionError as e:
-                    callback = self.migrate_objects[ldap_obj_name]['exc_callback']
-                    if callable(callback):
-                        try:
-                            callback(
-                                ldap, entry_attrs.dn, entry_attrs, e, options)
-                        except errors.ExecutionError as e2:
-                            failed[ldap_obj_name][pkey] = unicode(e2)
-                            continue
+                    if pool is None:
+                        migrate_entry(
+                            index, entry_attrs.dn, entry_attrs, mark_values)
                     else:
-                        failed[ldap_obj_name][pkey] = unicode(e)
-                        continue
-
-                migrated[ldap_obj_name].append(pkey)
+                        pool.submit(
+                            migrate_entry, index, entry_attrs.dn, entry_attrs,
+                            mark_values)
+                        if worker_errors:
+                            break
+                if seen < position and not worker_errors:
+                    raise _OrderChanged()
+            except _OrderChanged:
+                logger.warning(
+                    'Order of %ss in the source DS has changed since the '
+                    'migration was interrupted, migrating all of them again',
+                    ldap_obj_name)
+                position, last_dn = 0, None
+                continue
+            finally:
+                entries.close()
+            break
 
-                callback = self.migrate_objects[ldap_obj_name]['post_callback']
-                if callable(callback):
-                    callback(
-                        ldap, pkey, entry_attrs.dn, entry_attrs,
-                        failed[ldap_obj_name], config, context)
-                e = datetime.datetime.now()
-                d = e - s
-                total_dur = e - migration_start
-                migrate_cnt += 1
-                if migrate_cnt > 0 and migrate_cnt % 100 == 0:
-                    logger.info("%d %ss migrated. %s elapsed.",
-                                migrate_cnt, ldap_obj_name, total_dur)
-                logger.debug("%d %ss migrated, duration: %s (total %s)",
-                             migrate_cnt, ldap_obj_name, d, total_dur)
+        if pool is not None:
+            pool.wait()
+        if worker_errors:
+            raise worker_errors[0]
 
-        if 'def_group_dn' in context:
-            _update_default_group(ldap, context, True)
-
-        return (migrated, failed)
+        checkpoint.finish(mark)
+        return context
 
     def execute(self, ldapuri, bindpw, **options):
         ldap = self.api.Backend.ldap2
@@ -69,6 +69,17 @@ class rabase(Backend):
         """
         raise errors.NotImplementedError(name='%s.get_certificate' % self.name)
 
+    def get_certificates(self, serial_numbers):
+        """
+        Retrieve several existing certificates.
+
+        Returns a list of get_certificate() results in the order of
+        serial_numbers.
+
+        :param serial_numbers: certificate serial numbers
+        """
+        return [self.get_certificate(sn) for sn in serial_numbers]
+
     def request_certificate(
             self, csr, profile_id, ca_id, request_type='pkcs10'):
         """
@@ -56,6 +56,7 @@ from ipalib.plugable import Registry
 from .baseldap import (
     LDAPObject,
     pkey_to_value,
+    LDAPBulkCreate,
     LDAPCreate,
     LDAPSearch,
     LDAPQuery,
@@ -673,6 +674,43 @@ class user_add(baseuser_add):
         return dn
 
 
+@register()
+class user_add_bulk(LDAPBulkCreate):
+    __doc__ = _('Add several new users.')
+
+    msg_summary = ngettext(
+        '%(count)d user added', '%(count)d users added', 0
+    )
+
+    def post_callback(self, ldap, entries):
+        config = ldap.get_ipa_config()
+        def_primary_group = config.get('ipadefaultprimarygroup')
+        group_dn = self.api.Object['group'].get_dn(def_primary_group)
+
+        # add the users we just created into the default primary group,
+        # one by one only if some of them are already members
+        dns = [entry_attrs.dn for entry_attrs, _k, _o, _r in entries]
+        try:
+            ldap.add_entries_to_group(dns, group_dn)
+        except errors.AlreadyGroupMember:
+            for dn in dns:
+                try:
+                    ldap.add_entry_to_group(dn, group_dn)
+                except errors.AlreadyGroupMember:
+                    pass
+
+        for entry_attrs, _keys, options, result in entries:
+            # delete description attribute NO_UPG_MAGIC if present
+            if (options.get('noprivate', False) or not ldap.has_upg()) and \
+                    NO_UPG_MAGIC in entry_attrs.get('description', []):
+                entry_attrs['description'].remove(NO_UPG_MAGIC)
+                ldap.update_entry(entry_attrs)
+
+            if options.get('random', False):
+                result['randompassword'] = unicode(
+                    entry_attrs.single_value['userpassword'])
+
+
 @register()
 class user_del(baseuser_del):
     __doc__ = _('Delete a user.')
@@ -25,9 +25,11 @@ Also see the `ipalib.rpc` module.
 
 from __future__ import absolute_import
 
+import itertools
 import logging
 from xml.sax.saxutils import escape
 import os
+import time
 import traceback
 from io import BytesIO
 from urllib.parse import parse_qs
@@ -49,9 +51,10 @@ from ipalib.backend import Executioner
 from ipalib.errors import (PublicError, InternalError, JSONError,
     CCacheError, RefererError, InvalidSessionPassword, NotFound, ACIError,
     ExecutionError, PasswordExpired, KrbPrincipalExpired, UserLocked)
-from ipalib.request import context, destroy_context
+from ipalib.request import (
+    context, destroy_context, get_timings, start_timings)
 from ipalib.rpc import (xml_dumps, xml_loads,
-    json_encode_binary, json_decode_binary)
+    json_iterencode_binary, json_decode_binary)
 from ipapython.dn import DN
 from ipaserver.plugins.ldap2 import ldap2
 from ipalib.backend import Backend
@@ -59,6 +62,7 @@ from ipalib.krb_utils import (
     get_credentials_if_valid)
 from ipapython import kerberos
 from ipapython import ipautil
+from ipapython import session_storage
 from ipaplatform.paths import paths
 from ipapython.version import VERSION
 from ipalib.text import _
@@ -75,6 +79,9 @@ HTTP_STATUS_SUCCESS = '200 Success'
 HTTP_STATUS_SERVER_ERROR = '500 Internal Server Error'
 HTTP_STATUS_SERVICE_UNAVAILABLE = "503 Service Unavailable"
 
+# expiration time of validated session ccaches
+_ccache_expiration_cache = session_storage.CCacheDataCache(maxsize=1024)
+
 _not_found_template = """<html>
 <head>
 <title>404 Not Found</title>
@@ -297,6 +304,10 @@ class wsgi_dispatch(Executioner, HTTP_Status):
     def _on_finalize(self):
         self.url = self.env['mount_ipa']
         super(wsgi_dispatch, self)._on_finalize()
+        # WSGI applications mount themselves when they are finalized, make
+        # sure they are when plugins are finalized on-demand
+        for backend in self.api.Backend():
+            backend.ensure_finalized()
 
     def route(self, environ, start_response):
         key = environ.get('PATH_INFO')
@@ -366,6 +377,7 @@ class WSGIExecutioner(Executioner):
         args = ()
         options = {}
         command = None
+        timings = None
 
         e = None
         if 'HTTP_REFERER' not in environ:
@@ -388,6 +400,9 @@ class WSGIExecutioner(Executioner):
             else:
                 (name, args, options, _id) = self.simple_unmarshal(environ)
 
+            if self.api.env.command_timing:
+                timings = start_timings()
+
             if name in self._system_commands:
                 result = self._system_commands[name](self, *args, **options)
             else:
@@ -436,8 +451,17 @@ class WSGIExecutioner(Executioner):
                         name,
                         type(error).__name__)
 
+        if timings is not None:
+            timings.finish()
+            if timings.total * 1000 >= self.api.env.slow_command_threshold:
+                logger.warning('[%s] %s: %s: slow command: %s',
+                               type(self).__name__,
+                               principal,
+                               name,
+                               timings)
+
         version = options.get('version', VERSION_WITHOUT_CAPABILITIES)
-        return self.marshal(result, error, _id, version)
+        return self.marshal_iter(result, error, _id, version)
 
     def simple_unmarshal(self, environ):
         name = environ['PATH_INFO'].strip('/')
@@ -453,6 +477,11 @@ class WSGIExecutioner(Executioner):
         try:
             status = HTTP_STATUS_SUCCESS
             response = self.wsgi_execute(environ)
+            if not isinstance(response, bytes):
+                # encode the first chunk of a streamed response before the
+                # status is sent, so that encoding errors are reported
+                chunks = iter(response)
+                response = itertools.chain([next(chunks, b'')], chunks)
             if self.headers:
                 headers = self.headers
             else:
@@ -468,8 +497,14 @@ class WSGIExecutioner(Executioner):
         if logout_cookie is not None:
             headers.append(('IPASESSION', logout_cookie))
 
+        timings = get_timings()
+        if timings is not None:
+            headers = headers + [('X-IPA-Timing', str(timings))]
+
         start_response(status, headers)
-        return [response]
+        if isinstance(response, bytes):
+            return [response]
+        return response
 
     def unmarshal(self, data):
         raise NotImplementedError('%s.unmarshal()' % type(self).__name__)
@@ -478,6 +513,14 @@ class WSGIExecutioner(Executioner):
                 version=VERSION_WITHOUT_CAPABILITIES):
         raise NotImplementedError('%s.marshal()' % type(self).__name__)
 
+    def marshal_iter(self, result, error, _id=None,
+                     version=VERSION_WITHOUT_CAPABILITIES):
+        """
+        Marshal the response into an iterable of bytes, which is returned to
+        the WSGI server as is.
+        """
+        return [self.marshal(result, error, _id, version)]
+
 
 class jsonserver(WSGIExecutioner, HTTP_Status):
     """
@@ -501,6 +544,14 @@ class jsonserver(WSGIExecutioner, HTTP_Status):
 
     def marshal(self, result, error, _id=None,
                 version=VERSION_WITHOUT_CAPABILITIES):
+        return b''.join(self.marshal_iter(result, error, _id, version))
+
+    def marshal_iter(self, result, error, _id=None,
+                     version=VERSION_WITHOUT_CAPABILITIES):
+        """
+        Encode the response incrementally, so that large results can be sent
+        without serializing them into one string first.
+        """
         if error:
             assert isinstance(error, PublicError)
             error = dict(
@@ -517,10 +568,10 @@ class jsonserver(WSGIExecutioner, HTTP_Status):
             principal=unicode(principal),
             version=unicode(VERSION),
         )
-        dump = json_encode_binary(
+        chunks = json_iterencode_binary(
             response, version, pretty_print=self.api.env.debug
         )
-        return dump.encode('utf-8')
+        return (chunk.encode('utf-8') for chunk in chunks)
 
     def unmarshal(self, data):
         try:
@@ -647,13 +698,22 @@ class KerberosSession(HTTP_Status):
             logger.debug('no Principal Name, need login')
             return None
 
-        # ... and use it to resolve the ccache name (Issue: 6972 )
-        gss_name = gssapi.Name(principal, gssapi.NameType.kerberos_principal)
-
-        # Fail if Kerberos credentials are expired or missing
-        creds = get_credentials_if_valid(name=gss_name,
-                                         ccache_name=ccache_name)
-        if not creds:
+        def get_expiration():
+            # ... and use it to resolve the ccache name (Issue: 6972 )
+            gss_name = gssapi.Name(
+                principal, gssapi.NameType.kerberos_principal)
+
+            creds = get_credentials_if_valid(name=gss_name,
+                                             ccache_name=ccache_name)
+            if not creds:
+                return None
+            return time.time() + creds.lifetime
+
+        # Fail if Kerberos credentials are expired or missing. The ccache
+        # is validated again only when it changes.
+        expiration = _ccache_expiration_cache.get(
+            ccache_name, principal, get_expiration)
+        if expiration is None or expiration <= time.time():
             logger.debug(
                 'ccache expired or invalid, deleting session, need login')
             return None
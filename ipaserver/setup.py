@@ -44,6 +44,9 @@ if __name__ == '__main__':
             'ipaserver.install.plugins',
             'ipaserver.install.server',
         ],
+        package_data={
+            'ipaserver.plugins': ['manifest.json'],
+        },
         install_requires=[
             "cryptography",
             "custodia",
@@ -6,9 +6,11 @@
 set of functions and classes useful for management of domain level 1 topology
 """
 
-from copy import deepcopy
+import threading
 
-from ipalib import _
+from ipalib import _, errors
+from ipalib.request import context
+from ipapython.dn import DN
 from ipapython.graph import Graph
 
 CURR_TOPOLOGY_DISCONNECTED = _("""
@@ -19,6 +21,13 @@ REMOVAL_DISCONNECTS_TOPOLOGY = _("""
 Removal of '%(hostname)s' leads to disconnected topology in suffix '%(suffix)s':
 %(errors)s""")
 
+# attributes of topology entries which change with every modification
+TOPOLOGY_CHANGE_ATTRS = ('entryusn', 'modifytimestamp')
+
+_topology_graphs_cache = {}
+_topology_graphs_cache_size = 16
+_topology_graphs_lock = threading.Lock()
+
 
 def create_topology_graph(masters, segments):
     """
@@ -34,39 +43,58 @@ def create_topology_graph(masters, segments):
         graph.add_vertex(m['cn'][0])
 
     for s in segments:
-        direction = s['iparepltoposegmentdirection'][0]
-        left = s['iparepltoposegmentleftnode'][0]
-        right = s['iparepltoposegmentrightnode'][0]
-        try:
-            if direction == u'both':
-                graph.add_edge(left, right)
-                graph.add_edge(right, left)
-            elif direction == u'left-right':
-                graph.add_edge(left, right)
-            elif direction == u'right-left':
-                graph.add_edge(right, left)
-        except ValueError:  # ignore segments with deleted master
-            pass
+        for tail, head in get_segment_edges(s):
+            try:
+                graph.add_edge(tail, head)
+            except ValueError:  # ignore segments with deleted master
+                pass
 
     return graph
 
 
-def get_topology_connection_errors(graph):
+def get_segment_edges(segment):
     """
-    Traverse graph from each master and find out which masters are not
-    reachable.
+    Get graph edges of a topology segment.
+
+    :param segment: topology segment entry
+    :returns: list of (tail, head) tuples
+    """
+    direction = segment['iparepltoposegmentdirection'][0]
+    left = segment['iparepltoposegmentleftnode'][0]
+    right = segment['iparepltoposegmentrightnode'][0]
+    if direction == u'both':
+        return [(left, right), (right, left)]
+    elif direction == u'left-right':
+        return [(left, right)]
+    elif direction == u'right-left':
+        return [(right, left)]
+    return []
+
+
+def get_topology_connection_errors(graph, removed_masters=(),
+                                   removed_segments=()):
+    """
+    Find out which masters are not reachable from each master, optionally
+    as if some masters and segments were removed. The reachability of all
+    masters is computed in a single traversal of the graph.
 
     :param graph: topology graph where vertices are masters
+    :param removed_masters: names of masters to consider removed
+    :param removed_segments: segment entries to consider removed
     :returns: list of errors, error is: (master, visited, not_visited)
     """
+    removed_edges = [
+        edge for s in removed_segments for edge in get_segment_edges(s)
+    ]
+    reachable = graph.reachability(removed_masters, removed_edges)
+    vertices = frozenset(reachable)
+
     connect_errors = []
-    master_cns = list(graph.vertices)
-    master_cns.sort()
-    for m in master_cns:
-        visited = graph.bfs(m)
-        not_visited = graph.vertices - visited
-        if not_visited:
-            connect_errors.append((m, list(visited), list(not_visited)))
+    for m in sorted(vertices):
+        visited = reachable[m]
+        if len(visited) < len(vertices):
+            connect_errors.append(
+                (m, list(visited), list(vertices - visited)))
     return connect_errors
 
 
@@ -114,6 +142,63 @@ def _create_topology_graphs(api_instance):
     return topology_graphs
 
 
+def _get_topology_signature(api_instance):
+    """
+    Get a value which changes with every change of the masters, topology
+    suffixes and segments.
+
+    :param api_instance: instance of IPA API
+    """
+    ldap = api_instance.Backend.ldap2
+    signature = set()
+    for container, scope in ((api_instance.env.container_masters,
+                              ldap.SCOPE_ONELEVEL),
+                             (api_instance.env.container_topology,
+                              ldap.SCOPE_SUBTREE)):
+        try:
+            entries = ldap.get_entries(
+                DN(container, api_instance.env.basedn), scope,
+                attrs_list=list(TOPOLOGY_CHANGE_ATTRS), size_limit=0)
+        except errors.NotFound:
+            continue
+        for entry in entries:
+            signature.add((
+                entry.dn,
+                tuple(entry.get(attr, [None])[0]
+                      for attr in TOPOLOGY_CHANGE_ATTRS)
+            ))
+    return frozenset(signature)
+
+
+def get_topology_graphs(api_instance):
+    """
+    Get a topology graph for each topology suffix.
+
+    The graphs are cached until an entry of a master, a topology suffix or
+    a segment changes. The cached graphs are shared and must not be
+    modified.
+
+    :param api_instance: instance of IPA API
+    """
+    # different principals may be allowed to read different data
+    key = (api_instance.env.basedn, getattr(context, 'principal', None))
+    signature = _get_topology_signature(api_instance)
+
+    with _topology_graphs_lock:
+        cached = _topology_graphs_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    topology_graphs = _create_topology_graphs(api_instance)
+
+    with _topology_graphs_lock:
+        if len(_topology_graphs_cache) >= _topology_graphs_cache_size:
+            _topology_graphs_cache.clear()
+        _topology_graphs_cache[key] = (signature, topology_graphs)
+
+    return topology_graphs
+
+
 def _format_topology_errors(topo_errors):
     msg_lines = []
     for error in topo_errors:
@@ -136,32 +221,37 @@ class TopologyConnectivity:
     def __init__(self, api_instance):
         self.api = api_instance
 
-        self.graphs = _create_topology_graphs(self.api)
+        self.graphs = get_topology_graphs(self.api)
+        self._errors = None
 
     @property
     def errors(self):
+        if self._errors is None:
+            self._errors = self.errors_after_removal()
+
+        return self._errors
+
+    def errors_after_removal(self, master_cns=(), segments=None):
+        """
+        Get connection errors of each suffix as if the given masters and
+        segments were removed. The graphs are not modified.
+
+        :param master_cns: names of the removed masters
+        :param segments: dict {suffix_name: removed segment entries}
+        """
+        if segments is None:
+            segments = {}
+
         errors_by_suffix = {}
         for suffix in self.graphs:
             errors_by_suffix[suffix] = get_topology_connection_errors(
-                self.graphs[suffix]
+                self.graphs[suffix], master_cns, segments.get(suffix, ())
             )
 
         return errors_by_suffix
 
     def errors_after_master_removal(self, master_cn):
-        graphs_before = deepcopy(self.graphs)
-
-        for s in self.graphs:
-            try:
-                self.graphs[s].remove_vertex(master_cn)
-            except ValueError:
-                pass
-
-        errors_after_removal = self.errors
-
-        self.graphs = graphs_before
-
-        return errors_after_removal
+        return self.errors_after_removal([master_cn])
 
     def check_current_state(self):
         err_msg = ""
@@ -0,0 +1,92 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""Threads executing tasks of a command on behalf of the caller"""
+
+from __future__ import absolute_import
+
+import logging
+import threading
+
+from six.moves import queue
+
+from ipalib.request import context, destroy_context
+from ipapython.ipaldap import AUTOBIND_DISABLED
+
+logger = logging.getLogger(__name__)
+
+# per-request context attributes passed to the worker threads
+INHERITED_CONTEXT_ATTRS = ('ccache_name', 'client_ip', 'languages',
+                           'principal', 'request_url', 'timings')
+
+
+class WorkerPool:
+    """
+    Pool of threads executing tasks of a command, each thread has its own
+    LDAP connection bound with the credentials of the caller.
+
+    With max_pending, submit() blocks while the given number of tasks is
+    waiting for a free thread.
+    """
+
+    def __init__(self, api, size, ccache_name, name='worker', max_pending=0):
+        self.api = api
+        self.ccache_name = ccache_name
+        self.name = name
+        self.inherited = {
+            name: getattr(context, name) for name in INHERITED_CONTEXT_ATTRS
+            if hasattr(context, name)
+        }
+        self.tasks = queue.Queue(max_pending)
+        self.threads = [
+            threading.Thread(target=self._worker, name='%s-%d' % (name, i))
+            for i in range(size)
+        ]
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # ldap2 keeps the search limits on the shared plugin instance and
+        # resets them on disconnect, so the workers must not disconnect
+        # before all tasks are finished
+        self.wait()
+        for _thread in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def submit(self, func, *args):
+        self.tasks.put((func, args))
+
+    def wait(self):
+        """Wait until all submitted tasks are finished"""
+        self.tasks.join()
+
+    def _worker(self):
+        for name, value in self.inherited.items():
+            setattr(context, name, value)
+        try:
+            self.api.Backend.ldap2.connect(ccache=self.ccache_name,
+                                           autobind=AUTOBIND_DISABLED)
+        except Exception as e:
+            # the tasks executed in this thread fail and report it
+            logger.error('%s: failed to connect worker: %s', self.name, e)
+
+        try:
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    break
+                func, args = task
+                try:
+                    func(*args)
+                except Exception:
+                    logger.exception('%s: worker failed', self.name)
+                finally:
+                    self.tasks.task_done()
+        finally:
+            destroy_context()
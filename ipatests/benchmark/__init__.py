@@ -0,0 +1,18 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Microbenchmarks of the ipalib command pipeline and the LDAP backend
+
+The benchmarks do not need a running IPA server, LDAP operations are
+replaced by search results recorded in ``data/ldap_results.json``.
+
+Run all benchmarks and store the results::
+
+    $ python3 -m ipatests.benchmark -o before.json
+
+Compare the results with an earlier run::
+
+    $ python3 -m ipatests.benchmark -o after.json --compare before.json
+"""
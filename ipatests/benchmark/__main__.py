@@ -0,0 +1,9 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+import sys
+
+from ipatests.benchmark.runner import main
+
+sys.exit(main())
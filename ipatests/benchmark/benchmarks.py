@@ -0,0 +1,289 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Benchmarks of the ipalib command pipeline and the LDAP backend
+"""
+
+import base64
+import datetime
+import json
+import os
+
+import ipalib
+from ipalib import output
+from ipalib.frontend import Command
+from ipalib.parameters import Bool, DateTime, DNParam, Int, Str
+from ipalib.rpc import json_decode_binary, json_encode_binary
+from ipapython import ipaldap
+from ipapython.dn import DN, clear_dn_cache
+from ipapython.version import API_VERSION
+
+from ipatests.benchmark.runner import benchmark
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+BASE_DN = DN(('dc', 'example'), ('dc', 'test'))
+
+
+def load_ldap_results(filename='ldap_results.json'):
+    """
+    Load recorded LDAP search results.
+
+    Return (schema_entry, results) tuple, where schema_entry is the raw
+    SubSchema entry and results is a list of (dn, attrs) tuples as returned
+    by python-ldap.
+    """
+    with open(os.path.join(DATA_DIR, filename)) as f:
+        data = json.load(f)
+
+    binary = {name.lower() for name in data['binary_attributes']}
+    results = []
+    for dn, attrs in data['results']:
+        raw_attrs = {}
+        for name, values in attrs.items():
+            if name.lower() in binary:
+                raw_attrs[name] = [base64.b64decode(v) for v in values]
+            else:
+                raw_attrs[name] = [v.encode('utf-8') for v in values]
+        results.append((dn, raw_attrs))
+
+    schema_entry = {
+        name: [v.encode('utf-8') for v in values]
+        for name, values in data['schema'].items()
+    }
+    return schema_entry, results
+
+
+class RecordedLDAPClient(ipaldap.LDAPClient):
+    """LDAPClient which uses recorded schema and never connects"""
+
+    def __init__(self, schema_entry):
+        super(RecordedLDAPClient, self).__init__(None)
+        self.ldap_uri = 'ldap://benchmark.invalid'
+        self._conn = None
+        server_schema = ipaldap._ServerSchema(self.ldap_uri, schema_entry)
+        object.__setattr__(self, '_server_schema', server_schema)
+        object.__setattr__(self, '_has_schema', True)
+
+
+def get_client():
+    schema_entry, results = load_ldap_results()
+    return RecordedLDAPClient(schema_entry), results
+
+
+class bench_user_mod(Command):
+    """Command with typical options of a user-mod like command"""
+
+    takes_args = (
+        Str('uid', cli_name='login', label='User login'),
+    )
+
+    takes_options = (
+        Str('givenname?', cli_name='first', label='First name'),
+        Str('sn?', cli_name='last', label='Last name'),
+        Str('cn?', label='Full name'),
+        Str('mail*', cli_name='email', label='Email address'),
+        Int('uidnumber?', cli_name='uid', minvalue=1, label='UID'),
+        Bool('nsaccountlock?', label='Account disabled'),
+        DNParam('manager?', label='Manager'),
+        DateTime('krbpasswordexpiration?', label='Password expiration'),
+    )
+
+    has_output = (
+        output.Entry('result'),
+    )
+
+    def execute(self, *args, **options):
+        result = dict(options)
+        result['uid'] = args
+        return dict(result=result)
+
+
+@benchmark(number=2000)
+def bench_command_call():
+    """Command.__call__: normalize, convert and validate parameters"""
+    api = ipalib.create_api(mode='unit_test')
+    api.env.in_server = True
+    api.add_plugin(bench_user_mod)
+    api.finalize()
+    command = api.Command.bench_user_mod
+    kw = dict(
+        givenname=u'Alice',
+        sn=u'Tester',
+        cn=u'Alice Tester',
+        mail=[u'alice@example.test', u'atester@example.test'],
+        uidnumber=u'1000001',
+        nsaccountlock=u'FALSE',
+        manager=u'uid=bob,cn=users,cn=accounts,dc=example,dc=test',
+        krbpasswordexpiration=u'20260401000000Z',
+        all=True,
+        version=API_VERSION,
+    )
+
+    def func():
+        command(u'alice', **kw)
+
+    return func
+
+
+@benchmark(number=20000)
+def bench_param_convert():
+    """Param.convert of common parameter types"""
+    params = (
+        (Str('uid'), u'alice'),
+        (Str('mail*'), [u'alice@example.test', u'atester@example.test']),
+        (Int('uidnumber'), u'1000001'),
+        (Bool('nsaccountlock'), u'TRUE'),
+        (DNParam('manager'),
+         u'uid=bob,cn=users,cn=accounts,dc=example,dc=test'),
+        (DateTime('expiration'), u'20260401000000Z'),
+    )
+
+    def func():
+        for param, value in params:
+            param.convert(value)
+
+    return func
+
+
+def get_dn_values():
+    """Return distinct DN strings of the recorded results"""
+    _client, results = get_client()
+    values = []
+    for dn, attrs in results:
+        values.append(dn)
+        for name in ('member', 'memberOf'):
+            values.extend(v.decode('utf-8') for v in attrs.get(name, ()))
+    return list(dict.fromkeys(values))
+
+
+@benchmark(number=200)
+def bench_dn_parse():
+    """DN construction from distinct DN strings, parsed every time"""
+    values = get_dn_values()
+
+    def func():
+        # start with an empty cache of parsed DN strings
+        clear_dn_cache()
+        for value in values:
+            DN(value)
+
+    return func
+
+
+@benchmark(number=200)
+def bench_dn_parse_cached():
+    """DN construction from DN strings found in the parsed DN cache"""
+    values = get_dn_values()
+    for value in values:
+        DN(value)
+
+    def func():
+        for value in values:
+            DN(value)
+
+    return func
+
+
+@benchmark(number=200)
+def bench_dn_hash():
+    """DN hashing and comparison used by sets and dicts of DNs"""
+    _client, results = get_client()
+    dns = [DN(dn) for dn, _attrs in results]
+    other = [DN(dn) for dn, _attrs in results]
+
+    def func():
+        found = set(dns)
+        for dn in other:
+            assert dn in found
+        sorted(other)
+
+    return func
+
+
+@benchmark(number=200)
+def bench_convert_result():
+    """LDAPClient._convert_result of recorded search results"""
+    client, results = get_client()
+
+    def func():
+        entries = client._convert_result(results)
+        for entry in entries:
+            entry.get('memberOf')
+
+    return func
+
+
+@benchmark(number=200)
+def bench_entry_sync_attr():
+    """LDAPEntry update of nice values and their sync to raw values"""
+    client, results = get_client()
+    entries = [e for e in client._convert_result(results) if 'memberOf' in e]
+    groups = [
+        DN(('cn', 'bench{}'.format(i)), ('cn', 'groups'), ('cn', 'accounts'),
+           BASE_DN)
+        for i in range(3)
+    ]
+
+    def func():
+        for entry in entries:
+            entry['memberOf'].extend(groups)
+            entry['description'] = [u'benchmark']
+            entry.raw['memberOf']
+            del entry['memberOf'][-len(groups):]
+            del entry['description']
+            entry.raw['memberOf']
+
+    return func
+
+
+@benchmark(number=200)
+def bench_generate_modlist():
+    """LDAPEntry.generate_modlist of modified entries"""
+    client, results = get_client()
+    entries = [e for e in client._convert_result(results) if 'memberOf' in e]
+    for entry in entries:
+        entry['description'] = [u'benchmark']
+        entry['memberOf'] = entry['memberOf'][:1]
+        entry['modifyTimestamp'] = [datetime.datetime(2026, 1, 1)]
+
+    def func():
+        for entry in entries:
+            entry.generate_modlist()
+
+    return func
+
+
+def get_json_result():
+    client, results = get_client()
+    entries = client._convert_result(results)
+    return dict(
+        result=[dict(entry) for entry in entries],
+        count=len(entries),
+        truncated=False,
+        summary=u'{} entries returned'.format(len(entries)),
+    )
+
+
+@benchmark(number=50)
+def bench_json_encode_binary():
+    """json_encode_binary of a find-like command result"""
+    result = get_json_result()
+
+    def func():
+        json_encode_binary(result, API_VERSION)
+
+    return func
+
+
+@benchmark(number=50)
+def bench_json_decode_binary():
+    """json_decode_binary of a find-like command result"""
+    data = json_encode_binary(get_json_result(), API_VERSION)
+
+    def func():
+        json_decode_binary(data)
+
+    return func
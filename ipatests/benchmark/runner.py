@@ -0,0 +1,215 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Benchmark runner
+
+A benchmark is a function registered with the `benchmark` decorator. It
+prepares its data and returns a callable without arguments, only the
+callable is timed.
+
+Results are stored as JSON::
+
+    {
+        "format": 1,
+        "environment": {...},
+        "benchmarks": {
+            "<name>": {"number": ..., "repeat": ..., "min": ..., ...}
+        }
+    }
+
+Times are in microseconds per call of the benchmarked callable. The
+minimum of all repeats is the value compared between runs, it is the
+least affected by other load of the machine.
+"""
+
+import argparse
+import collections
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+
+from ipapython.version import VERSION
+
+FORMAT = 1
+
+Benchmark = collections.namedtuple('Benchmark', ['name', 'func', 'number'])
+
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(number):
+    """
+    Register a benchmark.
+
+    :param number: how many times the benchmarked callable is run in one
+        repeat
+    """
+    def decorator(func):
+        name = func.__name__
+        if name.startswith('bench_'):
+            name = name[len('bench_'):]
+        if name in BENCHMARKS:
+            raise ValueError("benchmark {!r} already registered".format(name))
+        BENCHMARKS[name] = Benchmark(name, func, number)
+        return func
+    return decorator
+
+
+def load_benchmarks():
+    """Import the module which registers the benchmarks"""
+    # pylint: disable=unused-import
+    from ipatests.benchmark import benchmarks  # noqa: F401
+    return BENCHMARKS
+
+
+def get_environment():
+    """Describe the environment the benchmarks run in"""
+    env = dict(
+        ipa_version=VERSION,
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        machine=platform.machine(),
+        git_revision=None,
+    )
+    try:
+        env['git_revision'] = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return env
+
+
+def run_benchmark(bench, repeat=5, scale=1.0):
+    """Run one benchmark, return its result as a dict"""
+    func = bench.func()
+    number = max(1, int(bench.number * scale))
+    # warm up caches and lazy imports
+    func()
+    timings = timeit.Timer(func).repeat(repeat=repeat, number=number)
+    timings = [t * 1e6 / number for t in timings]
+    return dict(
+        number=number,
+        repeat=repeat,
+        min=round(min(timings), 3),
+        median=round(statistics.median(timings), 3),
+        max=round(max(timings), 3),
+    )
+
+
+def run(patterns=(), repeat=5, scale=1.0, out=None):
+    """
+    Run all benchmarks matching any of the shell-style patterns (all if
+    no pattern is given).
+    """
+    results = collections.OrderedDict()
+    for name, bench in load_benchmarks().items():
+        if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+        results[name] = run_benchmark(bench, repeat=repeat, scale=scale)
+        if out is not None:
+            out.write("{:<32} {:>12.3f} us\n".format(
+                name, results[name]['min']))
+            out.flush()
+
+    return dict(
+        format=FORMAT,
+        environment=get_environment(),
+        benchmarks=results,
+    )
+
+
+def compare(old, new, threshold):
+    """
+    Compare two results, return list of (name, old, new, ratio, regressed)
+    tuples for benchmarks present in both.
+    """
+    for result in (old, new):
+        if result.get('format') != FORMAT:
+            raise ValueError(
+                "unsupported results format {!r}".format(result.get('format')))
+
+    rows = []
+    for name, new_result in new['benchmarks'].items():
+        old_result = old['benchmarks'].get(name)
+        if old_result is None:
+            continue
+        ratio = new_result['min'] / old_result['min']
+        rows.append(
+            (name, old_result['min'], new_result['min'], ratio,
+             ratio > threshold)
+        )
+    return rows
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog='python3 -m ipatests.benchmark',
+        description="Run microbenchmarks of ipalib and the LDAP backend")
+    parser.add_argument(
+        'patterns', nargs='*', metavar='PATTERN',
+        help="run only benchmarks matching the shell-style pattern")
+    parser.add_argument(
+        '-o', '--output', metavar='FILE',
+        help="write results as JSON to FILE")
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help="number of repeats of each benchmark (default: %(default)s)")
+    parser.add_argument(
+        '-s', '--scale', type=float, default=1.0,
+        help="multiply number of calls in each repeat (default: "
+             "%(default)s)")
+    parser.add_argument(
+        '-c', '--compare', metavar='FILE',
+        help="compare results with results stored in FILE")
+    parser.add_argument(
+        '-t', '--threshold', type=float, default=1.2,
+        help="report benchmarks slower by this ratio as regressions and "
+             "exit with status 1 (default: %(default)s)")
+    parser.add_argument(
+        '-l', '--list', action='store_true',
+        help="list benchmarks and exit")
+    options = parser.parse_args(args)
+
+    if options.list:
+        for name in load_benchmarks():
+            print(name)
+        return 0
+
+    old = None
+    if options.compare:
+        with open(options.compare) as f:
+            old = json.load(f)
+
+    results = run(options.patterns, repeat=options.repeat,
+                  scale=options.scale, out=sys.stdout)
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if old is None:
+        return 0
+
+    regressions = 0
+    print()
+    print("{:<32} {:>12} {:>12} {:>8}".format(
+        'benchmark', 'old (us)', 'new (us)', 'ratio'))
+    for name, old_min, new_min, ratio, regressed in compare(
+            old, results, options.threshold):
+        print("{:<32} {:>12.3f} {:>12.3f} {:>8.2f}{}".format(
+            name, old_min, new_min, ratio,
+            '  REGRESSION' if regressed else ''))
+        regressions += regressed
+
+    return 1 if regressions else 0
@@ -33,6 +33,7 @@ if __name__ == '__main__':
         package_dir={'ipatests': ''},
         packages=[
             "ipatests",
+            "ipatests.benchmark",
             "ipatests.pytest_ipa",
             "ipatests.pytest_ipa.integration",
             "ipatests.test_cmdline",
@@ -52,6 +53,7 @@ if __name__ == '__main__':
         scripts=['ipa-run-tests', 'ipa-test-config', 'ipa-test-task'],
         package_data={
             'ipatests': ['prci_definitions/*'],
+            'ipatests.benchmark': ['data/*'],
             'ipatests.test_install': ['*.update'],
             'ipatests.test_integration': ['scripts/*'],
             'ipatests.test_ipaclient': ['data/*/*/*'],
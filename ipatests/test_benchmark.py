@@ -0,0 +1,52 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the `ipatests.benchmark` microbenchmark suite.
+"""
+
+import json
+
+import pytest
+
+from ipatests.benchmark import runner
+
+pytestmark = pytest.mark.tier0
+
+
+def test_run(tmpdir):
+    output = str(tmpdir.join('results.json'))
+    assert runner.main(['-r', '1', '-s', '0.001', '-o', output]) == 0
+    with open(output) as f:
+        results = json.load(f)
+    assert results['format'] == runner.FORMAT
+    assert set(results['benchmarks']) == set(runner.load_benchmarks())
+    for result in results['benchmarks'].values():
+        assert result['number'] >= 1
+        assert 0 < result['min'] <= result['median'] <= result['max']
+
+    # compare with itself, the minimum is never a regression
+    assert runner.main(
+        ['-r', '1', '-s', '0.001', '-c', output, '-t', '1000', 'dn_*']) == 0
+
+
+def test_compare():
+    def results(**timings):
+        return dict(
+            format=runner.FORMAT,
+            benchmarks={
+                name: dict(min=value) for name, value in timings.items()
+            },
+        )
+
+    rows = runner.compare(
+        results(a=10.0, b=10.0, c=1.0),
+        results(a=11.0, b=13.0, d=1.0),
+        threshold=1.2,
+    )
+    assert [(name, regressed) for name, _o, _n, _r, regressed in rows] == [
+        ('a', False), ('b', True)]
+
+    with pytest.raises(ValueError):
+        runner.compare(dict(format=0), results(), threshold=1.2)
@@ -0,0 +1,143 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the on-disk cache of the API schema used by the client
+"""
+
+import os
+
+import pytest
+
+from ipaclient.remote_plugins import schema as remote_schema
+
+pytestmark = pytest.mark.tier0
+
+FINGERPRINT = u'abcdef0123456789'
+
+SCHEMA = {
+    u'fingerprint': FINGERPRINT,
+    u'ttl': 3600,
+    u'version': u'2.241',
+    u'commands': [
+        {
+            u'name': u'user_show',
+            u'version': u'1',
+            u'full_name': u'user_show/1',
+            u'doc': u'Display information about a user.\n\nMore text.',
+            u'topic_topic': u'user/1',
+            u'params': [],
+            u'output': [],
+        },
+        {
+            u'name': u'ping',
+            u'version': u'1',
+            u'full_name': u'ping/1',
+            u'doc': u'Ping a remote server.',
+            u'topic_topic': u'ping/1',
+            u'exclude': [u'webui'],
+            u'params': [],
+            u'output': [],
+        },
+    ],
+    u'classes': [],
+    u'topics': [
+        {
+            u'name': u'user',
+            u'version': u'1',
+            u'full_name': u'user/1',
+            u'doc': u'Users',
+        },
+        {
+            u'name': u'ping',
+            u'version': u'1',
+            u'full_name': u'ping/1',
+            u'doc': u'Ping the remote IPA server',
+        },
+    ],
+}
+
+
+class FakeClient:
+    def __init__(self):
+        self.fetched = 0
+
+    def isconnected(self):
+        return True
+
+    def forward(self, name, **kwargs):
+        assert name == u'schema'
+        self.fetched += 1
+        result = dict(SCHEMA)
+        result[u'commands'] = [dict(c) for c in SCHEMA[u'commands']]
+        return dict(result=result)
+
+
+@pytest.fixture
+def schema_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(remote_schema.Schema, '_DIR', str(tmpdir))
+    return str(tmpdir)
+
+
+def test_cache(schema_dir):
+    client = FakeClient()
+    schema = remote_schema.Schema(client)
+    assert client.fetched == 1
+    assert schema.fingerprint == FINGERPRINT
+    assert os.listdir(schema_dir) == [FINGERPRINT]
+
+    cached = remote_schema.Schema(client, FINGERPRINT)
+    assert client.fetched == 1
+    assert cached.ttl is None
+
+    # members are decoded only when accessed
+    assert isinstance(cached._dict['commands'][u'ping/1'], list)
+    assert cached['commands'][u'user_show/1'] == (
+        schema['commands'][u'user_show/1'])
+    assert isinstance(cached._dict['commands'][u'ping/1'], list)
+
+    assert sorted(cached['commands']) == [u'ping/1', u'user_show/1']
+    assert sorted(cached['topics']) == [u'ping/1', u'user/1']
+    assert cached['commands'].get_help(u'user_show/1') == {
+        u'name': u'user_show',
+        u'summary': u'Display information about a user.',
+        u'topic_topic': u'user/1',
+    }
+    assert cached['commands'].get_help(u'ping/1')[u'exclude'] == [u'webui']
+    assert cached['topics'][u'user/1'][u'doc'] == u'Users'
+
+
+def test_invalid_cache(schema_dir):
+    client = FakeClient()
+    remote_schema.Schema(client)
+
+    filename = os.path.join(schema_dir, FINGERPRINT)
+    with open(filename, 'rb') as f:
+        data = f.read()
+    with open(filename, 'wb') as f:
+        f.write(data[:-10])
+
+    # truncated file is ignored and the schema is fetched again
+    schema = remote_schema.Schema(client, FINGERPRINT)
+    assert client.fetched == 2
+    assert schema['commands'][u'ping/1'][u'doc'] == u'Ping a remote server.'
+
+
+def test_topic_module_doc():
+    client = FakeClient()
+    schema = remote_schema.Schema.__new__(remote_schema.Schema)
+    schema._dict = {}
+    schema._namespaces = {}
+    schema._help = {}
+    for ns in schema.namespaces:
+        schema._dict[ns] = {}
+        schema._namespaces[ns] = remote_schema._SchemaNameSpace(schema, ns)
+    schema._fetch(client)
+
+    module = remote_schema._SchemaTopicModule('test_topic_module')
+    assert module.__doc__ is None
+    module.set_doc_source(schema['topics'], u'user/1')
+    assert module.__doc__ == u'Users'
+    module.__doc__ = u'Overridden'
+    assert module.__doc__ == u'Overridden'
@@ -30,7 +30,7 @@ from ipatests.util import assert_equal
 from ipalib.constants import TYPE_ERROR
 from ipalib.base import NameSpace
 from ipalib import frontend, backend, plugable, errors, parameters, config
-from ipalib import output, messages
+from ipalib import output, messages, request
 from ipalib.parameters import Str
 from ipapython.version import API_VERSION
 
@@ -685,6 +685,44 @@ class test_Command(ClassChecker):
             assert o.run.__func__ is self.cls.run
         assert {'name': 'forward', 'messages': expected} == o.run(*args, **kw)
 
+    def test_timings(self):
+        """
+        Test recording of the phases of a command call in request timings.
+        """
+        class timed_cmd(self.cls):
+            takes_args = ('name',)
+
+            def execute(self, name, **options):
+                self.api.Command.nested_cmd(version=API_VERSION)
+                return dict(result=name)
+
+        class nested_cmd(self.cls):
+            def execute(self, **options):
+                return dict(result=None)
+
+        api, _home = create_test_api(in_server=True)
+        api.add_plugin(timed_cmd)
+        api.add_plugin(nested_cmd)
+        api.finalize()
+        try:
+            timings = request.start_timings()
+            api.Command.timed_cmd(u'test', version=API_VERSION)
+        finally:
+            request.destroy_context()
+
+        # phases of the nested command are part of the run phase
+        assert timings.command == 'timed_cmd'
+        assert list(timings.phases) == [
+            'args_options_2_params', 'get_default', 'normalize', 'convert',
+            'validate', 'run', 'validate_output']
+
+        timings.add_ldap('search', 0.002, 100)
+        timings.add_ldap('search', 0.001, 50)
+        timings.finish()
+        value = str(timings)
+        assert value.startswith('total;dur=')
+        assert value.endswith(', ldap_search;dur=3.0;count=2;bytes=150')
+
     def test_validate_output_basic(self):
         """
         Test the `ipalib.frontend.Command.validate_output` method.
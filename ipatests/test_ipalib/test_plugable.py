@@ -24,7 +24,10 @@ Test the `ipalib.plugable` module.
 # FIXME: Pylint errors
 # pylint: disable=no-member
 
+import importlib
+import json
 import os
+import sys
 import textwrap
 
 from ipalib import plugable, errors, create_api
@@ -301,3 +304,121 @@ class test_API(ClassChecker):
                 os.environ['IPA_CONFDIR'] = ipa_confdir
             else:
                 os.environ.pop('IPA_CONFDIR')
+
+
+MANIFEST_PLUGINS = {
+    'first': """
+        from ipalib import Registry, Command, Method, Object
+
+        register = Registry()
+
+
+        @register()
+        class thing(Object):
+            pass
+
+
+        @register()
+        class thing_show(Method):
+            pass
+
+
+        @register()
+        class thing_count(Command):
+            pass
+        """,
+    'second': """
+        from ipalib import Registry, Method, Object
+
+        register = Registry()
+
+
+        @register()
+        class other(Object):
+            pass
+
+
+        @register()
+        class other_show(Method):
+            pass
+        """,
+}
+
+
+@pytest.fixture
+def manifest_package(tmpdir, monkeypatch):
+    parent = tmpdir.mkdir('manifest_test')
+    parent.join('__init__.py').write('')
+    plugins = parent.mkdir('plugins')
+    plugins.join('__init__.py').write("manifest_env = ('context',)\n")
+    for name, source in MANIFEST_PLUGINS.items():
+        plugins.join(name + '.py').write(textwrap.dedent(source))
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    yield importlib.import_module('manifest_test.plugins')
+    for name in list(sys.modules):
+        if name.startswith('manifest_test'):
+            del sys.modules[name]
+
+
+def create_manifest_api(package, **kw):
+    api = create_api(mode='unit_test')
+    api.bootstrap(**kw)
+    api.add_package(package)
+    api.finalize()
+    return api
+
+
+def test_manifest(manifest_package):
+    """
+    Test the `ipalib.plugable.API.make_manifest` method and adding plugins
+    from a plugin manifest.
+    """
+    api = create_manifest_api(
+        manifest_package, context='manifest', plugins_on_demand=False)
+    manifest = api.make_manifest(manifest_package)
+    assert manifest['env'] == {'context': 'manifest'}
+    assert sorted(manifest['sources']) == ['first', 'second']
+    assert manifest['modules']['first'] == [
+        {'full_name': 'thing/1', 'bases': ['Object']},
+        {'full_name': 'thing_show/1', 'bases': ['Command', 'Method'],
+         'obj_name': 'thing'},
+        {'full_name': 'thing_count/1', 'bases': ['Command']},
+    ]
+    with open(os.path.join(os.path.dirname(manifest_package.__file__),
+                           plugable.MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+
+    for name in MANIFEST_PLUGINS:
+        del sys.modules['manifest_test.plugins.' + name]
+
+    api = create_manifest_api(
+        manifest_package, context='manifest', plugins_on_demand=True)
+    assert [plugin.full_name for plugin in api.Command] == [
+        'other_show/1', 'thing_count/1', 'thing_show/1']
+    assert 'manifest_test.plugins.first' not in sys.modules
+
+    # only the module of the object and its methods is imported
+    assert list(api.Object.thing.methods) == ['show']
+    assert 'manifest_test.plugins.first' in sys.modules
+    assert 'manifest_test.plugins.second' not in sys.modules
+    assert type(api.Command.thing_count).__module__ == (
+        'manifest_test.plugins.first')
+
+    # plugins are imported with the package if settings differ
+    del sys.modules['manifest_test.plugins.first']
+    create_manifest_api(
+        manifest_package, context='other', plugins_on_demand=True)
+    assert 'manifest_test.plugins.first' in sys.modules
+    assert 'manifest_test.plugins.second' in sys.modules
+
+    # or if a module changed since the manifest was made
+    for name in MANIFEST_PLUGINS:
+        del sys.modules['manifest_test.plugins.' + name]
+    with open(os.path.join(os.path.dirname(manifest_package.__file__),
+                           'second.py'), 'a') as f:
+        f.write('# changed\n')
+    create_manifest_api(
+        manifest_package, context='manifest', plugins_on_demand=True)
+    assert 'manifest_test.plugins.first' in sys.modules
+    assert 'manifest_test.plugins.second' in sys.modules
@@ -34,6 +34,7 @@ from ipatests.data import binary_bytes, utf8_bytes, unicode_str
 from ipalib.frontend import Command
 from ipalib.request import context, Connection
 from ipalib import rpc, errors, api, request as ipa_request
+from ipapython.dn import DN
 from ipapython.version import API_VERSION
 
 if six.PY3:
@@ -196,6 +197,43 @@ def test_xml_loads():
         assert type(e.faultString) is unicode
 
 
+def test_json_iterencode_binary():
+    """
+    Test the `ipalib.rpc.json_iterencode_binary` function.
+    """
+    f = rpc.json_iterencode_binary
+    entries = [
+        dict(uid=(unicode_str,), data=[binary_bytes], num=i, dn=None)
+        for i in range(100)
+    ]
+    response = dict(
+        result=dict(result=entries, count=100, truncated=False, empty=[]),
+        error=None,
+        id=0,
+    )
+    expected = rpc.json_encode_binary(response, API_VERSION)
+
+    chunks = list(f(response, API_VERSION, chunk_size=1024))
+    assert len(chunks) > 1
+    assert_equal(u''.join(chunks), expected)
+    assert_equal(u''.join(f(response, API_VERSION, depth=0)), expected)
+
+    # non-string keys are encoded at once
+    value = {1: [binary_bytes], u'two': {}}
+    assert_equal(u''.join(f(value, API_VERSION)),
+                 rpc.json_encode_binary(value, API_VERSION))
+
+    assert_equal(
+        u''.join(f(response, API_VERSION, pretty_print=True)),
+        rpc.json_encode_binary(response, API_VERSION, pretty_print=True))
+
+    # objects which cannot be serialized are rejected before the first
+    # chunk is produced
+    entries.append(dict(uid=[object()]))
+    raises(TypeError, f, response, API_VERSION)
+    raises(TypeError, f, {DN('cn=key'): u'value'}, API_VERSION)
+
+
 class test_xmlclient(PluginTester):
     """
     Test the `ipalib.rpc.xmlclient` plugin.
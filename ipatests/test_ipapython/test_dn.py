@@ -1232,6 +1232,30 @@ class TestDN:
         assert dn3_a not in s
         assert dn3_b not in s
 
+        # DNs parsed from strings hash the same as constructed ones
+        assert hash(DN(self.str_dn3.upper())) == hash(self.dn3)
+        assert DN(self.str_dn3.upper()) in s | {self.dn3}
+
+    def test_from_many(self):
+        values = [self.str_dn3, self.str_dn3.upper().encode('utf-8'),
+                  self.str_dn1, self.str_dn3]
+        dns = DN.from_many(values)
+        assert dns == [self.dn3, self.dn3, self.dn1, self.dn3]
+        for dn in dns:
+            self.assertExpectedClass(DN, dn, 'self')
+        assert str(dns[1]) == self.str_dn3.upper()
+
+        # DN objects created from the same string must not share state
+        assert dns[0] is not dns[3]
+        assert dns[0].rdns is not dns[3].rdns
+        assert dns[0][1:] == self.dn2
+
+        assert DN.from_many([]) == []
+        with pytest.raises(ValueError):
+            DN.from_many([self.str_dn1, 'bogus'])
+        with pytest.raises(TypeError):
+            DN.from_many([self.rdn1])
+
     def test_x500_text(self):
         # null DN x500 ordering and LDAP ordering are the same
         nulldn = DN()
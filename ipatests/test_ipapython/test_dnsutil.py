@@ -1,9 +1,20 @@
 #
 # Copyright (C) 2018  FreeIPA Contributors.  See COPYING for license
 #
+import socket
+import struct
+import threading
+import time
+
+import dns.exception
+import dns.flags
+import dns.message
 import dns.name
+import dns.rcode
 import dns.rdataclass
 import dns.rdatatype
+import dns.resolver
+import dns.rrset
 from dns.rdtypes.IN.SRV import SRV
 from dns.rdtypes.ANY.URI import URI
 
@@ -104,3 +115,247 @@ class TestSortURI:
         assert dnsutil.sort_prio_weight([h3, h2, h1]) == [h1, h2, h3]
         assert dnsutil.sort_prio_weight([h3, h3, h3]) == [h3]
         assert dnsutil.sort_prio_weight([h2, h2, h1, h1]) == [h1, h2]
+
+
+class DNSResponder:
+    """
+    Nameserver on a loopback address answering over UDP and TCP
+
+    ``answers`` map query names to functions called with the query and
+    the transport ('udp' or 'tcp'), which return the response or None to
+    not answer. With ``batch`` set, UDP queries are answered in reverse
+    order once that many of them were received.
+    """
+    def __init__(self, address='127.0.0.1'):
+        self.address = address
+        self.answers = {}
+        self.queries = []
+        self.batch = None
+        self._stop = threading.Event()
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.bind((address, 0))
+        self.udp.settimeout(0.05)
+        self.port = self.udp.getsockname()[1]
+        self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.bind((address, self.port))
+        self.tcp.listen(5)
+        self.tcp.settimeout(0.05)
+        self._threads = [
+            threading.Thread(target=self._serve_udp),
+            threading.Thread(target=self._serve_tcp),
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def close(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self.udp.close()
+        self.tcp.close()
+
+    def queried(self, qname, transport='udp'):
+        return self.queries.count((transport, dns.name.from_text(qname)))
+
+    def _respond(self, wire, transport):
+        query = dns.message.from_wire(wire)
+        qname = query.question[0].name
+        self.queries.append((transport, qname))
+        answer = self.answers.get(qname.to_text())
+        if answer is None:
+            return None
+        response = answer(query, transport)
+        return None if response is None else response.to_wire()
+
+    def _serve_udp(self):
+        received = []
+        while not self._stop.is_set():
+            try:
+                received.append(self.udp.recvfrom(65535))
+            except socket.timeout:
+                continue
+            if self.batch is not None and len(received) < self.batch:
+                continue
+            for wire, client in reversed(received):
+                response = self._respond(wire, 'udp')
+                if response is not None:
+                    self.udp.sendto(response, client)
+            received = []
+
+    def _serve_tcp(self):
+        while not self._stop.is_set():
+            try:
+                conn, _client = self.tcp.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                conn.settimeout(1)
+                length = struct.unpack('!H', conn.recv(2))[0]
+                wire = b''
+                while len(wire) < length:
+                    wire += conn.recv(length - len(wire))
+                response = self._respond(wire, 'tcp')
+                if response is not None:
+                    conn.sendall(struct.pack('!H', len(response)) + response)
+
+
+def answer_a(*addresses):
+    def answer(query, transport):
+        response = dns.message.make_response(query)
+        qname = query.question[0].name
+        response.answer.append(dns.rrset.from_text_list(
+            qname, 300, 'IN', 'A', list(addresses)))
+        return response
+    return answer
+
+
+def answer_rcode(rcode):
+    def answer(query, transport):
+        response = dns.message.make_response(query)
+        response.set_rcode(rcode)
+        return response
+    return answer
+
+
+def answer_truncated(query, transport):
+    if transport == 'tcp':
+        return answer_a('192.0.2.1', '192.0.2.2')(query, transport)
+    response = dns.message.make_response(query)
+    response.flags |= dns.flags.TC
+    return response
+
+
+def no_answer(query, transport):
+    return None
+
+
+@pytest.fixture
+def responder():
+    responder = DNSResponder()
+    try:
+        yield responder
+    finally:
+        responder.close()
+
+
+@pytest.fixture
+def responder2():
+    responder = DNSResponder('127.0.0.2')
+    try:
+        yield responder
+    finally:
+        responder.close()
+
+
+def make_resolver(*responders, **kwargs):
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.nameservers = [r.address for r in responders]
+    resolver.nameserver_ports = {r.address: r.port for r in responders}
+    resolver.timeout = kwargs.get('timeout', 2.0)
+    return resolver
+
+
+def make_query(qname):
+    return dns.message.make_query(qname, 'A')
+
+
+def rdata(response):
+    return sorted(rr.to_text() for rr in response.answer[0])
+
+
+@pytest.mark.tier0
+class TestQueryConcurrently:
+    def test_answers(self, responder):
+        names = ['host%d.example.test.' % i for i in range(5)]
+        for i, name in enumerate(names):
+            responder.answers[name] = answer_a('192.0.2.%d' % i)
+        responder.answers['gone.example.test.'] = answer_rcode(
+            dns.rcode.NXDOMAIN)
+        # all queries have to be sent before the first answer arrives
+        responder.batch = len(names) + 1
+
+        responses = dnsutil.query_concurrently(
+            [make_query(name) for name in names + ['gone.example.test.']],
+            make_resolver(responder))
+
+        for i, response in enumerate(responses[:-1]):
+            assert rdata(response) == ['192.0.2.%d' % i]
+        assert responses[-1].rcode() == dns.rcode.NXDOMAIN
+
+    def test_truncated(self, responder):
+        responder.answers['big.example.test.'] = answer_truncated
+        responder.answers['small.example.test.'] = answer_a('192.0.2.3')
+        responses = dnsutil.query_concurrently(
+            [make_query('big.example.test.'),
+             make_query('small.example.test.')],
+            make_resolver(responder))
+        assert rdata(responses[0]) == ['192.0.2.1', '192.0.2.2']
+        assert rdata(responses[1]) == ['192.0.2.3']
+        assert responder.queried('big.example.test.', 'tcp') == 1
+        assert responder.queried('small.example.test.', 'tcp') == 0
+
+    def test_timeout(self, responder):
+        responder.answers['silent.example.test.'] = no_answer
+        responder.answers['host.example.test.'] = answer_a('192.0.2.1')
+        start = time.time()
+        responses = dnsutil.query_concurrently(
+            [make_query('silent.example.test.'),
+             make_query('host.example.test.')],
+            make_resolver(responder, timeout=0.3))
+        assert time.time() - start < 2
+        assert isinstance(responses[0], dns.exception.Timeout)
+        assert rdata(responses[1]) == ['192.0.2.1']
+
+    def test_next_nameserver(self, responder, responder2):
+        responder.answers['silent.example.test.'] = no_answer
+        responder.answers['fail.example.test.'] = answer_rcode(
+            dns.rcode.SERVFAIL)
+        responder.answers['host.example.test.'] = answer_a('192.0.2.1')
+        responder.answers['gone.example.test.'] = answer_rcode(
+            dns.rcode.NXDOMAIN)
+        for name in ('silent', 'fail', 'host', 'gone'):
+            responder2.answers['%s.example.test.' % name] = answer_a(
+                '192.0.2.2')
+
+        names = ['silent.example.test.', 'fail.example.test.',
+                 'host.example.test.', 'gone.example.test.']
+        responses = dnsutil.query_concurrently(
+            [make_query(name) for name in names],
+            make_resolver(responder, responder2, timeout=0.3))
+
+        assert rdata(responses[0]) == ['192.0.2.2']
+        assert rdata(responses[1]) == ['192.0.2.2']
+        assert rdata(responses[2]) == ['192.0.2.1']
+        assert responses[3].rcode() == dns.rcode.NXDOMAIN
+        assert [responder2.queried(name) for name in names] == [1, 1, 0, 0]
+
+    def test_all_nameservers_fail(self, responder, responder2):
+        responder.answers['fail.example.test.'] = answer_rcode(
+            dns.rcode.SERVFAIL)
+        responder2.answers['fail.example.test.'] = answer_rcode(
+            dns.rcode.REFUSED)
+        responses = dnsutil.query_concurrently(
+            [make_query('fail.example.test.')],
+            make_resolver(responder, responder2))
+        assert responses[0].rcode() == dns.rcode.REFUSED
+
+    def test_closed_port(self, responder):
+        # nothing listens on the port of the closed responder
+        closed = DNSResponder('127.0.0.3')
+        closed.close()
+        responder.answers['host.example.test.'] = answer_a('192.0.2.1')
+        responses = dnsutil.query_concurrently(
+            [make_query('host.example.test.')],
+            make_resolver(closed, responder, timeout=0.3))
+        assert rdata(responses[0]) == ['192.0.2.1']
+
+        responses = dnsutil.query_concurrently(
+            [make_query('host.example.test.')],
+            make_resolver(closed, timeout=0.3))
+        assert isinstance(responses[0], dns.exception.DNSException)
+
+    def test_no_nameservers(self):
+        responses = dnsutil.query_concurrently(
+            [make_query('host.example.test.')], make_resolver())
+        assert isinstance(responses[0], dns.resolver.NoNameservers)
@@ -0,0 +1,151 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the keep-alive connections of the `ipapython.dogtag` module
+"""
+
+from __future__ import absolute_import
+
+import http.client
+import http.server
+import random
+import threading
+import time
+
+import pytest
+
+from ipalib import errors
+from ipapython import dogtag
+
+pytestmark = pytest.mark.tier0
+
+
+class IdleCloseHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answer one request per connection and close the connection without
+    announcing it, as a server closing an idle keep-alive connection.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        body = ('%d' % self.server.connections).encode('ascii')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(http.server.ThreadingHTTPServer):
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super(Server, self).process_request(request, client_address)
+
+
+@pytest.fixture
+def server():
+    server = Server(('127.0.0.1', 0), IdleCloseHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def request(server, connection=None):
+    host, port = server.server_address
+    return dogtag._httplib_request(
+        'http', host, port, '/ca', http.client.HTTPConnection, 'a=1',
+        connection=connection)
+
+
+class TestHTTPLibRequest:
+    def test_reconnect(self, server):
+        host, port = server.server_address
+        conn = http.client.HTTPConnection(host, port)
+        try:
+            for i in range(1, 4):
+                status, _headers, body = request(server, conn)
+                assert status == 200
+                assert body == str(i).encode('ascii')
+        finally:
+            conn.close()
+        assert server.connections == 3
+
+    def test_no_connection(self, server):
+        status, _headers, body = request(server)
+        assert status == 200
+        assert body == b'1'
+
+    def test_connection_failed(self, server):
+        host, port = server.server_address
+        server.shutdown()
+        server.server_close()
+        conn = http.client.HTTPConnection(host, port)
+        with pytest.raises(errors.NetworkError):
+            request(server, conn)
+        assert conn.sock is None
+
+
+class FakeConnection:
+    def __init__(self, connections):
+        self.thread = None
+        self.closed = False
+        connections.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+class TestMapWithConnections:
+    def test_order(self):
+        connections = []
+
+        def func(item, conn):
+            # a connection is never used by two threads
+            if conn.thread is None:
+                conn.thread = threading.current_thread()
+            assert conn.thread is threading.current_thread()
+            assert not conn.closed
+            time.sleep(random.random() / 100)
+            return item * 2
+
+        items = list(range(50))
+        result = dogtag.map_with_connections(
+            func, iter(items), lambda: FakeConnection(connections),
+            max_connections=4)
+        assert result == [item * 2 for item in items]
+        assert 1 <= len(connections) <= 4
+        assert all(conn.closed for conn in connections)
+
+    def test_error(self):
+        connections = []
+
+        def func(item, conn):
+            if item in (3, 7):
+                raise errors.NotFound(reason=u'%d not found' % item)
+            return item
+
+        with pytest.raises(errors.NotFound, match='^3 not found$'):
+            dogtag.map_with_connections(
+                func, range(10), lambda: FakeConnection(connections))
+        assert all(conn.closed for conn in connections)
+
+    def test_empty(self):
+        def connection_factory():
+            raise AssertionError('no connection expected')
+
+        assert dogtag.map_with_connections(
+            lambda item, conn: item, [], connection_factory) == []
@@ -0,0 +1,67 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+import random
+
+from ipapython.graph import Graph
+
+import pytest
+
+
+def mkgraph(vertices, edges):
+    graph = Graph()
+    for v in vertices:
+        graph.add_vertex(v)
+    for tail, head in edges:
+        graph.add_edge(tail, head)
+    return graph
+
+
+class TestReachability:
+    def test_strongly_connected_components(self):
+        graph = mkgraph(
+            'abcdef',
+            [('a', 'b'), ('b', 'a'), ('b', 'c'), ('c', 'd'), ('d', 'e'),
+             ('e', 'c'), ('f', 'f')]
+        )
+        components = graph.strongly_connected_components()
+        assert sorted(sorted(c) for c in components) == [
+            ['a', 'b'], ['c', 'd', 'e'], ['f']
+        ]
+        # reverse topological order
+        assert (components.index({'c', 'd', 'e'}) <
+                components.index({'a', 'b'}))
+
+    def test_removed(self):
+        graph = mkgraph(
+            'abc',
+            [('a', 'b'), ('b', 'a'), ('b', 'c'), ('c', 'b'), ('a', 'c'),
+             ('a', 'c')]
+        )
+        reachable = graph.reachability(removed_vertices=['b'])
+        assert reachable == {'a': {'a', 'c'}, 'c': {'c'}}
+
+        # duplicate edge is still there
+        reachable = graph.reachability(
+            removed_vertices=['b'], removed_edges=[('a', 'c')])
+        assert reachable == {'a': {'a', 'c'}, 'c': {'c'}}
+
+        reachable = graph.reachability(
+            removed_vertices=['b'], removed_edges=[('a', 'c'), ('a', 'c')])
+        assert reachable == {'a': {'a'}, 'c': {'c'}}
+
+        # the graph is not modified
+        assert graph.bfs('c') == {'a', 'b', 'c'}
+
+    @pytest.mark.parametrize('seed', range(10))
+    def test_matches_bfs(self, seed):
+        rand = random.Random(seed)
+        vertices = ['master%d' % i for i in range(30)]
+        edges = [
+            (rand.choice(vertices), rand.choice(vertices))
+            for _i in range(rand.randint(0, 60))
+        ]
+        graph = mkgraph(vertices, edges)
+
+        reachable = graph.reachability()
+        assert reachable == {v: graph.bfs(v) for v in vertices}
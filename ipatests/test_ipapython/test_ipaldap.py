@@ -0,0 +1,149 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""
+Test the pipelined operations of the LDAP client
+"""
+
+import pytest
+
+from ipalib import errors
+from ipapython import ipaldap
+from ipapython.dn import DN
+
+pytestmark = pytest.mark.tier0
+
+BASE_DN = DN(('cn', 'users'), ('cn', 'accounts'), ('dc', 'example'),
+             ('dc', 'test'))
+
+
+def user_dn(uid):
+    return DN(('uid', uid), BASE_DN)
+
+
+class FakeConn:
+    """
+    python-ldap connection answering asynchronous operations
+
+    ``send_errors`` map DNs to the exception raised when an operation is
+    sent, ``result_errors`` to the exception raised by its result.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.send_errors = {}
+        self.result_errors = {}
+        self.calls = []
+        self.pending = {}
+        self.added = {}
+
+    def _send(self, operation, dn):
+        self.calls.append((operation, dn))
+        if dn in self.send_errors:
+            raise self.send_errors[dn]
+        msgid = len(self.calls)
+        self.pending[msgid] = (operation, dn)
+        return msgid
+
+    def add_ext(self, dn, modlist):
+        msgid = self._send('add', dn)
+        self.added[dn] = dict(modlist)
+        return msgid
+
+    def search_ext(self, base, scope, filterstr, attrlist, timeout):
+        return self._send('search', base)
+
+    def result3(self, msgid):
+        operation, dn = self.pending.pop(msgid)
+        self.calls.append(('result', dn))
+        if dn in self.result_errors:
+            raise self.result_errors[dn]
+        if operation == 'add':
+            return 105, [], msgid, []
+        return 101, [(dn, self.entries[dn])], msgid, []
+
+
+@pytest.fixture
+def conn():
+    return FakeConn()
+
+
+@pytest.fixture
+def client(conn, monkeypatch):
+    monkeypatch.setattr(
+        ipaldap, 'ldap_initialize', lambda uri, cacertfile=None: conn)
+    return ipaldap.LDAPClient('ldap://ldap.example.test', no_schema=True)
+
+
+def ldap_error(error_class):
+    return error_class({'desc': error_class.__name__, 'info': ''})
+
+
+def test_add_entries(client, conn):
+    uids = [u'alice', u'bob', u'carol', u'dave']
+    conn.send_errors[str(user_dn(u'bob'))] = ldap_error(
+        ipaldap.ldap.INSUFFICIENT_ACCESS)
+    conn.result_errors[str(user_dn(u'carol'))] = ldap_error(
+        ipaldap.ldap.ALREADY_EXISTS)
+    conn.result_errors[str(user_dn(u'dave'))] = ldap_error(
+        ipaldap.ldap.NO_SUCH_OBJECT)
+    entries = [
+        client.make_entry(user_dn(uid), objectclass=[u'top', u'person'],
+                          uid=[uid], description=[])
+        for uid in uids
+    ]
+
+    results = client.add_entries(entries)
+
+    assert results[0] is None
+    assert isinstance(results[1], errors.ACIError)
+    assert isinstance(results[2], errors.DuplicateEntry)
+    assert isinstance(results[3], errors.NotFound)
+
+    # all operations are sent before the first result is read
+    operations = [operation for operation, _dn in conn.calls]
+    assert operations == ['add'] * 4 + ['result'] * 3
+    assert [dn for _operation, dn in conn.calls[4:]] == [
+        str(user_dn(u'alice')), str(user_dn(u'carol')),
+        str(user_dn(u'dave')),
+    ]
+    assert not conn.pending
+
+    # empty values are not sent, the created entry has no changes left
+    assert conn.added[str(user_dn(u'alice'))] == {
+        'objectclass': [b'top', b'person'], 'uid': [b'alice'],
+    }
+    assert not entries[0].generate_modlist()
+    assert entries[2].generate_modlist()
+
+
+def test_add_entries_empty(client, conn):
+    assert client.add_entries([]) == []
+    assert not conn.calls
+
+
+def test_get_entries_by_dn(client, conn):
+    dns = [user_dn(uid) for uid in (u'alice', u'bob', u'carol', u'dave')]
+    conn.entries[str(dns[0])] = {'uid': [b'alice'], 'cn': [b'Alice']}
+    conn.entries[str(dns[3])] = {'uid': [b'dave']}
+    conn.send_errors[str(dns[1])] = ldap_error(ipaldap.ldap.SERVER_DOWN)
+    conn.result_errors[str(dns[2])] = ldap_error(
+        ipaldap.ldap.NO_SUCH_OBJECT)
+
+    entries = client.get_entries_by_dn(dns, ['uid', 'cn'])
+
+    # missing entries map to None, unreadable entries are left out
+    assert sorted(entries) == [dns[0], dns[2], dns[3]]
+    assert entries[dns[0]].dn == dns[0]
+    assert entries[dns[0]]['uid'] == [u'alice']
+    assert entries[dns[0]]['cn'] == [u'Alice']
+    assert entries[dns[2]] is None
+    assert entries[dns[3]]['uid'] == [u'dave']
+
+    operations = [operation for operation, _dn in conn.calls]
+    assert operations == ['search'] * 4 + ['result'] * 3
+    assert not conn.pending
+
+
+def test_get_entries_by_dn_empty(client, conn):
+    assert client.get_entries_by_dn([]) == {}
+    assert not conn.calls
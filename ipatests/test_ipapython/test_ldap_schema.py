@@ -0,0 +1,117 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""
+Test the LDAP schema cache
+"""
+
+import os
+
+import pytest
+
+from ipapython import ipaldap
+
+pytestmark = pytest.mark.tier0
+
+SCHEMA_ENTRY = {
+    'attributeTypes': [
+        b"( 2.5.4.3 NAME ( 'cn' 'commonName' ) "
+        b"SYNTAX 1.3.6.1.4.1.1466.115.121.1.15 )",
+        b"( 2.5.4.31 NAME 'member' "
+        b"SYNTAX 1.3.6.1.4.1.1466.115.121.1.12 )",
+        b"( 2.16.840.1.113730.3.1.39 NAME 'preferredLanguage' "
+        b"SYNTAX 1.3.6.1.4.1.1466.115.121.1.15 SINGLE-VALUE )",
+    ],
+    'objectClasses': [
+        b"( 2.5.6.9 NAME 'groupOfNames' SUP top STRUCTURAL "
+        b"MUST cn MAY member )",
+    ],
+}
+
+
+class FakeConn:
+    def __init__(self, csn):
+        self.csn = csn
+        self.schema_searches = 0
+
+    def search_s(self, base, scope, attrlist):
+        if attrlist == ['nsSchemaCSN', 'modifyTimestamp']:
+            return [('cn=schema', {'nsSchemaCSN': [self.csn]})]
+        self.schema_searches += 1
+        return [('cn=schema', SCHEMA_ENTRY)]
+
+
+@pytest.fixture
+def schema_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(ipaldap.SchemaCache, '_SERVER_DIR',
+                        str(tmpdir.join('server', '1')))
+    monkeypatch.setattr(ipaldap.SchemaCache, '_USER_DIR',
+                        str(tmpdir.join('user', '1')))
+    return ipaldap.SchemaCache()
+
+
+def test_server_schema():
+    server_schema = ipaldap._ServerSchema('ldap://test', SCHEMA_ENTRY)
+    dn_syntax = ('1.3.6.1.4.1.1466.115.121.1.12', False)
+    assert server_schema.get_attribute_type('member') == dn_syntax
+    assert server_schema.get_attribute_type('MEMBER') == dn_syntax
+    assert server_schema.get_attribute_type('2.5.4.31') == dn_syntax
+    assert server_schema.get_attribute_type('member;range=0-1') == dn_syntax
+    assert server_schema.get_attribute_type('commonname') == (
+        '1.3.6.1.4.1.1466.115.121.1.15', False)
+    assert server_schema.get_attribute_type('preferredlanguage')[1] is True
+    assert server_schema.get_attribute_type('nonexistent') is None
+
+
+def test_schema_cache(schema_cache):
+    url = 'ldap://test'
+    conn = FakeConn(b'00000001')
+    schema = schema_cache.get_schema(url, conn)
+    assert schema.get_obj(ipaldap.ldap.schema.ObjectClass, 'groupofnames')
+    assert conn.schema_searches == 1
+
+    # the schema is retrieved only once per process
+    schema_cache.get_schema(url, conn)
+    assert conn.schema_searches == 1
+
+    # a new process loads the schema from disk
+    schema_cache.flush(url)
+    server_schema = schema_cache.get_server_schema(url, conn)
+    assert conn.schema_searches == 1
+    assert server_schema.get_attribute_type('member')[0] == (
+        '1.3.6.1.4.1.1466.115.121.1.12')
+    assert server_schema.schema.get_obj(
+        ipaldap.ldap.schema.ObjectClass, 'groupofnames')
+
+    # schema modification invalidates the on-disk cache
+    conn.csn = b'00000002'
+    schema_cache.get_server_schema(url, conn, force_update=True)
+    assert conn.schema_searches == 2
+
+
+def test_schema_cache_dir(schema_cache, tmpdir):
+    # the server directory is used when it is set up
+    assert schema_cache._get_dir() == str(tmpdir.join('user', '1'))
+    tmpdir.mkdir('server')
+    assert schema_cache._get_dir() == str(tmpdir.join('server', '1'))
+
+    schema_cache.get_schema('ldap://test', FakeConn(b'00000001'))
+    assert len(tmpdir.join('server', '1').listdir()) == 1
+
+
+def test_schema_cache_write_error(schema_cache, tmpdir, monkeypatch):
+    def rename(src, dst):
+        raise OSError(13, 'Permission denied')
+
+    os_rename = os.rename
+    monkeypatch.setattr(ipaldap.os, 'rename', rename)
+    conn = FakeConn(b'00000001')
+    schema_cache.get_schema('ldap://test', conn)
+    # the temporary file is removed
+    assert os.listdir(str(tmpdir.join('user', '1'))) == []
+
+    # nothing was cached
+    monkeypatch.setattr(ipaldap.os, 'rename', os_rename)
+    schema_cache.flush('ldap://test')
+    schema_cache.get_schema('ldap://test', conn)
+    assert conn.schema_searches == 2
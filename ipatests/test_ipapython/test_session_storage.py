@@ -39,3 +39,38 @@ class test_session_storage:
             session_storage.get_data(self.principal, self.key)
         except session_storage.KRB5Error:
             pass
+
+
+@pytest.mark.tier0
+def test_ccache_data_cache(tmpdir):
+    ccache = tmpdir.join('ccache')
+    ccache.write('creds')
+    ccache_name = 'FILE:{}'.format(ccache)
+    cache = session_storage.CCacheDataCache(maxsize=1)
+    calls = []
+
+    def func(value):
+        calls.append(value)
+        return value
+
+    assert cache.get(ccache_name, 'key', lambda: func(1)) == 1
+    assert cache.get(str(ccache), 'key', lambda: func(2)) == 1
+    assert calls == [1]
+
+    # modified ccache
+    ccache.write('more creds', mode='a')
+    assert cache.get(ccache_name, 'key', lambda: func(3)) == 3
+
+    # evicted entry
+    assert cache.get(ccache_name, 'other', lambda: func(4)) == 4
+    assert cache.get(ccache_name, 'key', lambda: func(5)) == 5
+
+    cache.invalidate(ccache_name, 'key')
+    assert cache.get(ccache_name, 'key', lambda: func(6)) == 6
+
+    # None is not cached, nor are values of other ccache types
+    assert cache.get(ccache_name, 'none', lambda: func(None)) is None
+    assert cache.get(ccache_name, 'none', lambda: func(7)) == 7
+    assert cache.get('KCM:0', 'key', lambda: func(8)) == 8
+    assert cache.get('KCM:0', 'key', lambda: func(9)) == 9
+    assert calls == [1, 3, 4, 5, 6, None, 7, 8, 9]
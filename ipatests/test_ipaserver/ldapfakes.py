@@ -0,0 +1,50 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Fake LDAP connections for tests of server code which needs no LDAP server
+
+Entries are real `ipapython.ipaldap.LDAPEntry` objects of a connection
+without schema, the fakes only replace the methods a test calls.
+"""
+
+from __future__ import absolute_import
+
+import threading
+
+from ipalib import errors
+from ipapython import ipaldap
+
+
+def make_entry(dn, **attrs):
+    """Return a new entry of a connection without schema"""
+    return ipaldap.LDAPClient(None, no_schema=True).make_entry(dn, **attrs)
+
+
+class FakeGroupLDAP(ipaldap.LDAPClient):
+    """
+    Connection recording the members added to a group
+
+    The membership methods may be called from several threads.
+    """
+
+    def __init__(self, group_dn, members=()):
+        super(FakeGroupLDAP, self).__init__(None, no_schema=True)
+        self.group_dn = group_dn
+        self.members = set(members)
+        self.lock = threading.Lock()
+
+    def add_entries_to_group(self, dns, group_dn):
+        assert group_dn == self.group_dn
+        with self.lock:
+            if self.members.intersection(dns):
+                raise errors.AlreadyGroupMember()
+            self.members.update(dns)
+
+    def add_entry_to_group(self, dn, group_dn):
+        assert group_dn == self.group_dn
+        with self.lock:
+            if dn in self.members:
+                raise errors.AlreadyGroupMember()
+            self.members.add(dn)
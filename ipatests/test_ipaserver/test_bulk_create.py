@@ -0,0 +1,210 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the bulk add commands against fake LDAP connections
+"""
+
+from __future__ import absolute_import
+
+import pytest
+
+from ipalib import errors
+from ipapython.dn import DN
+from ipaserver.plugins.baseldap import LDAPBulkCreate, LDAPObject
+from ipaserver.plugins.user import user_add_bulk, NO_UPG_MAGIC
+from ipatests.test_ipaserver.ldapfakes import FakeGroupLDAP, make_entry
+
+pytestmark = pytest.mark.tier0
+
+BASE_DN = DN(('dc', 'example'), ('dc', 'test'))
+USERS_DN = DN(('cn', 'users'), ('cn', 'accounts'), BASE_DN)
+GROUP_DN = DN(('cn', 'ipausers'), ('cn', 'groups'), ('cn', 'accounts'),
+              BASE_DN)
+
+
+class FakeObject:
+    object_name = u'user'
+    container_dn = USERS_DN
+    already_exists_msg = LDAPObject.already_exists_msg
+    container_not_found_msg = LDAPObject.container_not_found_msg
+    handle_duplicate_entry = LDAPObject.handle_duplicate_entry
+
+    class primary_key:
+        name = 'uid'
+
+
+class FakeCommand:
+    def prepare_entry(self, ldap, *keys, **options):
+        if options.get('invalid'):
+            raise errors.ValidationError(name='uid', error=u'invalid')
+        return make_entry(DN(('uid', keys[-1]), USERS_DN), uid=[keys[-1]]), []
+
+
+class FakeBulkCreate:
+    """Bulk add command with fake conversion and add commands"""
+    name = 'user_add_bulk'
+    obj = FakeObject()
+    create_command = FakeCommand()
+
+    _add_chunk = LDAPBulkCreate._add_chunk
+    _set_error = LDAPBulkCreate._set_error
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.added = None
+
+    def _convert_record(self, command, record, version):
+        record = dict(record)
+        return (record.pop('uid'),), record
+
+    def _find_existing(self, ldap, keys):
+        return {key.lower() for key in keys} & self.existing
+
+    def get_callbacks(self, callback_type):
+        assert callback_type == 'post'
+        return [FakeBulkCreate.post_callback]
+
+    def post_callback(self, ldap, entries):
+        self.added = [keys[-1] for _e, keys, _o, _r in entries]
+
+
+class FakeLDAP:
+    def __init__(self, add_errors=None):
+        self.add_errors = add_errors or {}
+        self.added = []
+
+    def add_entries(self, entries):
+        self.added.extend(entry.dn for entry in entries)
+        return [self.add_errors.get(entry['uid'][0]) for entry in entries]
+
+
+class TestAddChunk:
+    def test_errors(self):
+        command = FakeBulkCreate(existing=[u'alice'])
+        ldap = FakeLDAP(add_errors={
+            # added concurrently after the search for existing entries
+            u'carol': errors.DuplicateEntry(),
+            u'dave': errors.NotFound(reason=u'no such entry'),
+            u'erin': errors.ACIError(info=u'denied'),
+        })
+        results = command._add_chunk(ldap, [
+            dict(uid=u'alice'),
+            dict(uid=u'bob'),
+            dict(uid=u'carol'),
+            dict(uid=u'dave'),
+            dict(uid=u'erin'),
+            dict(uid=u'frank', invalid=True),
+            dict(uid=u'BOB'),
+        ], None)
+
+        assert [r['value'] for r in results] == [
+            u'alice', u'bob', u'carol', u'dave', u'erin', u'frank', u'BOB',
+        ]
+        assert results[1]['error'] is None
+        failed = [(r['error_name'], r['error']) for r in results
+                  if r['error'] is not None]
+        assert failed == [
+            (u'DuplicateEntry', u'user with name "alice" already exists'),
+            (u'DuplicateEntry', u'user with name "carol" already exists'),
+            (u'NotFound', u'container entry (%s) not found' % USERS_DN),
+            (u'ACIError', u'Insufficient access: denied'),
+            (u'ValidationError', u"invalid 'uid': invalid"),
+            (u'DuplicateEntry', u'user with name "BOB" already exists'),
+        ]
+        assert results[0]['error_code'] == 4002
+
+        # only new entries are sent, post callbacks only see the added ones
+        assert ldap.added == [
+            DN(('uid', uid), USERS_DN)
+            for uid in (u'bob', u'carol', u'dave', u'erin')
+        ]
+        assert command.added == [u'bob']
+
+    def test_nothing_added(self):
+        command = FakeBulkCreate(existing=[u'alice'])
+        results = command._add_chunk(FakeLDAP(), [dict(uid=u'alice')], None)
+        assert results[0]['error_name'] == u'DuplicateEntry'
+        assert command.added is None
+
+
+class FakeUserGroupLDAP(FakeGroupLDAP):
+    def __init__(self, members=(), upg=True):
+        super(FakeUserGroupLDAP, self).__init__(GROUP_DN, members)
+        self.upg = upg
+        self.updated = []
+
+    def get_ipa_config(self):
+        return dict(ipadefaultprimarygroup=u'ipausers')
+
+    def has_upg(self):
+        return self.upg
+
+    def update_entry(self, entry):
+        self.updated.append(entry.dn)
+
+
+class FakeGroup:
+    def get_dn(self, cn):
+        return DN(('cn', cn), ('cn', 'groups'), ('cn', 'accounts'), BASE_DN)
+
+
+class FakeUserAddBulk:
+    class api:
+        Object = {'group': FakeGroup()}
+
+    post_callback = user_add_bulk.post_callback
+
+
+@pytest.fixture
+def command():
+    return FakeUserAddBulk()
+
+
+def user_entries(*uids, **options):
+    entries = []
+    for uid in uids:
+        entry_attrs = make_entry(
+            DN(('uid', uid), USERS_DN), uid=[uid],
+            description=[NO_UPG_MAGIC], userpassword=[u'secret'])
+        entries.append((entry_attrs, (uid,), dict(options), dict(value=uid)))
+    return entries
+
+
+class TestUserAddBulk:
+    def test_default_group(self, command):
+        ldap = FakeUserGroupLDAP()
+        entries = user_entries(u'alice', u'bob')
+        command.post_callback(ldap, entries)
+        assert ldap.members == {e[0].dn for e in entries}
+
+    def test_default_group_member(self, command):
+        # one of the users is already a member, the others are added one
+        # by one
+        entries = user_entries(u'alice', u'bob', u'carol')
+        ldap = FakeUserGroupLDAP(members=[entries[1][0].dn])
+        command.post_callback(ldap, entries)
+        assert ldap.members == {e[0].dn for e in entries}
+
+    def test_no_upg_magic(self, command):
+        ldap = FakeUserGroupLDAP()
+        upg_entries = user_entries(u'alice')
+        private_entries = user_entries(u'bob', noprivate=True)
+        command.post_callback(ldap, upg_entries + private_entries)
+        assert upg_entries[0][0]['description'] == [NO_UPG_MAGIC]
+        assert private_entries[0][0]['description'] == []
+        assert ldap.updated == [private_entries[0][0].dn]
+
+        ldap = FakeUserGroupLDAP(upg=False)
+        entries = user_entries(u'carol')
+        command.post_callback(ldap, entries)
+        assert entries[0][0]['description'] == []
+
+    def test_random_password(self, command):
+        ldap = FakeUserGroupLDAP()
+        entries = (user_entries(u'alice', random=True) +
+                   user_entries(u'bob'))
+        command.post_callback(ldap, entries)
+        assert entries[0][3] == dict(value=u'alice', randompassword=u'secret')
+        assert entries[1][3] == dict(value=u'bob')
@@ -0,0 +1,228 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the cache of compiled CA ACL rules used by cert_request
+"""
+
+from __future__ import absolute_import
+
+import pytest
+
+pytest.importorskip('pyhbac')
+
+# pylint: disable=wrong-import-position
+from ipalib import api, errors
+from ipalib.constants import IPA_CA_CN
+from ipalib.request import context
+from ipapython import ipaldap
+from ipapython.dn import DN
+from ipaserver.plugins import cert
+from ipaserver.plugins.cert import _CAACLCache
+
+pytestmark = pytest.mark.tier0
+
+
+def caacl(name, enabled=True, **attrs):
+    obj = dict(cn=[name], ipaenabledflag=[enabled])
+    for attr, value in attrs.items():
+        obj[attr] = value if isinstance(value, list) else [value]
+    return obj
+
+
+class FakeLDAP(ipaldap.LDAPClient):
+    """CA ACL entries, every modification increases the last USN"""
+
+    def __init__(self, acls):
+        super(FakeLDAP, self).__init__(None, no_schema=True)
+        self.ldap_uri = 'ldap://master1.ipa.test'
+        self.lastusn = 1
+        self.usns = {acl['cn'][0]: 1 for acl in acls}
+        self.searches = 0
+
+    def get_last_usn(self):
+        return (('lastusn', [str(self.lastusn)]),)
+
+    def get_entries(self, base_dn, scope=None, filter=None, attrs_list=None,
+                    **kwargs):
+        assert base_dn == DN(api.env.container_caacl, api.env.basedn)
+        self.searches += 1
+        if not self.usns:
+            raise errors.NotFound(reason=u'no such entry')
+        return [
+            self.make_entry(DN(('cn', name), base_dn), entryusn=[str(usn)])
+            for name, usn in self.usns.items()
+        ]
+
+
+class FakeCAACLCache(_CAACLCache):
+    """CA ACL cache reading the rules from a list instead of LDAP"""
+
+    def __init__(self, *acls):
+        super(FakeCAACLCache, self).__init__()
+        self.acls = list(acls)
+        self.ldap = FakeLDAP(acls)
+        self.compiled = 0
+
+    def _find_acls(self):
+        self.compiled += 1
+        return [dict(acl) for acl in self.acls]
+
+    def _changed(self, name):
+        self.ldap.lastusn += 1
+        if name is not None:
+            self.ldap.usns[name] = self.ldap.lastusn
+
+    def add(self, acl):
+        self.acls.append(acl)
+        self._changed(acl['cn'][0])
+
+    def modify(self, name, **attrs):
+        for acl in self.acls:
+            if acl['cn'][0] == name:
+                acl.update(caacl(name, **attrs))
+        self._changed(name)
+
+    def delete(self, name):
+        self.acls = [acl for acl in self.acls if acl['cn'][0] != name]
+        del self.ldap.usns[name]
+        self._changed(None)
+
+    def rule_names(self, principal_type, ca_id, profile_id):
+        return sorted(
+            rule.name
+            for rule in self.get_rules(principal_type, ca_id, profile_id)
+        )
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeCAACLCache(
+        caacl(u'users_ipa_ca', memberuser_user=[u'alice'],
+              ipamembercertprofile_certprofile=[u'userCert']),
+        caacl(u'hosts_any_ca', ipacacategory=u'all',
+              hostcategory=u'all',
+              ipamembercertprofile_certprofile=[u'caIPAserviceCert']),
+        caacl(u'services_sub_ca', ipamemberca_ca=[u'sub'],
+              ipacertprofilecategory=u'all',
+              memberservice_service=[u'HTTP/www.ipa.test@IPA.TEST']),
+        caacl(u'groups_no_ca', memberuser_group=[u'admins'],
+              ipamembercertprofile_certprofile=[u'userCert', u'smime']),
+    )
+
+    class fake_api:
+        env = api.env
+
+        class Backend:
+            ldap2 = cache.ldap
+
+    monkeypatch.setattr(cert, 'api', fake_api)
+    return cache
+
+
+class TestCAACLCache:
+    def test_index(self, cache):
+        # no CA member stands for the IPA CA
+        assert cache.rule_names('user', IPA_CA_CN, u'userCert') == [
+            u'groups_no_ca', u'users_ipa_ca',
+        ]
+        assert cache.rule_names('user', IPA_CA_CN, u'smime') == [
+            u'groups_no_ca',
+        ]
+        assert cache.rule_names('user', u'sub', u'userCert') == []
+        # the rules are indexed per principal type
+        assert cache.rule_names('host', IPA_CA_CN, u'userCert') == []
+        assert cache.rule_names('service', u'sub', u'userCert') == [
+            u'services_sub_ca',
+        ]
+        assert cache.compiled == 1
+
+    def test_case_insensitive(self, cache):
+        assert cache.rule_names('user', IPA_CA_CN.upper(), u'USERCERT') == [
+            u'groups_no_ca', u'users_ipa_ca',
+        ]
+
+    def test_category_all(self, cache):
+        # CA category all
+        for ca_id in (IPA_CA_CN, u'sub', u'other'):
+            assert cache.rule_names('host', ca_id, u'caIPAserviceCert') == [
+                u'hosts_any_ca',
+            ]
+        assert cache.rule_names('host', u'sub', u'userCert') == []
+        # profile category all
+        for profile_id in (u'caIPAserviceCert', u'userCert', u'other'):
+            assert cache.rule_names('service', u'sub', profile_id) == [
+                u'services_sub_ca',
+            ]
+        assert cache.rule_names('service', IPA_CA_CN, u'userCert') == []
+
+    def test_unchanged(self, cache):
+        for _i in range(3):
+            cache.rule_names('user', IPA_CA_CN, u'userCert')
+            cache.rule_names('host', IPA_CA_CN, u'caIPAserviceCert')
+        assert cache.compiled == 1
+        # the CA ACLs are not searched while nothing changed
+        assert cache.ldap.searches == 1
+
+        # modifications of other entries do not drop the rules
+        cache._changed(None)
+        cache.rule_names('user', IPA_CA_CN, u'userCert')
+        assert cache.ldap.searches == 2
+        assert cache.compiled == 1
+
+    def test_principals(self, cache, monkeypatch):
+        monkeypatch.setattr(context, 'principal', u'admin@IPA.TEST',
+                            raising=False)
+        cache.rule_names('user', IPA_CA_CN, u'userCert')
+        # other principals may see other CA ACLs
+        monkeypatch.setattr(context, 'principal', u'alice@IPA.TEST')
+        cache.rule_names('user', IPA_CA_CN, u'userCert')
+        monkeypatch.setattr(context, 'principal', u'admin@IPA.TEST')
+        cache.rule_names('user', IPA_CA_CN, u'userCert')
+        assert cache.compiled == 2
+
+    def test_add(self, cache):
+        assert cache.rule_names('host', IPA_CA_CN, u'userCert') == []
+        cache.add(
+            caacl(u'hosts_user_cert', memberhost_host=[u'web.ipa.test'],
+                  ipamembercertprofile_certprofile=[u'userCert']))
+        assert cache.rule_names('host', IPA_CA_CN, u'userCert') == [
+            u'hosts_user_cert',
+        ]
+        assert cache.compiled == 2
+
+    def test_modify(self, cache):
+        assert cache.rule_names('user', IPA_CA_CN, u'smime') == [
+            u'groups_no_ca',
+        ]
+        cache.modify(u'users_ipa_ca', memberuser_user=[u'alice'],
+                     ipamembercertprofile_certprofile=[u'smime'])
+        assert cache.rule_names('user', IPA_CA_CN, u'smime') == [
+            u'groups_no_ca', u'users_ipa_ca',
+        ]
+        assert cache.rule_names('user', IPA_CA_CN, u'userCert') == [
+            u'groups_no_ca',
+        ]
+
+    def test_disable(self, cache):
+        assert cache.rule_names('service', u'sub', u'userCert') == [
+            u'services_sub_ca',
+        ]
+        cache.modify(u'services_sub_ca', enabled=False)
+        assert cache.rule_names('service', u'sub', u'userCert') == []
+
+        cache.modify(u'services_sub_ca', enabled=True)
+        assert cache.rule_names('service', u'sub', u'userCert') == [
+            u'services_sub_ca',
+        ]
+        assert cache.compiled == 3
+
+    def test_delete(self, cache):
+        assert cache.rule_names('user', IPA_CA_CN, u'userCert') == [
+            u'groups_no_ca', u'users_ipa_ca',
+        ]
+        cache.delete(u'users_ipa_ca')
+        assert cache.rule_names('user', IPA_CA_CN, u'userCert') == [
+            u'groups_no_ca',
+        ]
@@ -0,0 +1,416 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the lookups of trusted domains without AD domain controllers
+"""
+
+from __future__ import absolute_import
+
+import pytest
+
+from ipapython import ipautil
+
+dcerpc = pytest.importorskip('ipaserver.dcerpc')
+
+pytestmark = pytest.mark.tier0
+
+
+class StubSID:
+    """dom_sid with the sub-authorities only"""
+    def __init__(self, sid):
+        self.sid = sid
+        auths = [int(a) for a in sid.split('-')[3:]]
+        self.num_auths = len(auths)
+        # samba always has room for 15 sub-authorities
+        self.sub_auths = tuple(auths) + (0,) * (15 - len(auths))
+
+    def __str__(self):
+        return self.sid
+
+
+def make_domains(*sids):
+    domains = ipautil.CIDict()
+    for i, sid in enumerate(sids):
+        domains[u'dom%d.test' % i] = (u'dom%d' % i, StubSID(sid))
+    return domains
+
+
+def linear_scan(domains, sid):
+    """The lookup of a domain by SID the index replaces"""
+    for domain in domains:
+        domsid = domains[domain][1]
+        num_auths = min(sid.num_auths, domsid.num_auths)
+        if sid.sub_auths[:num_auths] == domsid.sub_auths[:num_auths]:
+            return domain
+    return None
+
+
+DOMAINS = [
+    pytest.param(('S-1-5-21-1-2-3',), id='single'),
+    pytest.param(('S-1-5-21-1-2-3', 'S-1-5-21-4-5-6'), id='disjoint'),
+    # a domain SID is a prefix of another one, in both orders
+    pytest.param(('S-1-5-21-1-2', 'S-1-5-21-1-2-3'), id='prefix-first'),
+    pytest.param(('S-1-5-21-1-2-3', 'S-1-5-21-1-2'), id='prefix-last'),
+    pytest.param(('S-1-5-21-1-2-3', 'S-1-5-21-1-2-4', 'S-1-5-21-1'),
+                 id='siblings'),
+    pytest.param(('S-1-5-21-1-2-3', 'S-1-5-21-1-2-3'), id='duplicate'),
+]
+
+SIDS = [
+    'S-1-5-21-1-2-3',
+    'S-1-5-21-1-2-3-500',
+    'S-1-5-21-1-2-4-1000',
+    'S-1-5-21-1-2-5',
+    # SIDs which are a prefix of domain SIDs
+    'S-1-5-21-1-2',
+    'S-1-5-21-1',
+    'S-1-5-21',
+    'S-1-5',
+    'S-1-5-21-4-5-6-7-8',
+    'S-1-5-21-4-6',
+    'S-1-5-32-544',
+    'S-1-5-21-7-8-9-500',
+]
+
+
+@pytest.mark.parametrize('domsids', DOMAINS)
+def test_sid_index(domsids):
+    domains = make_domains(*domsids)
+    index = dcerpc.TrustedDomainSIDIndex(domains)
+    for sid in SIDS:
+        assert index.get_domain_by_sid(StubSID(sid)) == linear_scan(
+            domains, StubSID(sid)), sid
+
+    for sid in domsids:
+        # the first domain with the SID wins
+        assert index.get_domain_by_exact_sid(sid) == (
+            u'dom%d.test' % domsids.index(sid))
+    assert index.get_domain_by_exact_sid('S-1-5-21-1-2-3-500') is None
+
+
+def test_sid_index_empty():
+    index = dcerpc.TrustedDomainSIDIndex(ipautil.CIDict())
+    assert index.get_domain_by_sid(StubSID('S-1-5-21-1-2-3')) is None
+    assert index.get_domain_by_sid(StubSID('S-1-5')) is None
+    assert index.get_domain_by_exact_sid('S-1-5-21-1-2-3') is None
+
+
+class FakeDomainValidator(dcerpc.DomainValidator):
+    """Validator of a configured domain with the given trusted domains"""
+    def __init__(self, domains):  # pylint: disable=W0231
+        self.domain = u'ipa.test'
+        self._domains = domains
+        self._sid_index = None
+
+    def get_trusted_domains(self):
+        return self._domains
+
+
+@pytest.mark.parametrize('domsids', DOMAINS)
+def test_validate_sids(domsids):
+    domains = make_domains(*domsids)
+    validator = FakeDomainValidator(domains)
+    invalid = ['S-1-5-21-1-2-x', 'not a SID']
+    result = validator.validate_sids(SIDS + invalid)
+
+    assert result == dict(
+        {sid: linear_scan(domains, StubSID(sid)) for sid in SIDS},
+        **dict.fromkeys(invalid))
+    for sid in SIDS:
+        assert validator.is_trusted_sid_valid(sid) == (
+            result[sid] is not None)
+
+
+def test_validate_sids_not_configured():
+    sids = ['S-1-5-21-1-2-3-500']
+    validator = FakeDomainValidator(make_domains('S-1-5-21-1-2-3'))
+    validator.domain = None
+    assert validator.validate_sids(sids) == {sids[0]: None}
+
+    # no trusted domain
+    validator = FakeDomainValidator(ipautil.CIDict())
+    assert validator.validate_sids(sids) == {sids[0]: None}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dcerpc.time, 'time', lambda: now[0])
+    return now
+
+
+def test_expiring_cache(clock):
+    cache = dcerpc._ExpiringCache(max_size=2)
+    cache.set('a', 1, 10)
+    cache.set('b', 2, 20)
+    assert cache.get('a') == 1
+
+    clock[0] += 10
+    with pytest.raises(KeyError):
+        cache.get('a')
+    assert cache.get('b') == 2
+
+    # values without time to live are not cached
+    cache.set('c', 3, 0)
+    with pytest.raises(KeyError):
+        cache.get('c')
+
+    # the oldest values are dropped first
+    cache.set('c', 3, 10)
+    cache.set('d', 4, 10)
+    with pytest.raises(KeyError):
+        cache.get('b')
+    cache.set('c', 5, 10)
+    cache.set('e', 6, 10)
+    with pytest.raises(KeyError):
+        cache.get('d')
+    assert cache.get('c') == 5
+    assert cache.get('e') == 6
+
+    cache.clear()
+    with pytest.raises(KeyError):
+        cache.get('e')
+
+
+class FakeGCConnection:
+    """Connection to an AD DC, a search raises error if set"""
+    def __init__(self, entries=None):
+        self.entries = entries
+        self.error = None
+        self.bound = False
+        self.closed = False
+        self.searches = 0
+
+    def gssapi_bind(self):
+        self.bound = True
+
+    def get_entries(self, base_dn, scope=None, filter=None, attrs_list=None):
+        assert base_dn == dcerpc.DN(('dc', 'ad'), ('dc', 'test'))
+        assert not self.closed
+        self.searches += 1
+        if self.error is not None:
+            raise self.error
+        return self.entries
+
+    def close(self):
+        self.closed = True
+
+
+def test_connection_pool_size():
+    pool = dcerpc._GCConnectionPool()
+    conns = [FakeGCConnection() for _i in range(3)]
+    pool.release('dc1', conns[0], 2)
+    pool.release('dc2', conns[1], 2)
+    pool.release('dc1', conns[2], 2)
+    # the connections of the least recently used server are closed first
+    assert [c.closed for c in conns] == [False, True, False]
+
+    assert pool.acquire('dc2', 60) is None
+    assert pool.acquire('dc1', 60) is conns[2]
+    assert pool.acquire('dc1', 60) is conns[0]
+    assert pool.acquire('dc1', 60) is None
+    assert not conns[0].closed and not conns[2].closed
+
+    pool.release('dc1', conns[0], 2)
+    pool.clear()
+    assert conns[0].closed
+    assert pool.acquire('dc1', 60) is None
+
+
+def test_connection_pool_idle_timeout(clock):
+    pool = dcerpc._GCConnectionPool()
+    conns = [FakeGCConnection() for _i in range(3)]
+    pool.release('dc1', conns[0], 10)
+    clock[0] += 30
+    pool.release('dc1', conns[1], 10)
+    pool.release('dc2', conns[2], 10)
+
+    # idle connections of all servers are closed after the timeout
+    clock[0] += 31
+    assert pool.acquire('dc2', 60) is conns[2]
+    assert [c.closed for c in conns] == [True, False, False]
+    clock[0] += 29
+    assert pool.acquire('dc1', 60) is None
+    assert conns[1].closed
+
+
+class GCDomainValidator(FakeDomainValidator):
+    """Validator searching AD DCs with fake connections"""
+    class api:
+        class env:
+            context = 'server'
+            ldap_pool_size = 2
+            ldap_pool_idle_timeout = 60
+            trust_cache_ttl = 300
+            trust_negative_cache_ttl = 30
+
+    def __init__(self, domains, ccache):
+        super(GCDomainValidator, self).__init__(domains)
+        self._admin_creds = u'Administrator%Secret123'
+        self.ccache = ccache
+        self.kinits = 0
+
+    def kinit_as_administrator(self, domain):
+        assert domain == u'ad.test'
+        self.kinits += 1
+        return self.ccache, u'Administrator@AD.TEST'
+
+    def search(self):
+        info = dict(name=u'AD', dns_domain=u'ad.test', gc=[])
+        return self._DomainValidator__search_in_dc(
+            info, u'dc.ad.test', 3268, '(objectClass=user)', ['objectSid'],
+            dcerpc._ldap.SCOPE_SUBTREE)
+
+
+class Connections(list):
+    """Connections opened so far, a search on new ones raises error"""
+    error = None
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    connections = Connections()
+
+    def from_hostname_plain(host, no_schema=False, decode_attrs=True):
+        assert host == u'dc.ad.test'
+        conn = FakeGCConnection(entries=[len(connections)])
+        conn.error = connections.error
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(dcerpc, '_gc_connection_pool',
+                        dcerpc._GCConnectionPool())
+    monkeypatch.setattr(dcerpc.ipaldap.LDAPClient, 'from_hostname_plain',
+                        from_hostname_plain)
+    return connections
+
+
+@pytest.fixture
+def gc_validator(tmp_path):
+    return GCDomainValidator(make_domains('S-1-5-21-1-2-3'),
+                             str(tmp_path / 'ccache'))
+
+
+def test_search_in_dc_pooled(gc_validator, connections):
+    assert gc_validator.search() == [0]
+    assert gc_validator.search() == [0]
+    assert gc_validator.kinits == 1
+    assert len(connections) == 1
+    assert connections[0].bound and not connections[0].closed
+    assert connections[0].searches == 2
+
+    # an entry which is not found does not break the connection
+    connections[0].error = dcerpc.errors.NotFound(reason=u'no such entry')
+    assert gc_validator.search() is None
+    connections[0].error = None
+    assert gc_validator.search() == [0]
+    assert len(connections) == 1
+
+
+def test_search_in_dc_retry(gc_validator, connections):
+    assert gc_validator.search() == [0]
+
+    # the AD DC closed the pooled connection, the search is retried with a
+    # new one
+    connections[0].error = dcerpc.errors.NetworkError(
+        uri=u'ldap://dc.ad.test', error=u"Can't contact LDAP server")
+    assert gc_validator.search() == [1]
+    assert connections[0].closed
+    assert gc_validator.kinits == 2
+    assert gc_validator.search() == [1]
+    assert len(connections) == 2
+    assert not connections[1].closed
+
+    # a failing new connection is not retried
+    connections[1].error = connections.error = connections[0].error
+    assert gc_validator.search() is None
+    assert len(connections) == 3
+    assert connections[1].closed and connections[2].closed
+    assert gc_validator.kinits == 3
+
+
+@pytest.mark.parametrize('context, pool_size', [('server', 0), ('cli', 2)])
+def test_search_in_dc_not_pooled(gc_validator, connections, monkeypatch,
+                                 context, pool_size):
+    monkeypatch.setattr(gc_validator.api.env, 'context', context)
+    monkeypatch.setattr(gc_validator.api.env, 'ldap_pool_size', pool_size)
+    assert gc_validator.search() == [0]
+    assert gc_validator.search() == [1]
+    assert gc_validator.kinits == 2
+    assert all(c.closed for c in connections)
+
+
+class StubIdmap:
+    """pysss_nss_idmap resolving names of the sids dictionary"""
+    SID_KEY = 'sid'
+
+    def __init__(self, sids):
+        self.sids = sids
+        self.calls = []
+
+    def getsidbyname(self, names):
+        self.calls.append(list(names))
+        return {
+            name: {self.SID_KEY: self.sids[name]}
+            for name in names if name in self.sids
+        }
+
+
+def test_object_sids(clock, monkeypatch, tmp_path):
+    idmap = StubIdmap({
+        u'alice@dom0.test': u'S-1-5-21-1-2-3-1000',
+        u'bob@other.test': u'S-1-5-21-9-9-9-1000',
+        u'dave@dom0.test': u'S-1-5-21-1-2-3-1001',
+    })
+    monkeypatch.setattr(dcerpc, 'pysss_nss_idmap', idmap)
+    monkeypatch.setattr(dcerpc.DomainValidator, '_trusted_objects_cache',
+                        dcerpc._ExpiringCache())
+    validator = GCDomainValidator(make_domains('S-1-5-21-1-2-3'),
+                                  str(tmp_path / 'ccache'))
+
+    def resolve(*names):
+        return validator.get_trusted_domain_object_sids(
+            names, fallback_to_ldap=False)
+
+    result = resolve(u'alice@dom0.test', u'bob@other.test',
+                     u'carol@dom0.test', u'alice@dom0.test')
+    # SSSD is asked once for all names
+    assert idmap.calls == [
+        [u'alice@dom0.test', u'bob@other.test', u'carol@dom0.test']]
+    assert result[u'alice@dom0.test'] == u'S-1-5-21-1-2-3-1000'
+    assert 'not belong to a trusted domain' in str(result[u'bob@other.test'])
+    assert 'unable to resolve' in str(result[u'carol@dom0.test'])
+    error = result[u'carol@dom0.test']
+    assert isinstance(error, dcerpc.errors.ValidationError)
+
+    # only the new names are resolved
+    result = resolve(u'carol@dom0.test', u'alice@dom0.test',
+                     u'dave@dom0.test')
+    assert idmap.calls[1:] == [[u'dave@dom0.test']]
+    assert result[u'dave@dom0.test'] == u'S-1-5-21-1-2-3-1001'
+    # cached errors are copied
+    assert result[u'carol@dom0.test'] is not error
+    assert isinstance(result[u'carol@dom0.test'],
+                      dcerpc.errors.ValidationError)
+    assert str(result[u'carol@dom0.test']) == str(error)
+
+    # errors expire first
+    clock[0] += validator.api.env.trust_negative_cache_ttl
+    resolve(u'alice@dom0.test', u'bob@other.test', u'carol@dom0.test')
+    assert idmap.calls[2:] == [[u'bob@other.test', u'carol@dom0.test']]
+
+    clock[0] += validator.api.env.trust_cache_ttl
+    assert validator.get_trusted_domain_object_sid(
+        u'alice@dom0.test', fallback_to_ldap=False) == u'S-1-5-21-1-2-3-1000'
+    with pytest.raises(dcerpc.errors.ValidationError):
+        validator.get_trusted_domain_object_sid(
+            u'bob@other.test', fallback_to_ldap=False)
+    assert idmap.calls[3:] == [[u'alice@dom0.test'], [u'bob@other.test']]
+
+    # other principals may be allowed to see other objects
+    monkeypatch.setattr(dcerpc.context, 'principal', u'alice@IPA.TEST',
+                        raising=False)
+    resolve(u'alice@dom0.test', u'bob@other.test')
+    assert idmap.calls[5:] == [[u'alice@dom0.test', u'bob@other.test']]
@@ -0,0 +1,132 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test waiting for modified DNS records against a local nameserver
+"""
+
+from __future__ import absolute_import
+
+import dns.name
+import dns.rcode
+import dns.resolver
+import pytest
+
+from ipalib import errors
+from ipaserver.plugins import dns as dns_plugin
+from ipatests.test_ipapython.test_dnsutil import (
+    DNSResponder, answer_a, answer_rcode, make_resolver)
+
+pytestmark = pytest.mark.tier0
+
+ZONE = dns.name.from_text(u'example.test.')
+
+
+class FakeDNSRecord:
+    """dnsrecord plugin with only the methods to wait for DNS"""
+    wait_for_modified_entries = dns_plugin.dnsrecord.wait_for_modified_entries
+    _entry2rrsets = dns_plugin.dnsrecord._entry2rrsets
+    _get_dns_rrset = dns_plugin.dnsrecord._get_dns_rrset
+
+    def __init__(self, wait_for_dns):
+        class api:
+            env = {'wait_for_dns': wait_for_dns}
+
+        self.api = api
+
+
+def answer_after(count, answer, before):
+    """Answer with before to the first count queries, then with answer"""
+    queries = []
+
+    def delayed(query, transport):
+        queries.append(query)
+        if len(queries) <= count:
+            return before(query, transport)
+        return answer(query, transport)
+    return delayed
+
+
+@pytest.fixture
+def responder(monkeypatch):
+    responder = DNSResponder()
+    resolver = make_resolver(responder, timeout=0.3)
+    monkeypatch.setattr(dns_plugin.dns.resolver, 'Resolver', lambda: resolver)
+    try:
+        yield responder
+    finally:
+        responder.close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(dns_plugin.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def entry(name):
+    return (ZONE, dns.name.from_text(name, origin=None))
+
+
+class TestWaitForModifiedEntries:
+    def test_match(self, responder, sleeps):
+        responder.answers['www.example.test.'] = answer_a('192.0.2.1')
+        responder.answers['old.example.test.'] = answer_rcode(
+            dns.rcode.NXDOMAIN)
+        FakeDNSRecord(10).wait_for_modified_entries({
+            entry(u'www'): {'arecord': [u'192.0.2.1']},
+            # a deleted name matches once it does not exist
+            entry(u'old'): None,
+        })
+        assert responder.queried('www.example.test.') == 1
+        assert responder.queried('old.example.test.') == 1
+        assert sleeps == []
+
+    def test_backoff(self, responder, sleeps):
+        responder.answers['www.example.test.'] = answer_a('192.0.2.1')
+        responder.answers['new.example.test.'] = answer_after(
+            6, answer_a('192.0.2.2'), answer_rcode(dns.rcode.NXDOMAIN))
+        responder.answers['old.example.test.'] = answer_after(
+            2, answer_rcode(dns.rcode.NXDOMAIN), answer_a('192.0.2.3'))
+        FakeDNSRecord(10).wait_for_modified_entries({
+            entry(u'www'): {'arecord': [u'192.0.2.1']},
+            entry(u'new'): {'arecord': [u'192.0.2.2']},
+            entry(u'old'): None,
+        })
+        # only the RRsets which do not match yet are queried again
+        assert responder.queried('www.example.test.') == 1
+        assert responder.queried('old.example.test.') == 3
+        assert responder.queried('new.example.test.') == 7
+        assert sleeps == [0.1, 0.2, 0.4, 0.8, 1, 1]
+
+    def test_mismatch(self, responder, sleeps):
+        responder.answers['www.example.test.'] = answer_a('192.0.2.9')
+        responder.answers['new.example.test.'] = answer_rcode(
+            dns.rcode.NXDOMAIN)
+        with pytest.raises(errors.DNSDataMismatch):
+            FakeDNSRecord(3).wait_for_modified_entries({
+                entry(u'www'): {'arecord': [u'192.0.2.1']},
+            })
+        assert responder.queried('www.example.test.') == 3
+        assert sleeps == [0.1, 0.2]
+
+        with pytest.raises(errors.DNSDataMismatch, match='NXDOMAIN'):
+            FakeDNSRecord(2).wait_for_modified_entries({
+                entry(u'new'): {'arecord': [u'192.0.2.2']},
+            })
+
+    def test_no_answer(self, responder, sleeps):
+        # the name server fails, e.g. because of an invalid zone
+        responder.answers['www.example.test.'] = answer_rcode(
+            dns.rcode.SERVFAIL)
+        FakeDNSRecord(2).wait_for_modified_entries({
+            entry(u'www'): {'arecord': [u'192.0.2.1']},
+        })
+        assert responder.queried('www.example.test.') == 2
+
+        with pytest.raises(errors.DNSDataMismatch, match='Timeout'):
+            FakeDNSRecord(2).wait_for_modified_entries({
+                entry(u'silent'): {'arecord': [u'192.0.2.1']},
+            })
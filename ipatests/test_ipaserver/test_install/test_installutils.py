@@ -4,6 +4,7 @@
 from __future__ import absolute_import
 
 import binascii
+import hashlib
 import os
 import re
 import subprocess
@@ -140,3 +141,36 @@ def test_gpg_asymmetric(tempdir, gpgkey):
     assert os.path.isfile(src)
     with open(src) as f:
         assert f.read() == payload
+
+
+@pytest.mark.parametrize('encrypt', [False, True])
+def test_backup_write_archive(request, tempdir, encrypt):
+    if encrypt:
+        request.getfixturevalue('gpgkey')
+    srcdir = os.path.join(tempdir, "backup")
+    os.makedirs(os.path.join(srcdir, "userRoot"))
+    payload = b'dn: dc=example,dc=test\n' * 1000
+    with open(os.path.join(srcdir, "userRoot", "id2entry.db"), 'wb') as f:
+        f.write(payload)
+    with open(os.path.join(srcdir, "files.tar"), 'wb') as f:
+        f.write(b'files')
+
+    filename = os.path.join(tempdir, "ipa-full.tar")
+    if encrypt:
+        filename += '.gpg'
+    checksums = ipa_backup.write_archive(srcdir, filename, encrypt)
+    assert sorted(checksums) == sorted([
+        'files.tar', 'userRoot/id2entry.db', os.path.basename(filename)])
+    assert checksums['userRoot/id2entry.db'] == (
+        'sha256:' + hashlib.sha256(payload).hexdigest())
+    with open(filename, 'rb') as f:
+        assert checksums[os.path.basename(filename)] == (
+            'sha256:' + hashlib.sha256(f.read()).hexdigest())
+
+    if encrypt:
+        filename = ipa_restore.decrypt_file(tempdir, filename)
+    outdir = os.path.join(tempdir, "restore")
+    os.makedirs(outdir)
+    subprocess.check_call(['tar', '-xzf', filename, '-C', outdir])
+    with open(os.path.join(outdir, "userRoot", "id2entry.db"), 'rb') as f:
+        assert f.read() == payload
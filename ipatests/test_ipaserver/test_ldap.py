@@ -30,6 +30,7 @@ from __future__ import absolute_import
 import os
 import sys
 
+import ldap
 import pytest
 import six
 
@@ -127,6 +128,41 @@ class test_ldap:
         cert = entry_attrs.get('usercertificate')[0]
         assert cert.serial_number is not None
 
+    def test_iter_entries(self):
+        """
+        Test streaming search results using ldap2
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        base_dn = DN(('cn', 'services'), ('cn', 'accounts'), api.env.basedn)
+        entries, truncated = self.conn.find_entries(
+            '(krbprincipalname=*)', ['krbprincipalname'], base_dn,
+            paged_search=True)
+
+        result = self.conn.iter_entries(
+            '(krbprincipalname=*)', ['krbprincipalname'], base_dn,
+            paged_search=True)
+        dns = []
+        while True:
+            try:
+                dns.append(next(result).dn)
+            except StopIteration as e:
+                assert e.value == truncated
+                break
+        assert sorted(dns) == sorted(e.dn for e in entries)
+
+        # stopping early abandons the search
+        result = self.conn.iter_entries(
+            '(krbprincipalname=*)', ['krbprincipalname'], base_dn,
+            paged_search=True)
+        next(result)
+        result.close()
+        assert self.conn.get_entry(self.dn, ['krbprincipalname'])
+
+        with pytest.raises(errors.EmptyResult):
+            list(self.conn.iter_entries(
+                '(krbprincipalname=nonexistent)', [''], base_dn))
+
     def test_autobind(self):
         """
         Test an autobind LDAP bind using ldap2
@@ -321,6 +357,40 @@ class test_LDAPEntry:
         e.raw['test'].append(b'second')
         assert e['test'] == ['not list', u'second']
 
+    def test_result_entry(self):
+        attrs = {'cn': [b'test1'], 'description': [b'a', b'b']}
+        e, = self.conn._convert_result([(str(self.dn1), attrs)])
+        assert e.raw['CN'] is attrs['cn']
+        assert e['commonName'] == self.cn1
+        assert e.generate_modlist() == []
+
+        e['description'].remove(u'a')
+        e['description'].append(u'c')
+        assert e.generate_modlist() == [
+            (ldap.MOD_DELETE, 'description', [b'a']),
+            (ldap.MOD_ADD, 'description', [b'c'])]
+
+        attrs = {'cn': [b'test1'], 'description': [b'a'], 'sn': [b'test']}
+        e, = self.conn._convert_result([(str(self.dn1), attrs)])
+        # only the modified attributes are copied
+        assert e['description'] == [u'a']
+        e.raw['description'].append(b'b')
+        del e['cn']
+        assert sorted(e.generate_modlist()) == [
+            (ldap.MOD_ADD, 'description', [b'b']),
+            (ldap.MOD_DELETE, 'cn', None)]
+        assert sorted(e._orig_raw) == ['cn', 'description']
+        assert attrs['sn'] == [b'test']
+
+        e.raw['sn'] = [b'test2']
+        e['description'] = [u'c']
+        assert sorted(e.generate_modlist()) == [
+            (ldap.MOD_ADD, 'description', [b'c']),
+            (ldap.MOD_ADD, 'sn', [b'test2']),
+            (ldap.MOD_DELETE, 'cn', None),
+            (ldap.MOD_DELETE, 'description', [b'a']),
+            (ldap.MOD_DELETE, 'sn', [b'test'])]
+
     def test_modlist_with_varying_encodings(self):
         """
         Test modlist is correct when only encoding of new value differs
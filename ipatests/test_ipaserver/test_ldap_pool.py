@@ -0,0 +1,89 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the pool of GSSAPI-bound LDAP connections of the ldap2 backend
+"""
+
+from __future__ import absolute_import
+
+import time
+
+import pytest
+
+from ipaserver.plugins.ldap2 import _ConnectionPool
+
+KEY = ('ldapi://test', 'FILE:/tmp/krbcc_admin', 'admin@EXAMPLE.TEST')
+OTHER_KEY = ('ldapi://test', 'FILE:/tmp/krbcc_user', 'user@EXAMPLE.TEST')
+
+
+class FakeConn:
+    def __init__(self):
+        self.unbound = False
+
+    def unbind_s(self):
+        self.unbound = True
+
+
+@pytest.fixture
+def pool():
+    return _ConnectionPool()
+
+
+def add(pool, key=KEY, lifetime=3600):
+    conn = FakeConn()
+    pool.add(conn, key, 'dn: uid=test', time.time() + lifetime)
+    return conn
+
+
+@pytest.mark.tier0
+class TestConnectionPool:
+    def test_reuse(self, pool):
+        conn = add(pool)
+        assert pool.acquire(KEY, 60) is None
+        assert pool.release(conn, 10)
+        assert pool.acquire(OTHER_KEY, 60) is None
+        pooled = pool.acquire(KEY, 60)
+        assert pooled.conn is conn
+        assert pooled.authzid == 'dn: uid=test'
+        # checked out connection is not handed out twice
+        assert pool.acquire(KEY, 60) is None
+        assert not conn.unbound
+
+    def test_release_foreign(self, pool):
+        assert not pool.release(FakeConn(), 10)
+
+    def test_idle_timeout(self, pool):
+        conn = add(pool)
+        pool.release(conn, 10)
+        assert pool.acquire(KEY, 0) is None
+        assert conn.unbound
+
+    def test_credentials_expired(self, pool):
+        conn = add(pool, lifetime=-1)
+        pool.release(conn, 10)
+        assert pool.acquire(KEY, 60) is None
+        assert conn.unbound
+
+    def test_max_size(self, pool):
+        conns = [add(pool), add(pool, OTHER_KEY), add(pool)]
+        for conn in conns:
+            pool.release(conn, 2)
+        # least recently released connection is closed first
+        assert [conn.unbound for conn in conns] == [True, False, False]
+        assert pool.acquire(KEY, 60).conn is conns[2]
+        assert pool.acquire(KEY, 60) is None
+
+    def test_discard(self, pool):
+        conn = add(pool)
+        pool.discard(conn)
+        assert conn.unbound
+        assert not pool.release(conn, 10)
+
+    def test_clear(self, pool):
+        conn = add(pool)
+        pool.release(conn, 10)
+        pool.clear()
+        assert conn.unbound
+        assert pool.acquire(KEY, 60) is None
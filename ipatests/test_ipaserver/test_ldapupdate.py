@@ -0,0 +1,283 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the prefetching of entries and the index tasks of LDAP updates
+"""
+
+from __future__ import absolute_import
+
+import pytest
+
+from ipalib import errors
+from ipapython import ipaldap
+from ipapython.dn import DN
+from ipaserver.install.ldapupdate import LDAPUpdate
+
+pytestmark = pytest.mark.tier0
+
+BASE_DN = DN(('dc', 'example'), ('dc', 'test'))
+
+
+def entry_dn(name):
+    return DN(('cn', name), BASE_DN)
+
+
+def index_dn(attr):
+    return DN(('cn', attr), LDAPUpdate.index_suffix)
+
+
+class FakeLDAP(ipaldap.LDAPClient):
+    """
+    Directory in memory recording the operations
+
+    ``plugins`` map DNs to functions called with the directory when an
+    entry is added or modified, like DS plugins changing other entries.
+    """
+    SCOPE_BASE = ipaldap.ldap.SCOPE_BASE
+
+    def __init__(self, entries):
+        super(FakeLDAP, self).__init__(None, no_schema=True)
+        self.entries = dict(entries)
+        self.plugins = {}
+        self.calls = []
+
+    def _read(self, dn):
+        raw = {k: list(v) for k, v in self.entries[dn].items()}
+        return self._convert_result([(str(dn), raw)])[0]
+
+    def _changed(self, dn):
+        if dn in self.plugins:
+            self.plugins[dn](self.entries)
+
+    def get_entries_by_dn(self, dns, attrs_list=None):
+        self.calls.append(('prefetch', list(dns)))
+        return {
+            dn: self._read(dn) if dn in self.entries else None
+            for dn in dns
+        }
+
+    def get_entries(self, base_dn, scope=None, filter=None, attrs_list=None,
+                    **kwargs):
+        self.calls.append(('read', base_dn))
+        if base_dn not in self.entries:
+            raise errors.NotFound(reason=u'no such entry')
+        return [self._read(base_dn)]
+
+    def add_entry(self, entry):
+        self.calls.append(('add', entry.dn))
+        self.entries[entry.dn] = {k: list(v) for k, v in entry.raw.items()}
+        entry.reset_modlist()
+        self._changed(entry.dn)
+
+    def update_entry(self, entry):
+        self.calls.append(('modify', entry.dn))
+        stored = self.entries[entry.dn]
+        for op, attr, values in entry.generate_modlist():
+            old = stored.get(attr, [])
+            if op == ipaldap.ldap.MOD_REPLACE:
+                stored[attr] = list(values)
+            elif op == ipaldap.ldap.MOD_ADD:
+                stored[attr] = old + list(values)
+            elif values is None:
+                stored.pop(attr, None)
+            else:
+                stored[attr] = [v for v in old if v not in values]
+        entry.reset_modlist()
+        self._changed(entry.dn)
+
+    def delete_entry(self, entry_or_dn):
+        self.calls.append(('delete', entry_or_dn))
+        del self.entries[entry_or_dn]
+
+
+class FakeLDAPUpdate(LDAPUpdate):
+    """LDAP update engine without API and server connection"""
+
+    def __init__(self, conn, updaters=None):  # pylint: disable=W0231
+        self.conn = conn
+        self.sub_dict = {}
+        self.modified = False
+        self.index_attributes = set()
+        self._prefetched = {}
+        self._prefetch_size = 1
+
+        class api:
+            Updater = updaters or {}
+
+        self.api = api
+
+    def create_index_task(self, *attributes):
+        self.conn.calls.append(('index', attributes))
+        return DN(('cn', 'indextask'), ('cn', 'index'), ('cn', 'tasks'),
+                  ('cn', 'config'))
+
+    def monitor_index_task(self, dn):
+        pass
+
+
+def description(value):
+    return dict(action='add', attr='description', value=value)
+
+
+def replace_description(old, new):
+    return dict(action='replace', attr='description', value=[old, new])
+
+
+@pytest.fixture
+def conn():
+    return FakeLDAP({
+        entry_dn(name): {
+            'objectClass': [b'top', b'nsContainer'],
+            'cn': [name.encode('utf-8')],
+            'description': [b'old'],
+        }
+        for name in ('a', 'b', 'c', 'd', 'e', 'f', 'g')
+    })
+
+
+def test_prefetch_window(conn):
+    updater = FakeLDAPUpdate(conn)
+    names = ['a', 'b', 'c', 'a', 'd', 'e', 'f', 'g']
+    updater._run_updates([
+        dict(dn=entry_dn(name), updates=[description(b'old')])
+        for name in names
+    ])
+    # the window doubles while nothing is modified, every entry is read
+    # by one pipelined search only
+    assert conn.calls == [
+        ('prefetch', [entry_dn('a')]),
+        ('prefetch', [entry_dn('b'), entry_dn('c')]),
+        ('prefetch', [entry_dn('a'), entry_dn('d'), entry_dn('e'),
+                      entry_dn('f')]),
+        ('prefetch', [entry_dn('g')]),
+    ]
+    assert not updater.modified
+
+
+def test_prefetch_stops(conn):
+    updater = FakeLDAPUpdate(conn, updaters={
+        'plugin': lambda: (False, []),
+    })
+    updater._prefetch_size = 8
+    updates = [
+        dict(dn=entry_dn('a'), updates=[description(b'old')]),
+        dict(dn=entry_dn('b'), updates=[description(b'old')]),
+        dict(dn=entry_dn('c'), deleteentry=None),
+        dict(dn=entry_dn('d'), updates=[description(b'old')]),
+        dict(plugin='plugin'),
+        dict(dn=entry_dn('e'), updates=[description(b'old')]),
+    ]
+    updater._prefetch_entries(updates, 0)
+    assert conn.calls == [('prefetch', [entry_dn('a'), entry_dn('b')])]
+    updater._prefetch_entries(updates, 3)
+    assert conn.calls[-1] == ('prefetch', [entry_dn('d')])
+
+
+def plugin_changing(dn):
+    def plugin(entries):
+        entries[dn]['description'] = [b'plugin']
+    return plugin
+
+
+def test_prefetch_modify(conn):
+    updater = FakeLDAPUpdate(conn)
+    conn.plugins[entry_dn('a')] = plugin_changing(entry_dn('b'))
+    updater._run_updates([
+        dict(dn=entry_dn('c'), updates=[description(b'old')]),
+        # b is prefetched, then changed by the modification of a
+        dict(dn=entry_dn('a'), updates=[description(b'new')]),
+        dict(dn=entry_dn('b'), updates=[replace_description(b'plugin',
+                                                            b'fixed')]),
+    ])
+    assert conn.calls[1:] == [
+        ('prefetch', [entry_dn('a'), entry_dn('b')]),
+        ('modify', entry_dn('a')),
+        ('prefetch', [entry_dn('b')]),
+        ('modify', entry_dn('b')),
+    ]
+    assert conn.entries[entry_dn('b')]['description'] == [b'fixed']
+
+
+def test_prefetch_add(conn):
+    updater = FakeLDAPUpdate(conn)
+    conn.plugins[entry_dn('new')] = plugin_changing(entry_dn('b'))
+    updater._run_updates([
+        dict(dn=entry_dn('c'), updates=[description(b'old')]),
+        dict(dn=entry_dn('new'), default=[
+            dict(attr='objectClass', value=b'top'),
+            dict(attr='objectClass', value=b'nsContainer'),
+            dict(attr='cn', value=b'new'),
+        ]),
+        dict(dn=entry_dn('b'), updates=[replace_description(b'plugin',
+                                                            b'fixed')]),
+    ])
+    assert conn.calls[1:] == [
+        ('prefetch', [entry_dn('new'), entry_dn('b')]),
+        ('add', entry_dn('new')),
+        ('prefetch', [entry_dn('b')]),
+        ('modify', entry_dn('b')),
+    ]
+    assert conn.entries[entry_dn('b')]['description'] == [b'fixed']
+
+
+def test_prefetch_plugin(conn):
+    def plugin():
+        plugin_changing(entry_dn('b'))(conn.entries)
+        return False, []
+
+    updater = FakeLDAPUpdate(conn, updaters={'plugin': plugin})
+    updater._prefetch_size = 8
+    updater._run_updates([
+        dict(dn=entry_dn('a'), updates=[description(b'old')]),
+        dict(plugin='plugin'),
+        dict(dn=entry_dn('b'), updates=[replace_description(b'plugin',
+                                                            b'fixed')]),
+    ])
+    assert conn.calls == [
+        ('prefetch', [entry_dn('a')]),
+        ('prefetch', [entry_dn('b')]),
+        ('modify', entry_dn('b')),
+    ]
+    assert conn.entries[entry_dn('b')]['description'] == [b'fixed']
+
+
+def test_index_task(conn):
+    for attr in ('uid', 'mail', 'cn'):
+        conn.entries[index_dn(attr)] = {
+            'objectClass': [b'top', b'nsIndex'],
+            'cn': [attr.encode('utf-8')],
+            'nsIndexType': [b'eq'],
+        }
+
+    def plugin():
+        conn.calls.append(('plugin',))
+        return False, []
+
+    updater = FakeLDAPUpdate(conn, updaters={'plugin': plugin})
+    index_update = dict(action='add', attr='nsIndexType', value=b'pres')
+    updater._run_updates([
+        dict(dn=index_dn('uid'), updates=[index_update]),
+        dict(dn=index_dn('mail'), updates=[index_update]),
+        # unchanged index
+        dict(dn=index_dn('cn'), updates=[
+            dict(action='add', attr='nsIndexType', value=b'eq')]),
+        dict(plugin='plugin'),
+        dict(dn=index_dn('cn'), updates=[index_update]),
+    ])
+    # one task indexes the attributes changed before the plugin runs
+    operations = [call for call in conn.calls if call[0] != 'prefetch']
+    assert operations == [
+        ('modify', index_dn('uid')),
+        ('modify', index_dn('mail')),
+        ('index', ('mail', 'uid')),
+        ('plugin',),
+        ('modify', index_dn('cn')),
+    ]
+
+    updater._run_index_task()
+    assert conn.calls[-1] == ('index', ('cn',))
+    updater._run_index_task()
+    assert conn.calls[-1] == ('index', ('cn',))
+    assert len([c for c in conn.calls if c[0] == 'index']) == 2
@@ -0,0 +1,201 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the service lookups of `ipaserver.masters` with a fake connection
+"""
+
+from __future__ import absolute_import
+
+import re
+
+import pytest
+
+from ipalib import api, errors
+from ipapython import ipaldap
+from ipapython.dn import DN
+from ipaserver import masters
+from ipatests.test_ipaserver.ldapfakes import make_entry
+
+pytestmark = pytest.mark.tier0
+
+MASTER1 = u'master1.ipa.test'
+MASTER2 = u'master2.ipa.test'
+MASTER3 = u'master3.ipa.test'
+
+
+def service_entry(service, server, *cfgstrings):
+    dn = DN(('cn', service), ('cn', server), api.env.container_masters,
+            api.env.basedn)
+    return make_entry(dn, cn=[service], ipaConfigString=list(cfgstrings))
+
+
+class FakeConnection(ipaldap.LDAPClient):
+    """
+    Connection returning the service entries of cn=masters
+
+    Service searches are answered by matching the cn and the enabled or
+    hidden configuration strings in the filter.
+    """
+    def __init__(self, entries, lastusn=1, truncated=False):
+        super(FakeConnection, self).__init__(None, no_schema=True)
+        self.ldap_uri = 'ldap://master1.ipa.test'
+        self.entries = entries
+        self.lastusn = lastusn
+        self.truncated = truncated
+        self.searches = []
+
+    def get_last_usn(self):
+        if self.lastusn is None:
+            return None
+        return (('lastusn', [str(self.lastusn)]),)
+
+    def find_entries(self, filter=None, attrs_list=None, base_dn=None,
+                     **kwargs):
+        assert base_dn == DN(api.env.container_masters, api.env.basedn)
+        self.searches.append(filter)
+        if filter == '(objectClass=ipaConfigObject)':
+            entries = self.entries
+        else:
+            cn = re.search(r'\(cn=([^)]*)\)', filter).group(1).lower()
+            entries = [
+                e for e in self.entries if e['cn'][0].lower() == cn and (
+                    'ipaConfigString=' not in filter or
+                    {masters.ENABLED_SERVICE, masters.HIDDEN_SERVICE} &
+                    set(e['ipaConfigString']))
+            ]
+        if not entries:
+            raise errors.NotFound(reason=u'no such entry')
+        return entries, self.truncated
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(masters.ServiceIndex, '_cache', {})
+
+
+def topology():
+    return [
+        service_entry(u'CA', MASTER1, masters.ENABLED_SERVICE),
+        service_entry(u'CA', MASTER2, masters.HIDDEN_SERVICE),
+        service_entry(u'CA', MASTER3, masters.CONFIGURED_SERVICE),
+        service_entry(u'KRA', MASTER3, masters.CONFIGURED_SERVICE),
+        service_entry(u'DNS', MASTER2, masters.ENABLED_SERVICE,
+                      u'startOrder 30'),
+        service_entry(u'DNS', MASTER3.upper(), masters.ENABLED_SERVICE),
+    ]
+
+
+@pytest.fixture(params=['index', 'no usn', 'truncated'])
+def conn(request):
+    if request.param == 'no usn':
+        return FakeConnection(topology(), lastusn=None)
+    elif request.param == 'truncated':
+        return FakeConnection(topology(), truncated=True)
+    return FakeConnection(topology())
+
+
+def find(svcname, conn, *preferred_hosts):
+    return masters.find_providing_servers(
+        svcname, conn, preferred_hosts=list(preferred_hosts), api=api)
+
+
+class TestLookups:
+    def test_enabled(self, conn):
+        assert find(u'CA', conn) == [MASTER1]
+        assert sorted(find(u'DNS', conn)) == [MASTER2, MASTER3]
+        assert find(u'KRA', conn) == []
+        assert find(u'OTPD', conn) == []
+        assert masters.find_providing_server(
+            u'CA', conn, api=api) == MASTER1
+        assert masters.find_providing_server(
+            u'KRA', conn, api=api) is None
+
+    def test_hidden(self, conn):
+        # hidden services are only used on preferred hosts
+        assert find(u'CA', conn, MASTER2) == [MASTER2, MASTER1]
+        assert find(u'CA', conn, MASTER2.upper()) == [MASTER2, MASTER1]
+        # configured services are not used at all
+        assert find(u'CA', conn, MASTER3) == [MASTER1]
+
+    def test_preferred(self, conn):
+        assert find(u'DNS', conn, MASTER3) == [MASTER3, MASTER2]
+        assert find(u'DNS', conn, MASTER2, MASTER3) == [MASTER2, MASTER3]
+        assert find(u'DNS', conn, MASTER1, MASTER3) == [MASTER3, MASTER2]
+
+    def test_is_service_enabled(self, conn):
+        # the configuration strings are ignored
+        assert masters.is_service_enabled(u'CA', conn, api=api)
+        assert masters.is_service_enabled(u'KRA', conn, api=api)
+        assert not masters.is_service_enabled(u'OTPD', conn, api=api)
+
+    def test_unknown_service(self, conn):
+        with pytest.raises(ValueError):
+            find(u'NTP', conn)
+        with pytest.raises(ValueError):
+            masters.is_service_enabled(u'NTP', conn, api=api)
+
+    def test_no_masters(self):
+        conn = FakeConnection([])
+        assert find(u'CA', conn) == []
+        assert not masters.is_service_enabled(u'CA', conn, api=api)
+        assert len(conn.searches) == 1
+
+
+def lookup_all(conn):
+    find(u'CA', conn)
+    find(u'DNS', conn, MASTER2)
+    masters.is_service_enabled(u'KRA', conn, api=api)
+
+
+class TestServiceIndex:
+    def test_cached(self):
+        conn = FakeConnection(topology())
+        lookup_all(conn)
+        lookup_all(conn)
+        assert conn.searches == ['(objectClass=ipaConfigObject)']
+
+        # another connection to the same server shares the index
+        other = FakeConnection(topology())
+        lookup_all(other)
+        assert other.searches == []
+
+    def test_lastusn(self):
+        conn = FakeConnection(topology())
+        assert find(u'KRA', conn) == []
+
+        conn.entries.append(
+            service_entry(u'KRA', MASTER1, masters.ENABLED_SERVICE))
+        assert find(u'KRA', conn) == []
+        conn.lastusn += 1
+        assert find(u'KRA', conn) == [MASTER1]
+        assert len(conn.searches) == 2
+
+    def test_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(masters.time, 'time', lambda: now[0])
+        conn = FakeConnection(topology())
+        lookup_all(conn)
+        now[0] += masters.SERVICE_INDEX_TTL - 1
+        lookup_all(conn)
+        assert len(conn.searches) == 1
+        now[0] += 1
+        lookup_all(conn)
+        assert len(conn.searches) == 2
+
+    def test_no_usn(self):
+        conn = FakeConnection(topology(), lastusn=None)
+        lookup_all(conn)
+        lookup_all(conn)
+        # every lookup loads the index without caching it
+        assert conn.searches == ['(objectClass=ipaConfigObject)'] * 6
+        assert not masters.ServiceIndex._cache
+
+    def test_truncated(self):
+        conn = FakeConnection(topology(), truncated=True)
+        lookup_all(conn)
+        # every lookup searches for its service
+        assert conn.searches.count('(objectClass=ipaConfigObject)') == 3
+        assert len(conn.searches) == 6
+        assert not masters.ServiceIndex._cache
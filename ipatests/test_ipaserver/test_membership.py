@@ -0,0 +1,200 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+tests for the membership graph used to compute indirect membership
+"""
+
+from __future__ import absolute_import
+
+import re
+
+import pytest
+
+from ipalib import errors
+from ipalib.request import context
+from ipapython.dn import DN
+from ipaserver.membership import MembershipCache, MembershipGraph
+from ipatests.test_ipaserver.ldapfakes import make_entry
+
+BASE_DN = DN(('dc', 'example'), ('dc', 'test'))
+
+
+def group_dn(name):
+    return DN(('cn', name), ('cn', 'groups'), ('cn', 'accounts'), BASE_DN)
+
+
+def user_dn(name):
+    return DN(('uid', name), ('cn', 'users'), ('cn', 'accounts'), BASE_DN)
+
+
+def raw(dn):
+    return str(dn).encode('utf-8')
+
+
+def usn_entry(dn, usn, **attrs):
+    return make_entry(dn, entryusn=[str(usn)], **attrs)
+
+
+class FakeLDAP:
+    """Serves entries with entryUSN not lower than the one in the filter"""
+    MATCH_ALL = '&'
+    MATCH_ANY = '|'
+
+    def __init__(self, *entries):
+        self.entries = list(entries)
+        self.searches = []
+
+    def combine_filters(self, filters, rules):
+        return '(%s%s)' % (rules, ''.join(filters))
+
+    def iter_entries(self, search_filter, attrs_list, base_dn, **kwargs):
+        self.searches.append(search_filter)
+        match = re.search(r'\(entryusn>=(\d+)\)', search_filter)
+        min_usn = int(match.group(1)) if match else 0
+        entries = [
+            e for e in self.entries
+            if int(e.raw['entryusn'][0]) >= min_usn
+        ]
+        if not entries:
+            raise errors.NotFound(reason='no such entry')
+        return iter(entries)
+
+
+@pytest.fixture
+def graph():
+    graph = MembershipGraph(BASE_DN)
+    # admins -> editors -> [alice, viewers -> bob], viewers -> admins
+    graph.add_entry(usn_entry(group_dn('admins'), 10,
+                              member=[group_dn('editors')]))
+    graph.add_entry(usn_entry(group_dn('editors'), 11,
+                              member=[user_dn('alice'), group_dn('viewers')]))
+    graph.add_entry(usn_entry(group_dn('viewers'), 12,
+                              member=[user_dn('bob'), group_dn('admins')]))
+    graph.add_entry(usn_entry(DN(('cn', 'allow_all'), BASE_DN), 13,
+                              memberuser=[group_dn('viewers')]))
+    return graph
+
+
+@pytest.mark.tier0
+class TestMembershipGraph:
+    def test_usn(self, graph):
+        assert graph.usn == 13
+        assert graph.timestamp is None
+
+    def test_indirect_members(self, graph):
+        indirect = graph.get_indirect_members(group_dn('admins'))
+        assert indirect == {
+            raw(user_dn('alice')), raw(group_dn('viewers')),
+            raw(user_dn('bob')), raw(group_dn('admins')),
+            raw(group_dn('editors')),
+        }
+        assert graph.get_indirect_members(group_dn('viewers')) == {
+            raw(group_dn('editors')), raw(user_dn('alice')),
+            raw(group_dn('viewers')), raw(user_dn('bob')),
+            raw(group_dn('admins')),
+        }
+        assert graph.get_indirect_members(user_dn('bob')) == set()
+
+    def test_rule_members(self, graph):
+        rule_dn = DN(('cn', 'allow_all'), BASE_DN)
+        assert graph.get_indirect_members(rule_dn) == {
+            raw(user_dn('bob')), raw(group_dn('admins')),
+            raw(group_dn('editors')), raw(user_dn('alice')),
+            raw(group_dn('viewers')),
+        }
+
+    def test_containers(self, graph):
+        assert graph.is_direct_member(user_dn('bob'), raw(group_dn('viewers')))
+        assert not graph.is_direct_member(
+            user_dn('bob'), raw(group_dn('editors')))
+        assert graph.is_direct_member(
+            group_dn('viewers'), raw(DN(('cn', 'allow_all'), BASE_DN)))
+        # DN values are compared case-insensitively
+        assert graph.is_direct_member(
+            user_dn('alice'), raw(group_dn('editors')).upper())
+
+    def test_reload_entry(self, graph):
+        graph.get_indirect_members(group_dn('admins'))
+        graph.add_entry(usn_entry(group_dn('editors'), 14,
+                                  member=[user_dn('alice')]))
+        assert graph.usn == 14
+        assert graph.get_indirect_members(group_dn('admins')) == {
+            raw(user_dn('alice')),
+        }
+
+
+@pytest.mark.tier0
+class TestMembershipCache:
+    def test_load_and_refresh(self):
+        ldap = FakeLDAP(
+            usn_entry(group_dn('admins'), 10, member=[group_dn('editors')]),
+            usn_entry(group_dn('editors'), 11, member=[user_dn('alice')]),
+        )
+        cache = MembershipCache()
+        graph = cache.get_graph(ldap, BASE_DN)
+        assert len(ldap.searches) == 1
+        assert graph.get_indirect_members(group_dn('admins')) == {
+            raw(user_dn('alice')),
+        }
+
+        # unchanged tree, the refresh reads nothing
+        assert cache.get_graph(ldap, BASE_DN) is graph
+        assert len(ldap.searches) == 2
+        assert '(entryusn>=12)' in ldap.searches[-1]
+
+        # only the modified entry is read again
+        ldap.entries[1] = usn_entry(group_dn('editors'), 12,
+                                    member=[user_dn('bob')])
+        assert cache.get_graph(ldap, BASE_DN) is graph
+        assert graph.usn == 12
+        assert graph.get_indirect_members(group_dn('admins')) == {
+            raw(user_dn('bob')),
+        }
+
+        # a container which lost its last member
+        ldap.entries[1] = usn_entry(group_dn('editors'), 13)
+        cache.get_graph(ldap, BASE_DN)
+        assert graph.get_indirect_members(group_dn('admins')) == set()
+        assert not graph.is_direct_member(
+            user_dn('bob'), raw(group_dn('editors')))
+
+    def test_principals(self):
+        ldap = FakeLDAP(
+            usn_entry(group_dn('admins'), 10, member=[user_dn('alice')]),
+        )
+        cache = MembershipCache()
+        try:
+            context.principal = 'alice@EXAMPLE.TEST'
+            graph = cache.get_graph(ldap, BASE_DN)
+            context.principal = 'bob@EXAMPLE.TEST'
+            assert cache.get_graph(ldap, BASE_DN) is not graph
+        finally:
+            del context.principal
+
+    def test_evict(self):
+        ldap = FakeLDAP(
+            usn_entry(group_dn('admins'), 10,
+                      member=[user_dn('alice'), user_dn('bob')]),
+        )
+        cache = MembershipCache(max_graphs=2, max_values=3)
+        try:
+            for name in ('alice', 'bob', 'carol'):
+                context.principal = name
+                cache.get_graph(ldap, BASE_DN)
+                # the graph in use is never evicted
+                assert list(cache.graphs) == [(name, str(BASE_DN))]
+        finally:
+            del context.principal
+
+        cache = MembershipCache(max_graphs=2)
+        try:
+            for name in ('alice', 'bob', 'carol'):
+                context.principal = name
+                cache.get_graph(ldap, BASE_DN)
+        finally:
+            del context.principal
+        assert list(cache.graphs) == [
+            ('bob', str(BASE_DN)), ('carol', str(BASE_DN)),
+        ]
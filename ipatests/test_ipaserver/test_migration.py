@@ -0,0 +1,263 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the checkpoints and the default group updates of the migrate_ds command
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ipalib import errors
+from ipapython import ipaldap
+from ipapython.dn import DN
+from ipaserver.plugins.migration import (
+    _Checkpoint, _update_mark, _mark_values, _lower_mark,
+    _update_default_group)
+from ipatests.test_ipaserver.ldapfakes import FakeGroupLDAP, make_entry
+
+pytestmark = pytest.mark.tier0
+
+LDAPURI = u'ldap://ds.example.test'
+BASE_DN = DN(('dc', 'example'), ('dc', 'test'))
+
+
+class FakeLDAP(ipaldap.LDAPClient):
+    def __init__(self):
+        super(FakeLDAP, self).__init__(None, no_schema=True)
+        self.entries = {}
+        self.saved = []
+
+    def get_entry(self, dn, attrs_list=None, **kwargs):
+        try:
+            return self.entries[dn]
+        except KeyError:
+            raise errors.NotFound(reason=u'no such entry')
+
+    def add_entry(self, entry):
+        self.entries[entry.dn] = entry
+        self.saved.append(list(entry.get('ipaconfigstring', [])))
+
+    def update_entry(self, entry):
+        self.saved.append(list(entry['ipaconfigstring']))
+
+
+def test_position():
+    ldap = FakeLDAP()
+    checkpoint = _Checkpoint(ldap, LDAPURI, BASE_DN)
+    checkpoint.load()
+    checkpoint.start('user')
+
+    # entries done out of order, the position only advances over the
+    # entries without a gap before them
+    order = [1, 2, 0] + list(range(4, 101))
+    for index in order:
+        checkpoint.done(index, DN(('uid', 'user%d' % index)))
+    assert checkpoint.count == 3
+    assert ldap.saved == []
+
+    checkpoint.done(3, DN(('uid', 'user3')))
+    assert checkpoint.count == 101
+    assert ldap.saved[-1][1:] == [u'user:position:101:uid=user100']
+
+    resumed = _Checkpoint(ldap, LDAPURI, BASE_DN)
+    resumed.load()
+    assert resumed.get_position('user') == (101, DN(('uid', 'user100')))
+    assert resumed.get_position('group') == (0, None)
+
+    resumed.start('user', 101, DN(('uid', 'user100')))
+    resumed.finish(('entryusn', u'1234'))
+    assert ldap.saved[-1][1:] == [u'user:entryusn:1234']
+
+    other = _Checkpoint(ldap, LDAPURI, BASE_DN)
+    other.load()
+    assert other.get_position('user') == (0, None)
+    assert other.get_filter('user') == u'(entryusn>=1235)'
+    assert other.get_filter('group') is None
+
+
+def test_update_mark():
+    entry = make_entry(
+        DN(('uid', 'user1')), uid=[b'user1'], entryusn=[b'15'],
+        modifytimestamp=[b'20260101000000Z'])
+    assert _update_mark(entry, None) == ('entryusn', u'15')
+    assert list(entry) == ['uid']
+
+    entry = make_entry(DN(('uid', 'user2')), entryusn=[b'9'])
+    assert _update_mark(entry, ('entryusn', u'15')) == ('entryusn', u'15')
+    entry = make_entry(DN(('uid', 'user3')), entryusn=[b'100'])
+    assert _update_mark(entry, ('entryusn', u'15')) == ('entryusn', u'100')
+
+    entry = make_entry(
+        DN(('uid', 'user4')), modifytimestamp=[b'20260102000000Z'])
+    assert _update_mark(entry, ('modifytimestamp', u'20260101000000Z')) == (
+        'modifytimestamp', u'20260102000000Z')
+
+
+def test_mark_values():
+    entry = make_entry(
+        DN(('uid', 'user1')), uid=[b'user1'], entryusn=[b'15'],
+        modifytimestamp=[b'20260101000000Z'])
+    assert _mark_values(entry) == {
+        'entryusn': u'15', 'modifytimestamp': u'20260101000000Z'}
+    assert 'entryusn' in entry
+    assert _mark_values(make_entry(DN(('uid', 'user2')))) == {}
+
+
+def test_lower_mark():
+    mark = ('entryusn', u'100')
+    assert _lower_mark(mark, []) == mark
+    assert _lower_mark(None, [{'entryusn': u'15'}]) is None
+    # the filter of the next migration matches USNs above the mark
+    assert _lower_mark(mark, [{'entryusn': u'50'}, {'entryusn': u'20'},
+                              {'modifytimestamp': u'20260101000000Z'}]) == (
+        'entryusn', u'19')
+    assert _lower_mark(mark, [{'entryusn': u'100'}]) == ('entryusn', u'99')
+
+    mark = ('modifytimestamp', u'20260103000000Z')
+    assert _lower_mark(mark, [{'modifytimestamp': u'20260102000000Z'}]) == (
+        'modifytimestamp', u'20260102000000Z')
+    assert _lower_mark(mark, [{'modifytimestamp': u'20260103000000Z'}]) == (
+        mark)
+    assert _lower_mark(mark, [{'entryusn': u'1'}]) == mark
+
+    checkpoint = _Checkpoint(FakeLDAP(), LDAPURI, BASE_DN)
+    checkpoint.start('user')
+    checkpoint.finish(_lower_mark(('entryusn', u'100'), [{'entryusn': u'20'}]))
+    assert checkpoint.get_filter('user') == u'(entryusn>=20)'
+
+
+def test_not_migrated():
+    ldap = FakeLDAP()
+    checkpoint = _Checkpoint(ldap, LDAPURI, BASE_DN)
+    checkpoint.start('user')
+    for index in range(100):
+        if index in (20, 50):
+            checkpoint.not_migrated({'entryusn': u'%d' % (index + 1000)})
+        checkpoint.done(index, DN(('uid', 'user%d' % index)))
+    assert ldap.saved[-1][1:] == [
+        u'user:position:100:uid=user99', u'user:failed:entryusn:1020']
+
+    # the entries which failed before the interruption are migrated again
+    # by the next incremental migration
+    resumed = _Checkpoint(ldap, LDAPURI, BASE_DN)
+    resumed.load()
+    resumed.start('user', 100, DN(('uid', 'user99')))
+    resumed.not_migrated({'entryusn': u'1150'})
+    resumed.finish(('entryusn', u'1200'))
+    assert ldap.saved[-1][1:] == [u'user:entryusn:1019']
+    assert resumed.get_filter('user') == u'(entryusn>=1020)'
+
+    # a new migration forgets them
+    resumed.start('group')
+    resumed.not_migrated({'modifytimestamp': u'20260102000000Z'})
+    resumed.start('group')
+    resumed.finish(('modifytimestamp', u'20260103000000Z'))
+    assert resumed.get_filter('group') == (
+        u'(modifytimestamp>=20260103000000Z)')
+
+
+GROUP_DN = DN(('cn', 'ipausers'), ('cn', 'groups'), ('cn', 'accounts'),
+              BASE_DN)
+
+
+class FakeUsersLDAP(FakeGroupLDAP):
+    """
+    Users and members of the default group
+
+    With lagging_memberof, the search for users which are not members of
+    the group also returns users which were added to it.
+    """
+
+    def __init__(self, lagging_memberof=False):
+        super(FakeUsersLDAP, self).__init__(GROUP_DN)
+        self.lagging_memberof = lagging_memberof
+        self.users = set()
+        self.searching = 0
+        self.concurrent_searches = 0
+        self.searches = 0
+
+    def add_user(self, dn):
+        with self.lock:
+            self.users.add(dn)
+
+    def find_entries(self, filter, attrs_list, base_dn, **kwargs):
+        with self.lock:
+            self.searches += 1
+            self.searching += 1
+            if self.searching > 1:
+                self.concurrent_searches += 1
+        try:
+            time.sleep(0.01)
+            with self.lock:
+                if self.lagging_memberof:
+                    dns = set(self.users)
+                else:
+                    dns = self.users - self.members
+        finally:
+            with self.lock:
+                self.searching -= 1
+        if not dns:
+            raise errors.NotFound(reason=u'no such entry')
+        return [self.make_entry(dn) for dn in sorted(dns)], False
+
+
+def default_group_context():
+    return dict(def_group_dn=GROUP_DN, def_group_lock=threading.Lock(),
+                def_group_next=0, migrate_cnt=0)
+
+
+def test_default_group():
+    ldap = FakeUsersLDAP()
+    ctx = default_group_context()
+    for i in range(250):
+        ldap.add_user(DN(('uid', 'user%d' % i), BASE_DN))
+        _update_default_group(ldap, ctx, False)
+        ctx['migrate_cnt'] += 1
+    # the users are added every 100 users
+    assert ldap.searches == 3
+    assert len(ldap.members) == 201
+
+    _update_default_group(ldap, ctx, True)
+    assert ldap.members == ldap.users
+
+
+def test_default_group_workers():
+    ldap = FakeUsersLDAP()
+    ctx = default_group_context()
+    lock = threading.Lock()
+
+    def migrate_user(i):
+        ldap.add_user(DN(('uid', 'user%d' % i), BASE_DN))
+        _update_default_group(ldap, ctx, False)
+        with lock:
+            ctx['migrate_cnt'] += 1
+
+    with ThreadPoolExecutor(8) as executor:
+        for result in executor.map(migrate_user, range(1000)):
+            assert result is None
+
+    # no two workers update the group at the same time, and only one of
+    # the users migrated concurrently updates it
+    assert ldap.concurrent_searches == 0
+    assert 1 <= ldap.searches <= 10
+
+    _update_default_group(ldap, ctx, True)
+    assert ldap.members == ldap.users
+
+
+def test_default_group_members():
+    ldap = FakeUsersLDAP(lagging_memberof=True)
+    ctx = default_group_context()
+    for i in range(3):
+        ldap.add_user(DN(('uid', 'user%d' % i), BASE_DN))
+    ldap.members.add(DN(('uid', 'user1'), BASE_DN))
+
+    _update_default_group(ldap, ctx, True)
+    assert ldap.members == ldap.users
@@ -21,6 +21,7 @@
 Test the `ipaserver.rpc` module.
 """
 
+from io import BytesIO
 import json
 import pytest
 
@@ -262,3 +263,44 @@ class test_jsonserver(PluginTester):
         options = dict(givenname=u'John', sn='Doe')
         d = dict(method=u'user_add', params=(args, options), id=18)
         assert o.unmarshal(json.dumps(d)) == (u'user_add', args, options, 18)
+
+    def test_call(self, monkeypatch):
+        """
+        Test the `ipaserver.rpcserver.jsonserver.__call__` method.
+        """
+        o, _api, _home = self.instance('Backend', in_server=True)
+
+        def call(method):
+            body = json.dumps(
+                dict(method=method, params=[[], {}], id=1)).encode('utf-8')
+            environ = {
+                'REQUEST_METHOD': 'POST',
+                'CONTENT_TYPE': 'application/json',
+                'CONTENT_LENGTH': str(len(body)),
+                'HTTP_REFERER': 'https://ipa.example.test/ipa/ui',
+                'wsgi.input': BytesIO(body),
+            }
+            s = StartResponse()
+            response = b''.join(o(environ, s))
+            return s.status, response
+
+        monkeypatch.setitem(
+            o._system_commands, 'test.entries',
+            lambda self: dict(result=[dict(cn=[u'entry%d' % i])
+                                      for i in range(3)]))
+        monkeypatch.setitem(
+            o._system_commands, 'test.unserializable',
+            lambda self: dict(result=[dict(cn=[u'entry']),
+                                      dict(cn=[object()])]))
+
+        status, response = call('test.entries')
+        assert status == '200 Success'
+        response = json.loads(response.decode('utf-8'))
+        assert response['error'] is None
+        assert response['result'] == dict(
+            result=[dict(cn=[u'entry%d' % i]) for i in range(3)])
+
+        # the response is not partially sent with the success status
+        status, response = call('test.unserializable')
+        assert status == '500 Internal Server Error'
+        assert response == b'500 Internal Server Error'
@@ -24,8 +24,8 @@ Test the `ipaserver/plugins/batch.py` module.
 from ipalib import api
 from ipatests.test_xmlrpc import objectclasses
 from ipatests.util import Fuzzy, assert_deepequal
-from ipatests.test_xmlrpc.xmlrpc_test import (Declarative, fuzzy_digits,
-                                              fuzzy_uuid)
+from ipatests.test_xmlrpc.xmlrpc_test import (Declarative, XMLRPC_test,
+                                              fuzzy_digits, fuzzy_uuid)
 from ipapython.dn import DN
 import pytest
 
@@ -264,4 +264,90 @@ class test_batch(Declarative):
             ),
         ),
 
+        dict(
+            desc='Execute read-only commands in parallel with timing',
+            command=('batch', [
+                dict(method=u'group_add',
+                    params=([group1], dict(description=u'Test desc 1'))),
+                dict(method=u'group_show', params=([group1], dict())),
+                dict(method=u'group_find', params=([group1], dict())),
+                dict(method=u'group_del', params=([group1], dict())),
+                dict(method=u'group_show', params=([group1], dict())),
+            ], dict(parallel=True, timing=True)),
+            expected=dict(
+                count=5,
+                results=deepequal_list(
+                    dict(
+                        value=group1,
+                        summary=u'Added group "testgroup1"',
+                        result=Fuzzy(type=dict),
+                        error=None,
+                        duration=Fuzzy(type=float)),
+                    dict(
+                        value=group1,
+                        summary=None,
+                        result=dict(
+                            cn=[group1],
+                            description=[u'Test desc 1'],
+                            gidnumber=[fuzzy_digits],
+                            dn=DN(('cn', 'testgroup1'),
+                                  ('cn', 'groups'),
+                                  ('cn', 'accounts'),
+                                  api.env.basedn),
+                            ),
+                        error=None,
+                        duration=Fuzzy(type=float)),
+                    dict(
+                        count=1,
+                        truncated=False,
+                        summary=u'1 group matched',
+                        result=Fuzzy(type=(list, tuple)),
+                        error=None,
+                        duration=Fuzzy(type=float)),
+                    dict(
+                        summary=u'Deleted group "%s"' % group1,
+                        result=dict(failed=[]),
+                        value=[group1],
+                        error=None,
+                        duration=Fuzzy(type=float)),
+                    dict(
+                        error=u'%s: group not found' % group1,
+                        error_name=u'NotFound',
+                        error_code=4001,
+                        error_kw=dict(
+                            reason=u'%s: group not found' % group1,
+                        ),
+                        duration=Fuzzy(type=float)),
+                ),
+            ),
+        ),
+
     ]
+
+
+@pytest.mark.tier1
+class test_batch_parallel(XMLRPC_test):
+    """
+    Test that commands executed by the worker threads run as the caller
+    """
+
+    def test_caller_principal(self):
+        result = api.Command.batch([
+            dict(method=u'user_find', params=([], dict(whoami=True))),
+            dict(method=u'vault_find', params=([], dict())),
+            dict(method=u'user_find', params=([], dict(whoami=True))),
+        ], parallel=True)
+        assert result['count'] == 3
+        user_find1, vault_find, user_find2 = result['results']
+
+        for user_find in (user_find1, user_find2):
+            assert user_find['error'] is None
+            assert user_find['count'] == 1
+            assert user_find['result'][0]['uid'] == [u'admin']
+
+        # the container of the vaults of the caller is found, the command
+        # fails only if KRA is not installed
+        if api.Command.kra_is_enabled()['result']:
+            assert vault_find['error'] is None
+        else:
+            assert vault_find['error_name'] == u'InvocationError'
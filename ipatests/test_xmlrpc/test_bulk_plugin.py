@@ -0,0 +1,214 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the bulk add commands built on `LDAPBulkCreate`.
+"""
+
+import pytest
+
+from ipalib import api
+from ipatests.test_xmlrpc.xmlrpc_test import Declarative, fuzzy_password
+
+group1 = u'testbulkgroup1'
+group2 = u'testbulkgroup2'
+
+user1 = u'testbulkuser1'
+user2 = u'testbulkuser2'
+
+dnszone = u'bulk-zone.test'
+dnszone_rname = u'root.%s.' % dnszone
+revzone = u'31.16.172.in-addr.arpa.'
+host1 = u'testbulkhost1.%s' % dnszone
+host1_ip = u'172.16.31.10'
+host2 = u'testbulkhost2.%s' % dnszone
+
+
+@pytest.mark.tier1
+class test_group_add_bulk(Declarative):
+
+    cleanup_commands = [
+        ('group_del', [group1, group2], {'continue': True}),
+    ]
+
+    tests = [
+
+        dict(
+            desc='Add groups %r and %r in bulk' % (group1, group2),
+            command=('group_add_bulk', [[
+                dict(cn=group1, description=u'Test desc 1'),
+                dict(cn=group2, description=u'Test desc 2', nonposix=True),
+            ]], {}),
+            expected=dict(
+                count=2,
+                failed=0,
+                summary=u'2 groups added',
+                result=[
+                    dict(value=group1, error=None),
+                    dict(value=group2, error=None),
+                ],
+            ),
+        ),
+
+        dict(
+            desc='Add existing, duplicate and invalid groups in bulk',
+            command=('group_add_bulk', [[
+                dict(cn=group1),
+                dict(cn=u'testbulkgroup3', gidnumber=u'abc'),
+                dict(cn=u'testbulkgroup3', nonsense=True),
+            ]], {}),
+            expected=dict(
+                count=0,
+                failed=3,
+                summary=u'0 groups added',
+                result=[
+                    dict(
+                        value=group1,
+                        error=u'group with name "%s" already exists' % group1,
+                        error_code=4002,
+                        error_name=u'DuplicateEntry',
+                    ),
+                    dict(
+                        value=u'testbulkgroup3',
+                        error=u"invalid 'gid': must be an integer",
+                        error_code=3008,
+                        error_name=u'ConversionError',
+                    ),
+                    dict(
+                        value=u'testbulkgroup3',
+                        error=u'Unknown option: nonsense',
+                        error_code=3005,
+                        error_name=u'OptionError',
+                    ),
+                ],
+            ),
+        ),
+
+    ]
+
+
+@pytest.mark.tier1
+class test_user_add_bulk(Declarative):
+
+    cleanup_commands = [
+        ('user_del', [user1, user2], {'continue': True}),
+    ]
+
+    tests = [
+
+        dict(
+            desc='Add users %r and %r in bulk' % (user1, user2),
+            command=('user_add_bulk', [[
+                dict(uid=user1, givenname=u'Test', sn=u'User1', random=True),
+                dict(uid=user2, givenname=u'Test', sn=u'User2',
+                     noprivate=True, gidnumber=1000),
+                dict(uid=user1, givenname=u'Test', sn=u'User1'),
+            ]], {}),
+            expected=dict(
+                count=2,
+                failed=1,
+                summary=u'2 users added',
+                result=[
+                    dict(value=user1, error=None,
+                         randompassword=fuzzy_password),
+                    dict(value=user2, error=None),
+                    dict(
+                        value=user1,
+                        error=u'user with name "%s" already exists' % user1,
+                        error_code=4002,
+                        error_name=u'DuplicateEntry',
+                    ),
+                ],
+            ),
+        ),
+
+        dict(
+            desc='Check that %r is in the default group' % user1,
+            command=('user_show', [user1], {}),
+            expected=lambda got, output: (
+                got is None and
+                output['result']['memberof_group'] == [u'ipausers']),
+        ),
+
+        dict(
+            desc='Check that %r is in the default group and has no '
+                 'description' % user2,
+            command=('user_show', [user2], {'all': True}),
+            expected=lambda got, output: (
+                got is None and
+                output['result']['memberof_group'] == [u'ipausers'] and
+                'description' not in output['result']),
+        ),
+
+    ]
+
+
+@pytest.mark.tier1
+@pytest.mark.skipif(
+    not api.Command.dns_is_enabled()['result'], reason='DNS not configured')
+class test_host_add_bulk(Declarative):
+
+    cleanup_commands = [
+        ('host_del', [host1, host2], {'continue': True, 'updatedns': True}),
+        ('dnszone_del', [dnszone, revzone], {'continue': True}),
+    ]
+
+    tests = [
+
+        dict(
+            desc='Create zone %r' % dnszone,
+            command=('dnszone_add', [dnszone],
+                     {'idnssoarname': dnszone_rname}),
+            expected=lambda got, output: got is None,
+        ),
+
+        dict(
+            desc='Create reverse zone %r' % revzone,
+            command=('dnszone_add', [revzone],
+                     {'idnssoarname': dnszone_rname}),
+            expected=lambda got, output: got is None,
+        ),
+
+        dict(
+            desc='Add hosts %r and %r in bulk' % (host1, host2),
+            command=('host_add_bulk', [[
+                dict(fqdn=host1, ip_address=host1_ip, random=True),
+                dict(fqdn=host2, force=True),
+                dict(fqdn=host2, force=True),
+            ]], {}),
+            expected=dict(
+                count=2,
+                failed=1,
+                summary=u'2 hosts added',
+                result=[
+                    dict(value=host1, error=None,
+                         randompassword=fuzzy_password),
+                    dict(value=host2, error=None),
+                    dict(
+                        value=host2,
+                        error=u'host with name "%s" already exists' % host2,
+                        error_code=4002,
+                        error_name=u'DuplicateEntry',
+                    ),
+                ],
+            ),
+        ),
+
+        dict(
+            desc='Check the A record of %r' % host1,
+            command=('dnsrecord_show', [dnszone, u'testbulkhost1'], {}),
+            expected=lambda got, output: (
+                got is None and
+                output['result']['arecord'] == [host1_ip]),
+        ),
+
+        dict(
+            desc='Check the PTR record of %r' % host1,
+            command=('dnsrecord_show', [revzone, u'10'], {}),
+            expected=lambda got, output: (
+                got is None and
+                output['result']['ptrrecord'] == [host1 + u'.']),
+        ),
+
+    ]
@@ -0,0 +1,237 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the cache of compiled HBAC rules and the group lookups of hbactest
+"""
+
+from __future__ import absolute_import
+
+import pytest
+
+pytest.importorskip('pyhbac')
+
+# pylint: disable=wrong-import-position
+from ipalib import api, errors
+from ipalib.request import context
+from ipapython import ipaldap
+from ipapython.dn import DN
+from ipaserver.plugins import hbactest
+
+pytestmark = pytest.mark.tier0
+
+
+def rule_dn(name):
+    return DN(('ipaUniqueID', name), api.env.container_hbac, api.env.basedn)
+
+
+def group_dn(name):
+    return DN(('cn', name), api.env.container_group, api.env.basedn)
+
+
+def hostgroup_dn(name):
+    return DN(('cn', name), api.env.container_hostgroup, api.env.basedn)
+
+
+class FakeLDAP(ipaldap.LDAPClient):
+    """
+    Directory with HBAC rule, user and host entries
+
+    Every modification increases the last USN, ``usn`` of a rule is its
+    entryUSN.
+    """
+    def __init__(self):
+        super(FakeLDAP, self).__init__(None, no_schema=True)
+        self.ldap_uri = 'ldap://master1.ipa.test'
+        self.lastusn = 1
+        self.rules = {}
+        self.entries = {}
+        self.searches = 0
+
+    def get_last_usn(self):
+        if self.lastusn is None:
+            return None
+        return (('lastusn', [str(self.lastusn)]),)
+
+    def set_rule(self, name, enabled=True, **attrs):
+        if self.lastusn is not None:
+            self.lastusn += 1
+        self.rules[name] = dict(
+            cn=[name], ipaenabledflag=[enabled], usn=self.lastusn, **attrs)
+
+    def delete_rule(self, name):
+        if self.lastusn is not None:
+            self.lastusn += 1
+        del self.rules[name]
+
+    def get_entries(self, base_dn, scope=None, filter=None, attrs_list=None,
+                    **kwargs):
+        assert base_dn == DN(api.env.container_hbac, api.env.basedn)
+        assert filter == '(objectclass=ipahbacrule)'
+        self.searches += 1
+        if not self.rules:
+            raise errors.NotFound(reason=u'no such entry')
+        return [
+            self.make_entry(rule_dn(name), entryusn=[str(rule['usn'])])
+            for name, rule in self.rules.items()
+        ]
+
+    def get_entry(self, dn, attrs_list=None, **kwargs):
+        assert attrs_list == ['memberof']
+        try:
+            return self.make_entry(dn, memberof=self.entries[dn])
+        except KeyError:
+            raise errors.NotFound(reason=u'no such entry')
+
+
+class FakeAPI:
+    env = api.env
+
+    def __init__(self, ldap):
+        self.compiled = []
+
+        class Backend:
+            ldap2 = ldap
+
+        class Command:
+            @staticmethod
+            def hbacrule_find(sizelimit=None, no_members=True):
+                assert not no_members
+                self.compiled.append(sizelimit)
+                rules = [
+                    {k: v for k, v in rule.items() if k != 'usn'}
+                    for rule in ldap.rules.values()
+                ]
+                return dict(result=rules[:sizelimit])
+
+        self.Backend = Backend
+        self.Command = Command
+
+
+@pytest.fixture
+def ldap():
+    ldap = FakeLDAP()
+    ldap.set_rule(u'allow_all', usercategory=[u'all'], hostcategory=[u'all'],
+                  servicecategory=[u'all'])
+    ldap.set_rule(u'admins_ssh', enabled=False, memberuser_group=[u'admins'],
+                  memberservice_hbacsvc=[u'sshd'])
+    return ldap
+
+
+@pytest.fixture
+def fake_api(ldap):
+    return FakeAPI(ldap)
+
+
+@pytest.fixture
+def cache():
+    return hbactest._HBACRuleCache()
+
+
+def rule_names(cache, fake_api, sizelimit=None):
+    return sorted(
+        (rule.name, enabled)
+        for enabled, rule in cache.get_rules(fake_api, sizelimit)
+    )
+
+
+class TestHBACRuleCache:
+    def test_compiled(self, cache, fake_api, ldap):
+        for _i in range(3):
+            assert rule_names(cache, fake_api) == [
+                (u'admins_ssh', False), (u'allow_all', True),
+            ]
+        # the rules are shared in enabled state
+        assert all(rule.enabled for _enabled, rule in
+                   cache.get_rules(fake_api))
+        assert fake_api.compiled == [None]
+        # the HBAC rules are not searched while nothing changed
+        assert ldap.searches == 1
+
+        # size limits are compiled separately
+        assert len(rule_names(cache, fake_api, 1)) == 1
+        assert fake_api.compiled == [None, 1]
+
+    def test_other_change(self, cache, fake_api, ldap):
+        rule_names(cache, fake_api)
+        ldap.lastusn += 1
+        rule_names(cache, fake_api)
+        rule_names(cache, fake_api)
+        assert ldap.searches == 2
+        assert fake_api.compiled == [None]
+
+    def test_rule_changes(self, cache, fake_api, ldap):
+        rule_names(cache, fake_api)
+        ldap.set_rule(u'admins_ssh', memberuser_group=[u'admins'])
+        assert rule_names(cache, fake_api) == [
+            (u'admins_ssh', True), (u'allow_all', True),
+        ]
+        ldap.set_rule(u'web', hostcategory=[u'all'])
+        assert len(rule_names(cache, fake_api)) == 3
+        ldap.delete_rule(u'allow_all')
+        ldap.delete_rule(u'admins_ssh')
+        assert rule_names(cache, fake_api) == [(u'web', True)]
+        ldap.delete_rule(u'web')
+        assert rule_names(cache, fake_api) == []
+        assert fake_api.compiled == [None] * 5
+
+    def test_no_usn(self, cache, fake_api, ldap):
+        ldap.lastusn = None
+        rule_names(cache, fake_api)
+        rule_names(cache, fake_api)
+        assert ldap.searches == 2
+        assert fake_api.compiled == [None]
+
+        ldap.set_rule(u'allow_all', enabled=False)
+        assert (u'allow_all', False) in rule_names(cache, fake_api)
+        assert fake_api.compiled == [None, None]
+
+    def test_principals(self, cache, fake_api, ldap, monkeypatch):
+        monkeypatch.setattr(context, 'principal', u'admin@IPA.TEST',
+                            raising=False)
+        rule_names(cache, fake_api)
+        rule_names(cache, fake_api)
+        # other principals may see other rules
+        monkeypatch.setattr(context, 'principal', u'alice@IPA.TEST')
+        rule_names(cache, fake_api)
+        assert fake_api.compiled == [None, None]
+
+
+class FakeHBACTest:
+    get_user = hbactest.BaseHBACTest.get_user
+    get_targethost = hbactest.BaseHBACTest.get_targethost
+    get_groups = hbactest.BaseHBACTest.get_groups
+    canonicalize = hbactest.BaseHBACTest.canonicalize
+
+    def __init__(self, api):
+        self.api = api
+        self.env = api.env
+
+
+def test_groups(fake_api, ldap, monkeypatch):
+    monkeypatch.setattr(hbactest, '_dcerpc_bindings_installed', False,
+                        raising=False)
+    user_dn = DN(('uid', u'alice'), api.env.container_user, api.env.basedn)
+    host_dn = DN(('fqdn', u'web.%s' % api.env.domain),
+                 api.env.container_host, api.env.basedn)
+    ldap.entries[user_dn] = [
+        group_dn(u'ipausers'), group_dn(u'admins'), rule_dn(u'admins_ssh'),
+        DN(('cn', u'User Administrator'), api.env.container_rolegroup,
+           api.env.basedn),
+    ]
+    ldap.entries[host_dn] = [hostgroup_dn(u'webservers')]
+    ldap.entries[DN(('uid', u'bob'), api.env.container_user,
+                    api.env.basedn)] = []
+
+    command = FakeHBACTest(fake_api)
+    # the memberOf values name the nested groups too
+    assert command.get_user(u'alice') == (
+        u'alice', [u'admins', u'ipausers'])
+    assert command.get_user(u'bob') == (u'bob', [])
+    assert command.get_user(u'carol') == (u'carol', None)
+    assert command.get_user(u'all') == (None, None)
+    assert command.get_targethost(u'web') == (
+        u'web.%s' % api.env.domain, [u'webservers'])
+    assert command.get_targethost(u'db.%s' % api.env.domain) == (
+        u'db.%s' % api.env.domain, None)
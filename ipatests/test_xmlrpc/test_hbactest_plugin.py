@@ -200,6 +200,44 @@ class test_hbactest(XMLRPC_test):
                 nodetail=True
             )
 
+    def test_f_hbactest_bulk(self):
+        """
+        Test running 'ipa hbactest-bulk' for several users and hosts
+        """
+        ret = api.Command['hbactest_bulk'](
+            user=[self.test_user, u'admin'],
+            targethost=[self.test_host, self.test_sourcehost],
+            service=[self.test_service],
+            rules=self.rule_names
+        )
+        assert ret['count'] == 4
+        decisions = {
+            (r['user'], r['targethost'], r['service']): r['value']
+            for r in ret['result']
+        }
+        assert len(decisions) == 4
+        for (user, targethost, service), value in decisions.items():
+            single = api.Command['hbactest'](
+                user=user,
+                targethost=targethost,
+                service=service,
+                rules=self.rule_names,
+                nodetail=True
+            )
+            assert single['value'] == value
+
+    def test_f_hbactest_bulk_non_existing_rule(self):
+        """
+        Test running 'ipa hbactest-bulk' with non-existing rule in --rules
+        """
+        with pytest.raises(errors.NotFound):
+            api.Command['hbactest_bulk'](
+                user=[self.test_user],
+                targethost=[self.test_host],
+                service=[self.test_service],
+                rules=[u'%s_1x1' % rule for rule in self.rule_names]
+            )
+
     def test_g_hbactest_clear_testing_data(self):
         """
         Clear data for HBAC test plugin testing.